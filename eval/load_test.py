@@ -0,0 +1,416 @@
+"""
+Household Ledger AI 부하 테스트 모듈
+eval/dataset/test_set.json 질문으로 만든 가중치 기반 합성 질문 믹스를 /api/v1/analyze에 반복 전송하며,
+단계별로 동시 사용자 수(closed-loop) 또는 도착률(open-loop)을 높여 처리량, 지연 시간 분위수, 오류율과
+포화 지점(처리량이 더 늘지 않거나 오류/지연이 허용치를 넘는 단계)을 측정합니다.
+결과는 Markdown/JSON 리포트와 커밋별 이력(JSON)으로 저장되어 릴리스 간 수용량을 비교할 수 있습니다.
+"""
+
+import asyncio
+import argparse
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import time
+import logging
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+import httpx
+import numpy as np
+
+# 로그 설정
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+# 요청마다 찍히는 httpx 접근 로그가 단계 요약을 가리지 않도록 낮춤
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+REPORT_DIR = "eval/reports"
+HISTORY_DIR = "eval/reports/load_history"
+TEST_SET_PATH = "eval/dataset/test_set.json"
+ANALYZE_PATH = "/api/v1/analyze"
+PERCENTILES = (50, 90, 99)
+
+# 실제 트래픽은 대부분 정상 조회이므로 보안 공격 케이스의 기본 비중을 낮춤 (--weight로 변경 가능)
+DEFAULT_CATEGORY_WEIGHTS = {"Security-Malicious": 0.25, "Security-Injection": 0.25}
+
+# 합성 변형: 기간/개수 표현을 바꿔 같은 케이스라도 결과 캐시 키가 달라지도록 함
+QUESTION_VARIATIONS = [
+    (re.compile(r"이번 달"), ["이번 달", "지난달", "최근 3개월", "올해"]),
+    (re.compile(r"(\d+)개"), ["3개", "5개", "10개"]),
+    (re.compile(r"^최근 "), ["최근 ", "요즘 "]),
+]
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {f"p{p}": 0.0 for p in PERCENTILES}
+    return {f"p{p}": float(v) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+
+def parse_weights(items: List[str]) -> Dict[str, float]:
+    """'카테고리=가중치' 또는 '케이스ID=가중치' 목록을 dict로 변환합니다."""
+    weights = dict(DEFAULT_CATEGORY_WEIGHTS)
+    for item in items or []:
+        key, _, value = item.partition("=")
+        if not value:
+            raise ValueError(f"가중치 형식 오류: {item} (예: Aggregate=3)")
+        weights[key.strip()] = float(value)
+    return weights
+
+class QuestionMix:
+    """
+    테스트 셋 케이스를 가중치에 따라 뽑고, 선택적으로 기간/개수 표현을 바꾼 합성 질문을 만듭니다.
+    케이스 가중치는 ID 지정값 > 카테고리 지정값 > 1.0 순으로 적용됩니다. (seed 고정 시 재현 가능)
+    """
+
+    def __init__(self, test_set: List[Dict[str, Any]], weights: Optional[Dict[str, float]] = None,
+                 variants: bool = True, seed: int = 42):
+        weights = weights if weights is not None else dict(DEFAULT_CATEGORY_WEIGHTS)
+        self.cases = [c for c in test_set if weights.get(c["id"], weights.get(c.get("category"), 1.0)) > 0]
+        if not self.cases:
+            raise ValueError("가중치가 0보다 큰 케이스가 없습니다.")
+        self.weights = [weights.get(c["id"], weights.get(c.get("category"), 1.0)) for c in self.cases]
+        self.variants = variants
+        self.rng = random.Random(seed)
+
+    def _vary(self, question: str) -> str:
+        for pattern, replacements in QUESTION_VARIATIONS:
+            if pattern.search(question):
+                question = pattern.sub(self.rng.choice(replacements), question, count=1)
+        return question
+
+    def sample(self) -> Tuple[Dict[str, Any], str]:
+        case = self.rng.choices(self.cases, weights=self.weights, k=1)[0]
+        question = self._vary(case["question"]) if self.variants else case["question"]
+        return case, question
+
+    def shares(self) -> Dict[str, float]:
+        total = sum(self.weights)
+        return {c["id"]: w / total for c, w in zip(self.cases, self.weights)}
+
+class StageRecorder:
+    """한 단계(동시 사용자 수 또는 도착률) 동안의 요청 결과를 모읍니다."""
+
+    def __init__(self, level: float):
+        self.level = level
+        self.latencies: List[float] = []
+        self.outcomes: Counter = Counter()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def begin(self):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def end(self, outcome: str, latency: Optional[float] = None):
+        self.in_flight -= 1
+        self.outcomes[outcome] += 1
+        if latency is not None and outcome in ("ok", "blocked"):
+            self.latencies.append(latency)
+
+    def summary(self) -> Dict[str, Any]:
+        completed = self.outcomes["ok"] + self.outcomes["blocked"]
+        total = sum(self.outcomes.values())
+        errors = total - completed - self.outcomes["dropped"]
+        return {
+            "level": self.level,
+            "requests": total,
+            "completed": completed,
+            "errors": errors,
+            "dropped": self.outcomes["dropped"],
+            "outcomes": dict(self.outcomes),
+            "error_rate": (errors + self.outcomes["dropped"]) / total if total else 0.0,
+            "throughput_rps": completed / self.elapsed if self.elapsed > 0 else 0.0,
+            "max_in_flight": self.max_in_flight,
+            "latency": {
+                "mean": float(np.mean(self.latencies)) if self.latencies else 0.0,
+                "max": max(self.latencies, default=0.0),
+                **percentiles(self.latencies)
+            },
+            "duration": self.elapsed
+        }
+
+def classify(case: Dict[str, Any], status: int) -> str:
+    """
+    응답 상태를 결과 종류로 분류합니다.
+    보안 케이스(should_block)의 400은 가드레일이 정상 동작한 것이므로 오류가 아닌 'blocked'로 봅니다.
+    """
+    if 200 <= status < 300:
+        return "ok"
+    if status == 400 and case.get("should_block"):
+        return "blocked"
+    return f"http_{status}"
+
+class LoadRunner:
+    """/api/v1/analyze에 질문 믹스를 전송하는 부하 생성기 (closed-loop / open-loop)"""
+
+    def __init__(self, client: httpx.AsyncClient, mix: QuestionMix, user_pool: int = 1000,
+                 think_time: float = 0.0, max_in_flight: int = 512):
+        self.client = client
+        self.mix = mix
+        self.user_pool = max(1, user_pool)
+        self.think_time = think_time
+        self.max_in_flight = max_in_flight
+        self.seq = 0
+
+    async def send(self, recorder: StageRecorder, scheduled: Optional[float] = None):
+        """
+        요청 1건 전송. open-loop에서는 예정 도착 시각(scheduled)부터 지연을 재서
+        서버가 밀릴 때 대기한 시간도 지연에 포함합니다. (coordinated omission 방지)
+        """
+        case, question = self.mix.sample()
+        self.seq += 1
+        # user_id 풀이 작을수록 같은 사용자의 반복 질문이 늘어 결과 캐시 적중률이 높아짐
+        payload = {
+            "user_id": f"load_user_{self.seq % self.user_pool}",
+            "session_id": f"load_{self.seq}",
+            "question": question
+        }
+        start = scheduled if scheduled is not None else time.perf_counter()
+        recorder.begin()
+        try:
+            response = await self.client.post(ANALYZE_PATH, json=payload)
+            outcome = classify(case, response.status_code)
+        except httpx.TimeoutException:
+            outcome = "timeout"
+        except httpx.HTTPError as e:
+            logger.debug(f"요청 실패: {e}")
+            outcome = "connection_error"
+        recorder.end(outcome, time.perf_counter() - start)
+
+    async def closed_loop(self, users: int, duration: float) -> StageRecorder:
+        """가상 사용자 users명이 응답을 받는 즉시(think_time 후) 다음 질문을 보냅니다."""
+        recorder = StageRecorder(users)
+        deadline = recorder.started + duration
+
+        async def user():
+            while time.perf_counter() < deadline:
+                await self.send(recorder)
+                if self.think_time:
+                    await asyncio.sleep(self.think_time)
+
+        await asyncio.gather(*(user() for _ in range(int(users))))
+        recorder.elapsed = time.perf_counter() - recorder.started
+        return recorder
+
+    async def open_loop(self, rate: float, duration: float, rng: random.Random) -> StageRecorder:
+        """
+        응답과 무관하게 초당 rate건의 포아송 도착으로 요청을 보냅니다.
+        진행 중인 요청이 max_in_flight를 넘으면 보내지 않고 'dropped'로 기록합니다.
+        """
+        recorder = StageRecorder(rate)
+        tasks = []
+        next_at = recorder.started
+        deadline = recorder.started + duration
+        while True:
+            next_at += rng.expovariate(rate)
+            if next_at >= deadline:
+                break
+            await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+            if recorder.in_flight >= self.max_in_flight:
+                recorder.outcomes["dropped"] += 1
+                continue
+            tasks.append(asyncio.create_task(self.send(recorder, scheduled=next_at)))
+        await asyncio.gather(*tasks)
+        recorder.elapsed = time.perf_counter() - recorder.started
+        return recorder
+
+def find_saturation(stages: List[Dict[str, Any]], min_gain: float, max_error_rate: float,
+                    slo_p99: Optional[float] = None) -> Dict[str, Any]:
+    """
+    포화 지점을 찾습니다. 이전 최고 처리량 대비 증가율이 min_gain(%) 미만이거나,
+    오류율이 max_error_rate(%)를 넘거나, p99가 slo_p99(초)를 넘는 첫 단계가 포화 단계이고
+    그 직전 단계가 수용량(capacity)입니다.
+    """
+    best = None
+    for stage in stages:
+        reasons = []
+        if stage["error_rate"] * 100 > max_error_rate:
+            reasons.append(f"오류율 {stage['error_rate'] * 100:.1f}%")
+        if slo_p99 is not None and stage["latency"]["p99"] > slo_p99:
+            reasons.append(f"p99 {stage['latency']['p99']:.2f}s > SLO {slo_p99:.2f}s")
+        if best is not None and stage["throughput_rps"] < best["throughput_rps"] * (1 + min_gain / 100):
+            reasons.append(f"처리량 증가 {min_gain:.0f}% 미만 ({best['throughput_rps']:.2f} -> {stage['throughput_rps']:.2f} req/s)")
+        if reasons:
+            return {"saturated_at": stage["level"], "reasons": reasons,
+                    "capacity_level": best["level"] if best else None,
+                    "capacity_rps": best["throughput_rps"] if best else 0.0}
+        best = stage
+    return {"saturated_at": None, "reasons": [],
+            "capacity_level": best["level"] if best else None,
+            "capacity_rps": best["throughput_rps"] if best else 0.0}
+
+def check_regressions(summary: Dict[str, Any], baseline: Dict[str, Any],
+                      max_capacity_drop: float, max_latency_regression: float) -> List[str]:
+    """기준 실행 대비 수용량(처리량) 하락률과 같은 단계의 p99 증가율이 임계값을 넘는 항목을 반환합니다."""
+    problems = []
+    before_cap = baseline.get("saturation", {}).get("capacity_rps")
+    after_cap = summary["saturation"]["capacity_rps"]
+    if before_cap and after_cap < before_cap * (1 - max_capacity_drop / 100):
+        problems.append(f"수용량 {before_cap:.2f} -> {after_cap:.2f} req/s ({(after_cap / before_cap - 1) * 100:.0f}%)")
+    before_stages = {s["level"]: s for s in baseline.get("stages", [])}
+    for stage in summary["stages"]:
+        before = before_stages.get(stage["level"], {}).get("latency", {}).get("p99")
+        after = stage["latency"]["p99"]
+        if before and after > before * (1 + max_latency_regression / 100):
+            problems.append(f"단계 {stage['level']:g} p99 {before:.2f}s -> {after:.2f}s (+{(after / before - 1) * 100:.0f}%)")
+    return problems
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def save_report(summary: Dict[str, Any], report_dir: str = REPORT_DIR, history_dir: str = HISTORY_DIR,
+                regressions: Optional[List[str]] = None):
+    options = summary["options"]
+    unit = "동시 사용자" if options["mode"] == "closed" else "도착률(req/s)"
+    saturation = summary["saturation"]
+    if saturation["saturated_at"] is None:
+        verdict = "마지막 단계까지 포화 없음 (더 높은 단계로 재측정 필요)"
+    else:
+        verdict = f"{unit} {saturation['saturated_at']:g}에서 포화 ({', '.join(saturation['reasons'])})"
+    capacity = (f"{saturation['capacity_rps']:.2f} req/s ({unit} {saturation['capacity_level']:g})"
+                if saturation["capacity_level"] is not None else "측정 불가 (첫 단계부터 포화)")
+
+    report = f"""# 🚦 가계부 AI (Household Ledger) 부하 테스트 리포트
+> **일시:** {summary['run_at']} | **커밋:** {summary['revision']} | **대상:** {summary['target']}
+> **모드:** {options['mode']}-loop | **단계별 시간:** {options['stage_seconds']:g}s | **user_id 풀:** {options['user_pool']}
+
+## 1. 수용량
+* **수용량:** {capacity}
+* **포화 지점:** {verdict}
+
+## 2. 단계별 결과
+| {unit} | 요청 | 처리량 | p50 | p90 | p99 | 오류율 | 최대 동시 진행 |
+| :--- | :--- | :--- | :--- | :--- | :--- | :--- | :--- |
+"""
+    for s in summary["stages"]:
+        lat = s["latency"]
+        report += (f"| {s['level']:g} | {s['requests']} | {s['throughput_rps']:.2f} req/s | {lat['p50']:.2f}s | "
+                   f"{lat['p90']:.2f}s | {lat['p99']:.2f}s | {s['error_rate'] * 100:.1f}% | {s['max_in_flight']} |\n")
+
+    report += """
+## 3. 질문 믹스
+| 케이스 | 비중 |
+| :--- | :--- |
+"""
+    for case_id, share in summary["mix"].items():
+        report += f"| {case_id} | {share * 100:.1f}% |\n"
+
+    errors = Counter()
+    for s in summary["stages"]:
+        errors.update({k: v for k, v in s["outcomes"].items() if k not in ("ok", "blocked")})
+    if errors:
+        report += "\n## 4. 오류 유형\n" + "".join(f"* {k}: {v}건\n" for k, v in errors.most_common())
+    if regressions:
+        report += "\n## 5. 회귀 감지\n" + "".join(f"* ⚠️ {p}\n" for p in regressions)
+
+    os.makedirs(report_dir, exist_ok=True)
+    os.makedirs(history_dir, exist_ok=True)
+    report_path = os.path.join(report_dir, "load_test_report.md")
+    json_path = os.path.join(report_dir, "load_test_report.json")
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    history_path = os.path.join(history_dir, f"{stamp}_{summary['revision']}_{options['mode']}.json")
+    with open(report_path, "w", encoding="utf-8") as f:
+        f.write(report)
+    for path in (json_path, history_path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ 리포트 생성 완료: {report_path}, {json_path}, {history_path}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="가계부 AI /api/v1/analyze 부하 테스트")
+    parser.add_argument("--base-url", default="http://localhost:8001", help="API 서버 주소")
+    parser.add_argument("--in-process", action="store_true",
+                        help="서버 없이 household_ledger.main:app을 프로세스 안에서 호출 (ASGI)")
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed",
+                        help="closed: 동시 사용자 수 고정, open: 초당 도착률 고정 (포아송)")
+    parser.add_argument("--stages", default="1,2,4,8,16",
+                        help="단계별 동시 사용자 수(closed) 또는 초당 요청 수(open), 쉼표 구분")
+    parser.add_argument("--stage-seconds", type=float, default=30.0, help="단계별 측정 시간(초)")
+    parser.add_argument("--warmup-seconds", type=float, default=5.0, help="첫 단계 전 버리는 워밍업 시간(초)")
+    parser.add_argument("--test-set", default=TEST_SET_PATH, help="질문 믹스의 원본 케이스 JSON 경로")
+    parser.add_argument("--weight", action="append", default=[],
+                        help="케이스 비중 '카테고리=가중치' 또는 '케이스ID=가중치' (반복 지정 가능, 0이면 제외)")
+    parser.add_argument("--no-variants", action="store_true", help="기간/개수 표현을 바꾼 합성 질문을 만들지 않음")
+    parser.add_argument("--user-pool", type=int, default=1000, help="순환 사용할 user_id 수 (작을수록 캐시 적중 증가)")
+    parser.add_argument("--think-time", type=float, default=0.0, help="closed-loop 사용자의 요청 간 대기 시간(초)")
+    parser.add_argument("--max-in-flight", type=int, default=512, help="open-loop 최대 동시 진행 요청 수 (초과 시 dropped)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="요청 타임아웃(초)")
+    parser.add_argument("--seed", type=int, default=42, help="질문 선택/도착 간격 난수 시드")
+    parser.add_argument("--min-gain", type=float, default=5.0, help="포화 판정: 최소 처리량 증가율(%%)")
+    parser.add_argument("--max-error-rate", type=float, default=1.0, help="포화 판정: 허용 오류율(%%)")
+    parser.add_argument("--slo-p99", type=float, help="포화 판정: 허용 p99 지연(초)")
+    parser.add_argument("--report-dir", default=REPORT_DIR, help="리포트(Markdown/JSON) 저장 디렉터리")
+    parser.add_argument("--history-dir", default=HISTORY_DIR, help="커밋별 결과 JSON 저장 디렉터리")
+    parser.add_argument("--baseline", help="비교할 이전 부하 테스트 JSON 경로")
+    parser.add_argument("--max-capacity-drop", type=float, default=10.0, help="허용 수용량 하락률(%%)")
+    parser.add_argument("--max-latency-regression", type=float, default=20.0, help="허용 단계별 p99 증가율(%%)")
+    return parser.parse_args(argv)
+
+def build_client(args) -> httpx.AsyncClient:
+    timeout = httpx.Timeout(args.timeout)
+    if args.in_process:
+        # ASGITransport는 lifespan을 실행하지 않으므로 스키마 설명/분류기는 첫 요청 시 준비됨 (워밍업으로 제외)
+        from household_ledger.main import app
+        return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://ledger", timeout=timeout)
+    limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+    return httpx.AsyncClient(base_url=args.base_url, timeout=timeout, limits=limits)
+
+async def main(argv=None) -> int:
+    args = parse_args(argv)
+    levels = [float(v) for v in args.stages.split(",") if v.strip()]
+    with open(args.test_set, "r", encoding="utf-8") as f:
+        test_set = json.load(f)
+    mix = QuestionMix(test_set, parse_weights(args.weight), variants=not args.no_variants, seed=args.seed)
+    rng = random.Random(args.seed)
+
+    stages = []
+    async with build_client(args) as client:
+        runner = LoadRunner(client, mix, args.user_pool, args.think_time, args.max_in_flight)
+        if args.warmup_seconds > 0:
+            # 커넥션 풀/스키마 캐시/모델 로딩 비용을 측정에서 제외
+            await runner.closed_loop(max(1, int(levels[0])), args.warmup_seconds)
+        for level in levels:
+            if args.mode == "closed":
+                recorder = await runner.closed_loop(int(level), args.stage_seconds)
+            else:
+                recorder = await runner.open_loop(level, args.stage_seconds, rng)
+            stage = recorder.summary()
+            stages.append(stage)
+            logger.info(f"단계 {level:g}: {stage['throughput_rps']:.2f} req/s, "
+                        f"p99 {stage['latency']['p99']:.2f}s, 오류율 {stage['error_rate'] * 100:.1f}%")
+
+    summary = {
+        "run_at": datetime.now().isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "target": "in-process" if args.in_process else args.base_url,
+        "options": {k: getattr(args, k) for k in ("mode", "stages", "stage_seconds", "warmup_seconds",
+                                                   "user_pool", "think_time", "max_in_flight", "seed", "test_set")},
+        "mix": mix.shares(),
+        "stages": stages,
+        "saturation": find_saturation(stages, args.min_gain, args.max_error_rate, args.slo_p99)
+    }
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = check_regressions(summary, baseline, args.max_capacity_drop, args.max_latency_regression)
+        for problem in regressions:
+            logger.warning(f"회귀 감지: {problem}")
+
+    save_report(summary, args.report_dir, args.history_dir, regressions)
+    # 회귀가 있으면 CI에서 실패로 처리되도록 종료 코드 1 반환
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -1,29 +1,95 @@
 """
 Household Ledger AI 성능 평가 모듈
 가계부 분석 에이전트의 SQL 생성 정확도, 보안 차단율, 응답 지연 시간을 측정합니다.
+케이스를 동시에 실행(--concurrency)하고 반복(--repeat)하여 p50/p90/p99, 처리량, 노드별 소요 시간,
+LLM 토큰 수를 기록하며, Markdown 리포트와 함께 실행 간 비교용 JSON을 저장합니다.
+학습 경로(NL->SQL 템플릿, Few-shot 예시)는 실행마다 빈 저장소에서 시작하고(--learned-stores),
+지연 시간은 템플릿 적중/LLM 생성, Few-shot 사용 여부별로 나눠 보고합니다.
 """
 
 import asyncio
+import argparse
 import json
+import sys
 import time
 import os
 import logging
+from collections import defaultdict
 from datetime import datetime
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+from langchain_core.callbacks import AsyncCallbackHandler
 
 from household_ledger.graph.workflow import create_household_workflow
+from household_ledger.graph.sql_templates import sql_template_store
+from household_ledger.graph.nodes import redis_client
 from household_ledger.common.config import settings
+from household_ledger.infrastructure.few_shot_index import few_shot_index
+from household_ledger.infrastructure.telemetry import llm_token_usage
 
 # 로그 설정
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+REPORT_DIR = "eval/reports"
+TEST_SET_PATH = "eval/dataset/test_set.json"
+PERCENTILES = (50, 90, 99)
+# few_shot_index.format_examples가 생성 프롬프트에 넣는 예시 블록의 머리글
+FEW_SHOT_MARKER = "참고 예시 (유사한 과거 질문"
+PATH_LABELS = {"template": "템플릿 적중", "generated": "LLM 생성", "cache": "결과 캐시"}
+
+class CaseTrace(AsyncCallbackHandler):
+    """
+    케이스 1회 실행 동안의 노드별 소요 시간, LLM 토큰 수, Few-shot 예시 사용 여부를 기록하는 콜백입니다.
+    호출(config)마다 새로 만들어 전달하므로 동시 실행 중에도 케이스 간 값이 섞이지 않습니다.
+    """
+
+    def __init__(self):
+        self.node_seconds: Dict[str, float] = defaultdict(float)
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.few_shot = False
+        self._started: Dict[Any, tuple] = {}
+
+    async def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node")
+        # 노드 자체의 실행만 기록 (노드 내부의 하위 체인/라우팅 함수 제외)
+        if node and kwargs.get("name") == node:
+            self._started[run_id] = (node, time.perf_counter())
+
+    async def _finish(self, run_id):
+        started = self._started.pop(run_id, None)
+        if started:
+            node, start = started
+            self.node_seconds[node] += time.perf_counter() - start
+
+    async def on_chain_end(self, outputs, *, run_id, **kwargs):
+        await self._finish(run_id)
+
+    async def on_chain_error(self, error, *, run_id, **kwargs):
+        await self._finish(run_id)
+
+    async def on_chat_model_start(self, serialized, messages, **kwargs):
+        if any(FEW_SHOT_MARKER in str(m.content) for batch in messages for m in batch):
+            self.few_shot = True
+
+    async def on_llm_start(self, serialized, prompts, **kwargs):
+        if any(FEW_SHOT_MARKER in p for p in prompts):
+            self.few_shot = True
+
+    async def on_llm_end(self, response, **kwargs):
+        prompt, completion = llm_token_usage(response)
+        self.prompt_tokens += prompt
+        self.completion_tokens += completion
+
 class LedgerEvalManager:
     def __init__(self):
         self.results: List[Dict[str, Any]] = []
         self.total_cases: int = 0
         self.total_latency: float = 0.0
-        
+        self.wall_time: float = 0.0
+
         # 지표 카운터
         self.tp, self.fp, self.fn, self.tn = 0, 0, 0, 0
         self.sql_execution_count = 0
@@ -31,16 +97,17 @@ class LedgerEvalManager:
         self.security_cases = 0
         self.security_blocked = 0
 
-    def evaluate(self, case: Dict[str, Any], state: Dict[str, Any], latency: float):
+    def evaluate(self, case: Dict[str, Any], state: Dict[str, Any], latency: float,
+                 trace: Optional[CaseTrace] = None, run: int = 0):
         self.total_cases += 1
         self.total_latency += latency
-        
+
         error = state.get("error")
         # LedgerState의 키값인 sql_query와 sql_result를 참조합니다.
         sql = (state.get("sql_query") or "").upper()
         results = state.get("sql_result") or []
         is_security = case.get("should_block", False)
-        
+
         is_passed = False
         fail_reason = ""
 
@@ -58,11 +125,11 @@ class LedgerEvalManager:
             self.sql_execution_count += 1
             if not error:
                 self.sql_success_count += 1
-            
+
             if results and len(results) > 0:
                 expected_kws = case.get("expected_keywords", [])
                 found_kws = [k for k in expected_kws if k.upper() in sql]
-                
+
                 # 키워드 매칭률 50% 이상 시 합격
                 if not expected_kws or len(found_kws) >= len(expected_kws) * 0.5:
                     self.tp += 1
@@ -75,18 +142,45 @@ class LedgerEvalManager:
                 self.fn += 1
                 fail_reason = f"결과 없음 ({str(error)[:20] if error else 'Empty'})"
 
+        if state.get("is_cached"):
+            path = "cache"
+        else:
+            path = "template" if state.get("sql_template") else "generated"
+
         self.results.append({
             "id": case["id"],
+            "run": run,
+            "path": path,
+            "few_shot": trace.few_shot if trace else False,
             "status": "✅ PASS" if is_passed else "❌ FAIL",
+            "passed": is_passed,
             "latency": latency,
-            "reason": fail_reason
+            "reason": fail_reason,
+            "node_seconds": dict(trace.node_seconds) if trace else {},
+            "prompt_tokens": trace.prompt_tokens if trace else 0,
+            "completion_tokens": trace.completion_tokens if trace else 0
         })
 
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {f"p{p}": 0.0 for p in PERCENTILES}
+    return {f"p{p}": float(v) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+
+def latency_by(results: List[Dict[str, Any]], key: str) -> Dict[str, Dict[str, float]]:
+    """결과를 key 값(경로, Few-shot 사용 여부)별로 나눠 실행 수와 지연 시간 분위수를 계산합니다."""
+    groups: Dict[str, List[float]] = defaultdict(list)
+    for r in results:
+        groups[str(r[key]).lower()].append(r["latency"])
+    return {
+        name: {"runs": len(values), "mean": float(np.mean(values)), **percentiles(values)}
+        for name, values in sorted(groups.items())
+    }
+
 def calculate_metrics(manager: LedgerEvalManager):
     precision = manager.tp / (manager.tp + manager.fp) if (manager.tp + manager.fp) > 0 else 0
     recall = manager.tp / (manager.tp + manager.fn) if (manager.tp + manager.fn) > 0 else 0
     f1 = 2 * (precision * recall) / (precision + recall) if (precision + recall) > 0 else 0
-    
+
     return {
         "esr": (manager.sql_success_count / manager.sql_execution_count * 100) if manager.sql_execution_count > 0 else 0,
         "srr": (manager.security_blocked / manager.security_cases * 100) if manager.security_cases > 0 else 0,
@@ -94,12 +188,78 @@ def calculate_metrics(manager: LedgerEvalManager):
         "f1": f1 * 100
     }
 
-def save_report(manager: LedgerEvalManager):
-    metrics = calculate_metrics(manager)
-    avg_lat = manager.total_latency / manager.total_cases if manager.total_cases > 0 else 0
-    
+def summarize(manager: LedgerEvalManager, options: Dict[str, Any]) -> Dict[str, Any]:
+    """리포트/비교용 요약 (KPI, 지연 시간 분위수, 처리량, 노드별 시간, 케이스별 결과)"""
+    latencies = [r["latency"] for r in manager.results]
+    node_values: Dict[str, List[float]] = defaultdict(list)
+    for r in manager.results:
+        for node, seconds in r["node_seconds"].items():
+            node_values[node].append(seconds)
+
+    cases: Dict[str, Dict[str, Any]] = {}
+    for r in manager.results:
+        case = cases.setdefault(r["id"], {"id": r["id"], "runs": 0, "passed": 0, "latencies": [],
+                                          "prompt_tokens": 0, "completion_tokens": 0, "reason": r["reason"]})
+        case["runs"] += 1
+        case["passed"] += int(r["passed"])
+        case["latencies"].append(r["latency"])
+        case["prompt_tokens"] += r["prompt_tokens"]
+        case["completion_tokens"] += r["completion_tokens"]
+        if not r["passed"]:
+            case["reason"] = r["reason"]
+
+    return {
+        "run_at": datetime.now().isoformat(timespec="seconds"),
+        "model": settings.LLM_MODEL_NAME,
+        "options": options,
+        "kpi": calculate_metrics(manager),
+        "latency": {
+            "mean": float(np.mean(latencies)) if latencies else 0.0,
+            "max": max(latencies, default=0.0),
+            **percentiles(latencies)
+        },
+        # 템플릿 적중과 LLM 생성 경로의 지연 분포는 크게 달라 합산 분위수만으로는 비교가 어렵습니다
+        "paths": latency_by(manager.results, "path"),
+        "few_shot": latency_by(manager.results, "few_shot"),
+        "runs": manager.total_cases,
+        "wall_time": manager.wall_time,
+        "throughput_rps": manager.total_cases / manager.wall_time if manager.wall_time > 0 else 0.0,
+        "tokens": {
+            "prompt": sum(r["prompt_tokens"] for r in manager.results),
+            "completion": sum(r["completion_tokens"] for r in manager.results)
+        },
+        "nodes": {
+            node: {"mean": float(np.mean(values)), **percentiles(values), "calls": len(values)}
+            for node, values in sorted(node_values.items(), key=lambda kv: -sum(kv[1]))
+        },
+        "cases": [
+            {**{k: v for k, v in c.items() if k != "latencies"}, **percentiles(c["latencies"])}
+            for c in sorted(cases.values(), key=lambda c: c["id"])
+        ]
+    }
+
+def check_regressions(summary: Dict[str, Any], baseline: Dict[str, Any],
+                      max_latency_regression: float, max_acc_drop: float) -> List[str]:
+    """기준 실행(JSON) 대비 p90/p99 지연 증가율과 정확도 하락폭이 임계값을 넘는 항목을 반환합니다."""
+    problems = []
+    for key in ("p90", "p99"):
+        before, after = baseline.get("latency", {}).get(key), summary["latency"][key]
+        if before and after > before * (1 + max_latency_regression / 100):
+            problems.append(f"{key} 지연 시간 {before:.2f}s -> {after:.2f}s (+{(after / before - 1) * 100:.0f}%)")
+    before_acc = baseline.get("kpi", {}).get("acc")
+    if before_acc is not None and summary["kpi"]["acc"] < before_acc - max_acc_drop:
+        problems.append(f"정확도 {before_acc:.1f}% -> {summary['kpi']['acc']:.1f}%")
+    return problems
+
+def save_report(manager: LedgerEvalManager, summary: Optional[Dict[str, Any]] = None,
+                report_dir: str = REPORT_DIR, regressions: Optional[List[str]] = None):
+    summary = summary or summarize(manager, {})
+    metrics = summary["kpi"]
+    lat = summary["latency"]
+
     report = f"""# 📊 가계부 AI (Household Ledger) 성능 평가 리포트
 > **일시:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} | **모델:** {settings.LLM_MODEL_NAME}
+> **실행:** {summary['runs']}회 (동시 실행 {summary['options'].get('concurrency', 1)}, 반복 {summary['options'].get('repeat', 1)}) | **총 소요:** {summary['wall_time']:.2f}s
 
 ## 1. 핵심 KPI
 | 지표 | 수치 | 진단 |
@@ -107,40 +267,162 @@ def save_report(manager: LedgerEvalManager):
 | **SQL 성공률 (ESR)** | **{metrics['esr']:.1f}%** | 실행 가능한 쿼리 생성 능력 |
 | **보안 차단율 (SRR)** | **{metrics['srr']:.1f}%** | 위험 쿼리(DELETE 등) 방어 능력 |
 | **종합 정확도 (ACC)** | **{metrics['acc']:.1f}%** | 전체 케이스 성공 비중 |
-| **평균 응답 시간** | **{avg_lat:.2f}s** | 사용자 경험 지표 |
+| **평균 응답 시간** | **{lat['mean']:.2f}s** | 사용자 경험 지표 |
+| **p50 / p90 / p99** | **{lat['p50']:.2f}s / {lat['p90']:.2f}s / {lat['p99']:.2f}s** | 꼬리 지연 시간 |
+| **처리량** | **{summary['throughput_rps']:.2f} req/s** | 동시 실행 기준 |
+| **LLM 토큰** | **{summary['tokens']['prompt']:,} / {summary['tokens']['completion']:,}** | 프롬프트 / 생성 |
 
-## 2. 상세 내역
-| ID | 결과 | 시간 | 사유 |
+## 2. 노드별 소요 시간
+| 노드 | 평균 | p90 | 실행 수 |
 | :--- | :--- | :--- | :--- |
 """
-    for r in manager.results:
-        report += f"| {r['id']} | {r['status']} | {r['latency']:.2f}s | {r['reason']} |\n"
+    for node, stats in summary["nodes"].items():
+        report += f"| {node} | {stats['mean']:.2f}s | {stats['p90']:.2f}s | {stats['calls']} |\n"
+
+    report += f"""
+## 3. 학습 경로별 지연 시간
+> **학습 저장소:** {summary['options'].get('learned_stores', 'isolated')}
+
+| 구분 | 실행 수 | 평균 | p50 | p90 | p99 |
+| :--- | :--- | :--- | :--- | :--- | :--- |
+"""
+    groups = [(PATH_LABELS.get(name, name), stats) for name, stats in summary.get("paths", {}).items()]
+    groups += [("Few-shot 사용" if name == "true" else "Few-shot 미사용", stats)
+               for name, stats in summary.get("few_shot", {}).items()]
+    for label, stats in groups:
+        report += (f"| {label} | {stats['runs']} | {stats['mean']:.2f}s | {stats['p50']:.2f}s | "
+                   f"{stats['p90']:.2f}s | {stats['p99']:.2f}s |\n")
 
-    report_path = "eval/reports/ledger_eval_report.md"
-    os.makedirs(os.path.dirname(report_path), exist_ok=True)
+    report += """
+## 4. 상세 내역
+| ID | 결과 | p50 | p90 | 토큰 (프롬프트/생성) | 사유 |
+| :--- | :--- | :--- | :--- | :--- | :--- |
+"""
+    for c in summary["cases"]:
+        status = "✅ PASS" if c["passed"] == c["runs"] else f"❌ FAIL ({c['passed']}/{c['runs']})"
+        report += (f"| {c['id']} | {status} | {c['p50']:.2f}s | {c['p90']:.2f}s | "
+                   f"{c['prompt_tokens']:,}/{c['completion_tokens']:,} | {c['reason']} |\n")
+
+    if regressions:
+        report += "\n## 5. 회귀 감지\n" + "".join(f"* ⚠️ {p}\n" for p in regressions)
+
+    report_path = os.path.join(report_dir, "ledger_eval_report.md")
+    json_path = os.path.join(report_dir, "ledger_eval_report.json")
+    os.makedirs(report_dir, exist_ok=True)
     with open(report_path, "w", encoding="utf-8") as f:
         f.write(report)
-    print(f"\n✅ 리포트 생성 완료: {report_path}")
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ 리포트 생성 완료: {report_path}, {json_path}")
+
+def isolate_learned_stores(mode: str, namespace: str):
+    """
+    학습 경로(NL->SQL 템플릿, Few-shot 예시)를 평가 실행 단위로 격리합니다.
+    두 저장소는 Redis/테이블에 전역으로 쌓이므로 그대로 두면 이전 실행이 학습한 항목에 적중해 생성 경로 대신 적중 경로를 재게 됩니다.
+    - off: 두 경로를 끄고 LLM 생성 경로만 측정
+    - isolated: 실행별 네임스페이스(Redis 키, pgvector 테이블)의 빈 저장소에서 시작해 이번 실행이 학습한 항목만 적중
+    """
+    sql_template_store.clear()
+    if mode == "off":
+        settings.SQL_TEMPLATE_ENABLED = False
+        settings.FEW_SHOT_ENABLED = False
+        return
+    settings.SQL_TEMPLATE_KEY = f"{settings.SQL_TEMPLATE_KEY}:{namespace}"
+    settings.FEW_SHOT_KEY = f"{settings.FEW_SHOT_KEY}:{namespace}"
+    if few_shot_index.persistent:
+        few_shot_index.TABLE = f"{few_shot_index.TABLE}_{namespace}"
+        few_shot_index._ready = False
+    else:
+        few_shot_index.clear()
+
+async def reset_learned_stores(mode: str):
+    """격리된 저장소를 비웁니다. (워밍업이 학습한 항목 제거, 실행 종료 후 평가용 키/테이블 정리)"""
+    if mode == "off":
+        return
+    sql_template_store.clear()
+    try:
+        await redis_client.delete(settings.SQL_TEMPLATE_KEY, settings.FEW_SHOT_KEY)
+        if few_shot_index.persistent:
+            await few_shot_index.executor.execute(f"DROP TABLE IF EXISTS {few_shot_index.TABLE}")
+            few_shot_index._ready = False
+        else:
+            few_shot_index.clear()
+    except Exception as e:
+        logger.warning(f"평가용 학습 저장소 정리 실패: {e}")
 
-async def main():
+async def run_case(graph, case: Dict[str, Any], run: int, semaphore: asyncio.Semaphore):
+    """케이스 1회 실행. 반복 실행마다 user_id를 달리해 결과 캐시 적중 없이 전체 파이프라인을 측정합니다."""
+    async with semaphore:
+        trace = CaseTrace()
+        start = time.perf_counter()
+        try:
+            # LedgerState 초기값 설정
+            state = await graph.ainvoke({
+                "messages": [{"role": "user", "content": case["question"]}],
+                "user_id": f"eval_bot_{run}",
+                "session_id": f"eval_{case['id']}_{run}",
+                "retry_count": 0
+            }, config={"callbacks": [trace]})
+        except Exception as e:
+            logger.error(f"{case['id']} 실행 실패: {e}")
+            state = {"error": f"EXCEPTION: {e}"}
+        return case, state, time.perf_counter() - start, trace, run
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="가계부 AI 에이전트 성능 평가")
+    parser.add_argument("--test-set", default=TEST_SET_PATH, help="평가 케이스 JSON 경로")
+    parser.add_argument("--report-dir", default=REPORT_DIR, help="리포트(Markdown/JSON) 저장 디렉터리")
+    parser.add_argument("--concurrency", type=int, default=8, help="동시에 실행할 케이스 수 (1이면 순차 실행)")
+    parser.add_argument("--repeat", type=int, default=1, help="케이스별 반복 실행 횟수")
+    parser.add_argument("--warmup", type=int, default=0, help="측정 전 버리는 워밍업 실행 수 (앞쪽 케이스부터)")
+    parser.add_argument("--learned-stores", choices=("isolated", "off"), default="isolated",
+                        help="학습 템플릿/Few-shot 예시 처리 (isolated: 실행별 빈 저장소, off: 생성 경로만 측정)")
+    parser.add_argument("--baseline", help="비교할 이전 실행의 JSON 리포트 경로")
+    parser.add_argument("--max-latency-regression", type=float, default=20.0, help="허용 p90/p99 증가율(%%)")
+    parser.add_argument("--max-acc-drop", type=float, default=5.0, help="허용 정확도 하락폭(%%p)")
+    return parser.parse_args(argv)
+
+async def main(argv=None) -> int:
+    args = parse_args(argv)
     graph = create_household_workflow()
     manager = LedgerEvalManager()
 
-    test_set_path = "eval/dataset/test_set.json"
-    with open(test_set_path, "r", encoding="utf-8") as f:
+    with open(args.test_set, "r", encoding="utf-8") as f:
         test_set = json.load(f)
 
-    for case in test_set:
-        start = time.time()
-        # LedgerState 초기값 설정
-        state = await graph.ainvoke({
-            "messages": [{"role": "user", "content": case["question"]}],
-            "user_id": "eval_bot",
-            "retry_count": 0
-        })
-        manager.evaluate(case, state, time.time() - start)
+    isolate_learned_stores(args.learned_stores, f"eval_{datetime.now():%Y%m%d%H%M%S}_{os.getpid()}")
+    semaphore = asyncio.Semaphore(max(1, args.concurrency))
+    try:
+        if args.warmup:
+            # 커넥션 풀/스키마 캐시/모델 로딩 비용을 측정에서 제외 (워밍업이 학습한 템플릿/예시도 버림)
+            warmup_cases = [test_set[i % len(test_set)] for i in range(args.warmup)]
+            await asyncio.gather(*(run_case(graph, case, -1 - i, semaphore) for i, case in enumerate(warmup_cases)))
+            await reset_learned_stores(args.learned_stores)
+
+        start = time.perf_counter()
+        tasks = [run_case(graph, case, run, semaphore) for run in range(args.repeat) for case in test_set]
+        for finished in asyncio.as_completed(tasks):
+            case, state, latency, trace, run = await finished
+            manager.evaluate(case, state, latency, trace, run)
+        manager.wall_time = time.perf_counter() - start
+    finally:
+        await reset_learned_stores(args.learned_stores)
+
+    options = {"concurrency": args.concurrency, "repeat": args.repeat, "warmup": args.warmup,
+               "cases": len(test_set), "test_set": args.test_set, "learned_stores": args.learned_stores}
+    summary = summarize(manager, options)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = check_regressions(summary, baseline, args.max_latency_regression, args.max_acc_drop)
+        for problem in regressions:
+            logger.warning(f"회귀 감지: {problem}")
 
-    save_report(manager)
+    save_report(manager, summary, args.report_dir, regressions)
+    # 회귀가 있으면 CI에서 실패로 처리되도록 종료 코드 1 반환
+    return 1 if regressions else 0
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    sys.exit(asyncio.run(main()))
@@ -12,6 +12,14 @@ class Settings(BaseSettings):
     LLM_API_KEY: str = "token-needed"
     LLM_BASE_URL: str = "http://localhost:8000/v1"
     LLM_MODEL_NAME: str = "unsloth/Qwen2.5-Coder-7B-Instruct-bnb-4bit"
+    # 공유 HTTP 커넥션 풀 및 재시도 설정 (429/5xx 지수 백오프)
+    LLM_TIMEOUT_SECONDS: float = 60.0
+    LLM_MAX_CONNECTIONS: int = 50
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    LLM_KEEPALIVE_EXPIRY: float = 30.0
+    LLM_HTTP2: bool = True                  # h2 패키지가 설치된 경우에만 적용
+    LLM_MAX_RETRIES: int = 3
+    LLM_RETRY_BACKOFF_SECONDS: float = 0.5
     
     # --- [Database Configuration - PostgreSQL] ---
     DB_HOST: str = "localhost"
@@ -19,17 +27,84 @@ class Settings(BaseSettings):
     DB_USER: str = "user"
     DB_PASSWORD: str = "password"
     DB_NAME: str = "ledger_db"
+    # SQL 실행 백엔드: "threadpool"(동기 엔진 + 스레드 풀 오프로딩) 또는 "async"(asyncpg 비동기 엔진)
+    SQL_EXECUTION_BACKEND: str = "threadpool"
+    SQL_POOL_SIZE: int = 10
+    SQL_MAX_OVERFLOW: int = 10
+    SQL_POOL_TIMEOUT: int = 30
+    SQL_STATEMENT_TIMEOUT_MS: int = 15000   # 쿼리 단위 실행 제한 시간
+    SQL_STREAM_BATCH_SIZE: int = 1000       # 서버 사이드 커서 fetch 단위
+    # 스트리밍 응답의 sql_result 기본 형식: "records"(행 dict 리스트) 또는 "columnar"(컬럼별 값 리스트)
+    SQL_RESULT_FORMAT: str = "records"
+    # 결과 거버너: 한 번에 가져오는 최대 행 수 (LIMIT 주입 + fetchmany) 및 다음 페이지 토큰 유지 시간(초)
+    SQL_MAX_RESULT_ROWS: int = 1000
+    SQL_PAGE_TOKEN_TTL_SECONDS: int = 600
+    # 로컬 SQL 검증 후 EXPLAIN으로 실행 계획/비용까지 확인할지 여부 (0 = 비용 제한 없음)
+    SQL_VALIDATE_WITH_EXPLAIN: bool = False
+    SQL_MAX_PLAN_COST: float = 0.0
+    # 집계 쿼리를 사전 집계(롤업) 테이블 조회로 재작성할지 여부
+    SQL_ROLLUP_REWRITE: bool = True
+    # SQL 생성 프롬프트의 데이터 요약: 상위 가맹점 수 및 통계 조회 실패 시 재시도 간격(초)
+    SCHEMA_CONTEXT_TOP_MERCHANTS: int = 10
+    SCHEMA_CONTEXT_RETRY_SECONDS: float = 30.0
+    
+    # 분석 프롬프트 데이터 크기 상한: 이 행 수/문자 수 이하는 원본, 초과 시 통계 요약(상위 N행, 그룹 합계) 사용
+    ANALYZER_MAX_ROWS: int = 50
+    ANALYZER_MAX_DATA_CHARS: int = 4000
+    ANALYZER_TOP_N: int = 10
+    # 결과 기반 차트 최대 점(막대) 수 (초과 시 월 단위 합산 또는 상위 N + 나머지)
+    CHART_MAX_POINTS: int = 30
     
     # --- [Cache Configuration - Redis] ---
     REDIS_HOST: str = "localhost"
     REDIS_PORT: int = 6379
+    # 분석 결과 캐시 TTL(초) 및 데이터 버전 키 (적재 시 증가시켜 기존 캐시를 무효화)
+    CACHE_TTL_SECONDS: int = 300
+    CACHE_DATA_VERSION_KEY: str = "ledger_data_version"
+
+    # --- [Intent Router Configuration] ---
+    # 로컬 분류기(규칙 + TF-IDF) 신뢰도가 임계값 이상이면 LLM 라우터 호출을 생략 (1.0 초과 시 항상 LLM 사용)
+    INTENT_FAST_PATH_THRESHOLD: float = 0.85
+    # LLM 라우팅 결과 기록(Redis 리스트) 및 학습 예시 상한, 재학습 주기(건)
+    INTENT_ROUTE_LOG_KEY: str = "ledger_route_log"
+    INTENT_MAX_EXAMPLES: int = 5000
+    INTENT_REFIT_EVERY: int = 20
+    # NL->SQL 템플릿: 성공한 SQL 질문을 슬롯(기간/카테고리/가맹점/개수) 템플릿으로 학습해 같은 형태의 질문은 LLM 없이 처리
+    SQL_TEMPLATE_ENABLED: bool = True
+    SQL_TEMPLATE_KEY: str = "ledger_sql_templates"
+    SQL_TEMPLATE_MAX: int = 500
+    # 검색 기반 Few-shot: 검증된 과거 질문->SQL/Cypher 쌍 중 유사한 상위 K개를 생성 프롬프트에 예시로 포함
+    # (백엔드: numpy = 프로세스 내 brute-force + Redis 저장, pgvector = PostgreSQL vector 확장)
+    FEW_SHOT_ENABLED: bool = True
+    FEW_SHOT_BACKEND: str = "numpy"
+    FEW_SHOT_TOP_K: int = 3
+    FEW_SHOT_MIN_SCORE: float = 0.3
+    FEW_SHOT_DIM: int = 512
+    FEW_SHOT_MAX_EXAMPLES: int = 5000
+    FEW_SHOT_KEY: str = "ledger_few_shot_examples"
+
+    # --- [Observability] ---
+    # 노드별 지연 시간/LLM 토큰/SQL 실행 메트릭 수집(/metrics) 및 OpenTelemetry span 기록 (opentelemetry-api 필요)
+    METRICS_ENABLED: bool = True
+    OTEL_TRACING_ENABLED: bool = False
 
     # --- [Knowledge Graph Configuration - Neo4j] ---
     # Bolt 프로토콜을 사용한 그래프 DB 연결 설정
     NEO4J_URI: str = "bolt://localhost:7687"
     NEO4J_USER: str = "neo4j"
     NEO4J_PASSWORD: str = "password"
+    NEO4J_QUERY_TIMEOUT_SECONDS: float = 10.0
     
+    # --- [Ingestion Configuration] ---
+    # CSV 청크 단위 COPY 적재 행 수 (메모리 사용량 상한)
+    INGEST_CHUNK_SIZE: int = 100_000
+    # 가맹점 카테고리 분류: 프롬프트 1회당 가맹점 수 및 동시 LLM 요청 수
+    CATEGORY_BATCH_SIZE: int = 50
+    CATEGORY_MAX_CONCURRENCY: int = 8
+    # Neo4j 벌크 적재: UNWIND 배치 크기 및 병렬 세션 수 (1 = 순차 적재)
+    NEO4J_BATCH_SIZE: int = 5000
+    NEO4J_LOAD_WORKERS: int = 4
+
     # --- [Application Settings] ---
     DATA_PATH: str = "data/"
     RUN_MANUAL_TESTS: bool = False
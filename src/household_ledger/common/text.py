@@ -0,0 +1,9 @@
+from collections import Counter
+
+def char_ngrams(text: str) -> Counter:
+    """
+    한국어 조사/어미 변화에 강하도록 공백 포함 문자 2~3-gram을 셉니다.
+    의도 분류기(TF-IDF)와 Few-shot 예시 임베딩이 같은 토큰화를 쓰도록 한곳에 둡니다.
+    """
+    t = f" {' '.join(text.lower().split())} "
+    return Counter(t[i:i + n] for n in (2, 3) for i in range(len(t) - n + 1))
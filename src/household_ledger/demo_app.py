@@ -3,7 +3,6 @@ import httpx
 import pandas as pd
 import uuid
 import json
-import re
 import os
 
 # --- [SECTION: Configuration - 환경 설정] ---
@@ -38,24 +37,56 @@ with st.sidebar:
 
 # --- [SECTION: Utility Functions - 유틸리티 함수] ---
 
-def parse_analysis_and_chart(text):
-    """분석 텍스트에서 [CHART_JSON] 태그를 찾아 분리합니다."""
-    chart_pattern = r"\[CHART_JSON\]\s*(\{.*\})"
-    match = re.search(chart_pattern, text, re.DOTALL)
-    if match:
-        clean_text = text.replace(match.group(0), "").strip()
-        try:
-            chart_data = json.loads(match.group(1))
-            return clean_text, chart_data
-        except:
-            return clean_text, None
-    return text, None
+def render_chart(chart):
+    """백엔드가 결과 컬럼으로 생성한 chart_data를 렌더링합니다. (pie는 막대 차트로 표시)"""
+    if not chart or not chart.get("data"):
+        return
+    chart_df = pd.DataFrame(chart["data"]).set_index(chart["x"])[chart["y"]]
+    if chart["type"] == "line":
+        st.line_chart(chart_df)
+    else:
+        st.bar_chart(chart_df)
+
+def result_frame(data):
+    """done 응답의 sql_result를 result_format(records/columnar)에 맞춰 데이터프레임으로 변환합니다."""
+    result = data.get("sql_result")
+    if not result:
+        return None
+    if data.get("result_format") == "columnar":
+        return pd.DataFrame(dict(zip(result["columns"], result["data"])), columns=result["columns"])
+    return pd.DataFrame(result)
+
+def iter_sse_events(lines):
+    """SSE 응답 라인을 (event, data) 튜플로 변환합니다."""
+    event, data_lines = "message", []
+    for line in lines:
+        if line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data_lines.append(line[len("data:"):].strip())
+        elif line == "" and data_lines:
+            yield event, json.loads("\n".join(data_lines))
+            event, data_lines = "message", []
+
+# 노드 완료 이벤트를 진행 상황 문구로 변환
+NODE_LABELS = {
+    "refiner": lambda d: f"✏️ 정제된 질문: {d.get('refined_question')}",
+    "cache_check": lambda d: "⚡ 캐시 적중" if d.get("is_cached") else "🔎 캐시 미스 - 새로 분석합니다",
+    "router": lambda d: f"🧭 실행 경로: {d.get('next_step')}",
+    "sql_gen": lambda d: "🛠️ SQL 생성 완료",
+    "validate_sql": lambda d: f"⚠️ SQL 검증 실패: {d.get('error')}" if d.get("error") else
+        ("✅ SQL 검증 통과 (롤업 테이블로 재작성)" if d.get("sql_query") else "✅ SQL 검증 통과"),
+    "graph_gen": lambda d: "🛠️ Cypher 생성 완료",
+    "graph_exec": lambda d: f"🕸️ 그래프 조회: {d.get('row_count')}건",
+    "executor": lambda d: f"📄 SQL 조회: {d.get('row_count')}건",
+}
 
 # --- [SECTION: Chat Display - 대화창 표시] ---
 
 for msg in st.session_state.messages:
     with st.chat_message(msg["role"]):
         st.markdown(msg["content"])
+        render_chart(msg.get("chart"))
         # 저장된 데이터프레임이 있다면 표시
         if "data" in msg and msg["data"] is not None:
             st.dataframe(msg["data"], use_container_width=True)
@@ -68,59 +99,73 @@ if user_query := st.chat_input("질문을 입력하세요 (예: 이번 달 식
     with st.chat_message("user"):
         st.markdown(user_query)
 
-    # 2. 백엔드 API 호출
+    # 2. 백엔드 스트리밍 API 호출
     with st.chat_message("assistant"):
-        with st.spinner("백엔드 에이전트가 분석 중입니다..."):
-            try:
-                # [핵심] 백엔드 FastAPI의 /api/v1/analyze 엔드포인트 호출
-                response = httpx.post(
-                    f"{BACKEND_URL}/api/v1/analyze",
-                    json={
-                        "user_id": st.session_state.user_id,
-                        "session_id": st.session_state.session_id,
-                        "question": user_query
-                    },
-                    timeout=60.0 # LLM 추론 시간을 고려하여 넉넉히 설정
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    
-                    # 결과 파싱
-                    full_analysis = data.get("analysis", "")
-                    clean_text, chart_json = parse_analysis_and_chart(full_analysis)
-                    
-                    # 3. 분석 과정 (Debug Expander) 표시
-                    with st.expander("🔍 에이전트 분석 과정 보기"):
-                        st.write(f"**정제된 질문:** {data.get('refined_question')}")
-                        st.write(f"**실행 경로:** {data.get('next_step')}")
-                        if data.get("sql_query"):
-                            st.code(data["sql_query"], language="sql")
-                    
-                    # 4. 최종 결과 출력
-                    st.markdown(clean_text)
-                    
-                    # 차트 렌더링
-                    if chart_json and "data" in chart_json:
-                        st.info("📊 데이터 분석 시각화")
-                        chart_df = pd.DataFrame(chart_json["data"])
-                        st.bar_chart(chart_df.set_index(chart_df.columns[0]))
-                    
-                    # 5. 세션 상태에 메시지 추가 (결과 테이블 포함)
-                    # 백엔드 응답에 sql_result가 포함되어 있다면 데이터프레임으로 변환
-                    res_df = pd.DataFrame(data.get("sql_result")) if data.get("sql_result") else None
-                    
-                    st.session_state.messages.append({
-                        "role": "assistant",
-                        "content": clean_text,
-                        "data": res_df
-                    })
-                    
-                else:
+        status = st.status("백엔드 에이전트가 분석 중입니다...", expanded=False)
+        answer_box = st.empty()
+        streamed_text = ""
+        data = None
+        try:
+            # [핵심] /api/v1/analyze/stream 엔드포인트로 노드 진행 상황과 분석 토큰을 즉시 수신
+            with httpx.stream(
+                "POST",
+                f"{BACKEND_URL}/api/v1/analyze/stream",
+                json={
+                    "user_id": st.session_state.user_id,
+                    "session_id": st.session_state.session_id,
+                    "question": user_query,
+                    # 서버 기본값(SQL_RESULT_FORMAT)과 무관하게 행 단위 결과를 요청
+                    "result_format": "records"
+                },
+                timeout=httpx.Timeout(60.0, read=None) # 토큰 사이 대기는 제한하지 않음
+            ) as response:
+                if response.status_code != 200:
                     st.error(f"백엔드 서버 에러: {response.status_code}")
-                    
-            except Exception as e:
-                st.error(f"백엔드 연결 실패: {e}")
+                else:
+                    for event, payload in iter_sse_events(response.iter_lines()):
+                        if event == "node":
+                            label = NODE_LABELS.get(payload["node"])
+                            if label:
+                                status.write(label(payload))
+                            if payload.get("sql_query"):
+                                status.code(payload["sql_query"], language="sql")
+                        elif event == "token":
+                            # 분석 토큰 누적 렌더링
+                            streamed_text += payload["content"]
+                            answer_box.markdown(streamed_text + "▌")
+                        elif event == "done":
+                            data = payload
+                        elif event == "error":
+                            status.update(label="분석 실패", state="error")
+                            st.error(f"백엔드 서버 에러: {payload.get('detail')}")
+
+            if data is not None:
+                status.update(label="분석 완료", state="complete")
+
+                # 3. 최종 결과 출력
+                clean_text = data.get("analysis") or streamed_text
+                answer_box.markdown(clean_text)
+
+                # 차트 렌더링 (백엔드가 결과 컬럼으로 생성한 chart_data 사용)
+                chart = data.get("chart_data")
+                if chart:
+                    st.info("📊 데이터 분석 시각화")
+                    render_chart(chart)
+
+                # 4. 세션 상태에 메시지 추가 (결과 테이블 포함)
+                # 백엔드 응답에 sql_result가 포함되어 있다면 데이터프레임으로 변환
+                res_df = result_frame(data)
+
+                st.session_state.messages.append({
+                    "role": "assistant",
+                    "content": clean_text,
+                    "chart": chart,
+                    "data": res_df
+                })
+
+        except Exception as e:
+            status.update(label="분석 실패", state="error")
+            st.error(f"백엔드 연결 실패: {e}")
 
     # 화면 갱신을 위해 rerun 호출 (선택 사항)
     # st.rerun()
\ No newline at end of file
@@ -1,6 +1,6 @@
-from sqlalchemy import String, Numeric, Date, Time, ForeignKey, Text, BigInteger
+from sqlalchemy import String, Numeric, Date, Time, DateTime, ForeignKey, Text, BigInteger, Index, func
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
-from datetime import date, time
+from datetime import date, time, datetime
 from typing import Optional
 
 class Base(DeclarativeBase):
@@ -21,15 +21,24 @@ class Account(Base):
 class TransactionHistory(Base):
     """
     결제 상세 내역 모델 (transactions.csv 매핑)
+    transaction_date 기준 월별 RANGE 파티션 테이블입니다. (파티션은 적재 시 필요한 월만 생성)
     """
     __tablename__ = "transactions"
+    __table_args__ = (
+        # 생성 쿼리 대부분이 계좌 + 기간 조건이므로 복합 인덱스 사용
+        Index("ix_transactions_account_date", "account_id", "transaction_date"),
+        # 카테고리별 기간 합계는 인덱스만으로 처리 (Index Only Scan)
+        Index("ix_transactions_category_date", "category", "transaction_date", postgresql_include=["amount"]),
+        {"postgresql_partition_by": "RANGE (transaction_date)"},
+    )
     
+    # 파티션 테이블의 PK/유니크 제약에는 파티션 키가 포함되어야 합니다.
     transaction_id: Mapped[str] = mapped_column(String(50), primary_key=True)
     # Account 테이블과 연결되는 외래키
     account_id: Mapped[str] = mapped_column(String(50), ForeignKey("accounts.account_id"))
     
     # Microsoft 데이터셋 특성상 날짜와 시간이 분리되어 있습니다.
-    transaction_date: Mapped[date] = mapped_column(Date, index=True)
+    transaction_date: Mapped[date] = mapped_column(Date, primary_key=True, index=True)
     transaction_time: Mapped[Optional[time]] = mapped_column(Time)
     
     # 결제 금액 및 가맹점
@@ -37,10 +46,70 @@ class TransactionHistory(Base):
     merchant_id: Mapped[Optional[str]] = mapped_column(String(100), index=True)
     
     # [핵심] LLM이 가맹점명을 분석하여 채워넣을 카테고리 필드
-    category: Mapped[Optional[str]] = mapped_column(String(50), index=True)
+    category: Mapped[Optional[str]] = mapped_column(String(50))
     
     # 기타 분석용 필드
     transaction_type: Mapped[Optional[str]] = mapped_column(String(50))
     location: Mapped[Optional[str]] = mapped_column(String(255))
     country: Mapped[Optional[str]] = mapped_column(String(50))
-    currency: Mapped[Optional[str]] = mapped_column(String(10))
\ No newline at end of file
+    currency: Mapped[Optional[str]] = mapped_column(String(10))
+
+class MerchantCategory(Base):
+    """
+    가맹점별 LLM 카테고리 분류 결과 캐시
+    재적재 시 이미 분류된 가맹점은 LLM을 다시 호출하지 않습니다.
+    """
+    __tablename__ = "merchant_categories"
+
+    merchant_id: Mapped[str] = mapped_column(String(100), primary_key=True)
+    category: Mapped[str] = mapped_column(String(50))
+    classified_at: Mapped[Optional[datetime]] = mapped_column(DateTime, server_default=func.now())
+
+class IngestWatermark(Base):
+    """
+    원천 파일별 증분 적재 워터마크
+    이미 적재한 구간(byte_offset)의 체크섬이 같으면 파일 끝에 추가된 행만 읽습니다.
+    """
+    __tablename__ = "ingest_watermarks"
+    # 적재 관리용 테이블이므로 LLM 스키마 설명에서 제외
+    __table_args__ = {"info": {"internal": True}}
+
+    source: Mapped[str] = mapped_column(String(255), primary_key=True)
+    checksum: Mapped[str] = mapped_column(String(64))
+    byte_offset: Mapped[int] = mapped_column(BigInteger)
+    # 마지막으로 적재한 거래 시각 (파일이 통째로 교체된 경우 이후 거래만 적재하는 기준)
+    last_timestamp: Mapped[Optional[datetime]] = mapped_column(DateTime)
+    updated_at: Mapped[Optional[datetime]] = mapped_column(DateTime, server_default=func.now(), onupdate=func.now())
+
+class DailySpendRollup(Base):
+    """
+    계좌 × 일 × 카테고리 × 가맹점 단위 사전 집계 (적재 시 변경된 일자만 재계산)
+    transactions 원본 대신 합계/건수/최소/최대 집계를 빠르게 조회하기 위한 테이블입니다.
+    """
+    __tablename__ = "daily_spend_rollup"
+    __table_args__ = {"comment": "일별 지출 집계. transactions의 합계/건수/최소/최대 질문은 이 테이블이 훨씬 빠름"}
+
+    account_id: Mapped[str] = mapped_column(String(50), primary_key=True)
+    transaction_date: Mapped[date] = mapped_column(Date, primary_key=True)
+    category: Mapped[str] = mapped_column(String(50), primary_key=True)
+    merchant_id: Mapped[str] = mapped_column(String(100), primary_key=True)
+    total_amount: Mapped[float] = mapped_column(Numeric(18, 2), comment="SUM(amount)")
+    txn_count: Mapped[int] = mapped_column(BigInteger, comment="COUNT(*)")
+    min_amount: Mapped[float] = mapped_column(Numeric(15, 2), comment="MIN(amount)")
+    max_amount: Mapped[float] = mapped_column(Numeric(15, 2), comment="MAX(amount)")
+
+class MonthlySpendRollup(Base):
+    """
+    계좌 × 월 × 카테고리 × 가맹점 단위 사전 집계 (일별 집계에서 파생)
+    """
+    __tablename__ = "monthly_spend_rollup"
+    __table_args__ = {"comment": "월별 지출 집계. 월 단위 합계/건수 질문에 사용"}
+
+    account_id: Mapped[str] = mapped_column(String(50), primary_key=True)
+    spend_month: Mapped[date] = mapped_column(Date, primary_key=True, comment="해당 월의 1일")
+    category: Mapped[str] = mapped_column(String(50), primary_key=True)
+    merchant_id: Mapped[str] = mapped_column(String(100), primary_key=True)
+    total_amount: Mapped[float] = mapped_column(Numeric(18, 2), comment="SUM(amount)")
+    txn_count: Mapped[int] = mapped_column(BigInteger, comment="COUNT(*)")
+    min_amount: Mapped[float] = mapped_column(Numeric(15, 2), comment="MIN(amount)")
+    max_amount: Mapped[float] = mapped_column(Numeric(15, 2), comment="MAX(amount)")
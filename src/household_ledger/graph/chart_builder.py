@@ -0,0 +1,97 @@
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from household_ledger.common.config import settings
+from household_ledger.graph.result_values import (
+    Number, clip_value, numeric_columns, parse_datetime, primary_measure, result_columns
+)
+
+# 날짜 축으로 취급할 컬럼명 힌트
+_DATE_HINTS = ("date", "month", "day", "week", "year", "time", "period")
+# 파이 차트로 그릴 최대 항목 수 (단일 값, 비중 질문에 적합)
+_PIE_MAX_SLICES = 6
+_OTHERS_LABEL = "기타(나머지)"
+
+def _is_id(col: str) -> bool:
+    """식별자 성격의 숫자 컬럼은 값(series)으로 그리지 않음"""
+    name = str(col).lower()
+    return name == "id" or name.endswith("_id")
+
+def _is_periodic(col: str) -> bool:
+    return any(h in str(col).lower() for h in _DATE_HINTS)
+
+def _date_axis(rows: List[Dict[str, Any]], candidates: List[str]) -> Optional[str]:
+    for col in candidates:
+        if _is_periodic(col) and all(parse_datetime(row.get(col)) is not None for row in rows):
+            return col
+    return None
+
+def _sum_by(keys: List[Any], numeric: Dict[str, List[Optional[Number]]], series: List[str]) -> Dict[Any, Dict[str, Number]]:
+    """키별로 시리즈 컬럼 합계를 구합니다. (키가 None인 행은 제외, NULL 값은 0으로 취급)"""
+    groups: Dict[Any, Dict[str, Number]] = {}
+    for i, key in enumerate(keys):
+        if key is None:
+            continue
+        sums = groups.setdefault(key, dict.fromkeys(series, 0))
+        for col in series:
+            sums[col] += numeric[col][i] or 0
+    return groups
+
+def _to_points(x: str, groups: List[Tuple[Any, Dict[str, Number]]], fmt: Callable[[Any], Any] = lambda k: k):
+    return [{x: fmt(key), **sums} for key, sums in groups]
+
+def build_chart_data(rows: List[Dict[str, Any]], max_points: Optional[int] = None) -> Dict[str, Any]:
+    """
+    조회 결과의 컬럼 구성으로 차트 종류와 시리즈를 결정합니다. (LLM 없이 결정적으로 생성)
+    - 날짜 컬럼 + 숫자 컬럼 -> line (날짜순, 점이 많으면 월 단위 합산)
+    - 범주 컬럼 + 숫자 컬럼 -> bar (값 내림차순 상위 N개 + 나머지 합계), 항목이 적고 값이 하나면 pie
+    그릴 수 없으면 빈 dict를 반환합니다.
+    반환 형식: {"type", "x", "y": [시리즈 컬럼], "data": [{x: ..., y1: ...}, ...]}
+    """
+    max_points = max_points or settings.CHART_MAX_POINTS
+    if not rows or len(rows) < 2:
+        return {}
+    columns = result_columns(rows)
+    numeric = numeric_columns(rows, columns)
+    # 연도/월처럼 숫자여도 날짜 성격인 컬럼과 식별자는 축(차원)으로 사용
+    series = [c for c in numeric if not _is_id(c) and not _is_periodic(c)]
+    if not series:
+        return {}
+    dimensions = [c for c in columns if c not in series]
+
+    x = _date_axis(rows, [c for c in dimensions if c not in numeric])
+    periodic = next((c for c in dimensions if c in numeric and _is_periodic(c)), None)
+    if x is None and periodic is not None:
+        # EXTRACT(MONTH ...) 같은 숫자 기간 컬럼 -> 기간 순서대로 line
+        groups = sorted(_sum_by(numeric[periodic], numeric, series).items())
+        x, chart_type = periodic, "line"
+        data = _to_points(x, groups[-max_points:])
+    elif x is not None:
+        dates = [parse_datetime(row.get(x)) for row in rows]
+        groups = sorted(_sum_by(dates, numeric, series).items())
+        if len(groups) > max_points:
+            # 점이 너무 많으면 월 단위로 합산
+            monthly: Dict[datetime, Dict[str, Number]] = {}
+            for day, sums in groups:
+                bucket = monthly.setdefault(datetime(day.year, day.month, 1), dict.fromkeys(series, 0))
+                for col in series:
+                    bucket[col] += sums[col]
+            groups = sorted(monthly.items())[-max_points:]
+        chart_type = "line"
+        data = _to_points(x, groups, lambda d: d.strftime("%Y-%m-%d"))
+    else:
+        x = next((c for c in dimensions if not _is_id(c)), dimensions[0] if dimensions else None)
+        if x is None:
+            return {}
+        measure = primary_measure({c: numeric[c] for c in series})
+        groups = sorted(_sum_by([str(row.get(x)) for row in rows], numeric, series).items())
+        groups.sort(key=lambda item: item[1][measure], reverse=True)
+        if len(groups) > max_points:
+            # 상위 N-1개 + 나머지 합계
+            head, rest = groups[:max_points - 1], groups[max_points - 1:]
+            others = {c: sum(sums[c] for _, sums in rest) for c in series}
+            groups = head + [(_OTHERS_LABEL, others)]
+        chart_type = "pie" if len(series) == 1 and len(groups) <= _PIE_MAX_SLICES and "category" in str(x).lower() else "bar"
+        data = _to_points(x, groups)
+
+    return {"type": chart_type, "x": x, "y": series, "data": [{k: clip_value(v) for k, v in p.items()} for p in data]}
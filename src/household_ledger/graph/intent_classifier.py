@@ -0,0 +1,133 @@
+import re
+import json
+import math
+from collections import Counter, deque
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from household_ledger.common.config import settings
+from household_ledger.common.text import char_ngrams
+
+INTENTS = ("SQL", "GRAPH", "HYBRID", "GENERAL")
+
+# --- [1단계: 규칙 기반 분류] ---
+
+_GREETING = re.compile(r"^(안녕|하이|헬로|hi\b|hello|hey|반가워|고마워|감사|ㅎㅇ|도움말|help|뭐 할 수 있|넌 누구|누구야)")
+_RELATION = re.compile(r"(같은 카테고리|같은 업종|비슷한|유사한|관련된|연결된|관계|함께 이용|같이 이용|패턴이 비슷)")
+_AGGREGATE = re.compile(r"(얼마|합계|총\s*지출|총액|총\s*금액|평균|몇\s*(번|건|회|곳)|가장 많이|제일 많이|가장 큰|최대|최소|top\s*\d+|상위\s*\d+)", re.IGNORECASE)
+_PERIOD = re.compile(r"(이번\s*달|지난\s*달|저번\s*달|올해|작년|이번\s*주|지난\s*주|오늘|어제|\d+\s*월|\d{4}\s*년)")
+
+# 규칙이 확정적으로 맞는 경우의 신뢰도
+RULE_CONFIDENCE = {"GENERAL": 0.99, "SQL": 0.95, "HYBRID": 0.9, "GRAPH": 0.9}
+
+def rule_intent(question: str) -> Optional[str]:
+    """인사/기간+금액 질문처럼 형태가 분명한 질문을 규칙으로 분류합니다. (해당 없으면 None)"""
+    q = " ".join(question.lower().split())
+    relation, aggregate = _RELATION.search(q), _AGGREGATE.search(q)
+    if _GREETING.search(q) and not (relation or aggregate or _PERIOD.search(q)):
+        return "GENERAL"
+    if relation:
+        return "HYBRID" if aggregate else "GRAPH"
+    if aggregate:
+        return "SQL"
+    return None
+
+# --- [2단계: 라우팅 기록으로 학습하는 TF-IDF 분류기] ---
+
+# 학습 기록이 없을 때 사용하는 기본 예시 (라우터 프롬프트의 Few-shot과 동일한 성격)
+SEED_EXAMPLES: List[Tuple[str, str]] = [
+    ("이번 달 식비 얼마야?", "SQL"),
+    ("가장 많이 쓴 곳 3개 보여줘", "SQL"),
+    ("지난달 카테고리별 지출 합계", "SQL"),
+    ("작년 교통비 평균", "SQL"),
+    ("스타벅스와 같은 카테고리인 곳들 알려줘", "GRAPH"),
+    ("내 소비 패턴이랑 비슷한 가맹점은?", "GRAPH"),
+    ("이 가맹점과 연결된 계좌들", "GRAPH"),
+    ("스타벅스와 같은 카테고리에 있는 다른 가맹점들의 총 지출은?", "HYBRID"),
+    ("비슷한 가맹점들에서 쓴 금액 합계", "HYBRID"),
+    ("안녕", "GENERAL"),
+    ("가계부 잘 쓰는 법 알려줘", "GENERAL"),
+    ("고마워", "GENERAL"),
+]
+
+# 코사인 유사도를 확률처럼 보이도록 바꾸는 softmax 온도 (클수록 최상위 의도에 확신)
+SOFTMAX_SCALE = 10.0
+
+def _normalize(vec: Dict[str, float]) -> Dict[str, float]:
+    norm = math.sqrt(sum(v * v for v in vec.values()))
+    return {k: v / norm for k, v in vec.items()} if norm else {}
+
+class IntentPrediction(NamedTuple):
+    intent: str
+    confidence: float
+    source: str     # rule | tfidf | none
+
+class IntentClassifier:
+    """
+    LLM 라우터 앞단의 로컬 의도 분류기입니다.
+    규칙 -> TF-IDF 최근접 중심(centroid) 순으로 판단하며, 신뢰도가 임계값 미만이면 LLM 라우터를 사용합니다.
+    LLM 라우터의 결정은 add_example()로 학습 데이터에 추가되어 점점 더 많은 질문을 빠른 경로로 처리합니다.
+    """
+
+    def __init__(self, examples: Iterable[Tuple[str, str]] = SEED_EXAMPLES):
+        self.examples = deque(examples, maxlen=settings.INTENT_MAX_EXAMPLES)
+        self._idf: Dict[str, float] = {}
+        self._centroids: Dict[str, Dict[str, float]] = {}
+        self._pending = 0
+        self.fit()
+
+    def fit(self):
+        """현재 예시로 IDF와 의도별 중심 벡터를 다시 계산합니다."""
+        docs = [(char_ngrams(q), intent) for q, intent in self.examples if intent in INTENTS]
+        df = Counter(gram for grams, _ in docs for gram in grams)
+        n = len(docs)
+        self._idf = {gram: math.log((1 + n) / (1 + count)) + 1 for gram, count in df.items()}
+
+        sums: Dict[str, Counter] = {}
+        for grams, intent in docs:
+            vec = _normalize({g: c * self._idf[g] for g, c in grams.items()})
+            sums.setdefault(intent, Counter()).update(vec)
+        self._centroids = {intent: _normalize(dict(vec)) for intent, vec in sums.items()}
+        self._pending = 0
+
+    def add_example(self, question: str, intent: str):
+        """LLM 라우터가 결정한 경로를 학습 예시로 추가합니다. (INTENT_REFIT_EVERY건마다 재학습)"""
+        if intent not in INTENTS or not question.strip():
+            return
+        self.examples.append((question, intent))
+        self._pending += 1
+        if self._pending >= settings.INTENT_REFIT_EVERY:
+            self.fit()
+
+    def _predict_tfidf(self, question: str) -> IntentPrediction:
+        grams = char_ngrams(question)
+        vec = _normalize({g: c * self._idf[g] for g, c in grams.items() if g in self._idf})
+        if not vec or not self._centroids:
+            return IntentPrediction("GENERAL", 0.0, "none")
+        sims = {intent: sum(w * centroid.get(g, 0.0) for g, w in vec.items()) for intent, centroid in self._centroids.items()}
+        exps = {intent: math.exp(SOFTMAX_SCALE * s) for intent, s in sims.items()}
+        best = max(exps, key=exps.get)
+        return IntentPrediction(best, exps[best] / sum(exps.values()), "tfidf")
+
+    def predict(self, question: str) -> IntentPrediction:
+        intent = rule_intent(question)
+        if intent is not None:
+            return IntentPrediction(intent, RULE_CONFIDENCE[intent], "rule")
+        return self._predict_tfidf(question)
+
+    async def load_logged_routes(self, redis_client) -> int:
+        """Redis에 기록된 LLM 라우팅 결과를 학습 예시로 불러와 재학습합니다."""
+        raw = await redis_client.lrange(settings.INTENT_ROUTE_LOG_KEY, 0, settings.INTENT_MAX_EXAMPLES - 1)
+        loaded = 0
+        for item in reversed(raw or []):
+            try:
+                entry = json.loads(item)
+            except (TypeError, ValueError):
+                continue
+            if isinstance(entry, dict) and entry.get("intent") in INTENTS and entry.get("question"):
+                self.examples.append((entry["question"], entry["intent"]))
+                loaded += 1
+        self.fit()
+        return loaded
+
+# 싱글톤 객체 생성
+intent_classifier = IntentClassifier()
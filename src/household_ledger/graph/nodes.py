@@ -1,41 +1,51 @@
 import json
 import re
+import time
+import hashlib
 import logging
-import pandas as pd
 from datetime import datetime
-from sqlalchemy import create_engine, text, inspect
-from neo4j import GraphDatabase
-from langchain_openai import ChatOpenAI
 from household_ledger.graph.state import LedgerState
 from household_ledger.common.config import settings
-from household_ledger.domain import models
+from household_ledger.graph.sql_validator import check_select_sql, find_bind_params
+from household_ledger.graph.rollup_planner import rewrite_for_rollup
+from household_ledger.graph.intent_classifier import intent_classifier
+from household_ledger.graph.result_digest import build_result_digest
+from household_ledger.graph.chart_builder import build_chart_data
+from household_ledger.graph.result_governor import PAGE_KEY_PREFIX, apply_row_limit, new_page_token
+from household_ledger.graph.sql_templates import sql_template_store
+from household_ledger.graph.query_slots import (
+    extract_slots, format_history, is_self_contained, parse_history_entry, rewrite_followup
+)
+from household_ledger.infrastructure.sql_executor import GENERATED_QUERY_TAG, sql_executor
+from household_ledger.infrastructure.result_codec import dumps_text
+from household_ledger.infrastructure.llm_client import llm_registry
+from household_ledger.infrastructure.neo4j_client import neo4j_client
+from household_ledger.infrastructure.schema_context import describe_models, schema_context
+from household_ledger.infrastructure.few_shot_index import few_shot_index, format_examples
 import redis.asyncio as redis
 
 # 로깅 및 DB 엔진 설정
 logger = logging.getLogger(__name__)
-sql_engine = create_engine(f"postgresql://{settings.DB_USER}:{settings.DB_PASSWORD}@{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}")
+# SQL 실행은 풀링된 비동기 실행기(sql_executor)를 통해 이벤트 루프 밖에서 수행합니다.
+sql_engine = sql_executor.engine
 redis_client = redis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, decode_responses=True)
 
+# 분석 결과 캐시 적중/미스 카운터 (프로세스 단위)
+cache_stats = {"hit": 0, "miss": 0}
+# 라우터 빠른 경로(로컬 분류기) / LLM 라우터 처리 횟수
+router_stats = {"fast_path": 0, "llm": 0}
+# NL->SQL 템플릿 적중/미스/학습/실행 실패(LLM 생성으로 대체) 횟수
+template_stats = {"hit": 0, "miss": 0, "learned": 0, "fallback": 0}
+
 # --- [Utility Functions] ---
 
 def get_llm():
-    """LLM 객체를 지연 로딩하여 테스트 수집 시 api_key 에러를 방지합니다."""
-    return ChatOpenAI(
-        model=settings.LLM_MODEL_NAME,
-        base_url=settings.LLM_BASE_URL,
-        api_key=settings.LLM_API_KEY or "none",
-        temperature=0
-    )
+    """공유 커넥션 풀을 사용하는 LLM 객체를 반환합니다. (호출마다 새로 생성하지 않음)"""
+    return llm_registry.get_chat_model()
 
 def get_dynamic_schema_info() -> str:
-    """SQLAlchemy 모델에서 가계부 테이블 정보를 동적으로 추출합니다."""
-    schema_info = []
-    for name, obj in vars(models).items():
-        if isinstance(obj, type) and hasattr(obj, "__tablename__") and obj != models.Base:
-            inst = inspect(obj)
-            columns = [f"- {col.name} ({col.type})" for col in inst.columns]
-            schema_info.append(f"Table: {obj.__tablename__}\nColumns:\n" + "\n".join(columns))
-    return "\n\n".join(schema_info)
+    """SQLAlchemy 모델에서 가계부 테이블 정보를 추출합니다. (데이터 요약 없이 모델 스키마만)"""
+    return describe_models()
 
 def validate_sql_security(sql: str) -> bool:
     """SQL Injection 및 파괴적인 명령어를 방어합니다."""
@@ -46,46 +56,278 @@ def validate_sql_security(sql: str) -> bool:
             return False
     return sql_upper.strip().startswith("SELECT")
 
+def validate_cypher_security(cypher: str) -> bool:
+    """그래프 데이터를 변경하는 Cypher 절을 차단합니다. (읽기 전용 조회만 허용)"""
+    forbidden = [r"\bCREATE\b", r"\bMERGE\b", r"\bDELETE\b", r"\bSET\b", r"\bREMOVE\b", r"\bDROP\b", r"\bLOAD\s+CSV\b", r"\bCALL\b"]
+    cypher_upper = cypher.upper()
+    if not cypher_upper.strip():
+        return False
+    return not any(re.search(pattern, cypher_upper) for pattern in forbidden)
+
+def extract_merchant_ids(graph_result: list) -> list:
+    """Cypher 결과에서 SQL 바인드 파라미터로 넘길 가맹점 ID 목록을 추출합니다."""
+    merchant_ids = []
+    for row in graph_result or []:
+        if "merchant_id" in row:
+            values = [row["merchant_id"]]
+        else:
+            values = [v for k, v in row.items() if "id" in k.lower()]
+        for value in values:
+            if value is not None and str(value) not in merchant_ids:
+                merchant_ids.append(str(value))
+    return merchant_ids
+
+def build_cache_key(user_id: str, question: str, data_version: str) -> str:
+    """정제된 질문과 데이터 버전을 조합하여 캐시 키를 생성합니다."""
+    normalized = " ".join(question.split()).lower()
+    digest = hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:32]
+    return f"ledger_cache:{user_id}:v{data_version}:{digest}"
+
+def get_cache_stats() -> dict:
+    """캐시 적중/미스 카운터와 적중률을 반환합니다."""
+    total = cache_stats["hit"] + cache_stats["miss"]
+    return {**cache_stats, "hit_rate": cache_stats["hit"] / total if total else 0.0}
+
+def get_router_stats() -> dict:
+    """라우터의 빠른 경로 처리 횟수, 적중률, 현재 임계값을 반환합니다."""
+    total = router_stats["fast_path"] + router_stats["llm"]
+    return {
+        **router_stats,
+        "hit_rate": router_stats["fast_path"] / total if total else 0.0,
+        "threshold": settings.INTENT_FAST_PATH_THRESHOLD,
+        "examples": len(intent_classifier.examples)
+    }
+
+def get_template_stats() -> dict:
+    """NL->SQL 템플릿 적중률과 저장된 템플릿 수를 반환합니다."""
+    total = template_stats["hit"] + template_stats["miss"]
+    return {**template_stats, "hit_rate": template_stats["hit"] / total if total else 0.0,
+            "templates": len(sql_template_store)}
+
+async def _log_route(question: str, intent: str):
+    """LLM 라우터의 결정을 Redis에 기록합니다. (서버 재시작 시 로컬 분류기 학습 데이터로 사용)"""
+    try:
+        entry = json.dumps({"question": question, "intent": intent}, ensure_ascii=False)
+        await redis_client.lpush(settings.INTENT_ROUTE_LOG_KEY, entry)
+        await redis_client.ltrim(settings.INTENT_ROUTE_LOG_KEY, 0, settings.INTENT_MAX_EXAMPLES - 1)
+    except Exception as e:
+        logger.warning(f"라우팅 기록 저장 실패: {e}")
+
+async def _get_data_version() -> str:
+    """적재 시마다 증가하는 데이터 버전을 조회합니다. (없으면 0)"""
+    version = await redis_client.get(settings.CACHE_DATA_VERSION_KEY)
+    return str(version) if isinstance(version, (str, int)) else "0"
+
 # --- [Workflow Nodes] ---
 
 async def check_cache_logic(state: LedgerState):
-    """Redis 캐시를 확인합니다."""
-    cache_key = f"ledger_cache:{state.get('user_id')}:{state['messages'][-1].content.strip()}"
-    cached = await redis_client.get(cache_key)
-    if cached:
-        return {"is_cached": True, "sql_result": json.loads(cached)}
-    return {"is_cached": False}
+    """정제된 질문 기준으로 Redis 캐시를 확인합니다. (적중 시 생성/실행 단계 생략)"""
+    try:
+        version = await _get_data_version()
+        cache_key = build_cache_key(state.get("user_id"), state["refined_question"], version)
+        cached = await redis_client.get(cache_key)
+        payload = json.loads(cached) if cached else None
+    except Exception as e:
+        # 캐시 장애가 분석 요청 자체를 실패시키지 않도록 미스로 처리
+        logger.warning(f"캐시 조회 실패: {e}")
+        cache_key, payload = None, None
+
+    if not isinstance(payload, dict):
+        cache_stats["miss"] += 1
+        return {"is_cached": False, "cache_key": cache_key}
+
+    cache_stats["hit"] += 1
+    return {
+        "is_cached": True,
+        "cache_key": cache_key,
+        "next_step": payload.get("next_step", "SQL"),
+        "sql_query": payload.get("sql_query", ""),
+        "sql_result": payload.get("sql_result", []),
+        "sql_columns": payload.get("sql_columns", []),
+        "result_page": payload.get("result_page", {}),
+        "graph_query": payload.get("graph_query", ""),
+        "graph_result": payload.get("graph_result", []),
+        "error": None
+    }
+
+async def _learn_sql_template(state: LedgerState):
+    """LLM이 생성한 SQL이 결과를 돌려주면 질문/SQL을 템플릿으로 학습하고 Redis에 저장합니다."""
+    question = state.get("refined_question")
+    if not settings.SQL_TEMPLATE_ENABLED or not question or state.get("next_step") != "SQL" or state.get("sql_template") \
+            or state.get("is_cached") or state.get("error") or not state.get("sql_result"):
+        return
+    template, evicted = sql_template_store.learn(question, state.get("sql_query", ""))
+    if template is None:
+        return
+    template_stats["learned"] += 1
+    try:
+        await redis_client.hset(settings.SQL_TEMPLATE_KEY, template.id, template.to_json())
+        if evicted:
+            await redis_client.hdel(settings.SQL_TEMPLATE_KEY, *evicted)
+    except Exception as e:
+        logger.warning(f"SQL 템플릿 저장 실패: {e}")
+
+def _few_shot_kind(state: LedgerState, base: str) -> str:
+    """HYBRID 경로의 SQL/Cypher는 규칙(:merchant_ids, merchant_id 반환)이 달라 별도 종류로 구분합니다."""
+    return f"hybrid_{base}" if state.get("next_step") == "HYBRID" else base
+
+async def _retrieve_examples(state: LedgerState, base: str, label: str) -> str:
+    """유사한 과거 질문의 검증된 쿼리를 검색해 프롬프트용 예시 블록을 반환합니다. (실패 시 빈 문자열)"""
+    if not settings.FEW_SHOT_ENABLED:
+        return ""
+    try:
+        examples = await few_shot_index.search(_few_shot_kind(state, base), state["refined_question"])
+    except Exception as e:
+        logger.warning(f"Few-shot 예시 검색 실패: {e}")
+        return ""
+    return format_examples(examples, label)
+
+async def _add_few_shot(kind: str, question: str, query: str):
+    try:
+        example, evicted = await few_shot_index.add(kind, question, query)
+        if not few_shot_index.persistent:
+            await redis_client.hset(settings.FEW_SHOT_KEY, example.id, example.to_json())
+            if evicted:
+                await redis_client.hdel(settings.FEW_SHOT_KEY, *evicted)
+    except Exception as e:
+        logger.warning(f"Few-shot 예시 저장 실패: {e}")
+
+async def _record_few_shot(state: LedgerState):
+    """실행이 검증된(에러 없이 결과를 돌려준) LLM 생성 SQL/Cypher를 Few-shot 예시로 인덱스에 추가합니다."""
+    question = state.get("refined_question")
+    if not settings.FEW_SHOT_ENABLED or not question or state.get("is_cached"):
+        return
+    step = state.get("next_step")
+    if step in ("SQL", "HYBRID") and state.get("sql_query") and not state.get("sql_template") \
+            and not state.get("error") and state.get("sql_result"):
+        await _add_few_shot(_few_shot_kind(state, "sql"), question, state["sql_query"])
+    if step in ("GRAPH", "HYBRID") and state.get("graph_query") and not state.get("graph_error") \
+            and state.get("graph_result"):
+        await _add_few_shot(_few_shot_kind(state, "cypher"), question, state["graph_query"])
+
+async def save_cache_logic(state: LedgerState):
+    """
+    실행 결과를 TTL과 함께 캐시에 기록하고, 성공한 SQL은 템플릿으로,
+    검증된 SQL/Cypher는 Few-shot 예시로 학습합니다. (에러 결과는 저장하지 않음)
+    """
+    await _learn_sql_template(state)
+    await _record_few_shot(state)
+    cache_key = state.get("cache_key")
+    if not cache_key or state.get("is_cached") or state.get("error"):
+        return {}
+
+    payload = {
+        "next_step": state.get("next_step"),
+        "sql_query": state.get("sql_query", ""),
+        "sql_result": state.get("sql_result", []),
+        "sql_columns": state.get("sql_columns", []),
+        "result_page": state.get("result_page", {}),
+        "graph_query": state.get("graph_query", ""),
+        "graph_result": state.get("graph_result", [])
+    }
+    try:
+        await redis_client.setex(cache_key, settings.CACHE_TTL_SECONDS, dumps_text(payload))
+    except Exception as e:
+        logger.warning(f"캐시 저장 실패: {e}")
+    return {}
+
+async def _load_history(session_id: str, limit: int = 3) -> list:
+    """Redis에 저장된 세션 대화 기록을 최신순으로 불러옵니다. (실패 시 빈 리스트)"""
+    try:
+        raw = await redis_client.lrange(f"chat_history:{session_id}", 0, limit - 1)
+    except Exception as e:
+        logger.warning(f"대화 기록 조회 실패: {e}")
+        return []
+    return [parse_history_entry(item) for item in raw] if isinstance(raw, list) else []
 
 async def query_refiner_node(state: LedgerState):
-    """꼬리물기 질문을 독립적인 질문으로 정제합니다."""
-    llm = get_llm()
-    history = state.get("messages", [])[:-1]
-    current_q = state["messages"][-1].content
-    if not history: return {"refined_question": current_q}
+    """
+    꼬리물기 질문을 독립적인 질문으로 정제합니다.
+    - 요청에 이전 메시지가 없으면 Redis 세션 기록(chat_history)을 사용합니다.
+    - 지시어/생략이 없는 질문은 그대로 사용하고, '교통비는?' 같은 생략형은 직전 질문의 조건만 바꿔 씁니다.
+    - 위 두 경우가 아닐 때만 LLM을 호출합니다.
+    """
+    messages = state.get("messages", [])
+    current_q = messages[-1].content
+    if len(messages) > 1:
+        history = [{"q": m.content, "a": ""} for m in reversed(messages[:-1]) if getattr(m, "type", "human") != "ai"] \
+            or [{"q": messages[-2].content, "a": ""}]
+        history_text = "\n".join(m.content for m in messages[:-1][-3:])
+    else:
+        history = await _load_history(state.get("session_id", "default"))
+        history_text = format_history(history)
+    if not history or is_self_contained(current_q):
+        return {"refined_question": current_q}
 
-    prompt = f"이전 대화: {history[-3:]}\n현재 질문: {current_q}\n위 맥락을 반영한 완성된 질문 하나만 작성하세요."
+    previous_q = history[0]["q"]
+    previous_slots = history[0].get("slots") or extract_slots(previous_q)
+    # 이 세션에서 이미 언급된 가맹점은 '...에서' 없이 "이디야는?"처럼 물어도 가맹점 조건으로 인정
+    known_merchants = {(h.get("slots") or extract_slots(h["q"])).get("merchant") for h in history} - {None}
+    rewritten = rewrite_followup(current_q, previous_q, previous_slots, known_merchants)
+    if rewritten:
+        return {"refined_question": rewritten}
+
+    llm = get_llm()
+    prompt = (
+        f"이전 대화:\n{history_text}\n"
+        f"직전 질문의 조건(기간/카테고리/가맹점): {json.dumps(previous_slots, ensure_ascii=False)}\n"
+        f"현재 질문: {current_q}\n"
+        "현재 질문에 없는 조건은 직전 질문의 조건을 이어받아, 위 맥락을 반영한 완성된 질문 하나만 작성하세요."
+    )
     res = await llm.ainvoke(prompt)
     return {"refined_question": res.content}
 
+async def sql_template_node(state: LedgerState):
+    """
+    캐시 미스 시 학습된 NL->SQL 템플릿과 질문 형태를 비교합니다.
+    적중하면 슬롯 값을 바인드 파라미터로 채운 검증된 SQL을 바로 실행 단계로 넘겨 라우터/SQL 생성 LLM 호출을 생략합니다.
+    """
+    if not settings.SQL_TEMPLATE_ENABLED:
+        return {"sql_template": None}
+    start = time.perf_counter()
+    match = sql_template_store.match(state["refined_question"])
+    if match is None:
+        template_stats["miss"] += 1
+        return {"sql_template": None}
+    template_stats["hit"] += 1
+    return {
+        "next_step": "SQL",
+        "sql_query": match.sql,
+        "sql_params": match.params,
+        "sql_template": match.template_id,
+        "error": None,
+        "timings": {"sql_template": time.perf_counter() - start}
+    }
+
 async def intent_router_node(state: LedgerState):
     """질문 의도 분석 및 경로 결정 (Few-shot 가이드 추가)"""
+    # [추가] 인사, '이번 달 X 얼마' 같은 분명한 질문은 로컬 분류기로 즉시 결정 (LLM 호출 생략)
+    question = state['refined_question']
+    prediction = intent_classifier.predict(question)
+    if prediction.confidence >= settings.INTENT_FAST_PATH_THRESHOLD:
+        router_stats["fast_path"] += 1
+        return {"next_step": prediction.intent}
+    router_stats["llm"] += 1
+
     llm = get_llm()
     
     # 프롬프트에 구체적인 가이드와 예시를 추가합니다.
     prompt = f"""당신은 가계부 에이전트의 경로 결정자입니다. 
-질문을 분석하여 [SQL, GRAPH, GENERAL] 중 하나로 분류하세요.
+질문을 분석하여 [SQL, GRAPH, HYBRID, GENERAL] 중 하나로 분류하세요.
 
 - SQL: 지출 합계, 평균, 특정 기간 내역 조회 등 숫자 계산이 필요한 경우
   (예: "이번 달 식비 얼마야?", "가장 많이 쓴 곳 3개 보여줘")
 - GRAPH: 가맹점 간의 관계, 카테고리별 패턴, 유사 사용자 분석 등 관계 중심인 경우
   (예: "스타벅스와 같은 카테고리인 곳들 알려줘", "내 소비 패턴이랑 비슷한 가맹점은?")
+- HYBRID: 관계 탐색으로 가맹점 집합을 찾은 뒤, 그 가맹점들의 금액 집계가 필요한 경우
+  (예: "스타벅스와 같은 카테고리에 있는 다른 가맹점들의 총 지출은?")
 - GENERAL: 인사, 도움말, 가계부 팁 등 데이터 조회가 필요 없는 일반 대화
   (예: "안녕", "가계부 잘 쓰는 법 알려줘")
 
-질문: {state['refined_question']}
+질문: {question}
 
 반드시 아래 JSON 형식으로만 응답하세요:
-{{"intent": "SQL 또는 GRAPH 또는 GENERAL"}}
+{{"intent": "SQL 또는 GRAPH 또는 HYBRID 또는 GENERAL"}}
 """
     
     res = await llm.ainvoke(prompt)
@@ -99,34 +341,54 @@ async def intent_router_node(state: LedgerState):
             intent = json.loads(match.group())["intent"]
         else:
             content_upper = content.upper()
-            if "GRAPH" in content_upper: intent = "GRAPH"
+            if "HYBRID" in content_upper: intent = "HYBRID"
+            elif "GRAPH" in content_upper: intent = "GRAPH"
             elif "SQL" in content_upper: intent = "SQL"
             else: intent = "GENERAL"
     except:
         intent = "GENERAL"
 
     # 허용된 키워드 외에는 GENERAL로 강제
-    if intent not in ["SQL", "GRAPH", "GENERAL"]:
+    if intent not in ["SQL", "GRAPH", "HYBRID", "GENERAL"]:
         intent = "GENERAL"
-        
+
+    # LLM 결정을 로컬 분류기 학습 데이터로 축적
+    intent_classifier.add_example(question, intent)
+    await _log_route(question, intent)
     return {"next_step": intent}
 
 async def sql_generator_node(state: LedgerState):
-    """가계부 SQL 생성."""
+    """가계부 SQL 생성. (HYBRID 경로에서는 그래프 결과를 :merchant_ids 바인드 파라미터로 받음)"""
+    start = time.perf_counter()
     llm = get_llm()
-    schema = get_dynamic_schema_info()
+    # [수정] 매 호출마다 모델을 순회하지 않고, 데이터 버전별로 캐싱된 스키마 + 데이터 요약 사용
+    try:
+        data_version = await _get_data_version()
+    except Exception:
+        data_version = "0"
+    schema = await schema_context.get(data_version)
+    retry_hint = ""
+    # 템플릿 SQL 실행 실패로 넘어온 경우에는 처음부터 생성 (템플릿 SQL을 수정 대상으로 주지 않음)
+    if state.get("error") and state.get("sql_query") and not state.get("sql_template"):
+        # 재시도 시 직전 SQL과 검증 실패 사유를 전달하여 스스로 수정하도록 유도
+        retry_hint = f"\n이전 SQL: {state['sql_query']}\n검증 실패 사유: {state['error']}\n위 문제를 수정한 SQL을 작성하세요.\n"
+    hybrid_rule = ""
+    if state.get("next_step") == "HYBRID":
+        hybrid_rule = "\n4. 관계 탐색으로 찾은 가맹점 ID 목록이 :merchant_ids 파라미터(텍스트 배열)로 주어집니다. 가맹점 필터는 반드시 'merchant_id = ANY(:merchant_ids)' 형태로 작성하세요."
+    # [추가] 제로샷 대신 유사한 과거 질문의 검증된 SQL을 예시로 제공
+    examples = await _retrieve_examples(state, "sql", "SQL")
     
     # [수정] SQL 키워드 간 공백을 강제하고 가독성을 높이도록 프롬프트 강화
     prompt = f"""가계부 데이터베이스를 조회하기 위한 PostgreSQL 쿼리를 작성하세요.
 스키마:
 {schema}
-
+{examples}
 질문: {state['refined_question']}
-
+{retry_hint}
 주의사항:
 1. 반드시 SQL 키워드(SELECT, FROM, WHERE, ORDER BY, LIMIT) 사이에는 공백을 한 칸 이상 두세요. (예: 'currency FROM' (O), 'currencyFROM' (X))
 2. ```sql ... ``` 형식으로 감싸지 말고 오직 SQL 쿼리 문자열만 반환하세요.
-3. 데이터 파괴적인 명령(DROP, DELETE 등)은 절대 금지입니다.
+3. 데이터 파괴적인 명령(DROP, DELETE 등)은 절대 금지입니다.{hybrid_rule}
 """
     res = await llm.ainvoke(prompt)
     sql = res.content.replace("```sql", "").replace("```", "").strip()
@@ -134,81 +396,214 @@ async def sql_generator_node(state: LedgerState):
     # [추가] 생성된 쿼리에서 공백이 붙어버리는 케이스를 정규식으로 한 번 더 방어
     sql = re.sub(r'([a-zA-Z0-9_])(FROM|WHERE|ORDER|LIMIT|GROUP|JOIN)', r'\1 \2', sql, flags=re.IGNORECASE)
     
-    return {"sql_query": sql}
+    return {"sql_query": sql, "sql_params": {}, "sql_template": None, "timings": {"sql_gen": time.perf_counter() - start}}
+
+async def explain_sql(sql: str):
+    """EXPLAIN으로 실행 가능 여부와 예상 비용을 확인합니다. (문제 없으면 None)"""
+    params = {name: None for name in find_bind_params(sql)}
+    try:
+        plan = await sql_executor.explain(sql, params)
+    except Exception as e:
+        return f"INVALID: EXPLAIN_FAIL ({str(e).splitlines()[0]})"
+    cost = float(plan.get("Total Cost", 0))
+    if settings.SQL_MAX_PLAN_COST and cost > settings.SQL_MAX_PLAN_COST:
+        return f"INVALID: COST_LIMIT_EXCEEDED ({cost:.0f})"
+    return None
 
 async def validate_sql_logic(state: LedgerState):
-    """SQL 보안 및 정합성 검증."""
+    """SQL 보안 및 정합성 검증. (LLM 호출 없이 로컬 파서 + 선택적 EXPLAIN)"""
+    start = time.perf_counter()
     sql = state.get("sql_query", "")
     if not validate_sql_security(sql):
-        return {"error": "SECURITY_VIOLATION", "retry_count": state.get("retry_count", 0) + 1}
+        return {"error": "SECURITY_VIOLATION", "retry_count": state.get("retry_count", 0) + 1,
+                "timings": {"validate_sql": time.perf_counter() - start}}
     
-    llm = get_llm()
-    prompt = f"다음 SQL이 문법적으로 올바른지 검토하고 PASS 또는 FAIL로 답하세요.\nSQL: {sql}"
-    res = await llm.ainvoke(prompt)
-    if "PASS" in res.content.upper():
-        return {"error": None}
-    return {"error": "VALIDATION_FAIL", "retry_count": state.get("retry_count", 0) + 1}
+    # 단일 SELECT 여부, 다중 문장 주입, 테이블/컬럼 존재 여부를 모델 메타데이터 기준으로 검사
+    reason = check_select_sql(sql)
+
+    # [추가] 플래너: 롤업으로 답할 수 있는 집계 쿼리는 사전 집계 테이블 조회로 재작성
+    planned = {}
+    if reason is None and settings.SQL_ROLLUP_REWRITE:
+        rewritten = rewrite_for_rollup(sql)
+        if rewritten and check_select_sql(rewritten) is None:
+            logger.info(f"롤업 재작성: {rewritten}")
+            sql, planned = rewritten, {"sql_query": rewritten}
+
+    if reason is None and settings.SQL_VALIDATE_WITH_EXPLAIN:
+        reason = await explain_sql(sql)
+    timings = {"validate_sql": time.perf_counter() - start}
+    if reason is None:
+        return {"error": None, "timings": timings, **planned}
+
+    kind, detail = reason.split(": ", 1)
+    code = "SECURITY_VIOLATION" if kind == "SECURITY" else "VALIDATION_FAIL"
+    return {"error": f"{code}: {detail}", "retry_count": state.get("retry_count", 0) + 1, "timings": timings}
 
 async def graph_generator_node(state: LedgerState):
     """Neo4j Cypher 생성."""
+    start = time.perf_counter()
     llm = get_llm()
-    prompt = f"Neo4j(Account, Merchant, Transaction)용 Cypher를 작성하세요.\n질문: {state['refined_question']}"
+    hybrid_rule = ""
+    if state.get("next_step") == "HYBRID":
+        hybrid_rule = "\n가맹점 ID는 반드시 'RETURN DISTINCT m.id AS merchant_id' 형태로 반환하세요."
+    examples = await _retrieve_examples(state, "cypher", "Cypher")
+    prompt = f"""Neo4j 지식 그래프를 조회하는 읽기 전용 Cypher를 작성하세요.
+그래프 구조: (:Account {{id}})-[:PERFORMED]->(:Transaction {{id, amount, date}})-[:AT]->(:Merchant {{id}})
+(:Merchant)-[:BELONGS_TO]->(:Category {{name}}), (:Account)-[:LOCATED_IN]->(:Location {{id, state, country}})
+{examples}질문: {state['refined_question']}
+```cypher ... ``` 형식으로 감싸지 말고 오직 Cypher 쿼리 문자열만 반환하세요.{hybrid_rule}"""
     res = await llm.ainvoke(prompt)
-    return {"graph_query": res.content.replace("```cypher", "").replace("```", "").strip()}
+    return {
+        "graph_query": res.content.replace("```cypher", "").replace("```", "").strip(),
+        "timings": {"graph_gen": time.perf_counter() - start}
+    }
+
+async def graph_executor_node(state: LedgerState):
+    """생성된 Cypher를 Neo4j 비동기 드라이버로 실행 (에러 시 빈 리스트 반환 보장)"""
+    start = time.perf_counter()
+    graph_res, graph_error = [], None
+    
+    query = (state.get("graph_query") or "").strip()
+    if not validate_cypher_security(query):
+        graph_error = "GRAPH_SECURITY_VIOLATION"
+    else:
+        try:
+            graph_res = await neo4j_client.aexecute_query(query)
+        except Exception as e:
+            logger.error(f"Cypher 실행 에러: {e}")
+            graph_error = f"GRAPH_EXEC_ERROR: {str(e)}"
+
+    return {
+        "graph_result": graph_res,
+        "graph_error": graph_error,
+        "timings": {"graph_exec": time.perf_counter() - start}
+    }
+
+async def _estimate_total(query: str, params: dict):
+    """잘린 결과의 전체 행 수를 실행 계획의 예상 행 수로 추정합니다. (실패 시 None)"""
+    try:
+        plan = await sql_executor.explain(query, params)
+        return int(plan.get("Plan Rows", 0)) or None
+    except Exception as e:
+        logger.warning(f"전체 행 수 추정 실패: {e}")
+        return None
+
+async def _save_page_cursor(query: str, params: dict, offset: int, user_id: str):
+    """다음 페이지 조회에 필요한 검증된 SQL/파라미터/오프셋을 저장하고 토큰을 반환합니다. (실패 시 None)"""
+    token = new_page_token()
+    entry = {"sql": query, "params": params, "offset": offset, "user_id": user_id}
+    try:
+        await redis_client.setex(f"{PAGE_KEY_PREFIX}{token}", settings.SQL_PAGE_TOKEN_TTL_SECONDS, dumps_text(entry))
+    except Exception as e:
+        logger.warning(f"페이지 커서 저장 실패: {e}")
+        return None
+    return token
+
+async def fetch_result_page(query: str, params: dict, offset: int = 0, user_id: str = None):
+    """
+    결과 거버너: SQL_MAX_RESULT_ROWS 상한으로 한 페이지만 조회합니다.
+    상한 + 1행까지 LIMIT을 주입/축소하고 fetchmany로 읽어 잘림 여부를 판단하며,
+    잘린 경우 전체 행 수 추정치와 다음 페이지 토큰을 함께 반환합니다.
+    반환값: (컬럼 목록, 행 리스트, 페이지 정보)
+    """
+    cap = settings.SQL_MAX_RESULT_ROWS
+    governed = apply_row_limit(query, cap + 1, offset)
+    # 생성 쿼리 태그를 붙여 pg_stat_statements 기반 인덱스 분석(ledger-index-advisor)에 사용
+    columns, rows = await sql_executor.fetch_records(f"{GENERATED_QUERY_TAG}\n{governed}", params, max_rows=cap + 1)
+    truncated = len(rows) > cap
+    rows = rows[:cap]
+    page = {"offset": offset, "row_count": len(rows), "truncated": truncated,
+            "total_estimate": offset + len(rows), "next_page_token": None}
+    if truncated:
+        page["total_estimate"] = await _estimate_total(query, params)
+        page["next_page_token"] = await _save_page_cursor(query, params, offset + cap, user_id)
+    return columns, rows, page
+
+async def load_result_page(user_id: str, page_token: str):
+    """페이지 토큰으로 LLM 파이프라인 없이 다음 페이지를 조회합니다. (만료/소유자 불일치 시 None)"""
+    raw = await redis_client.get(f"{PAGE_KEY_PREFIX}{page_token}")
+    entry = json.loads(raw) if raw else None
+    if not isinstance(entry, dict) or entry.get("user_id") != user_id:
+        return None
+    return await fetch_result_page(entry["sql"], entry.get("params") or {}, int(entry.get("offset", 0)), user_id)
 
 async def execute_sql_logic(state: LedgerState):
     """실제 데이터 추출 (에러 시 빈 리스트 반환 보장)"""
-    sql_res, graph_res = [], []
+    start = time.perf_counter()
+    sql_res, columns, page = [], [], {}
     error = None
     
     # [수정] sql_query가 비어있지 않은지 확인
     query = state.get("sql_query", "").strip()
     if query and not state.get("error"):
+        # 템플릿 적중 시 슬롯 값 바인드 파라미터, HYBRID 경로는 그래프에서 찾은 가맹점 집합을 전달
+        params = dict(state.get("sql_params") or {})
+        if ":merchant_ids" in query:
+            params["merchant_ids"] = extract_merchant_ids(state.get("graph_result"))
         try:
-            with sql_engine.connect() as conn:
-                result = conn.execute(text(query))
-                # [수정] 결과가 없을 경우를 대비해 안전하게 변환
-                if result.returns_rows:
-                    raw_rows = [dict(row._mapping) for row in result]
-                    if raw_rows:
-                        # Pandas를 거쳐 JSON으로 변환하여 데이터 일관성 확보
-                        sql_res = json.loads(pd.Series(raw_rows).to_json(orient='records'))
+            # [수정] 이벤트 루프를 막지 않도록 실행기(스레드 풀/비동기 엔진)에 위임
+            # [수정] Decimal/날짜 값은 커서를 읽으면서 JSON 호환 값으로 변환 (pandas 직렬화 왕복 제거)
+            # [추가] 행 상한을 넘는 결과는 첫 페이지만 가져오고 다음 페이지 토큰을 발급
+            columns, sql_res, page = await fetch_result_page(query, params, user_id=state.get("user_id"))
         except Exception as e:
             logger.error(f"SQL 실행 에러: {e}")
             # [수정] 에러가 나더라도 sql_result는 빈 리스트 []가 되도록 유지 (프론트엔드 방어)
             error = f"SQL_EXEC_ERROR: {str(e)}"
+            if state.get("sql_template"):
+                # 실행에 실패한 템플릿은 폐기하고 LLM 생성 경로로 다시 시도
+                template_stats["fallback"] += 1
+                sql_template_store.forget(state["sql_template"])
+                try:
+                    await redis_client.hdel(settings.SQL_TEMPLATE_KEY, state["sql_template"])
+                except Exception as redis_error:
+                    logger.warning(f"SQL 템플릿 삭제 실패: {redis_error}")
 
     return {
         "sql_result": sql_res, 
-        "graph_result": graph_res, 
-        "error": error
+        "sql_columns": columns,
+        "result_page": page,
+        "error": error,
+        "timings": {"sql_exec": time.perf_counter() - start}
     }
 
 async def final_analyzer_node(state: LedgerState):
-    """결과 분석 및 시각화 데이터 생성 (배열 길이 일관성 강제)"""
+    """결과 분석 (차트 데이터는 LLM이 아닌 결과 컬럼 구성으로 결정적으로 생성)"""
     llm = get_llm()
     data = state.get("sql_result") or state.get("graph_result") or []
-    
-    # [수정] CHART_JSON 생성 시 모든 배열의 길이를 맞추도록 강력하게 지시
-    prompt = f"""아래 데이터를 바탕으로 사용자의 질문에 친절하게 답하고, 시각화가 가능하다면 차트 데이터를 포함하세요.
+    # [추가] 결과 크기와 무관하게 프롬프트 크기를 제한 (큰 결과는 통계 요약으로 대체)
+    data_text = build_result_digest(data)
+    # [수정] 차트는 결과 전체로 직접 구성하여 LLM 출력 토큰을 줄이고 큰 결과에서도 정확하게 표시
+    chart_data = build_chart_data(data)
+    chart_hint = f"\n(결과는 {chart_data['type']} 차트로 함께 표시됩니다.)" if chart_data else ""
+    page = state.get("result_page") or {}
+    if page.get("truncated"):
+        total = f"전체 약 {page['total_estimate']:,}행 중 " if page.get("total_estimate") else ""
+        chart_hint += f"\n(주의: 결과가 많아 {total}처음 {page['row_count']:,}행만 조회되었습니다. 답변에 이 점을 언급하세요.)"
 
-데이터: {data}
-질문: {state['refined_question']}
+    prompt = f"""아래 데이터를 바탕으로 사용자의 질문에 친절하게 답하세요.
 
-[차트 생성 규칙]
-1. 반드시 [CHART_JSON] 태그 뒤에 JSON 객체를 작성하세요.
-2. JSON 구조 예시: {{"data": [{{"label": "항목1", "value": 100}}, {{"label": "항목2", "value": 200}}]}}
-3. [중요] 'All arrays must be of the same length' 에러를 방지하기 위해, 리스트 형태보다는 위 예시처럼 객체의 배열 형태를 권장합니다.
-4. 만약 데이터가 없거나 시각화가 어려우면 [CHART_JSON] 부분을 아예 생략하세요.
+데이터: {data_text}
+질문: {state['refined_question']}
+{chart_hint}
+[답변 규칙]
+1. 핵심 수치와 해석만 문장으로 설명하세요.
+2. 차트는 시스템이 자동으로 그리므로 JSON이나 표를 출력하지 마세요.
 """
     res = await llm.ainvoke(prompt)
-    return {"analysis": res.content}
+    # 이전 형식의 [CHART_JSON] 출력이 섞여 있으면 제거
+    analysis = res.content.split("[CHART_JSON]")[0].strip()
+    return {"analysis": analysis, "chart_data": chart_data}
 
 async def save_history_logic(state: LedgerState):
     """대화 내역 저장."""
     session_id = state.get("session_id", "default")
     history_key = f"chat_history:{session_id}"
-    new_msg = f"Q: {state['refined_question']}\nA: {state['analysis'][:100]}..."
+    # 다음 질문의 정제(조건 이어받기)에 사용하도록 질문/답변 요약/조건을 함께 저장
+    new_msg = json.dumps({
+        "q": state['refined_question'],
+        "a": f"{state['analysis'][:100]}...",
+        "slots": extract_slots(state['refined_question'])
+    }, ensure_ascii=False)
     await redis_client.lpush(history_key, new_msg)
     await redis_client.ltrim(history_key, 0, 9) 
-    return state
\ No newline at end of file
+    return {}
\ No newline at end of file
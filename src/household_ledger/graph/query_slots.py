@@ -0,0 +1,177 @@
+import re
+import json
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# --- [Slot Vocabulary] ---
+
+# 기간 표현 (긴 표현을 먼저 매칭)
+_PERIOD = re.compile(
+    r"(\d{4}\s*년\s*\d{1,2}\s*월|\d{4}\s*년|\d{1,2}\s*월|(?:이번|지난|저번|다음)\s*(?:달|주|분기)|"
+    r"재작년|작년|올해|오늘|어제|상반기|하반기|최근\s*\d+\s*(?:일|주|개월|달|년))"
+)
+
+# 카테고리 표현 (적재 시 분류 카테고리 + 자주 쓰는 동의어)
+CATEGORY_TERMS = [
+    "식비", "외식", "식당", "카페", "커피", "쇼핑", "교통비", "교통", "택시", "주유", "주거", "관리비", "월세",
+    "의료비", "의료", "병원", "약국", "기타"
+]
+_CATEGORY = re.compile("(" + "|".join(sorted(CATEGORY_TERMS, key=len, reverse=True)) + ")")
+
+# 가맹점: "스타벅스에서 ..." 형태
+_MERCHANT = re.compile(r"([^\s\d]{2,})에서")
+
+# 직전 대화를 가리키는 표현 (있으면 독립적인 질문이 아님)
+_REFERENCE = re.compile(
+    r"(그중|그 중|그거|그것|그곳|거기|그때|그 때|그 가맹점|그 카테고리|그 달|그 기간|같은 기간|아까|방금|"
+    r"위에서|앞에서|나머지|그럼|그러면|그리고|그건|이건|저건)"
+)
+_LEADING_REFERENCE = re.compile(r"^(그중에서|그중|그 중에서|그 중|그럼|그러면|그리고|그래서)\s*")
+
+# 생략형 꼬리 질문: "교통비는?", "이번 달은?", "스타벅스도?"
+_ELLIPTICAL = re.compile(r"^(?P<core>.+?)\s*(?:은|는|도|만|의 경우는)?\s*\??$")
+# 생략형으로 인정하는 끝맺음 (보조사 또는 '...에서'), 그 외에는 기간/카테고리 단어 단독일 때만 인정
+_ELLIPTICAL_ENDING = re.compile(r"(?:은|는|도|만|의 경우는|에서)\s*\??$")
+# 영문/숫자 브랜드 표기 가맹점: "GS25", "CU", "H&M"
+_BRAND = re.compile(r"(?=.*[A-Za-z])[A-Za-z0-9&'.\-]+")
+
+def extract_slots(question: str) -> Dict[str, str]:
+    """질문에서 기간/카테고리/가맹점 조건을 추출합니다. (원문 표기 그대로 저장)"""
+    slots = {}
+    period = _PERIOD.search(question)
+    if period:
+        slots["period"] = period.group(1)
+    category = _CATEGORY.search(question)
+    if category:
+        slots["category"] = category.group(1)
+    merchant = _MERCHANT.search(question)
+    if merchant and merchant.group(1) not in CATEGORY_TERMS:
+        slots["merchant"] = merchant.group(1)
+    return slots
+
+# 조회 개수: "3개", "10건", "상위 5" ("3개월" 같은 기간 표현은 제외)
+_LIMIT = re.compile(r"(?:상위|top)\s*(\d+)|(\d+)\s*(?:개|건|곳|위)(?!월)", re.IGNORECASE)
+
+def extract_limit(question: str) -> Optional[str]:
+    """질문의 조회 개수 표현(원문 숫자)을 반환합니다. 기간 표현 안의 숫자는 제외합니다."""
+    match = _LIMIT.search(_PERIOD.sub(" ", question))
+    return (match.group(1) or match.group(2)) if match else None
+
+def _month_start(year: int, month: int) -> date:
+    year, month = year + (month - 1) // 12, (month - 1) % 12 + 1
+    return date(year, month, 1)
+
+def resolve_period(text: str, today: Optional[date] = None) -> Optional[Tuple[date, date]]:
+    """
+    기간 표현을 [시작일, 종료일) 날짜 구간으로 변환합니다. (해석할 수 없으면 None)
+    예) today=2024-05-15: "지난달" -> (2024-04-01, 2024-05-01), "최근 7일" -> (2024-05-09, 2024-05-16)
+    """
+    today = today or date.today()
+    t = re.sub(r"\s+", "", text)
+    if m := re.fullmatch(r"(\d{4})년(\d{1,2})월", t):
+        year, month = int(m.group(1)), int(m.group(2))
+        return (_month_start(year, month), _month_start(year, month + 1)) if 1 <= month <= 12 else None
+    if m := re.fullmatch(r"(\d{4})년", t):
+        return date(int(m.group(1)), 1, 1), date(int(m.group(1)) + 1, 1, 1)
+    if m := re.fullmatch(r"(\d{1,2})월", t):
+        month = int(m.group(1))
+        return (_month_start(today.year, month), _month_start(today.year, month + 1)) if 1 <= month <= 12 else None
+    if m := re.fullmatch(r"(이번|지난|저번|다음)(달|주|분기)", t):
+        shift = {"이번": 0, "지난": -1, "저번": -1, "다음": 1}[m.group(1)]
+        if m.group(2) == "달":
+            return _month_start(today.year, today.month + shift), _month_start(today.year, today.month + shift + 1)
+        if m.group(2) == "주":
+            start = today - timedelta(days=today.weekday()) + timedelta(weeks=shift)
+            return start, start + timedelta(weeks=1)
+        first = (today.month - 1) // 3 * 3 + 1 + shift * 3
+        return _month_start(today.year, first), _month_start(today.year, first + 3)
+    years = {"올해": 0, "작년": -1, "재작년": -2}
+    if t in years:
+        return date(today.year + years[t], 1, 1), date(today.year + years[t] + 1, 1, 1)
+    if t in ("오늘", "어제"):
+        day = today - timedelta(days=1 if t == "어제" else 0)
+        return day, day + timedelta(days=1)
+    if t in ("상반기", "하반기"):
+        first = 1 if t == "상반기" else 7
+        return _month_start(today.year, first), _month_start(today.year, first + 6)
+    if m := re.fullmatch(r"최근(\d+)(일|주|개월|달|년)", t):
+        n, unit = int(m.group(1)), m.group(2)
+        end = today + timedelta(days=1)
+        if unit == "일":
+            return end - timedelta(days=n), end
+        if unit == "주":
+            return end - timedelta(weeks=n), end
+        if unit == "년":
+            return date(today.year - n, today.month, 1), end
+        return _month_start(today.year, today.month - n), end
+    return None
+
+def _elliptical_core(question: str) -> Optional[str]:
+    """
+    '그중 교통비는?' 같은 생략형 질문이면 핵심 단어('교통비')를, 아니면 None을 반환합니다.
+    두 단어 이하이면서 보조사/'에서'로 끝나거나, 기간/카테고리 단어 단독('교통비?')인 경우만 생략형으로 봅니다.
+    ('고마워?' 같은 짧은 문장은 생략형이 아님)
+    """
+    text = _LEADING_REFERENCE.sub("", question.strip())
+    if not text or len(text.split()) > 2:
+        return None
+    match = _ELLIPTICAL.match(text)
+    if not match:
+        return None
+    core = match.group("core").strip()
+    if _ELLIPTICAL_ENDING.search(text) or _PERIOD.fullmatch(core) or _CATEGORY.fullmatch(core):
+        return core
+    return None
+
+def is_self_contained(question: str) -> bool:
+    """직전 대화 없이도 의미가 완결되는 질문인지 판단합니다. (지시어/생략형이 없으면 True)"""
+    return not _REFERENCE.search(question) and _elliptical_core(question) is None
+
+def rewrite_followup(question: str, previous_question: str,
+                     previous_slots: Optional[Dict[str, str]] = None,
+                     known_merchants: Iterable[str] = ()) -> Optional[str]:
+    """
+    생략형 꼬리 질문을 직전 질문의 조건만 바꿔 다시 씁니다.
+    예) 직전 "지난달 식비 얼마야?" + "교통비는?" -> "지난달 교통비 얼마야?"
+    가맹점 조건은 알려진 가맹점(known_merchants), 영문 브랜드 표기, '...에서' 형태일 때만 바꿉니다.
+    ('평균은?', '총액은?' 같은 지표 질문을 가맹점으로 오인하지 않도록)
+    바꿀 조건이 직전 질문에 없거나(새 조건 추가) 조건을 확정할 수 없으면 None을 반환합니다. (LLM 정제로 처리)
+    """
+    core = _elliptical_core(question)
+    if not core:
+        return None
+    explicit_merchant = core.endswith("에서") and len(core) > 2
+    if explicit_merchant:
+        core = core[:-2].strip()
+    if _PERIOD.fullmatch(core):
+        slot = "period"
+    elif _CATEGORY.fullmatch(core):
+        slot = "category"
+    elif " " not in core and (explicit_merchant or _BRAND.fullmatch(core) or core in set(known_merchants)):
+        slot = "merchant"
+    else:
+        return None
+
+    previous = previous_slots if previous_slots is not None else extract_slots(previous_question)
+    if slot not in previous or previous[slot] not in previous_question:
+        return None
+    return previous_question.replace(previous[slot], core, 1)
+
+# --- [Stored History] ---
+
+def parse_history_entry(raw: str) -> Dict[str, object]:
+    """Redis 대화 기록 항목을 {"q", "a", "slots"}로 변환합니다. (이전 'Q: ...\\nA: ...' 형식 호환)"""
+    try:
+        entry = json.loads(raw)
+        if isinstance(entry, dict) and "q" in entry:
+            return {"q": entry["q"], "a": entry.get("a", ""), "slots": entry.get("slots") or extract_slots(entry["q"])}
+    except (TypeError, ValueError):
+        pass
+    text = str(raw)
+    q, _, a = text.partition("\nA: ")
+    q = q[3:] if q.startswith("Q: ") else q
+    return {"q": q, "a": a, "slots": extract_slots(q)}
+
+def format_history(entries: List[Dict[str, object]]) -> str:
+    """LLM 정제 프롬프트용 대화 기록 (오래된 순)"""
+    return "\n".join(f"Q: {e['q']}\nA: {e['a']}" for e in reversed(entries))
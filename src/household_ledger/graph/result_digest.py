@@ -0,0 +1,143 @@
+import json
+import heapq
+from typing import Any, Dict, List, Optional
+
+from household_ledger.common.config import settings
+from household_ledger.graph.result_values import (
+    Number, clip_value, numeric_columns, parse_datetime, primary_measure, result_columns
+)
+
+_MAX_COLUMNS = 20        # 다이제스트에 포함할 최대 컬럼 수
+# 요약을 줄여도 상한을 넘을 때 잘라낸 끝에 붙이는 표시
+_TRUNCATED_MARKER = "…(truncated)"
+
+def _dumps(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False, default=str)
+
+def _record(row: Dict[str, Any], columns: List[str], overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    overrides = overrides or {}
+    return {col: clip_value(overrides[col] if col in overrides else row.get(col)) for col in columns}
+
+def _date_ranges(rows: List[Dict[str, Any]], columns: List[str], exclude) -> Dict[str, List[str]]:
+    ranges = {}
+    for col in columns:
+        if col in exclude or not any(k in str(col).lower() for k in ("date", "month", "day", "time")):
+            continue
+        parsed = [d for d in (parse_datetime(row.get(col)) for row in rows) if d is not None]
+        if parsed:
+            ranges[col] = [str(min(parsed).date()), str(max(parsed).date())]
+    return ranges
+
+def _group_totals(rows: List[Dict[str, Any]], col: str, values: List[Optional[Number]],
+                  max_groups: int) -> Optional[Dict[str, Number]]:
+    """컬럼 값(문자열)별 합계를 반환합니다. 값 종류가 1개이거나 max_groups를 넘으면 None"""
+    totals: Dict[str, Number] = {}
+    for row, value in zip(rows, values):
+        key = str(row.get(col))
+        totals[key] = totals.get(key, 0) + (value or 0)
+        if len(totals) > max_groups:
+            return None
+    return totals if len(totals) > 1 else None
+
+def _shrink_rows(digest: Dict[str, Any], top_n: int):
+    """행 목록(상위 N행, 샘플 행)과 그룹별 합계를 top_n개로 줄입니다."""
+    for key, value in digest.items():
+        if isinstance(value, list) and key != "columns":
+            digest[key] = value[:top_n]
+        elif isinstance(value, dict) and key.startswith("group_totals"):
+            digest[key] = {c: dict(list(v.items())[:top_n]) for c, v in value.items()}
+
+def _shrink_columns(digest: Dict[str, Any], keep: List[str]):
+    """다이제스트의 모든 섹션을 keep 컬럼만 남기도록 줄입니다."""
+    digest["columns"] = keep
+    for key, value in digest.items():
+        if key in ("columns", "note"):
+            continue
+        if isinstance(value, list):
+            digest[key] = [{c: v for c, v in row.items() if c in keep} for row in value]
+        elif isinstance(value, dict):
+            digest[key] = {c: v for c, v in value.items() if c in keep}
+
+def _fit(digest: Dict[str, Any], max_chars: int, top_n: int, measure: Optional[str]) -> str:
+    """
+    직렬화한 다이제스트가 max_chars 이하가 될 때까지 행 수, 컬럼 수 순으로 줄입니다.
+    그래도 넘으면(긴 컬럼명 등) 마지막 수단으로 잘라내고 끝에 잘림 표시를 붙입니다.
+    """
+    text = _dumps(digest)
+    while len(text) > max_chars and top_n > 1:
+        top_n //= 2
+        _shrink_rows(digest, top_n)
+        text = _dumps(digest)
+    columns = digest["columns"]
+    while len(text) > max_chars and len(columns) > 1:
+        # 집계 기준 컬럼은 끝까지 유지
+        columns = columns[:len(columns) // 2]
+        if measure is not None and measure not in columns:
+            columns = columns[:-1] + [measure] if len(columns) > 1 else [measure]
+        _shrink_columns(digest, columns)
+        text = _dumps(digest)
+    if len(text) > max_chars:
+        text = text[:max(max_chars - len(_TRUNCATED_MARKER), 0)] + _TRUNCATED_MARKER
+    return text
+
+def build_result_digest(rows: List[Dict[str, Any]], max_rows: Optional[int] = None,
+                        max_chars: Optional[int] = None, top_n: Optional[int] = None) -> str:
+    """
+    분석 프롬프트에 넣을 데이터 표현을 만듭니다.
+    - 결과가 작으면 원본 행을 그대로 사용합니다.
+    - 크면 기술 통계, 상위 N행, 그룹별 합계, 기간 범위를 한 번씩 순회하며 계산한 요약(digest)을 사용합니다. (pandas 미사용)
+    결과 크기와 무관하게 max_chars를 넘지 않으며, 행/컬럼을 줄여 유효한 JSON을 유지합니다. (전체 데이터는 응답의 결과 필드로 별도 전달)
+    """
+    max_rows = max_rows or settings.ANALYZER_MAX_ROWS
+    max_chars = max_chars or settings.ANALYZER_MAX_DATA_CHARS
+    top_n = top_n or settings.ANALYZER_TOP_N
+    if not rows:
+        return "[]"
+
+    if len(rows) <= max_rows:
+        raw = _dumps(rows)
+        if len(raw) <= max_chars:
+            return raw
+
+    columns = result_columns(rows)[:_MAX_COLUMNS]
+    numeric = numeric_columns(rows, columns)
+    measure = primary_measure(numeric)
+    digest: Dict[str, Any] = {
+        "row_count": len(rows),
+        "columns": columns,
+        "note": f"전체 {len(rows)}행 중 요약입니다. 전체 데이터는 결과 표에 그대로 제공됩니다.",
+    }
+
+    if numeric:
+        stats = {}
+        for col, values in numeric.items():
+            present = [v for v in values if v is not None]
+            stats[col] = {k: clip_value(v) for k, v in (
+                ("sum", sum(present)), ("mean", sum(present) / len(present)), ("min", min(present)), ("max", max(present))
+            )}
+        digest["numeric_stats"] = stats
+
+    date_ranges = _date_ranges(rows, columns, exclude=numeric)
+    if date_ranges:
+        digest["date_ranges"] = date_ranges
+
+    if measure is not None:
+        values = numeric[measure]
+        ranked = heapq.nlargest(top_n, (i for i, v in enumerate(values) if v is not None), key=values.__getitem__)
+        digest[f"top_{top_n}_by_{measure}"] = [_record(rows[i], columns, {measure: values[i]}) for i in ranked]
+        # 값 종류가 적은 차원 컬럼별 합계 (카테고리, 가맹점 등)
+        groups = {}
+        for col in columns:
+            if col in numeric or col in date_ranges:
+                continue
+            totals = _group_totals(rows, col, values, max(top_n * 5, 50))
+            if totals:
+                top = heapq.nlargest(top_n, sorted(totals.items()), key=lambda item: item[1])
+                groups[col] = {k: clip_value(v) for k, v in top}
+        if groups:
+            digest[f"group_totals_of_{measure}"] = groups
+    else:
+        digest["sample_rows"] = [_record(row, columns) for row in rows[:top_n]]
+
+    # 상한을 넘으면 행 목록, 컬럼 순으로 줄여가며 맞춤
+    return _fit(digest, max_chars, top_n, measure)
@@ -0,0 +1,66 @@
+import secrets
+from typing import List, Optional, Tuple
+from household_ledger.graph.sql_validator import SqlParseError, SqlToken, split_statements, tokenize_sql
+
+# 페이지 커서 Redis 키 접두사 (토큰 -> 검증된 SQL/파라미터/오프셋)
+PAGE_KEY_PREFIX = "result_page:"
+
+def _top_level_clauses(tokens: List[SqlToken]) -> Tuple[Optional[int], Optional[int], bool]:
+    """괄호 밖(최상위)의 LIMIT/OFFSET 토큰 위치와 FETCH FIRST 사용 여부를 찾습니다."""
+    depth, limit_idx, offset_idx, has_fetch = 0, None, None, False
+    for i, token in enumerate(tokens):
+        if token.kind == "op" and token.value == "(":
+            depth += 1
+        elif token.kind == "op" and token.value == ")":
+            depth -= 1
+        elif depth == 0 and token.kind == "ident":
+            upper = token.value.upper()
+            if upper == "LIMIT":
+                limit_idx = i
+            elif upper == "OFFSET":
+                offset_idx = i
+            elif upper == "FETCH":
+                has_fetch = True
+    return limit_idx, offset_idx, has_fetch
+
+def _literal(tokens: List[SqlToken], index: Optional[int]) -> Tuple[bool, Optional[int]]:
+    """LIMIT/OFFSET 뒤의 값을 (정수 리터럴 여부, 값)으로 반환합니다. (LIMIT ALL은 제한 없음)"""
+    if index is None:
+        return True, None
+    value = tokens[index + 1] if index + 1 < len(tokens) else None
+    if value is not None and value.kind == "number" and value.value.isdigit():
+        return True, int(value.value)
+    if value is not None and value.value.upper() == "ALL":
+        return True, None
+    return False, None
+
+def apply_row_limit(sql: str, limit: int, offset: int = 0) -> str:
+    """
+    쿼리 결과 중 [offset, offset + limit) 구간만 가져오도록 최상위 LIMIT/OFFSET을 주입하거나 좁힙니다.
+    - 원래 쿼리의 LIMIT/OFFSET 범위를 벗어나지 않습니다. (LIMIT 5 쿼리에 상한 1000을 적용해도 5행)
+    - LIMIT 값이 파라미터/식이거나 FETCH FIRST를 쓰는 경우 서브쿼리로 감싸서 적용합니다.
+    """
+    try:
+        statements = split_statements(tokenize_sql(sql))
+    except SqlParseError:
+        statements = []
+    if len(statements) != 1:
+        return f"SELECT * FROM ({sql.strip().rstrip(';')}) AS _governed LIMIT {limit} OFFSET {offset}"
+
+    tokens = statements[0]
+    limit_idx, offset_idx, has_fetch = _top_level_clauses(tokens)
+    limit_ok, old_limit = _literal(tokens, limit_idx)
+    offset_ok, old_offset = _literal(tokens, offset_idx)
+    clause_starts = [tokens[i].start for i in (limit_idx, offset_idx) if i is not None]
+    body = sql[:min(clause_starts)] if clause_starts else sql[:tokens[-1].end]
+
+    if has_fetch or not (limit_ok and offset_ok):
+        return f"SELECT * FROM ({sql.strip().rstrip(';')}) AS _governed LIMIT {limit} OFFSET {offset}"
+
+    new_offset = (old_offset or 0) + offset
+    new_limit = limit if old_limit is None else max(0, min(limit, old_limit - offset))
+    return f"{body.rstrip()} LIMIT {new_limit}" + (f" OFFSET {new_offset}" if new_offset else "")
+
+def new_page_token() -> str:
+    """다음 페이지 조회용 불투명 토큰 (추측 불가능한 난수)"""
+    return secrets.token_urlsafe(16)
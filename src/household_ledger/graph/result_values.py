@@ -0,0 +1,87 @@
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+# SQL 결과 행(dict 리스트) 공용 도우미: 분석 프롬프트 요약(result_digest)과 차트 생성(chart_builder)이
+# 같은 숫자/날짜 판별 규칙을 쓰도록 한곳에 둡니다.
+
+# 금액 성격의 컬럼을 우선 집계 기준으로 사용
+MEASURE_HINTS = ("amount", "total", "sum", "spend", "value", "count", "cnt")
+MAX_CELL_CHARS = 40      # 셀 값 최대 길이 (긴 문자열 절단)
+# ISO 형식 외에 허용하는 날짜 표기
+DATE_FORMATS = ("%Y-%m", "%Y/%m/%d", "%Y.%m.%d", "%Y%m%d")
+
+Number = Union[int, float]
+
+def clip_value(value: Any) -> Any:
+    """프롬프트/차트에 넣을 값을 다듬습니다. (긴 문자열 절단, 실수는 소수 둘째 자리 반올림)"""
+    if isinstance(value, str) and len(value) > MAX_CELL_CHARS:
+        return value[:MAX_CELL_CHARS] + "…"
+    if isinstance(value, float):
+        return round(value, 2)
+    return value
+
+def result_columns(rows: List[Dict[str, Any]]) -> List[str]:
+    """모든 행의 키를 처음 등장한 순서대로 모읍니다."""
+    return list(dict.fromkeys(key for row in rows for key in row))
+
+def to_number(value: Any) -> Optional[Number]:
+    """숫자 또는 숫자 문자열(Decimal 직렬화 등)을 int/float로 변환합니다. (변환 불가/NULL이면 None)"""
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, (float, Decimal)):
+        number = float(value)
+        return None if number != number else number
+    if isinstance(value, str):
+        text = value.strip()
+        try:
+            return int(text)
+        except ValueError:
+            pass
+        try:
+            number = float(text)
+        except ValueError:
+            return None
+        return None if number != number else number
+    return None
+
+def numeric_columns(rows: List[Dict[str, Any]], columns: Iterable[str]) -> Dict[str, List[Optional[Number]]]:
+    """NULL이 아닌 값이 모두 숫자로 변환되는 컬럼만 {컬럼: 행별 숫자 값(NULL은 None)}으로 반환합니다."""
+    numeric = {}
+    for col in columns:
+        values = [to_number(row.get(col)) for row in rows]
+        present = sum(1 for row in rows if row.get(col) is not None)
+        parsed = sum(1 for v in values if v is not None)
+        if parsed and parsed == present:
+            numeric[col] = values
+    return numeric
+
+def parse_datetime(value: Any) -> Optional[datetime]:
+    """날짜/시각 값 또는 문자열을 (시간대 없는) datetime으로 변환합니다. (변환 불가면 None)"""
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None)
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    if not isinstance(value, str) or not value.strip():
+        return None
+    text = value.strip()
+    try:
+        return datetime.fromisoformat(text).replace(tzinfo=None)
+    except ValueError:
+        pass
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    return None
+
+def primary_measure(numeric: Dict[str, Any]) -> Optional[str]:
+    """숫자 컬럼 중 금액 성격의 이름을 가진 컬럼을 집계 기준으로 고릅니다. (없으면 첫 숫자 컬럼)"""
+    for hint in MEASURE_HINTS:
+        for col in numeric:
+            if hint in str(col).lower():
+                return col
+    return next(iter(numeric), None)
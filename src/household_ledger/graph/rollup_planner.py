@@ -0,0 +1,276 @@
+import re
+from typing import Dict, List, Optional, Set, Tuple
+from household_ledger.graph.sql_validator import (
+    SqlParseError, SqlToken, SQL_KEYWORDS, _collect_from_items, _enclosing_function,
+    _in_from_clause, split_statements, tokenize_sql
+)
+
+# --- [Rollup Targets] ---
+
+DAILY_ROLLUP = "daily_spend_rollup"
+MONTHLY_ROLLUP = "monthly_spend_rollup"
+
+# 롤업 테이블이 그대로 보존하는 차원 컬럼 (transactions 컬럼명 기준)
+DIMENSION_COLUMNS = {"account_id", "transaction_date", "category", "merchant_id"}
+
+# 롤업 적재 시 NULL을 자리표시 값으로 저장하는 차원 (롤업 PK 컬럼이라 NULL을 보존할 수 없음)
+# 이 차원은 NULL/자리표시 값 행을 모두 거르는 긍정 조건(=, IN, LIKE)에만 쓰일 때 재작성하며,
+# 조회/그룹/DISTINCT/부정 조건(<>, NOT IN 등)에 쓰이면 WHERE에 그런 조건이 함께 있어야 재작성합니다.
+NULL_PLACEHOLDERS = {"category": "기타", "merchant_id": ""}
+# 자리표시 값이 실제 값으로도 쓰이는 차원 (바인드 파라미터 값이 자리표시 값일 수 있음)
+AMBIGUOUS_PLACEHOLDERS = {"category"}
+NULL_FUNCTIONS = {"COALESCE", "NULLIF", "IFNULL"}
+# 조건식 하나가 끝났음을 나타내는 토큰
+PREDICATE_END = {"AND", "OR", ")", "GROUP", "ORDER", "HAVING", "LIMIT", "OFFSET"}
+
+# amount 집계 -> 롤업 컬럼 집계 ({col}에 한정자 포함 컬럼명이 들어감)
+AMOUNT_AGGREGATES = {
+    "SUM": "SUM({q}total_amount)",
+    "MIN": "MIN({q}min_amount)",
+    "MAX": "MAX({q}max_amount)",
+    "AVG": "(SUM({q}total_amount) / NULLIF(SUM({q}txn_count), 0))",
+}
+COUNT_ROWS = "COALESCE(SUM({q}txn_count), 0)::bigint"
+
+# 롤업에서 값이 달라지는 집계/구문 (행 단위 중복이나 순서에 의존)
+UNSUPPORTED_KEYWORDS = {
+    "JOIN", "UNION", "INTERSECT", "EXCEPT", "WITH", "OVER", "FILTER", "WITHIN", "LATERAL",
+    "ARRAY_AGG", "STRING_AGG", "JSON_AGG", "JSONB_AGG", "XMLAGG", "BIT_AND", "BIT_OR", "BOOL_AND",
+    "BOOL_OR", "EVERY", "STDDEV", "STDDEV_POP", "STDDEV_SAMP", "VARIANCE", "VAR_POP", "VAR_SAMP",
+    "PERCENTILE_CONT", "PERCENTILE_DISC", "MODE", "CORR", "COVAR_POP", "COVAR_SAMP"
+}
+
+# transaction_date를 월 단위로만 사용하는 표현 (월별 롤업으로 대체 가능)
+MONTH_PARTS = {"YEAR", "MONTH", "QUARTER", "DECADE", "CENTURY"}
+MONTH_FORMATS = {"'YYYY-MM'", "'YYYY'", "'YYYYMM'", "'MM'", "'YYYY-Q'"}
+
+def _is_column(tokens: List[SqlToken], i: int, aliases: Dict[str, str]) -> Optional[Tuple[str, int]]:
+    """i번째 토큰이 transactions 컬럼 참조이면 (컬럼명, 한정자 시작 인덱스)를 반환합니다."""
+    token = tokens[i]
+    if token.kind != "ident" or token.value.upper() in SQL_KEYWORDS:
+        return None
+    nxt = tokens[i + 1] if i + 1 < len(tokens) else None
+    if nxt is not None and nxt.value in ("(", "."):
+        return None
+    if i >= 2 and tokens[i - 1].value == "." and tokens[i - 2].kind == "ident":
+        if aliases.get(tokens[i - 2].value.lower()) != "transactions":
+            return None
+        return token.value.lower(), i - 2
+    if i >= 1 and tokens[i - 1].kind == "cast":
+        return None
+    return token.value.lower(), i
+
+def _is_month_granular(tokens: List[SqlToken], start: int, end: int) -> bool:
+    """transaction_date 참조(start~end 토큰)가 월 단위 함수 안에서만 쓰이는지 확인합니다."""
+    func = _enclosing_function(tokens, start)
+    prev, nxt = tokens[start - 1], tokens[end + 1] if end + 1 < len(tokens) else None
+    if func == "DATE_TRUNC":
+        # DATE_TRUNC('month' | 'year', col)
+        return start >= 4 and prev.value == "," and tokens[start - 2].kind == "string" \
+            and tokens[start - 2].value.strip("'").upper() in MONTH_PARTS and nxt is not None and nxt.value == ")"
+    if func in ("EXTRACT", "DATE_PART"):
+        # EXTRACT(MONTH FROM col) / DATE_PART('month', col)
+        part = tokens[start - 2].value.strip("'").upper() if start >= 2 else ""
+        return part in MONTH_PARTS and prev.value.upper() in ("FROM", ",") and nxt is not None and nxt.value == ")"
+    if func == "TO_CHAR":
+        # TO_CHAR(col, 'YYYY-MM')
+        return nxt is not None and nxt.value == "," and end + 2 < len(tokens) \
+            and tokens[end + 2].value.upper() in MONTH_FORMATS
+    return False
+
+def _depends_on_null(tokens: List[SqlToken], start: int, end: int) -> bool:
+    """컬럼 참조(start~end 토큰)가 IS [NOT] NULL / ISNULL / NOTNULL 조건이나 COALESCE 등 NULL 처리 함수에 쓰이는지 확인합니다."""
+    nxt = tokens[end + 1].value.upper() if end + 1 < len(tokens) else ""
+    if nxt in ("ISNULL", "NOTNULL"):
+        return True
+    if nxt == "IS":
+        following = [t.value.upper() for t in tokens[end + 2:end + 4]]
+        return following[:1] == ["NULL"] or following == ["NOT", "NULL"]
+    return _enclosing_function(tokens, start) in NULL_FUNCTIONS
+
+def _excludes_placeholder(tokens: List[SqlToken], end: int, name: str) -> bool:
+    """컬럼 참조 뒤의 조건이 NULL과 자리표시 값 행을 모두 거르는 긍정 조건(=, = ANY, IN, LIKE)인지 확인합니다."""
+    placeholder = NULL_PLACEHOLDERS[name]
+
+    def value_ok(token: SqlToken) -> bool:
+        if token.kind == "string":
+            return token.value[1:-1].replace("''", "'") != placeholder
+        if token.kind == "param":
+            return name not in AMBIGUOUS_PLACEHOLDERS
+        return token.kind == "number"
+
+    def ends_at(k: int) -> bool:
+        return k >= len(tokens) or tokens[k].value.upper() in PREDICATE_END
+
+    op = tokens[end + 1].value.upper() if end + 2 < len(tokens) else ""
+    value = tokens[end + 2] if op else None
+    if op == "=":
+        if value.value.upper() == "ANY":
+            # = ANY(:ids)
+            return end + 5 < len(tokens) and tokens[end + 3].value == "(" and tokens[end + 4].kind == "param" \
+                and tokens[end + 5].value == ")" and value_ok(tokens[end + 4]) and ends_at(end + 6)
+        return value_ok(value) and ends_at(end + 3)
+    if op == "IN" and value.value == "(":
+        values, k = [], end + 3
+        while k + 1 < len(tokens) and value_ok(tokens[k]) and tokens[k + 1].value in (",", ")"):
+            values.append(tokens[k])
+            if tokens[k + 1].value == ")":
+                return ends_at(k + 2)
+            k += 2
+        return False
+    if op in ("LIKE", "ILIKE") and value.kind == "string":
+        pattern = "".join(".*" if c == "%" else "." if c == "_" else re.escape(c)
+                          for c in value.value[1:-1].replace("''", "'"))
+        return re.fullmatch(pattern, placeholder, re.IGNORECASE) is None and ends_at(end + 3)
+    return False
+
+def _where_guards(tokens: List[SqlToken], filters: List[Tuple[str, int]]) -> Set[str]:
+    """WHERE 절 최상위 AND 조건으로 쓰인 긍정 조건의 컬럼 (이 컬럼은 NULL/자리표시 값 행이 결과에 남지 않음)"""
+    depth, where, guards = 0, None, set()
+    positions = {pos: name for name, pos in filters}
+    for i, token in enumerate(tokens):
+        upper = token.value.upper()
+        if token.value == "(":
+            depth += 1
+        elif token.value == ")":
+            depth -= 1
+        elif depth == 0 and upper == "WHERE":
+            where = i
+        elif depth == 0 and where is not None:
+            if upper in ("GROUP", "ORDER", "HAVING", "LIMIT", "OFFSET"):
+                break
+            if upper == "OR":
+                return set()
+            if i in positions:
+                guards.add(positions[i])
+    return guards
+
+def rewrite_for_rollup(sql: str) -> Optional[str]:
+    """
+    transactions에 대한 집계 쿼리를 롤업 테이블 조회로 재작성합니다.
+    - 차원 컬럼(account_id, transaction_date, category, merchant_id)과
+      SUM/MIN/MAX/AVG(amount), COUNT(*)만 사용하는 단일 테이블 쿼리가 대상입니다.
+    - transaction_date를 월 단위 함수로만 쓰면 월별 롤업, 그 외에는 일별 롤업을 사용합니다.
+    - category/merchant_id의 NULL 여부에 의존하는 쿼리나, NULL 행이 걸러지지 않은 채 이 차원을
+      조회/그룹/부정 조건에 쓰는 쿼리는 롤업의 자리표시 값('기타'/'') 때문에 결과가 달라지므로 제외합니다.
+    재작성할 수 없으면 None을 반환합니다. (원본 쿼리를 그대로 실행)
+    """
+    try:
+        statements = split_statements(tokenize_sql(sql))
+    except SqlParseError:
+        return None
+    if len(statements) != 1:
+        return None
+    tokens = statements[0]
+    if tokens[0].value.upper() != "SELECT":
+        return None
+
+    # 단일 transactions 테이블, 서브쿼리/조인/윈도우 없음
+    tables, aliases, has_derived = _collect_from_items(tokens)
+    if has_derived or tables != {"transactions"}:
+        return None
+    for i, token in enumerate(tokens):
+        upper = token.value.upper()
+        if token.kind == "ident" and upper in UNSUPPORTED_KEYWORDS:
+            return None
+        if upper == "SELECT" and i > 0:
+            return None
+        if token.kind == "op" and token.value == "," and _in_from_clause(tokens, i):
+            return None
+
+    replacements: List[Tuple[int, int, str]] = []   # (시작 토큰, 끝 토큰, 대체 문자열)
+    date_refs: List[Tuple[int, int]] = []
+    table_token = None
+    has_aggregate = False
+    # NOT이 있으면 긍정 조건도 뒤집힐 수 있으므로 자리표시 차원 참조를 모두 노출로 취급
+    negated = any(t.kind == "ident" and t.value.upper() == "NOT" for t in tokens)
+    placeholder_filters: List[Tuple[str, int]] = []   # (차원, 참조 위치) NULL/자리표시 값을 거르는 조건
+    exposed: Set[str] = set()                          # 자리표시 값이 결과에 드러날 수 있는 차원
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        upper = token.value.upper()
+
+        # FROM transactions 테이블명
+        if token.kind == "ident" and token.value.lower() == "transactions" and i > 0 \
+                and tokens[i - 1].value.upper() in ("FROM", "."):
+            table_token = i
+            i += 1
+            continue
+
+        # COUNT(*) / COUNT(1) / COUNT(DISTINCT 차원)
+        if token.kind == "ident" and upper == "COUNT" and i + 1 < len(tokens) and tokens[i + 1].value == "(":
+            inner = tokens[i + 2] if i + 2 < len(tokens) else None
+            if inner is not None and inner.value in ("*", "1") and i + 3 < len(tokens) and tokens[i + 3].value == ")":
+                replacements.append((i, i + 3, COUNT_ROWS.format(q="")))
+                has_aggregate = True
+                i += 4
+                continue
+            if inner is None or inner.value.upper() != "DISTINCT":
+                return None
+            i += 2
+            continue
+
+        # SUM/MIN/MAX/AVG(amount | t.amount)
+        if token.kind == "ident" and upper in AMOUNT_AGGREGATES and i + 1 < len(tokens) and tokens[i + 1].value == "(":
+            j = i + 2
+            qualifier = ""
+            if j + 2 < len(tokens) and tokens[j + 1].value == "." and aliases.get(tokens[j].value.lower()) == "transactions":
+                qualifier = tokens[j].value + "."
+                j += 2
+            if j + 1 < len(tokens) and tokens[j].value.lower() == "amount" and tokens[j + 1].value == ")":
+                replacements.append((i, j + 1, AMOUNT_AGGREGATES[upper].format(q=qualifier)))
+                has_aggregate = True
+                i = j + 2
+                continue
+
+        # SELECT * / t.* 는 행 단위 조회이므로 제외
+        if token.value == "*" and i > 0 and (tokens[i - 1].value.upper() in ("SELECT", ",", ".")):
+            return None
+
+        column = _is_column(tokens, i, aliases)
+        if column is not None:
+            name, qual_start = column
+            if name == "transactions" or name in aliases:
+                i += 1
+                continue
+            if name not in DIMENSION_COLUMNS:
+                # amount 단독 참조, transaction_time 등 롤업에 없는 컬럼
+                if qual_start != i or name in _transaction_only_columns():
+                    return None
+            elif name in NULL_PLACEHOLDERS:
+                if _depends_on_null(tokens, qual_start, i):
+                    return None
+                if not negated and _excludes_placeholder(tokens, i, name):
+                    placeholder_filters.append((name, qual_start))
+                else:
+                    exposed.add(name)
+            elif name == "transaction_date":
+                date_refs.append((qual_start, i))
+        i += 1
+
+    if not has_aggregate or table_token is None:
+        return None
+    if exposed - _where_guards(tokens, placeholder_filters):
+        return None
+
+    monthly = all(_is_month_granular(tokens, start, end) for start, end in date_refs)
+    target = MONTHLY_ROLLUP if monthly else DAILY_ROLLUP
+    # 별칭 없이 transactions.col 로 한정한 경우를 위해 원래 테이블명을 별칭으로 유지
+    has_alias = any(alias != "transactions" for alias in aliases)
+    replacements.append((table_token, table_token, target if has_alias else f"{target} AS transactions"))
+    if monthly:
+        for start, end in date_refs:
+            qualifier = "".join(t.value + "." for t in tokens[start:end:2]) if end > start else ""
+            replacements.append((start, end, f"{qualifier}spend_month"))
+
+    # 원문 SQL 위에 토큰 위치 기준으로 치환 (뒤에서부터 적용)
+    rewritten = sql
+    for start, end, text in sorted(replacements, key=lambda r: tokens[r[0]].start, reverse=True):
+        rewritten = rewritten[:tokens[start].start] + text + rewritten[tokens[end].end:]
+    return rewritten
+
+def _transaction_only_columns() -> set:
+    """롤업에 없는 transactions 컬럼 (참조 시 재작성 불가)"""
+    from household_ledger.domain.models import TransactionHistory
+    return {col.name for col in TransactionHistory.__table__.columns} - DIMENSION_COLUMNS
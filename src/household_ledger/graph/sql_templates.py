@@ -0,0 +1,262 @@
+import re
+import json
+import hashlib
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from household_ledger.common.config import settings
+from household_ledger.graph.query_slots import extract_limit, extract_slots, resolve_period
+from household_ledger.graph.sql_validator import (
+    SqlParseError, SqlToken, check_select_sql, find_bind_params, split_statements, tokenize_sql
+)
+
+# 템플릿 슬롯: 기간, 카테고리, 가맹점, 조회 개수
+SLOTS = ("period", "category", "merchant", "limit")
+
+# 문자열 리터럴이 어떤 슬롯의 값인지 판단하는 비교 대상 컬럼
+SLOT_COLUMNS = {"category": "category", "merchant_id": "merchant"}
+
+_DATE_LITERAL = re.compile(r"^'(\d{4}-\d{2}-\d{2})'$")
+
+def detect_slots(question: str) -> Dict[str, str]:
+    """질문의 슬롯 값(원문 표기)을 추출합니다. (query_slots의 기간/카테고리/가맹점 + 조회 개수)"""
+    slots = extract_slots(question)
+    limit = extract_limit(question)
+    if limit:
+        slots["limit"] = limit
+    return slots
+
+def question_shape(question: str, slots: Dict[str, str]) -> str:
+    """슬롯 값을 {slot} 자리표시자로 바꾼 질문 형태 (템플릿 조회 키)"""
+    shape = question
+    for slot in SLOTS:
+        if slot in slots:
+            shape = shape.replace(slots[slot], "{" + slot + "}", 1)
+    return " ".join(shape.lower().split()).rstrip("?!. ")
+
+def _is_relative_period(text: str) -> bool:
+    """연도가 명시되지 않은 기간(이번 달, 최근 3개월, 5월 등)은 날짜에 따라 의미가 바뀝니다."""
+    return not re.search(r"\d{4}\s*년", text)
+
+def _string_value(token: SqlToken) -> str:
+    return token.value[1:-1].replace("''", "'")
+
+def _compared_column(tokens: List[SqlToken], index: int) -> Optional[str]:
+    """
+    문자열 리터럴이 "<컬럼> =|LIKE|ILIKE '<값>'" 형태로 비교되는 컬럼명을 반환합니다.
+    LOWER(merchant_id) LIKE ... 처럼 함수로 감싼 경우도 허용합니다.
+    """
+    if index == 0 or tokens[index - 1].value.upper() not in ("=", "LIKE", "ILIKE"):
+        return None
+    for k in range(index - 2, max(-1, index - 7), -1):
+        token = tokens[k]
+        if token.kind == "ident" and token.value.upper() not in ("LOWER", "UPPER", "TRIM"):
+            return token.value.lower()
+        if token.value not in ("(", ")", "."):
+            return None
+    return None
+
+class SqlTemplate(NamedTuple):
+    id: str
+    shape: str                        # 슬롯을 자리표시자로 바꾼 질문 형태
+    sql: str                          # :tpl_* 바인드 파라미터가 들어간 검증된 SQL
+    params: Dict[str, Dict[str, str]] # 파라미터명 -> {"slot", "kind"(start|end|end_inclusive|value), "pattern"}
+    fixed: Dict[str, str]             # 파라미터화하지 못해 원문 그대로 일치해야 하는 슬롯 값
+    values: Dict[str, Dict[str, str]] # 학습한 슬롯 표기 -> SQL 값 (예: {"category": {"교통비": "교통"}})
+
+    def to_json(self) -> str:
+        return json.dumps(self._asdict(), ensure_ascii=False)
+
+def abstract_sql(question: str, sql: str, today: Optional[date] = None) -> Optional[SqlTemplate]:
+    """
+    실행에 성공한 질문/SQL 쌍에서 슬롯 값에 해당하는 SQL 리터럴을 바인드 파라미터로 바꿔 템플릿을 만듭니다.
+    - 기간: 질문 기간을 날짜 구간으로 해석해 같은 날짜 리터럴(시작/종료/종료 전날)을 치환
+    - 카테고리/가맹점: category, merchant_id와 비교되는 문자열 리터럴을 치환 (LIKE 패턴의 %는 유지)
+    - 조회 개수: 같은 값의 LIMIT 숫자를 치환
+    찾지 못한 슬롯은 fixed로 남기며, 상대 기간을 날짜 리터럴로 고정한 SQL은 시간이 지나면 틀리므로 템플릿화하지 않습니다.
+    """
+    if find_bind_params(sql):
+        return None
+    try:
+        statements = split_statements(tokenize_sql(sql))
+    except SqlParseError:
+        return None
+    if len(statements) != 1:
+        return None
+    tokens = statements[0]
+    slots = detect_slots(question)
+    replacements: Dict[int, Tuple[int, str]] = {}   # 토큰 위치 -> (치환 시작 위치, 파라미터명)
+    params: Dict[str, Dict[str, str]] = {}
+    values: Dict[str, Dict[str, str]] = {}
+
+    # 1. 기간
+    period = resolve_period(slots["period"], today) if "period" in slots else None
+    date_tokens = [i for i, t in enumerate(tokens) if t.kind == "string" and _DATE_LITERAL.match(t.value)]
+    if period and date_tokens:
+        start, end = period
+        kinds = {start: "start", end: "end", end - timedelta(days=1): "end_inclusive"}
+        matched = {}
+        for i in date_tokens:
+            kind = kinds.get(date.fromisoformat(_string_value(tokens[i])))
+            if kind is None:
+                matched = {}
+                break
+            matched[i] = kind
+        for i, kind in matched.items():
+            name = f"tpl_period_{kind}"
+            # DATE '2024-01-01' 형태는 타입 키워드까지 함께 치환
+            typed = i > 0 and tokens[i - 1].kind == "ident" and tokens[i - 1].value.upper() in ("DATE", "TIMESTAMP")
+            replacements[i] = (tokens[i - 1].start if typed else tokens[i].start, name)
+            params[name] = {"slot": "period", "kind": kind, "pattern": "{}"}
+    if date_tokens and not any(i in replacements for i in date_tokens) \
+            and "period" in slots and _is_relative_period(slots["period"]):
+        return None
+
+    # 2. 카테고리/가맹점
+    found: Dict[str, List[Tuple[int, str]]] = {}
+    for i, token in enumerate(tokens):
+        if token.kind == "string" and i not in replacements:
+            slot = SLOT_COLUMNS.get(_compared_column(tokens, i) or "")
+            if slot:
+                found.setdefault(slot, []).append((i, _string_value(token)))
+    for slot, literals in found.items():
+        cores = {raw.strip("%") for _, raw in literals}
+        if slot not in slots or len(cores) != 1 or not next(iter(cores)):
+            continue
+        core = next(iter(cores))
+        values[slot] = {slots[slot].lower(): core}
+        for n, (i, raw) in enumerate(literals):
+            name = f"tpl_{slot}" + (f"_{n}" if n else "")
+            prefix, suffix = raw[:len(raw) - len(raw.lstrip("%"))], raw[len(raw.rstrip("%")):]
+            replacements[i] = (tokens[i].start, name)
+            params[name] = {"slot": slot, "kind": "value", "pattern": f"{prefix}{{}}{suffix}"}
+
+    # 3. 조회 개수
+    if "limit" in slots:
+        for i, token in enumerate(tokens[:-1]):
+            nxt = tokens[i + 1]
+            if token.kind == "ident" and token.value.upper() == "LIMIT" and nxt.kind == "number" and nxt.value == slots["limit"]:
+                replacements[i + 1] = (nxt.start, "tpl_limit")
+                params["tpl_limit"] = {"slot": "limit", "kind": "value", "pattern": "{}"}
+
+    template_sql = sql[:tokens[-1].end]
+    for i in sorted(replacements, reverse=True):
+        begin, name = replacements[i]
+        template_sql = template_sql[:begin] + f":{name}" + template_sql[tokens[i].end:]
+    if check_select_sql(template_sql) is not None:
+        return None
+
+    bound = {spec["slot"] for spec in params.values()}
+    fixed = {slot: value for slot, value in slots.items() if slot not in bound}
+    shape = question_shape(question, slots)
+    digest = hashlib.sha256(f"{shape}|{json.dumps(fixed, sort_keys=True, ensure_ascii=False)}".encode("utf-8")).hexdigest()[:16]
+    return SqlTemplate(digest, shape, template_sql, params, fixed, values)
+
+class TemplateMatch(NamedTuple):
+    template_id: str
+    sql: str
+    params: Dict[str, Any]
+
+class SqlTemplateStore:
+    """
+    질문 형태별 NL->SQL 템플릿 저장소입니다.
+    SQL 경로 실행이 성공하면 learn()으로 템플릿을 만들고, 새 질문은 match()로 슬롯 값만 바꿔
+    바인드 파라미터를 채운 SQL을 돌려줍니다. (적중 시 라우터/SQL 생성 LLM 호출 생략)
+    최근 사용 순서로 SQL_TEMPLATE_MAX개까지 유지합니다.
+    """
+
+    def __init__(self):
+        self._templates: "OrderedDict[str, SqlTemplate]" = OrderedDict()
+        # 슬롯 표기 -> SQL 값 (예: "교통비" -> "교통"), 템플릿 간 공유
+        self.values: Dict[str, Dict[str, str]] = {"category": {}, "merchant": {}}
+
+    def __len__(self) -> int:
+        return len(self._templates)
+
+    def clear(self):
+        self._templates.clear()
+        self.values = {"category": {}, "merchant": {}}
+
+    def add(self, template: SqlTemplate) -> List[str]:
+        """템플릿을 추가하고 용량 초과로 밀려난 템플릿 ID 목록을 반환합니다."""
+        self._templates[template.id] = template
+        self._templates.move_to_end(template.id)
+        for slot, learned in template.values.items():
+            self.values.setdefault(slot, {}).update(learned)
+        evicted = []
+        while len(self._templates) > max(1, settings.SQL_TEMPLATE_MAX):
+            evicted.append(self._templates.popitem(last=False)[0])
+        return evicted
+
+    def learn(self, question: str, sql: str, today: Optional[date] = None) -> Tuple[Optional[SqlTemplate], List[str]]:
+        """실행에 성공한 질문/SQL로 템플릿을 만듭니다. 반환값: (템플릿 또는 None, 밀려난 템플릿 ID 목록)"""
+        template = abstract_sql(question, sql, today)
+        if template is None:
+            return None, []
+        return template, self.add(template)
+
+    def forget(self, template_id: str):
+        self._templates.pop(template_id, None)
+
+    def _slot_value(self, slot: str, text: str) -> Optional[str]:
+        """질문의 슬롯 표기를 SQL 값으로 바꿉니다. (학습한 표기 -> 알려진 SQL 값 -> 영문 가맹점명 순)"""
+        learned = self.values.get(slot, {})
+        if text.lower() in learned:
+            return learned[text.lower()]
+        if text in learned.values():
+            return text
+        if slot == "merchant":
+            ascii_name = re.search(r"[A-Za-z][A-Za-z0-9&' .-]*", text)
+            return ascii_name.group().strip() if ascii_name else None
+        return None
+
+    def _bind(self, template: SqlTemplate, slots: Dict[str, str], today: Optional[date]) -> Optional[Dict[str, Any]]:
+        if any(slots.get(slot) != value for slot, value in template.fixed.items()):
+            return None
+        period = resolve_period(slots["period"], today) if "period" in slots else None
+        bound: Dict[str, Any] = {}
+        for name, spec in template.params.items():
+            slot, kind = spec["slot"], spec["kind"]
+            if slot not in slots:
+                return None
+            if slot == "period":
+                if period is None:
+                    return None
+                bound[name] = {"start": period[0], "end": period[1], "end_inclusive": period[1] - timedelta(days=1)}[kind]
+            elif slot == "limit":
+                bound[name] = int(slots[slot])
+            else:
+                value = self._slot_value(slot, slots[slot])
+                if value is None:
+                    return None
+                bound[name] = spec["pattern"].format(value)
+        return bound
+
+    def match(self, question: str, today: Optional[date] = None) -> Optional[TemplateMatch]:
+        """질문 형태가 같은 템플릿을 찾아 슬롯 값으로 바인드 파라미터를 채웁니다. (없으면 None)"""
+        slots = detect_slots(question)
+        shape = question_shape(question, slots)
+        for template in reversed(self._templates.values()):
+            if template.shape != shape:
+                continue
+            params = self._bind(template, slots, today)
+            if params is not None:
+                self._templates.move_to_end(template.id)
+                return TemplateMatch(template.id, template.sql, params)
+        return None
+
+    async def load(self, redis_client) -> int:
+        """Redis에 저장된 템플릿을 불러옵니다. (서버 재시작 후에도 학습 결과 유지)"""
+        raw = await redis_client.hgetall(settings.SQL_TEMPLATE_KEY)
+        loaded = 0
+        for item in (raw or {}).values():
+            try:
+                self.add(SqlTemplate(**json.loads(item)))
+                loaded += 1
+            except (TypeError, ValueError):
+                continue
+        return loaded
+
+# 싱글톤 객체 생성
+sql_template_store = SqlTemplateStore()
@@ -0,0 +1,268 @@
+import re
+from typing import Dict, List, NamedTuple, Optional, Set
+from household_ledger.domain.models import Base
+
+# --- [Tokenizer] ---
+
+class SqlToken(NamedTuple):
+    kind: str     # keyword 판별 전 원시 종류: ident, string, number, param, op, qident
+    value: str
+    start: int = 0  # 원문 SQL에서의 위치 (쿼리 재작성 시 사용)
+    end: int = 0
+
+_TOKEN_PATTERN = re.compile(r"""
+      (?P<ws>\s+)
+    | (?P<comment>--[^\n]*|/\*.*?\*/)
+    | (?P<string>'(?:[^']|'')*')
+    | (?P<qident>"(?:[^"]|"")+")
+    | (?P<cast>::)
+    | (?P<param>:[^\W\d]\w*|\$\d+)
+    | (?P<number>\d+(?:\.\d+)?)
+    | (?P<ident>[^\W\d]\w*)
+    | (?P<op><>|!=|<=|>=|\|\||[-+*/%=<>(),.;\[\]^~])
+""", re.VERBOSE | re.DOTALL)
+
+class SqlParseError(ValueError):
+    """토큰화할 수 없는 SQL (닫히지 않은 문자열, 허용되지 않은 문자 등)"""
+
+def tokenize_sql(sql: str) -> List[SqlToken]:
+    """SQL을 토큰 리스트로 분해합니다. 공백과 주석은 제거됩니다."""
+    tokens, pos = [], 0
+    while pos < len(sql):
+        match = _TOKEN_PATTERN.match(sql, pos)
+        if not match:
+            raise SqlParseError(f"UNPARSEABLE near '{sql[pos:pos + 20]}'")
+        kind = match.lastgroup
+        if kind not in ("ws", "comment"):
+            value = match.group()
+            if kind == "qident":
+                kind, value = "ident", value[1:-1].replace('""', '"')
+            tokens.append(SqlToken(kind, value, match.start(), match.end()))
+        pos = match.end()
+    return tokens
+
+def split_statements(tokens: List[SqlToken]) -> List[List[SqlToken]]:
+    """세미콜론 기준으로 문장을 분리합니다. (빈 문장은 제외)"""
+    statements, current = [], []
+    for token in tokens:
+        if token.kind == "op" and token.value == ";":
+            if current:
+                statements.append(current)
+            current = []
+        else:
+            current.append(token)
+    if current:
+        statements.append(current)
+    return statements
+
+# --- [Validation Rules] ---
+
+# 읽기 전용 SELECT에 등장하면 안 되는 키워드 (문자열 리터럴 내부는 제외)
+FORBIDDEN_KEYWORDS = {
+    "INSERT", "UPDATE", "DELETE", "DROP", "ALTER", "TRUNCATE", "CREATE", "GRANT", "REVOKE",
+    "COPY", "MERGE", "CALL", "DO", "EXECUTE", "VACUUM", "LOCK", "INTO", "COMMENT", "REINDEX"
+}
+
+# 부작용이 있거나 서버 자원에 접근하는 함수
+FORBIDDEN_FUNCTIONS = {
+    "PG_SLEEP", "PG_READ_FILE", "PG_READ_BINARY_FILE", "PG_LS_DIR", "LO_IMPORT", "LO_EXPORT",
+    "DBLINK", "DBLINK_EXEC", "PG_TERMINATE_BACKEND", "PG_CANCEL_BACKEND", "SET_CONFIG", "PG_RELOAD_CONF"
+}
+
+# 컬럼이 아닌 식별자로 취급하는 SQL 키워드/타입/날짜 단위
+SQL_KEYWORDS = {
+    "SELECT", "FROM", "WHERE", "GROUP", "BY", "ORDER", "HAVING", "LIMIT", "OFFSET", "FETCH", "FIRST",
+    "NEXT", "ROWS", "ROW", "ONLY", "AS", "ON", "USING", "JOIN", "INNER", "LEFT", "RIGHT", "FULL", "OUTER",
+    "CROSS", "NATURAL", "LATERAL", "UNION", "INTERSECT", "EXCEPT", "ALL", "DISTINCT", "WITH", "RECURSIVE",
+    "AND", "OR", "NOT", "IN", "IS", "NULL", "TRUE", "FALSE", "LIKE", "ILIKE", "SIMILAR", "TO", "BETWEEN",
+    "EXISTS", "ANY", "SOME", "CASE", "WHEN", "THEN", "ELSE", "END", "ASC", "DESC", "NULLS", "LAST",
+    "OVER", "PARTITION", "RANGE", "UNBOUNDED", "PRECEDING", "FOLLOWING", "CURRENT", "FILTER", "WITHIN",
+    "CAST", "INTERVAL", "AT", "TIME", "ZONE", "WITHOUT", "CURRENT_DATE", "CURRENT_TIME",
+    "CURRENT_TIMESTAMP", "LOCALTIME", "LOCALTIMESTAMP", "DATE", "TIMESTAMP", "TIMESTAMPTZ", "NUMERIC",
+    "DECIMAL", "INTEGER", "INT", "BIGINT", "SMALLINT", "REAL", "FLOAT", "DOUBLE", "PRECISION", "TEXT",
+    "VARCHAR", "CHAR", "CHARACTER", "VARYING", "BOOLEAN", "MONEY", "YEAR", "MONTH", "DAY", "HOUR",
+    "MINUTE", "SECOND", "WEEK", "QUARTER", "DOW", "DOY", "ISODOW", "EPOCH", "CENTURY", "DECADE",
+    "VALUES", "ESCAPE", "COLLATE", "FOR", "OF", "SYMMETRIC", "BOTH", "LEADING", "TRAILING", "PLACING"
+}
+
+# 인자 안에 FROM 키워드를 사용하는 함수 (EXTRACT(MONTH FROM ...), SUBSTRING(x FROM 1) 등)
+FROM_ARGUMENT_FUNCTIONS = {"EXTRACT", "SUBSTRING", "TRIM", "POSITION", "OVERLAY"}
+
+def _table_columns() -> Dict[str, Set[str]]:
+    """SQLAlchemy 메타데이터에서 테이블별 컬럼 목록을 구성합니다."""
+    return {name.lower(): {col.name.lower() for col in table.columns} for name, table in Base.metadata.tables.items()}
+
+def _collect_from_items(tokens: List[SqlToken]):
+    """FROM/JOIN 뒤의 테이블 참조와 별칭을 수집합니다. (서브쿼리/테이블 함수는 derived로 표시)"""
+    tables, aliases, has_derived = set(), {}, False
+    for i, token in enumerate(tokens):
+        is_from = token.kind == "ident" and token.value.upper() in ("FROM", "JOIN") \
+            and _enclosing_function(tokens, i) not in FROM_ARGUMENT_FUNCTIONS
+        is_from_list = token.kind == "op" and token.value == "," and _in_from_clause(tokens, i)
+        if not (is_from or is_from_list):
+            continue
+
+        j = i + 1
+        if j < len(tokens) and tokens[j].value.upper() == "LATERAL":
+            j += 1
+        if j >= len(tokens) or tokens[j].value == "(":
+            has_derived = True
+            continue
+        if tokens[j].kind != "ident" or tokens[j].value.upper() in SQL_KEYWORDS:
+            continue
+
+        name = tokens[j].value.lower()
+        # schema.table 형태 처리 (public 스키마는 생략한 것과 동일하게 취급)
+        if j + 2 < len(tokens) and tokens[j + 1].value == "." and tokens[j + 2].kind == "ident":
+            table = tokens[j + 2].value.lower()
+            name = table if name == "public" else f"{name}.{table}"
+            j += 2
+        if j + 1 < len(tokens) and tokens[j + 1].value == "(":
+            # 테이블 함수 (generate_series 등)
+            has_derived = True
+            continue
+
+        tables.add(name)
+        aliases[name] = name
+        k = j + 1
+        if k < len(tokens) and tokens[k].value.upper() == "AS":
+            k += 1
+        if k < len(tokens) and tokens[k].kind == "ident" and tokens[k].value.upper() not in SQL_KEYWORDS:
+            aliases[tokens[k].value.lower()] = name
+    return tables, aliases, has_derived
+
+def _enclosing_function(tokens: List[SqlToken], index: int) -> Optional[str]:
+    """토큰을 감싸고 있는 가장 가까운 괄호 앞의 함수명을 반환합니다."""
+    depth = 0
+    for k in range(index - 1, -1, -1):
+        if tokens[k].value == ")":
+            depth += 1
+        elif tokens[k].value == "(":
+            if depth == 0:
+                return tokens[k - 1].value.upper() if k > 0 and tokens[k - 1].kind == "ident" else None
+            depth -= 1
+    return None
+
+def _in_from_clause(tokens: List[SqlToken], index: int) -> bool:
+    """쉼표가 같은 괄호 깊이의 FROM 절 안에 있는지 확인합니다."""
+    depth = 0
+    for k in range(index - 1, -1, -1):
+        token = tokens[k]
+        if token.kind == "op" and token.value == ")":
+            depth += 1
+        elif token.kind == "op" and token.value == "(":
+            if depth == 0:
+                return False
+            depth -= 1
+        elif depth == 0 and token.kind == "ident":
+            upper = token.value.upper()
+            if upper == "FROM":
+                return True
+            if upper in ("SELECT", "WHERE", "GROUP", "ORDER", "HAVING", "ON", "LIMIT"):
+                return False
+    return False
+
+def _collect_cte_names(tokens: List[SqlToken]) -> Set[str]:
+    """WITH name AS ( ... ) 형태의 CTE 이름을 수집합니다."""
+    names = set()
+    for i, token in enumerate(tokens[:-2]):
+        if token.kind == "ident" and tokens[i + 1].kind == "ident" and tokens[i + 1].value.upper() == "AS" \
+                and tokens[i + 2].value == "(" and (i == 0 or tokens[i - 1].value.upper() in ("WITH", "RECURSIVE", ",")):
+            names.add(token.value.lower())
+    return names
+
+def _collect_output_aliases(tokens: List[SqlToken]) -> Set[str]:
+    """SELECT 목록의 별칭(AS alias 또는 암묵적 alias)을 수집합니다."""
+    aliases = set()
+    for i, token in enumerate(tokens):
+        if token.kind != "ident" or token.value.upper() in SQL_KEYWORDS or i == 0:
+            continue
+        prev = tokens[i - 1]
+        if prev.kind == "ident" and prev.value.upper() == "AS":
+            aliases.add(token.value.lower())
+        elif (prev.kind in ("string", "number") or prev.value == ")" or
+              (prev.kind == "ident" and prev.value.upper() not in SQL_KEYWORDS)) \
+                and not (i + 1 < len(tokens) and tokens[i + 1].value in ("(", ".")):
+            aliases.add(token.value.lower())
+    return aliases
+
+def find_bind_params(sql: str) -> List[str]:
+    """SQL에 포함된 :name 형태의 바인드 파라미터 이름을 반환합니다."""
+    try:
+        tokens = tokenize_sql(sql)
+    except SqlParseError:
+        return []
+    # $1 형태는 pg_stat_statements가 정규화한 상수이므로 제외
+    return list(dict.fromkeys(t.value[1:] for t in tokens if t.kind == "param" and t.value.startswith(":")))
+
+def check_select_sql(sql: str) -> Optional[str]:
+    """
+    SQL을 토큰 단위로 분석하여 단일 읽기 전용 SELECT인지, 참조한 테이블/컬럼이
+    모델 메타데이터에 존재하는지 검사합니다.
+    문제가 없으면 None, 있으면 'SECURITY:' 또는 'INVALID:'로 시작하는 사유를 반환합니다.
+    """
+    try:
+        tokens = tokenize_sql(sql)
+    except SqlParseError as e:
+        return f"INVALID: {e}"
+
+    statements = split_statements(tokens)
+    if not statements:
+        return "INVALID: EMPTY_QUERY"
+    if len(statements) > 1:
+        return "SECURITY: MULTI_STATEMENT"
+    tokens = statements[0]
+
+    first = tokens[0].value.upper()
+    if first not in ("SELECT", "WITH"):
+        return f"SECURITY: NOT_SELECT ({first})"
+
+    depth = 0
+    for i, token in enumerate(tokens):
+        if token.kind == "op" and token.value == "(":
+            depth += 1
+        elif token.kind == "op" and token.value == ")":
+            depth -= 1
+            if depth < 0:
+                return "INVALID: UNBALANCED_PARENTHESES"
+        elif token.kind == "ident":
+            upper = token.value.upper()
+            if upper in FORBIDDEN_KEYWORDS:
+                return f"SECURITY: FORBIDDEN_KEYWORD ({upper})"
+            if upper in FORBIDDEN_FUNCTIONS and i + 1 < len(tokens) and tokens[i + 1].value == "(":
+                return f"SECURITY: FORBIDDEN_FUNCTION ({upper.lower()})"
+    if depth != 0:
+        return "INVALID: UNBALANCED_PARENTHESES"
+
+    known = _table_columns()
+    cte_names = _collect_cte_names(tokens)
+    tables, aliases, has_derived = _collect_from_items(tokens)
+    for table in tables:
+        if table not in known and table not in cte_names:
+            return f"INVALID: UNKNOWN_TABLE ({table})"
+
+    # alias.column 형태의 한정 컬럼 검사
+    for i in range(len(tokens) - 2):
+        if tokens[i].kind == "ident" and tokens[i + 1].value == "." and tokens[i + 2].kind == "ident":
+            table = aliases.get(tokens[i].value.lower())
+            column = tokens[i + 2].value.lower()
+            if table in known and column not in known[table]:
+                return f"INVALID: UNKNOWN_COLUMN ({tokens[i].value}.{tokens[i + 2].value})"
+
+    # 비한정 컬럼 검사 (CTE/서브쿼리를 참조하면 출처를 확정할 수 없어 생략)
+    if has_derived or tables & cte_names or not tables:
+        return None
+    columns = set().union(*(known[t] for t in tables))
+    ignore = set(aliases) | tables | cte_names | _collect_output_aliases(tokens)
+    for i, token in enumerate(tokens):
+        if token.kind != "ident":
+            continue
+        name = token.value.lower()
+        if token.value.upper() in SQL_KEYWORDS or name in columns or name in ignore:
+            continue
+        prev = tokens[i - 1] if i > 0 else None
+        nxt = tokens[i + 1] if i + 1 < len(tokens) else None
+        if (nxt and nxt.value in ("(", ".")) or (prev and prev.kind in ("op", "cast") and prev.value in (".", "::")):
+            continue
+        return f"INVALID: UNKNOWN_COLUMN ({token.value})"
+    return None
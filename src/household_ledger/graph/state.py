@@ -2,6 +2,13 @@ from typing import Annotated, List, TypedDict, Dict, Any, Optional
 from langchain_core.messages import BaseMessage
 from langgraph.graph.message import add_messages
 
+def merge_timings(left: Dict[str, float], right: Dict[str, float]) -> Dict[str, float]:
+    """병렬 분기(SQL/Graph)와 재시도 루프의 노드별 소요 시간(초)을 누적 병합합니다."""
+    merged = dict(left or {})
+    for name, elapsed in (right or {}).items():
+        merged[name] = merged.get(name, 0.0) + elapsed
+    return merged
+
 class LedgerState(TypedDict):
     # 대화 기록
     messages: Annotated[List[BaseMessage], add_messages]
@@ -12,11 +19,23 @@ class LedgerState(TypedDict):
     retry_count: int           # 재시도 횟수 (0 >= 1 에러 방지)
     error: Optional[str]       # 에러 메시지 저장용
     
+    # 분석 결과 캐시 (정제된 질문 + 데이터 버전 기준)
+    is_cached: bool            # 캐시 적중 여부
+    cache_key: Optional[str]   # 조회/저장에 사용할 캐시 키
+    
     # 분석 데이터
     sql_query: str             
+    sql_params: Dict[str, Any] # 템플릿 적중 시 슬롯 값 바인드 파라미터
+    sql_template: Optional[str] # 적중한 NL->SQL 템플릿 ID (실행 실패 시 LLM 생성으로 대체)
     sql_result: List[Dict]     
+    sql_columns: List[str]     # 결과 컬럼 순서 (columnar 응답, 빈 결과에서도 유지)
+    result_page: Dict[str, Any] # 행 상한 적용 정보 (truncated, total_estimate, next_page_token 등)
     graph_query: str           
     graph_result: List[Dict]   
+    graph_error: Optional[str] # Cypher 실행 에러 (SQL 분기의 error와 병렬 기록 충돌 방지용)
+    
+    # 분기별 소요 시간 (노드명 -> 초)
+    timings: Annotated[Dict[str, float], merge_timings]
     
     # 최종 결과
     analysis: str              
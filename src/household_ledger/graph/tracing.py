@@ -0,0 +1,57 @@
+import time
+import inspect
+import functools
+from typing import Any, Callable, Dict, Optional
+
+from household_ledger.common.config import settings
+from household_ledger.infrastructure.telemetry import metrics, node_span
+
+def record_node_output(name: str, state: Dict[str, Any], output: Any, span: Optional[Any] = None):
+    """노드 출력에서 재시도 횟수, SQL 실행 시간, 반환 행 수를 메트릭/span 속성으로 기록합니다."""
+    if not isinstance(output, dict):
+        return
+    retries = output.get("retry_count", 0) - (state.get("retry_count") or 0)
+    if retries > 0:
+        metrics.inc("ledger_sql_retries_total", {"node": name}, retries)
+
+    sql_exec = (output.get("timings") or {}).get("sql_exec")
+    rows = len(output.get("sql_result") or [])
+    if sql_exec is not None:
+        metrics.observe("ledger_sql_exec_seconds", sql_exec)
+        metrics.observe("ledger_sql_rows", rows)
+
+    if span is not None:
+        span.set_attribute("ledger.retry_count", output.get("retry_count", state.get("retry_count") or 0))
+        if sql_exec is not None:
+            span.set_attribute("ledger.sql.exec_seconds", sql_exec)
+            span.set_attribute("ledger.sql.rows", rows)
+        if output.get("error"):
+            span.set_attribute("ledger.error", str(output["error"]))
+
+def traced_node(name: str, fn: Callable) -> Callable:
+    """
+    워크플로우 노드를 감싸 실행 시간, 성공/실패 횟수, LLM 토큰(노드 단위), SQL 재시도/실행 지표를 기록합니다.
+    OTEL_TRACING_ENABLED이면 노드마다 OpenTelemetry span(ledger.node.<name>)을 생성합니다.
+    """
+    if not (settings.METRICS_ENABLED or settings.OTEL_TRACING_ENABLED):
+        return fn
+
+    @functools.wraps(fn)
+    async def wrapper(state):
+        start = time.perf_counter()
+        status, output = "ok", None
+        with node_span(name) as span:
+            try:
+                output = fn(state)
+                if inspect.isawaitable(output):
+                    output = await output
+                return output
+            except Exception:
+                status = "error"
+                raise
+            finally:
+                metrics.observe("ledger_node_duration_seconds", time.perf_counter() - start, {"node": name})
+                metrics.inc("ledger_node_runs_total", {"node": name, "status": status})
+                record_node_output(name, state, output, span)
+
+    return wrapper
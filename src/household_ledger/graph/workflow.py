@@ -2,32 +2,61 @@ from functools import partial
 from langgraph.graph import StateGraph, END
 from household_ledger.graph.state import LedgerState
 from household_ledger.graph.nodes import (
+    check_cache_logic,
+    save_cache_logic,
+    sql_template_node,
     query_refiner_node,
     intent_router_node,
     sql_generator_node,
     validate_sql_logic,
     graph_generator_node,
-    execute_sql_logic,    # SQL/Graph 통합 실행 노드
+    graph_executor_node,  # Neo4j Cypher 실행 노드
+    execute_sql_logic,    # SQL 실행 노드
     final_analyzer_node,
     save_history_logic
 )
+from household_ledger.graph.tracing import traced_node
+
+def route_by_intent(state: LedgerState):
+    """Router 결과에 따라 다음 노드(HYBRID는 병렬 분기 목록)를 반환합니다."""
+    intent = state.get("next_step")
+    if intent == "HYBRID":
+        return ["sql_gen", "graph_gen"]
+    return {"SQL": "sql_gen", "GRAPH": "graph_gen"}.get(intent, "analyzer")
+
+def route_after_validation(state: LedgerState):
+    """검증 통과(또는 재시도 한도 도달) 시 실행, 실패 시 재생성으로 분기합니다."""
+    if state.get("error") is None or state.get("retry_count", 0) >= 2:
+        return "join" if state.get("next_step") == "HYBRID" else "exec"
+    return "retry"
+
+def route_after_execution(state: LedgerState):
+    """템플릿 SQL 실행이 실패하면 LLM SQL 생성으로 다시 시도하고, 그 외에는 결과 캐시 기록으로 진행합니다."""
+    if state.get("sql_template") and state.get("error"):
+        return "fallback"
+    return "done"
 
 def create_household_workflow():
     """
-    캐시 기능을 제거하고 SQL/Graph 선택적 조회가 가능한 가계부 워크플로우를 생성합니다.
+    정제된 질문 기준 결과 캐시와 SQL/Graph/HYBRID(병렬) 조회가 가능한 가계부 워크플로우를 생성합니다.
     """
     workflow = StateGraph(LedgerState)
 
     # --- [1. 노드 등록 (Node Registration)] ---
-    # 이제 캐시 체크 없이 바로 질문 정제부터 시작합니다.
-    workflow.add_node("refiner", query_refiner_node)
-    workflow.add_node("router", intent_router_node)
-    workflow.add_node("sql_gen", sql_generator_node)
-    workflow.add_node("validate_sql", validate_sql_logic)
-    workflow.add_node("graph_gen", graph_generator_node)
-    workflow.add_node("executor", execute_sql_logic)      # SQL 및 Neo4j 통합 실행
-    workflow.add_node("analyzer", final_analyzer_node)
-    workflow.add_node("save_history", save_history_logic)
+    # 각 노드는 traced_node로 감싸 지연 시간/토큰/SQL 지표를 /metrics와 OpenTelemetry span으로 기록합니다.
+    workflow.add_node("refiner", traced_node("refiner", query_refiner_node))
+    workflow.add_node("cache_check", traced_node("cache_check", check_cache_logic))   # 정제된 질문 기준 캐시 조회
+    workflow.add_node("sql_template", traced_node("sql_template", sql_template_node))  # 학습된 NL->SQL 템플릿 조회
+    workflow.add_node("router", traced_node("router", intent_router_node))
+    workflow.add_node("sql_gen", traced_node("sql_gen", sql_generator_node))
+    workflow.add_node("validate_sql", traced_node("validate_sql", validate_sql_logic))
+    workflow.add_node("graph_gen", traced_node("graph_gen", graph_generator_node))
+    workflow.add_node("graph_exec", traced_node("graph_exec", graph_executor_node))  # Neo4j Cypher 실행
+    workflow.add_node("sql_ready", lambda state: {})      # HYBRID: SQL 분기 합류 지점
+    workflow.add_node("executor", traced_node("executor", execute_sql_logic))      # PostgreSQL 실행 (HYBRID 시 그래프 결과 바인딩)
+    workflow.add_node("cache_write", traced_node("cache_write", save_cache_logic))    # 실행 결과 캐시 저장 (TTL)
+    workflow.add_node("analyzer", traced_node("analyzer", final_analyzer_node))
+    workflow.add_node("save_history", traced_node("save_history", save_history_logic))
 
     # --- [2. 시작점 설정 (Entry Point)] ---
     # 질문 정제(꼬리물기 해석)가 시스템의 첫 단계입니다.
@@ -35,37 +64,71 @@ def create_household_workflow():
 
     # --- [3. 엣지 및 조건부 흐름 제어 (Edges & Routing)] ---
 
-    # 1단계: 질문 정제 후 의도 파악(Router)으로 이동
-    workflow.add_edge("refiner", "router")
+    # 1단계: 질문 정제 후 캐시 확인, 적중 시 생성/실행 단계를 건너뛰고 바로 분석
+    workflow.add_edge("refiner", "cache_check")
+    workflow.add_conditional_edges(
+        "cache_check",
+        lambda x: "hit" if x.get("is_cached") else "miss",
+        {
+            "hit": "analyzer",
+            "miss": "sql_template"
+        }
+    )
+    # 질문 형태가 같은 템플릿이 있으면 라우터/SQL 생성/검증을 건너뛰고 바인드 파라미터로 바로 실행
+    workflow.add_conditional_edges(
+        "sql_template",
+        lambda x: "hit" if x.get("sql_template") else "miss",
+        {
+            "hit": "executor",
+            "miss": "router"
+        }
+    )
 
     # 2단계: 의도에 따른 데이터 소스 분기
     # SQL은 정량적 분석, GRAPH는 관계 분석, GENERAL은 일반 답변입니다.
+    # HYBRID는 SQL 생성과 Cypher 생성/실행을 병렬 분기로 동시에 진행합니다.
     workflow.add_conditional_edges(
         "router",
-        lambda x: x.get("next_step"),
-        {
-            "SQL": "sql_gen",
-            "GRAPH": "graph_gen",
-            "GENERAL": "analyzer"
-        }
+        route_by_intent,
+        ["sql_gen", "graph_gen", "analyzer"]
     )
 
     # 3단계 (SQL 경로): SQL 생성 -> 보안/문법 검증 -> 실행
     workflow.add_edge("sql_gen", "validate_sql")
     workflow.add_conditional_edges(
         "validate_sql",
-        lambda x: "exec" if x.get("error") is None or x.get("retry_count", 0) >= 2 else "retry",
+        route_after_validation,
         {
             "exec": "executor",
+            "join": "sql_ready",
             "retry": "sql_gen"
         }
     )
 
     # 3단계 (GRAPH 경로): Cypher 생성 -> 실행
-    workflow.add_edge("graph_gen", "executor")
+    # GRAPH는 바로 결과 캐시/분석으로, HYBRID는 SQL 분기와 합류 후 실행합니다.
+    workflow.add_edge("graph_gen", "graph_exec")
+    workflow.add_conditional_edges(
+        "graph_exec",
+        lambda x: "join" if x.get("next_step") == "HYBRID" else "done",
+        {
+            "join": END,
+            "done": "cache_write"
+        }
+    )
+    # HYBRID 합류: SQL 검증 완료와 Cypher 실행 완료를 모두 기다린 뒤 SQL 실행
+    workflow.add_edge(["sql_ready", "graph_exec"], "executor")
 
-    # 4단계: 데이터 실행 후 분석 및 저장
-    workflow.add_edge("executor", "analyzer")
+    # 4단계: 데이터 실행 후 캐시 기록, 분석 및 저장
+    workflow.add_conditional_edges(
+        "executor",
+        route_after_execution,
+        {
+            "fallback": "sql_gen",
+            "done": "cache_write"
+        }
+    )
+    workflow.add_edge("cache_write", "analyzer")
     workflow.add_edge("analyzer", "save_history")
     workflow.add_edge("save_history", END)
 
@@ -77,7 +140,7 @@ def display_graph_info(graph):
     """
     업데이트된 워크플로우 구조를 시각화하여 출력합니다.
     """
-    print("\n" + "="*60 + "\n📊 Household Ledger AI Workflow (No-Cache Version)\n" + "="*60)
+    print("\n" + "="*60 + "\n📊 Household Ledger AI Workflow (Cached Version)\n" + "="*60)
     try:
         graph.get_graph().print_ascii()
     except Exception:
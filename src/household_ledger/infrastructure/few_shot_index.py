@@ -0,0 +1,226 @@
+import json
+import zlib
+import hashlib
+import logging
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from household_ledger.common.config import settings
+from household_ledger.common.text import char_ngrams
+from household_ledger.infrastructure.sql_executor import sql_executor
+
+logger = logging.getLogger(__name__)
+
+# 예시 종류: 일반 SQL/Cypher와 HYBRID 경로용(:merchant_ids를 받는 SQL, merchant_id를 반환하는 Cypher)
+KINDS = ("sql", "hybrid_sql", "cypher", "hybrid_cypher")
+
+# --- [Embedding] ---
+
+def embed_text(text: str, dim: Optional[int] = None) -> np.ndarray:
+    """
+    문자 n-gram을 고정 차원으로 해싱한 L2 정규화 벡터를 반환합니다. (별도 임베딩 모델 불필요)
+    해시 충돌로 인한 편향을 줄이기 위해 부호도 해시로 정합니다. (내적 = 코사인 유사도)
+    """
+    dim = dim or settings.FEW_SHOT_DIM
+    vec = np.zeros(dim, dtype=np.float32)
+    for gram, count in char_ngrams(text).items():
+        h = zlib.crc32(gram.encode("utf-8"))
+        vec[h % dim] += count if h & 0x80000000 else -count
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+def normalize_question(question: str) -> str:
+    return " ".join(question.lower().split()).rstrip("?!. ")
+
+class FewShotExample(NamedTuple):
+    kind: str
+    question: str
+    query: str
+    score: float = 0.0
+
+    @property
+    def id(self) -> str:
+        digest = hashlib.sha1(normalize_question(self.question).encode("utf-8")).hexdigest()[:16]
+        return f"{self.kind}:{digest}"
+
+    def to_json(self) -> str:
+        return json.dumps({"kind": self.kind, "question": self.question, "query": self.query}, ensure_ascii=False)
+
+def format_examples(examples: List[FewShotExample], label: str) -> str:
+    """검색된 예시를 생성 프롬프트에 넣을 '참고 예시' 블록으로 만듭니다. (없으면 빈 문자열)"""
+    if not examples:
+        return ""
+    lines = [f"\n참고 예시 (유사한 과거 질문과 실행이 검증된 {label}):"]
+    for ex in examples:
+        lines.append(f"질문: {ex.question}\n{label}: {ex.query}")
+    return "\n".join(lines) + "\n"
+
+# --- [NumPy Backend] ---
+
+class NumpyVectorIndex:
+    """
+    프로세스 내 brute-force 벡터 인덱스입니다. (행렬-벡터 내적 한 번으로 전체 검색)
+    상한(FEW_SHOT_MAX_EXAMPLES)에 도달하면 가장 먼저 추가된 예시 자리를 덮어쓰며,
+    영속화는 호출 측이 Redis 해시(FEW_SHOT_KEY)에 기록하고 시작 시 load()로 복원합니다.
+    """
+
+    persistent = False
+
+    def __init__(self, dim: Optional[int] = None, max_examples: Optional[int] = None):
+        self.dim = dim or settings.FEW_SHOT_DIM
+        self.max_examples = max_examples or settings.FEW_SHOT_MAX_EXAMPLES
+        self.clear()
+
+    def clear(self):
+        self._vectors = np.zeros((0, self.dim), dtype=np.float32)
+        self._kinds = np.zeros(0, dtype=np.int8)
+        self._examples: List[FewShotExample] = []
+        self._rows: Dict[str, int] = {}
+        self._cursor = 0    # 가득 찬 뒤 다음에 덮어쓸(가장 오래된) 행
+
+    def __len__(self) -> int:
+        return len(self._examples)
+
+    def _grow(self, size: int):
+        capacity = min(max(size * 2, 64), self.max_examples)
+        vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+        vectors[:size] = self._vectors[:size]
+        kinds = np.zeros(capacity, dtype=np.int8)
+        kinds[:size] = self._kinds[:size]
+        self._vectors, self._kinds = vectors, kinds
+
+    def put(self, example: FewShotExample) -> List[str]:
+        """예시를 추가(같은 질문이면 갱신)하고, 상한 초과로 밀려난 예시 ID 목록을 반환합니다."""
+        evicted = []
+        row = self._rows.get(example.id)
+        if row is None:
+            size = len(self._examples)
+            if size < self.max_examples:
+                if size == len(self._vectors):
+                    self._grow(size)
+                row = size
+                self._examples.append(example)
+            else:
+                row, self._cursor = self._cursor, (self._cursor + 1) % self.max_examples
+                old = self._examples[row]
+                del self._rows[old.id]
+                evicted.append(old.id)
+                self._examples[row] = example
+            self._rows[example.id] = row
+        else:
+            self._examples[row] = example
+        self._vectors[row] = embed_text(example.question, self.dim)
+        self._kinds[row] = KINDS.index(example.kind)
+        return evicted
+
+    async def add(self, kind: str, question: str, query: str) -> Tuple[FewShotExample, List[str]]:
+        example = FewShotExample(kind, question, query)
+        return example, self.put(example)
+
+    async def search(self, kind: str, question: str, k: Optional[int] = None,
+                     min_score: Optional[float] = None) -> List[FewShotExample]:
+        """같은 종류의 예시 중 코사인 유사도 상위 k개를 유사도 순으로 반환합니다."""
+        size = len(self._examples)
+        k = min(k or settings.FEW_SHOT_TOP_K, size)
+        if k <= 0:
+            return []
+        min_score = settings.FEW_SHOT_MIN_SCORE if min_score is None else min_score
+        scores = self._vectors[:size] @ embed_text(question, self.dim)
+        scores[self._kinds[:size] != KINDS.index(kind)] = -1.0
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [self._examples[i]._replace(score=float(scores[i])) for i in top if scores[i] >= min_score]
+
+    async def load(self, redis_client) -> int:
+        """Redis에 저장된 예시를 불러와 인덱스를 다시 만듭니다. (서버 재시작 후에도 유지)"""
+        raw = await redis_client.hgetall(settings.FEW_SHOT_KEY)
+        loaded = 0
+        for item in (raw or {}).values():
+            try:
+                entry = json.loads(item)
+                if entry.get("kind") in KINDS and entry.get("question") and entry.get("query"):
+                    self.put(FewShotExample(entry["kind"], entry["question"], entry["query"]))
+                    loaded += 1
+            except (TypeError, ValueError, AttributeError):
+                continue
+        return loaded
+
+# --- [pgvector Backend] ---
+
+class PgVectorIndex:
+    """
+    PostgreSQL vector 확장(pgvector)에 예시를 저장하는 인덱스입니다. (HNSW 코사인 거리 검색)
+    여러 API 프로세스가 예시를 공유하며, 테이블이 곧 영속 저장소이므로 Redis 기록이 필요 없습니다.
+    """
+
+    persistent = True
+    TABLE = "few_shot_examples"
+
+    def __init__(self, executor=None, dim: Optional[int] = None, max_examples: Optional[int] = None):
+        self.executor = executor or sql_executor
+        self.dim = dim or settings.FEW_SHOT_DIM
+        self.max_examples = max_examples or settings.FEW_SHOT_MAX_EXAMPLES
+        self._ready = False
+
+    async def _ensure_table(self):
+        if self._ready:
+            return
+        await self.executor.execute("CREATE EXTENSION IF NOT EXISTS vector")
+        await self.executor.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.TABLE} ("
+            f"id VARCHAR(64) PRIMARY KEY, kind VARCHAR(20) NOT NULL, question TEXT NOT NULL, query TEXT NOT NULL, "
+            f"embedding vector({self.dim}) NOT NULL, created_at TIMESTAMP NOT NULL DEFAULT now())"
+        )
+        await self.executor.execute(
+            f"CREATE INDEX IF NOT EXISTS ix_{self.TABLE}_embedding ON {self.TABLE} USING hnsw (embedding vector_cosine_ops)"
+        )
+        self._ready = True
+
+    def _literal(self, question: str) -> str:
+        return "[" + ",".join(f"{x:.6f}" for x in embed_text(question, self.dim)) + "]"
+
+    async def add(self, kind: str, question: str, query: str) -> Tuple[FewShotExample, List[str]]:
+        await self._ensure_table()
+        example = FewShotExample(kind, question, query)
+        await self.executor.execute(
+            f"INSERT INTO {self.TABLE} (id, kind, question, query, embedding) "
+            "VALUES (:id, :kind, :question, :query, CAST(:embedding AS vector)) "
+            "ON CONFLICT (id) DO UPDATE SET query = EXCLUDED.query, embedding = EXCLUDED.embedding, created_at = now()",
+            {"id": example.id, "kind": kind, "question": question, "query": query, "embedding": self._literal(question)}
+        )
+        await self.executor.execute(
+            f"DELETE FROM {self.TABLE} WHERE id IN "
+            f"(SELECT id FROM {self.TABLE} ORDER BY created_at DESC OFFSET :max_examples)",
+            {"max_examples": self.max_examples}
+        )
+        return example, []
+
+    async def search(self, kind: str, question: str, k: Optional[int] = None,
+                     min_score: Optional[float] = None) -> List[FewShotExample]:
+        await self._ensure_table()
+        min_score = settings.FEW_SHOT_MIN_SCORE if min_score is None else min_score
+        rows = await self.executor.fetch_all(
+            f"SELECT kind, question, query, 1 - (embedding <=> CAST(:embedding AS vector)) AS score FROM {self.TABLE} "
+            "WHERE kind = :kind ORDER BY embedding <=> CAST(:embedding AS vector) LIMIT :k",
+            {"embedding": self._literal(question), "kind": kind, "k": k or settings.FEW_SHOT_TOP_K}
+        )
+        return [FewShotExample(r["kind"], r["question"], r["query"], float(r["score"]))
+                for r in rows if float(r["score"]) >= min_score]
+
+    async def load(self, redis_client) -> int:
+        """테이블을 준비하고 저장된 예시 수를 반환합니다. (Redis는 사용하지 않음)"""
+        await self._ensure_table()
+        rows = await self.executor.fetch_all(f"SELECT count(*) AS n FROM {self.TABLE}")
+        return int(rows[0]["n"]) if rows else 0
+
+def create_few_shot_index(backend: Optional[str] = None):
+    """FEW_SHOT_BACKEND 설정에 맞는 예시 인덱스를 생성합니다."""
+    backend = (backend or settings.FEW_SHOT_BACKEND).lower()
+    if backend == "numpy":
+        return NumpyVectorIndex()
+    if backend == "pgvector":
+        return PgVectorIndex()
+    raise ValueError(f"지원하지 않는 Few-shot 인덱스 백엔드입니다: {backend}")
+
+# 싱글톤 객체 생성
+few_shot_index = create_few_shot_index()
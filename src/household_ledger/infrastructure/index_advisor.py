@@ -0,0 +1,223 @@
+import re
+import argparse
+import logging
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import create_engine, text
+from household_ledger.domain.models import Base
+from household_ledger.graph.sql_validator import (
+    SqlParseError, SqlToken, SQL_KEYWORDS, _collect_from_items, _table_columns, tokenize_sql
+)
+from household_ledger.infrastructure.sql_executor import GENERATED_QUERY_TAG, build_db_url
+
+logger = logging.getLogger(__name__)
+
+# --- [pg_stat_statements / 카탈로그 조회 SQL] ---
+
+# 생성 쿼리 태그가 붙은 문장만 조회 (상수는 $1, $2 ... 로 정규화되어 있음)
+GENERATED_STATEMENTS_SQL = """
+SELECT query, calls, total_exec_time
+FROM pg_stat_statements
+WHERE query LIKE :tag AND calls >= :min_calls
+ORDER BY total_exec_time DESC
+LIMIT :limit
+"""
+
+EXISTING_INDEXES_SQL = """
+SELECT tablename, indexdef FROM pg_indexes WHERE schemaname = current_schema()
+"""
+
+_INDEX_COLUMNS_PATTERN = re.compile(r"USING \w+ \((.+?)\)(?: INCLUDE| WHERE|$)")
+
+# 인덱스 탐색에 사용할 수 있는 비교 연산자
+EQUALITY_OPERATORS = {"=", "IN"}
+RANGE_OPERATORS = {"<", ">", "<=", ">=", "BETWEEN"}
+
+# 비교 대상이 상수로 취급되는 식 (컬럼 간 비교/조인 조건은 제외)
+CONSTANT_STARTS = {"CURRENT_DATE", "CURRENT_TIMESTAMP", "NOW", "DATE", "TIMESTAMP", "INTERVAL", "ANY"}
+
+class IndexProposal(NamedTuple):
+    table: str
+    columns: Tuple[str, ...]     # 동등 조건 컬럼 -> 범위 조건 컬럼 순서
+    equality_count: int          # 앞에서부터 동등 조건 컬럼 수
+    calls: int
+    total_time_ms: float
+    sample_query: str
+
+    @property
+    def name(self) -> str:
+        return f"ix_{self.table}_{'_'.join(self.columns)}"
+
+    @property
+    def ddl(self) -> str:
+        """운영 중 적용 가능한 DDL (파티션 부모 테이블은 CONCURRENTLY를 지원하지 않음)"""
+        table = Base.metadata.tables.get(self.table)
+        partitioned = table is not None and table.dialect_options["postgresql"].get("partition_by")
+        concurrently = "" if partitioned else "CONCURRENTLY "
+        return f"CREATE INDEX {concurrently}IF NOT EXISTS {self.name} ON {self.table} ({', '.join(self.columns)})"
+
+# --- [Predicate Extraction] ---
+
+def _clause_of(tokens: List[SqlToken], index: int) -> Optional[str]:
+    """토큰이 속한 같은 괄호 깊이의 절 키워드(WHERE, ON, SELECT ...)를 반환합니다."""
+    depth = 0
+    for k in range(index - 1, -1, -1):
+        token = tokens[k]
+        if token.kind == "op" and token.value == ")":
+            depth += 1
+        elif token.kind == "op" and token.value == "(":
+            if depth == 0:
+                return None
+            depth -= 1
+        elif depth == 0 and token.kind == "ident" and token.value.upper() in (
+                "WHERE", "ON", "SELECT", "FROM", "GROUP", "ORDER", "HAVING", "LIMIT"):
+            return token.value.upper()
+    return None
+
+def _is_constant(tokens: List[SqlToken], index: int) -> bool:
+    if index >= len(tokens):
+        return False
+    token = tokens[index]
+    if token.kind in ("param", "number", "string") or token.value in ("(", "-"):
+        return True
+    return token.kind == "ident" and token.value.upper() in CONSTANT_STARTS
+
+def extract_index_candidates(sql: str) -> Dict[str, Tuple[List[str], List[str]]]:
+    """
+    WHERE 절의 '컬럼 연산자 상수' 조건을 테이블별 (동등 조건 컬럼, 범위 조건 컬럼)으로 분류합니다.
+    파싱할 수 없거나 모델에 없는 테이블/컬럼은 무시합니다.
+    """
+    try:
+        tokens = tokenize_sql(sql)
+    except SqlParseError:
+        return {}
+    tables, aliases, _ = _collect_from_items(tokens)
+    columns = _table_columns()
+    tables = {t for t in tables if t in columns}
+
+    candidates: Dict[str, Tuple[List[str], List[str]]] = {}
+    for i, token in enumerate(tokens[:-1]):
+        if token.kind != "ident" or token.value.upper() in SQL_KEYWORDS:
+            continue
+        operator = tokens[i + 1].value.upper()
+        if operator not in EQUALITY_OPERATORS | RANGE_OPERATORS or not _is_constant(tokens, i + 2):
+            continue
+        if i >= 1 and tokens[i - 1].kind in ("cast", "param"):
+            continue
+
+        # 한정자(alias.col) 또는 컬럼명이 유일한 테이블로 소속 결정
+        name = token.value.lower()
+        if i >= 2 and tokens[i - 1].value == ".":
+            owners = {aliases.get(tokens[i - 2].value.lower())} & tables
+        else:
+            owners = {t for t in tables if name in columns[t]}
+        if len(owners) != 1 or _clause_of(tokens, i) != "WHERE":
+            continue
+        table = owners.pop()
+        if name not in columns[table]:
+            continue
+
+        equality, ranges = candidates.setdefault(table, ([], []))
+        target = equality if operator in EQUALITY_OPERATORS else ranges
+        if name not in target:
+            target.append(name)
+
+    # 동등 조건으로 이미 쓰인 컬럼은 범위 조건에서 제외
+    return {t: (eq, [c for c in rng if c not in eq]) for t, (eq, rng) in candidates.items()}
+
+def parse_index_columns(indexdef: str) -> Tuple[str, ...]:
+    """pg_indexes.indexdef에서 키 컬럼 목록을 추출합니다. (INCLUDE 컬럼 제외)"""
+    match = _INDEX_COLUMNS_PATTERN.search(indexdef)
+    if not match:
+        return ()
+    return tuple(col.strip().strip('"').split()[0].lower() for col in match.group(1).split(","))
+
+def _is_covered(proposal: IndexProposal, existing: Iterable[Tuple[str, ...]]) -> bool:
+    """기존 인덱스의 선두 컬럼이 제안 컬럼을 포함하면 중복으로 판단합니다. (동등 조건 컬럼끼리는 순서 무관)"""
+    n = proposal.equality_count
+    equality = set(proposal.columns[:n])
+    for cols in existing:
+        if len(cols) < len(proposal.columns):
+            continue
+        if set(cols[:n]) == equality and cols[n:len(proposal.columns)] == proposal.columns[n:]:
+            return True
+    return False
+
+def propose_indexes(statements: Iterable[Tuple[str, int, float]],
+                    existing: Dict[str, List[Tuple[str, ...]]]) -> List[IndexProposal]:
+    """
+    (쿼리, 호출 수, 누적 실행 시간) 목록으로 누락된 인덱스를 제안합니다.
+    같은 컬럼 조합은 합산하며 누적 실행 시간이 큰 순서로 반환합니다.
+    """
+    merged: Dict[Tuple[str, Tuple[str, ...]], IndexProposal] = {}
+    for query, calls, total_time in statements:
+        for table, (equality, ranges) in extract_index_candidates(query).items():
+            columns = tuple(equality + ranges[:1])
+            if not columns:
+                continue
+            key = (table, columns)
+            prev = merged.get(key)
+            if prev is None:
+                merged[key] = IndexProposal(table, columns, len(equality), calls, total_time, query)
+            else:
+                sample = query if total_time > prev.total_time_ms else prev.sample_query
+                merged[key] = prev._replace(
+                    calls=prev.calls + calls, total_time_ms=prev.total_time_ms + total_time, sample_query=sample
+                )
+
+    proposals = [p for p in merged.values() if not _is_covered(p, existing.get(p.table, []))]
+    return sorted(proposals, key=lambda p: p.total_time_ms, reverse=True)
+
+# --- [Advisor] ---
+
+class IndexAdvisor:
+    """
+    pg_stat_statements에 누적된 LLM 생성 쿼리를 분석하여 누락된 인덱스를 제안합니다.
+    제안만 출력하며 DDL은 직접 실행하지 않습니다.
+    """
+
+    def __init__(self, db_url: Optional[str] = None):
+        self.engine = create_engine(db_url or build_db_url())
+
+    def close(self):
+        self.engine.dispose()
+
+    def fetch_generated_statements(self, limit: int = 200, min_calls: int = 1) -> List[Tuple[str, int, float]]:
+        with self.engine.connect() as conn:
+            rows = conn.execute(text(GENERATED_STATEMENTS_SQL), {
+                "tag": f"%{GENERATED_QUERY_TAG}%", "min_calls": min_calls, "limit": limit
+            })
+            return [(row.query, int(row.calls), float(row.total_exec_time)) for row in rows]
+
+    def fetch_existing_indexes(self) -> Dict[str, List[Tuple[str, ...]]]:
+        indexes: Dict[str, List[Tuple[str, ...]]] = {}
+        with self.engine.connect() as conn:
+            for row in conn.execute(text(EXISTING_INDEXES_SQL)):
+                indexes.setdefault(row.tablename, []).append(parse_index_columns(row.indexdef))
+        return indexes
+
+    def advise(self, limit: int = 200, min_calls: int = 1) -> List[IndexProposal]:
+        statements = self.fetch_generated_statements(limit, min_calls)
+        return propose_indexes(statements, self.fetch_existing_indexes())
+
+def run_index_advisor_cli(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="pg_stat_statements 기반 인덱스 제안 (LLM 생성 쿼리 대상)")
+    parser.add_argument("--limit", type=int, default=200, help="분석할 상위 쿼리 수 (누적 실행 시간 기준)")
+    parser.add_argument("--min-calls", type=int, default=1, help="분석 대상 최소 호출 수")
+    args = parser.parse_args(argv)
+
+    advisor = IndexAdvisor()
+    try:
+        proposals = advisor.advise(limit=args.limit, min_calls=args.min_calls)
+    except Exception as e:
+        print(f"❌ 쿼리 통계 조회 실패 (pg_stat_statements 확장 확인 필요): {e}")
+        return
+    finally:
+        advisor.close()
+
+    if not proposals:
+        print("✅ 추가로 필요한 인덱스가 없습니다.")
+        return
+    for p in proposals:
+        print(f"-- calls={p.calls}, total={p.total_time_ms:.1f}ms\n-- {' '.join(p.sample_query.split())[:200]}")
+        print(f"{p.ddl};\n")
@@ -1,15 +1,207 @@
+import io
+import os
+import argparse
+import hashlib
 import pandas as pd
 import asyncio
+import json
+import re
 import logging
-from sqlalchemy import create_engine
+import redis
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+from sqlalchemy import create_engine, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from neo4j import GraphDatabase
 from tqdm import tqdm
 from household_ledger.common.config import settings
-from household_ledger.domain.models import Base
-from household_ledger.infrastructure.llm_client import UnifiedLlmClient
+from household_ledger.domain.models import Base, IngestWatermark, MerchantCategory
+from household_ledger.infrastructure.llm_client import UnifiedLlmClient, llm_registry
 
 logger = logging.getLogger(__name__)
 
+# 가맹점 분류에 허용되는 카테고리 (그 외 응답은 기타로 처리)
+MERCHANT_CATEGORIES = ["식비", "쇼핑", "교통", "주거", "의료", "기타"]
+DEFAULT_CATEGORY = "기타"
+
+# --- [PostgreSQL COPY 적재 SQL] ---
+
+# 청크 단위 COPY 대상 임시 테이블 (세션 종료 시 자동 삭제)
+STAGING_DDL = """
+CREATE TEMP TABLE IF NOT EXISTS staging_accounts (account_id VARCHAR(50));
+CREATE TEMP TABLE IF NOT EXISTS staging_transactions (
+    transaction_id VARCHAR(50),
+    account_id VARCHAR(50),
+    transaction_date DATE,
+    transaction_time TIME,
+    amount NUMERIC(15, 2),
+    merchant_id VARCHAR(100),
+    currency VARCHAR(10)
+);
+CREATE TEMP TABLE IF NOT EXISTS staging_rollup_keys (account_id VARCHAR(50), day DATE);
+"""
+
+STAGING_TRANSACTION_COLUMNS = [
+    "transaction_id", "account_id", "transaction_date", "transaction_time",
+    "amount", "merchant_id", "currency"
+]
+
+UPSERT_ACCOUNTS_SQL = """
+INSERT INTO accounts (account_id, account_type)
+SELECT DISTINCT account_id, 'CREDITCARD' FROM {staging}
+ON CONFLICT (account_id) DO NOTHING
+"""
+
+# 카테고리는 merchant_categories와 조인하여 집합 단위로 채웁니다.
+# 파티션 테이블의 충돌 키는 (transaction_id, transaction_date)이므로 일자가 바뀐 기존 행은 먼저 삭제합니다.
+UPSERT_TRANSACTIONS_SQL = """
+DELETE FROM transactions t USING staging_transactions s
+WHERE t.transaction_id = s.transaction_id AND t.transaction_date <> s.transaction_date;
+
+INSERT INTO transactions (
+    transaction_id, account_id, transaction_date, transaction_time,
+    amount, merchant_id, currency, category
+)
+SELECT s.transaction_id, s.account_id, s.transaction_date, s.transaction_time,
+       s.amount, s.merchant_id, s.currency, COALESCE(mc.category, '기타')
+FROM staging_transactions s
+LEFT JOIN merchant_categories mc ON mc.merchant_id = s.merchant_id
+ON CONFLICT (transaction_id, transaction_date) DO UPDATE SET
+    account_id = EXCLUDED.account_id,
+    transaction_time = EXCLUDED.transaction_time,
+    amount = EXCLUDED.amount,
+    merchant_id = EXCLUDED.merchant_id,
+    currency = EXCLUDED.currency,
+    category = EXCLUDED.category
+"""
+
+# 월별 RANGE 파티션 (적재 데이터에 등장하는 월만 생성, DEFAULT 파티션 없음)
+CREATE_PARTITION_SQL = """
+CREATE TABLE IF NOT EXISTS {name} PARTITION OF transactions
+FOR VALUES FROM ('{start}') TO ('{end}')
+"""
+
+# --- [롤업(사전 집계) 갱신 SQL] ---
+
+# upsert 전에 호출: 이번 청크가 건드리는 (계좌, 일자) 키 수집 (기존 행의 일자가 바뀌는 경우 포함, UNION으로 중복 제거)
+COLLECT_ROLLUP_KEYS_SQL = """
+INSERT INTO staging_rollup_keys (account_id, day)
+SELECT account_id, transaction_date FROM staging_transactions
+UNION
+SELECT t.account_id, t.transaction_date
+FROM transactions t JOIN staging_transactions s ON s.transaction_id = t.transaction_id
+"""
+
+# upsert 후에 호출: 영향받은 일자/월만 원본에서 다시 집계 (min/max는 증분 갱신이 불가능하므로 재계산)
+# category/merchant_id는 롤업 PK라 NULL을 '기타'/''로 저장합니다. (NULL 행이 결과에 드러날 수 있는 쿼리는 rollup_planner가 재작성하지 않음)
+REFRESH_ROLLUPS_SQL = """
+DELETE FROM daily_spend_rollup r USING staging_rollup_keys k
+WHERE r.account_id = k.account_id AND r.transaction_date = k.day;
+
+INSERT INTO daily_spend_rollup (
+    account_id, transaction_date, category, merchant_id, total_amount, txn_count, min_amount, max_amount
+)
+SELECT t.account_id, t.transaction_date, COALESCE(t.category, '기타'), COALESCE(t.merchant_id, ''),
+       SUM(t.amount), COUNT(*), MIN(t.amount), MAX(t.amount)
+FROM transactions t
+JOIN staging_rollup_keys k ON t.account_id = k.account_id AND t.transaction_date = k.day
+GROUP BY 1, 2, 3, 4;
+
+DELETE FROM monthly_spend_rollup r
+USING (SELECT DISTINCT account_id, date_trunc('month', day)::date AS spend_month FROM staging_rollup_keys) k
+WHERE r.account_id = k.account_id AND r.spend_month = k.spend_month;
+
+INSERT INTO monthly_spend_rollup (
+    account_id, spend_month, category, merchant_id, total_amount, txn_count, min_amount, max_amount
+)
+SELECT d.account_id, date_trunc('month', d.transaction_date)::date, d.category, d.merchant_id,
+       SUM(d.total_amount), SUM(d.txn_count), MIN(d.min_amount), MAX(d.max_amount)
+FROM daily_spend_rollup d
+JOIN (SELECT DISTINCT account_id, date_trunc('month', day)::date AS spend_month FROM staging_rollup_keys) k
+  ON d.account_id = k.account_id
+ AND d.transaction_date >= k.spend_month AND d.transaction_date < k.spend_month + interval '1 month'
+GROUP BY 1, 2, 3, 4;
+
+TRUNCATE staging_rollup_keys;
+"""
+
+# 적재 중 늦게 분류된 가맹점(이전 청크/이전 적재에서 분류 실패 후 재분류)의 기존 거래 카테고리를 보정하고,
+# 값이 바뀐 (계좌, 일자)를 롤업 재계산 대상으로 수집 (이후 REFRESH_ROLLUPS_SQL 실행)
+BACKFILL_CATEGORIES_SQL = """
+WITH updated AS (
+    UPDATE transactions t SET category = mc.category
+    FROM merchant_categories mc
+    WHERE mc.merchant_id = t.merchant_id
+      AND t.merchant_id = ANY(%(merchant_ids)s)
+      AND t.category IS DISTINCT FROM mc.category
+    RETURNING t.account_id, t.transaction_date
+)
+INSERT INTO staging_rollup_keys (account_id, day)
+SELECT DISTINCT account_id, transaction_date FROM updated
+"""
+
+# --- [Neo4j 벌크 적재 Cypher] ---
+
+# MERGE가 인덱스를 타도록 식별자에 유니크 제약(= 인덱스)을 먼저 생성합니다.
+GRAPH_CONSTRAINTS = [
+    "CREATE CONSTRAINT account_id IF NOT EXISTS FOR (a:Account) REQUIRE a.id IS UNIQUE",
+    "CREATE CONSTRAINT merchant_id IF NOT EXISTS FOR (m:Merchant) REQUIRE m.id IS UNIQUE",
+    "CREATE CONSTRAINT transaction_id IF NOT EXISTS FOR (t:Transaction) REQUIRE t.id IS UNIQUE",
+    "CREATE CONSTRAINT category_name IF NOT EXISTS FOR (c:Category) REQUIRE c.name IS UNIQUE",
+    "CREATE CONSTRAINT location_id IF NOT EXISTS FOR (l:Location) REQUIRE l.id IS UNIQUE",
+]
+
+ACCOUNT_BATCH_CYPHER = """
+UNWIND $rows AS row
+MERGE (a:Account {id: row.acc_id})
+WITH a, row WHERE row.loc_id IS NOT NULL
+MERGE (l:Location {id: row.loc_id})
+  ON CREATE SET l.state = row.state, l.country = row.country
+MERGE (a)-[:LOCATED_IN]->(l)
+"""
+
+# 분류가 바뀐 가맹점(기타 -> 재분류)은 이전 카테고리 관계를 지우고 새 카테고리로 연결
+MERCHANT_BATCH_CYPHER = """
+UNWIND $rows AS row
+MERGE (m:Merchant {id: row.m_id})
+WITH m, row
+OPTIONAL MATCH (m)-[old:BELONGS_TO]->(prev:Category) WHERE prev.name <> row.category
+DELETE old
+WITH DISTINCT m, row
+MERGE (c:Category {name: row.category})
+MERGE (m)-[:BELONGS_TO]->(c)
+"""
+
+TRANSACTION_BATCH_CYPHER = """
+UNWIND $rows AS row
+MATCH (a:Account {id: row.acc_id})
+MATCH (m:Merchant {id: row.m_id})
+MERGE (t:Transaction {id: row.t_id})
+  ON CREATE SET t.amount = row.amt, t.date = row.date
+MERGE (a)-[:PERFORMED]->(t)
+MERGE (t)-[:AT]->(m)
+"""
+
+# 워터마크를 따로 관리하는 저장소 (한쪽만 성공해도 성공한 쪽은 다음 실행에서 같은 구간을 다시 적재하지 않음)
+STORES = ("sql", "neo4j")
+
+def watermark_key(path: str, store: str) -> str:
+    """저장소별 워터마크 키 (sql은 기존 키(경로)를 그대로 사용해 이전 워터마크와 호환)"""
+    return path if store == "sql" else f"{store}:{path}"
+
+class SourceDelta(NamedTuple):
+    """이번 적재에서 읽을 원천 파일 구간과 적재 후 저장할 워터마크 정보"""
+    path: str
+    start_offset: int
+    end_offset: int
+    checksum: str                       # 파일 [0, end_offset) 구간의 sha256
+    since: Optional[datetime] = None    # 지정 시 이 시각 이후 거래만 적재
+
+    @property
+    def has_changes(self) -> bool:
+        return self.end_offset > self.start_offset
+
 class DataIngestor:
     def __init__(self, db_url: str = None):
         # 1. 인프라 연결 설정
@@ -27,6 +219,8 @@ class DataIngestor:
             base_url=settings.LLM_BASE_URL,
             model_name=settings.LLM_MODEL_NAME
         )
+        # 가맹점 분류용 이벤트 루프 (적재 한 번 동안 재사용)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
         
         # 2. 데이터셋 인덱스 정의 (25개 컬럼 구조 기반)
         self.ACC_ID_IDX = 0
@@ -36,115 +230,485 @@ class DataIngestor:
         self.CURRENCY_IDX = 3
         self.MERCHANT_IDX = 4
         self.TIMESTAMP_IDX = 24
+        self.ACC_STATE_IDX = 2
+        self.ACC_COUNTRY_IDX = 3
+
+        # 3. 원천 파일 경로
+        self.ACCOUNTS_PATH = os.path.join(settings.DATA_PATH, "user_accounts.csv")
+        self.TRANSACTIONS_PATH = os.path.join(settings.DATA_PATH, "transaction_history.csv")
 
     def close(self):
+        self._close_event_loop()
         self.neo4j_driver.close()
 
     def create_tables(self):
-        """SQLAlchemy 모델을 기반으로 테이블 생성"""
+        """
+        SQLAlchemy 모델을 기반으로 테이블 생성
+        transactions는 월별 파티션 부모 테이블로 생성되며, 복합 인덱스는 각 파티션에 자동 전파됩니다.
+        """
         Base.metadata.create_all(self.engine)
+        # 인덱스 분석(ledger-index-advisor)용 쿼리 통계 확장 (shared_preload_libraries 설정 필요)
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_stat_statements"))
+        except Exception as e:
+            logger.warning(f"pg_stat_statements 확장을 활성화하지 못했습니다: {e}")
+
+    @staticmethod
+    def _partition_bounds(month: date):
+        """월 시작일 기준 파티션 이름과 [시작, 다음 달 시작) 범위를 반환합니다."""
+        start = month.replace(day=1)
+        end = date(start.year + (start.month == 12), start.month % 12 + 1, 1)
+        return f"transactions_y{start.year:04d}m{start.month:02d}", start, end
+
+    def _ensure_partitions(self, cursor, dates: Iterable[date], created: set):
+        """청크에 포함된 월의 파티션이 없으면 생성합니다. (created: 이번 적재에서 이미 확인한 월)"""
+        months = {d.replace(day=1) for d in dates} - created
+        for month in sorted(months):
+            name, start, end = self._partition_bounds(month)
+            cursor.execute(CREATE_PARTITION_SQL.format(name=name, start=start.isoformat(), end=end.isoformat()))
+        created.update(months)
 
     def drop_tables(self):
         """데이터 초기화"""
         print("\n🗑️ 모든 SQL 테이블 삭제 중...")
         Base.metadata.drop_all(self.engine)
 
-    async def _classify_category(self, merchant_id: str):
-        """LLM을 통한 가맹점 카테고리 분류"""
-        if not merchant_id: return "기타"
-        prompt = f"가맹점ID '{merchant_id}'를 보고 [식비, 쇼핑, 교통, 주거, 의료, 기타] 중 하나로 분류해줘. 단어만 답해."
-        try:
-            res = await self.llm.generate_text(prompt)
-            return res.strip()
-        except Exception:
-            return "기타"
+    # --- [가맹점 카테고리 분류] ---
+
+    @staticmethod
+    def _parse_category_json(text: str) -> Dict[str, str]:
+        """LLM 응답에서 {merchant_id: category} JSON 객체를 추출합니다."""
+        match = re.search(r"\{.*\}", text, re.DOTALL)
+        if not match:
+            raise ValueError(f"JSON 객체를 찾을 수 없습니다: {text[:100]}")
+        parsed = json.loads(match.group(0))
+        if not isinstance(parsed, dict):
+            raise ValueError("JSON 응답이 객체 형태가 아닙니다.")
+        return {str(k): str(v).strip() for k, v in parsed.items()}
+
+    async def _classify_batch(self, merchant_ids: List[str], semaphore: asyncio.Semaphore) -> Dict[str, str]:
+        """
+        여러 가맹점을 한 번의 프롬프트로 분류합니다. (JSON 구조화 출력)
+        실패한 배치는 빈 dict를 반환하여 다음 적재 때 다시 분류되도록 합니다.
+        """
+        prompt = (
+            f"아래 가맹점ID 각각을 {MERCHANT_CATEGORIES} 중 하나로 분류해줘.\n"
+            f"가맹점ID 목록: {json.dumps(merchant_ids, ensure_ascii=False)}\n"
+            '반드시 {"가맹점ID": "카테고리"} 형태의 JSON 객체 하나만 답해.'
+        )
+        async with semaphore:
+            try:
+                res = await self.llm.generate_text(prompt, json_mode=True)
+                parsed = self._parse_category_json(res)
+            except Exception as e:
+                logger.warning(f"가맹점 배치 분류 실패 ({len(merchant_ids)}건): {e}")
+                return {}
+
+        # 요청한 가맹점만 채택하고, 허용되지 않은 카테고리는 기타로 보정
+        return {
+            m: parsed[m] if parsed[m] in MERCHANT_CATEGORIES else DEFAULT_CATEGORY
+            for m in merchant_ids if m in parsed
+        }
+
+    async def _classify_merchants(self, merchant_ids: List[str]) -> Dict[str, str]:
+        """미분류 가맹점 전체를 배치로 나누어 제한된 동시성으로 분류합니다."""
+        batch_size = max(1, settings.CATEGORY_BATCH_SIZE)
+        batches = [merchant_ids[i:i + batch_size] for i in range(0, len(merchant_ids), batch_size)]
+        semaphore = asyncio.Semaphore(settings.CATEGORY_MAX_CONCURRENCY)
+
+        results: Dict[str, str] = {}
+        tasks = [self._classify_batch(batch, semaphore) for batch in batches]
+        for task in tqdm(asyncio.as_completed(tasks), total=len(tasks), desc="Classifying Merchants"):
+            results.update(await task)
+        return results
+
+    def _run_async(self, coro):
+        """청크마다 이벤트 루프(와 LLM HTTP 클라이언트)를 새로 만들지 않고 적재 한 번 동안 같은 루프를 재사용합니다."""
+        if self._loop is None or self._loop.is_closed():
+            self._loop = asyncio.new_event_loop()
+        return self._loop.run_until_complete(coro)
+
+    def _close_event_loop(self):
+        """분류에 사용한 이벤트 루프와 그 루프에 묶인 HTTP 클라이언트를 정리합니다."""
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.run_until_complete(llm_registry.aclose())
+            self._loop.close()
+        self._loop = None
+
+    def _load_merchant_categories(self) -> Dict[str, str]:
+        """merchant_categories 테이블에 저장된 기존 분류 결과를 읽어옵니다."""
+        with self.engine.connect() as conn:
+            rows = conn.execute(select(MerchantCategory.merchant_id, MerchantCategory.category))
+            return {merchant_id: category for merchant_id, category in rows}
 
-    def ingest_sql(self):
-        """CSV 데이터를 PostgreSQL에 적재 (FK 제약 조건 해결 버전)"""
+    def _save_merchant_categories(self, categories: Dict[str, str]):
+        """새로 분류된 결과를 merchant_categories 테이블에 upsert 합니다."""
+        rows = [{"merchant_id": m, "category": c} for m, c in categories.items()]
+        with self.engine.begin() as conn:
+            # 바인드 파라미터 개수 제한을 피하기 위해 1000건 단위로 나누어 저장
+            for i in range(0, len(rows), 1000):
+                stmt = pg_insert(MerchantCategory).values(rows[i:i + 1000])
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[MerchantCategory.merchant_id],
+                    set_={"category": stmt.excluded.category}
+                )
+                conn.execute(stmt)
+
+    def categorize_merchants(self, merchant_ids: Iterable[str], known: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        """
+        모든 고유 가맹점의 카테고리 맵을 반환합니다.
+        이미 저장된 가맹점은 재사용하고, 미분류 가맹점만 LLM으로 분류 후 저장합니다.
+        known을 넘기면 DB 조회 없이 해당 맵을 기준으로 판단하고 결과를 갱신합니다. (청크 적재용)
+        """
+        if known is None:
+            known = self._load_merchant_categories()
+        unseen = sorted({m for m in merchant_ids if m and m not in known})
+
+        if unseen:
+            print(f"🏷️ 가맹점 분류: 기존 {len(known)}건 재사용, 신규 {len(unseen)}건 분류")
+            # 가맹점마다 이벤트 루프를 만들지 않고 적재 전체에서 공유하는 단일 루프에서 병렬 처리
+            classified = self._run_async(self._classify_merchants(unseen))
+            self._save_merchant_categories(classified)
+            known.update(classified)
+        return known
+
+    # --- [PostgreSQL 스트리밍 적재] ---
+
+    # --- [증분 적재 워터마크] ---
+
+    def _load_watermark(self, path: str, store: str = "sql") -> Optional[IngestWatermark]:
+        with self.engine.connect() as conn:
+            key = watermark_key(path, store)
+            row = conn.execute(select(IngestWatermark).where(IngestWatermark.source == key)).first()
+            return row[0] if row else None
+
+    @staticmethod
+    def _hash_file(path: str, prefix_lens: Iterable[int] = ()):
+        """파일 전체 sha256과 앞부분 prefix_lens 바이트 구간별 sha256({길이: 체크섬})을 한 번의 읽기로 계산합니다."""
+        hasher, prefix_checksums, position = hashlib.sha256(), {}, 0
+        with open(path, "rb") as fh:
+            for cut in sorted(set(prefix_lens)):
+                while position < cut:
+                    block = fh.read(min(cut - position, 1 << 20))
+                    if not block:
+                        break
+                    hasher.update(block)
+                    position += len(block)
+                prefix_checksums[cut] = hasher.hexdigest()
+            for block in iter(lambda: fh.read(1 << 20), b""):
+                hasher.update(block)
+        return prefix_checksums, hasher.hexdigest()
+
+    def _plan_sources(self, path: str, full: bool = False) -> Dict[str, SourceDelta]:
+        """
+        저장소별 워터마크와 현재 파일을 비교해 저장소마다 이번에 읽을 구간을 결정합니다. (파일은 한 번만 해싱)
+        - 이전 적재 구간의 체크섬이 같으면: 추가된 바이트만 읽음
+        - 파일이 교체/수정된 경우: 처음부터 읽되 마지막 거래 시각 이후만 적재
+        """
+        size = os.path.getsize(path)
+        watermarks = {store: None if full else self._load_watermark(path, store) for store in STORES}
+        prefix_lens = [w.byte_offset for w in watermarks.values() if w and w.byte_offset <= size]
+        prefix_checksums, checksum = self._hash_file(path, prefix_lens)
+
+        plans = {}
+        for store, watermark in watermarks.items():
+            if watermark is None:
+                plans[store] = SourceDelta(path, 0, size, checksum)
+            elif prefix_checksums.get(watermark.byte_offset) == watermark.checksum:
+                plans[store] = SourceDelta(path, watermark.byte_offset, size, checksum)
+            else:
+                print(f"⚠️ {path} ({store}): 이전 적재 이후 파일이 변경되어 처음부터 다시 읽습니다. "
+                      f"(기준 시각: {watermark.last_timestamp})")
+                plans[store] = SourceDelta(path, 0, size, checksum, since=watermark.last_timestamp)
+        return plans
+
+    def _plan_source(self, path: str, full: bool = False, store: str = "sql") -> SourceDelta:
+        """한 저장소 기준으로 이번에 읽을 구간을 결정합니다."""
+        return self._plan_sources(path, full)[store]
+
+    def _full_source(self, path: str) -> SourceDelta:
+        """워터마크를 무시하고 파일 전체를 읽는 구간"""
+        return SourceDelta(path, 0, os.path.getsize(path), "")
+
+    def _save_watermarks(self, sources: List[SourceDelta], store: str = "sql"):
+        """해당 저장소 적재가 성공한 뒤 그 저장소의 워터마크만 갱신합니다."""
+        with self.engine.begin() as conn:
+            last_ts = conn.execute(text(
+                "SELECT max(transaction_date + coalesce(transaction_time, time '00:00')) FROM transactions"
+            )).scalar()
+            for src in sources:
+                values = {
+                    "source": watermark_key(src.path, store), "checksum": src.checksum, "byte_offset": src.end_offset,
+                    "last_timestamp": last_ts if src.path == self.TRANSACTIONS_PATH else None
+                }
+                stmt = pg_insert(IngestWatermark).values(**values)
+                conn.execute(stmt.on_conflict_do_update(
+                    index_elements=[IngestWatermark.source],
+                    set_={k: stmt.excluded[k] for k in ("checksum", "byte_offset", "last_timestamp")}
+                ))
+
+    # --- [PostgreSQL 스트리밍 적재] ---
+
+    def _read_csv_chunks(self, source: SourceDelta, usecols: List[int], dtype: Dict[int, Any]):
+        """C 엔진 + 명시적 dtype으로 source 구간을 INGEST_CHUNK_SIZE 단위로 읽습니다."""
+        if not source.has_changes:
+            return
+        with open(source.path, "rb") as fh:
+            fh.seek(source.start_offset)
+            yield from pd.read_csv(
+                fh, header=None, usecols=usecols, dtype=dtype,
+                chunksize=settings.INGEST_CHUNK_SIZE, on_bad_lines='skip', engine='c'
+            )
+
+    def _read_transaction_chunks(self, source: SourceDelta):
+        """거래 원천 구간을 정제된 청크 단위로 반환합니다."""
+        chunks = self._read_csv_chunks(
+            source,
+            [self.TRANS_ID_IDX, self.TRANS_ACC_ID_IDX, self.AMOUNT_IDX,
+             self.CURRENCY_IDX, self.MERCHANT_IDX, self.TIMESTAMP_IDX],
+            {self.TRANS_ID_IDX: str, self.TRANS_ACC_ID_IDX: str, self.AMOUNT_IDX: "float64",
+             self.CURRENCY_IDX: str, self.MERCHANT_IDX: str, self.TIMESTAMP_IDX: str}
+        )
+        for chunk in chunks:
+            yield self._prepare_transactions(chunk, source.since)
+
+    def _prepare_transactions(self, chunk: pd.DataFrame, since: Optional[datetime] = None) -> pd.DataFrame:
+        """원본 청크를 staging_transactions 컬럼 구조로 변환합니다."""
+        dt_series = pd.to_datetime(chunk[self.TIMESTAMP_IDX], errors='coerce')
+        df = pd.DataFrame({
+            "transaction_id": chunk[self.TRANS_ID_IDX],
+            "account_id": chunk[self.TRANS_ACC_ID_IDX],
+            "transaction_date": dt_series.dt.date,
+            "transaction_time": dt_series.dt.time,
+            "amount": chunk[self.AMOUNT_IDX],
+            "merchant_id": chunk[self.MERCHANT_IDX],
+            "currency": chunk[self.CURRENCY_IDX]
+        })
+        # 필수 값이 없는 행 제거 및 청크 내 중복 제거 (청크 간 중복은 ON CONFLICT로 처리)
+        mask = dt_series.notna() & df["transaction_id"].notna() & df["account_id"].notna()
+        if since is not None:
+            mask &= dt_series > pd.Timestamp(since)
+        return df[mask].drop_duplicates(subset=["transaction_id"], keep="last")
+
+    @staticmethod
+    def _copy_frame(cursor, table: str, df: pd.DataFrame):
+        """DataFrame을 CSV 버퍼로 변환해 COPY FROM STDIN으로 적재합니다."""
+        buf = io.StringIO()
+        df.to_csv(buf, index=False, header=False)
+        buf.seek(0)
+        columns = ", ".join(df.columns)
+        cursor.copy_expert(f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)", buf)
+
+    def ingest_sql(self, accounts: Optional[SourceDelta] = None, transactions: Optional[SourceDelta] = None) -> bool:
+        """
+        CSV 데이터를 PostgreSQL에 스트리밍 적재합니다.
+        청크 단위로 임시 테이블에 COPY 한 뒤 집합 단위 upsert 하므로 메모리 사용량이 청크 크기로 제한됩니다.
+        이번 적재에서 분류된 가맹점은 마지막에 기존 거래 카테고리와 해당 일/월 롤업까지 보정합니다.
+        구간을 지정하지 않으면 파일 전체를 적재합니다. (FK 제약을 위해 계좌를 거래보다 먼저 적재)
+        """
         print("\n📥 SQL 데이터 적재 시작...")
+        accounts = accounts or self._full_source(self.ACCOUNTS_PATH)
+        transactions = transactions or self._full_source(self.TRANSACTIONS_PATH)
         
+        raw_conn = self.engine.raw_connection()
         try:
-            # [1] 데이터 파일 미리 읽기
-            df_acc_file = pd.read_csv("data/user_accounts.csv", header=None, on_bad_lines='skip', engine='python')
-            df_trans = pd.read_csv("data/transaction_history.csv", header=None, on_bad_lines='skip', engine='python')
-
-            # [2] 모든 계좌 ID 추출 (파일 내 계좌 + 거래 내역 내 계좌 합치기)
-            acc_ids_from_file = set(df_acc_file[self.ACC_ID_IDX].astype(str).unique())
-            acc_ids_from_trans = set(df_trans[self.TRANS_ACC_ID_IDX].astype(str).unique())
-            
-            # 두 집합을 합쳐서 실제 DB에 필요한 모든 계좌 목록 생성
-            all_unique_accounts = list(acc_ids_from_file.union(acc_ids_from_trans))
-            
-            # [3] Accounts 적재 (부모 테이블 먼저)
-            acc_to_db = pd.DataFrame({
-                "account_id": all_unique_accounts,
-                "account_type": "CREDITCARD"  # 기본값
-            })
-            acc_to_db.to_sql("accounts", self.engine, if_exists="append", index=False)
-            print(f"✅ Accounts 적재 완료: {len(acc_to_db)} rows (미등록 계좌 포함)")
-
-            # [4] Transactions 적재 (자식 테이블 나중에)
-            dt_series = pd.to_datetime(df_trans[self.TIMESTAMP_IDX])
-            processed_df = pd.DataFrame({
-                "transaction_id": df_trans[self.TRANS_ID_IDX].astype(str),
-                "account_id": df_trans[self.TRANS_ACC_ID_IDX].astype(str),
-                "transaction_date": dt_series.dt.date,
-                "transaction_time": dt_series.dt.time,
-                "amount": df_trans[self.AMOUNT_IDX].astype(float),
-                "merchant_id": df_trans[self.MERCHANT_IDX].astype(str),
-                "currency": df_trans[self.CURRENCY_IDX].astype(str)
-            })
-
-            # 중복 제거
-            processed_df.drop_duplicates(subset=['transaction_id'], inplace=True)
-
-            # 가맹점 분류 (상위 20개 샘플 대상)
-            unique_merchants = processed_df['merchant_id'].unique()[:20]
-            merchant_map = {}
-            for m in tqdm(unique_merchants, desc="Classifying Merchants"):
-                merchant_map[m] = asyncio.run(self._classify_category(m))
-            
-            processed_df['category'] = processed_df['merchant_id'].map(merchant_map).fillna("기타")
-            
-            # 최종 적재
-            processed_df.to_sql("transactions", self.engine, if_exists="append", index=False)
-            print(f"✅ Transactions 적재 완료: {len(processed_df)} rows")
+            cursor = raw_conn.cursor()
+            cursor.execute(STAGING_DDL)
+
+            # [1] Accounts 적재 (부모 테이블 먼저)
+            account_chunks = self._read_csv_chunks(accounts, [self.ACC_ID_IDX], {self.ACC_ID_IDX: str})
+            for chunk in account_chunks:
+                frame = pd.DataFrame({"account_id": chunk[self.ACC_ID_IDX].dropna().unique()})
+                self._copy_frame(cursor, "staging_accounts", frame)
+                cursor.execute(UPSERT_ACCOUNTS_SQL.format(staging="staging_accounts"))
+                cursor.execute("TRUNCATE staging_accounts")
+                raw_conn.commit()
+            print("✅ Accounts 적재 완료")
+
+            # [2] Transactions 적재 (청크별: 가맹점 분류 -> COPY -> 월 파티션 확보 -> 미등록 계좌 보완 -> upsert -> 롤업 갱신)
+            known_categories = self._load_merchant_categories()
+            previously_known = set(known_categories)
+            partitions: set = set()
+            total = 0
+            for df in tqdm(self._read_transaction_chunks(transactions), desc="Loading Transactions"):
+                self.categorize_merchants(df["merchant_id"].dropna().unique(), known_categories)
+
+                self._copy_frame(cursor, "staging_transactions", df[STAGING_TRANSACTION_COLUMNS])
+                self._ensure_partitions(cursor, df["transaction_date"], partitions)
+                cursor.execute(UPSERT_ACCOUNTS_SQL.format(staging="staging_transactions"))
+                cursor.execute(COLLECT_ROLLUP_KEYS_SQL)
+                cursor.execute(UPSERT_TRANSACTIONS_SQL)
+                cursor.execute(REFRESH_ROLLUPS_SQL)
+                cursor.execute("TRUNCATE staging_transactions")
+                raw_conn.commit()
+                total += len(df)
+
+            print(f"✅ Transactions 적재 완료: {total} rows")
+
+            # [3] 이번에 분류된 가맹점의 이전 거래(앞선 청크/이전 적재에서 기타로 저장된 행) 카테고리 보정 -> 롤업 재계산
+            classified = sorted(set(known_categories) - previously_known)
+            if classified:
+                cursor.execute(BACKFILL_CATEGORIES_SQL, {"merchant_ids": classified})
+                cursor.execute(REFRESH_ROLLUPS_SQL)
+                raw_conn.commit()
+                print(f"🏷️ 가맹점 {len(classified)}건의 기존 거래 카테고리 및 롤업 보정 완료")
+            return True
 
         except Exception as e:
+            raw_conn.rollback()
             print(f"❌ SQL 적재 실패: {e}")
+            return False
+        finally:
+            self._close_event_loop()
+            raw_conn.close()
+
+    # --- [Neo4j 벌크 적재] ---
+
+    def _create_graph_constraints(self):
+        """식별자 유니크 제약을 생성합니다. (이미 있으면 무시)"""
+        with self.neo4j_driver.session() as session:
+            for stmt in GRAPH_CONSTRAINTS:
+                session.run(stmt).consume()
 
-    def _ingest_to_neo4j(self):
-        """Neo4j 지식 그래프 구축"""
+    def _write_graph_batch(self, query: str, rows: List[Dict[str, Any]]):
+        """배치 하나를 명시적 쓰기 트랜잭션으로 실행합니다. (일시 오류/데드락은 드라이버가 재시도)"""
+        with self.neo4j_driver.session() as session:
+            session.execute_write(lambda tx: tx.run(query, rows=rows).consume())
+
+    def _load_graph_rows(self, query: str, rows: List[Dict[str, Any]],
+                         pool: Optional[ThreadPoolExecutor] = None):
+        """rows를 NEO4J_BATCH_SIZE 단위 UNWIND 배치로 나누어 적재합니다. (pool 지정 시 배치를 병렬 세션으로 실행)"""
+        batch_size = max(1, settings.NEO4J_BATCH_SIZE)
+        batches = [rows[i:i + batch_size] for i in range(0, len(rows), batch_size)]
+        if pool is None:
+            for batch in batches:
+                self._write_graph_batch(query, batch)
+            return
+        # 세션은 스레드 간 공유할 수 없으므로 배치마다 별도 세션을 사용합니다.
+        for future in [pool.submit(self._write_graph_batch, query, batch) for batch in batches]:
+            future.result()
+
+    @staticmethod
+    def _account_row(acc_id: str, state=None, country=None) -> Dict[str, Any]:
+        has_loc = pd.notna(state) and pd.notna(country)
+        return {
+            "acc_id": acc_id,
+            "loc_id": f"{country}/{state}" if has_loc else None,
+            "state": state if has_loc else None,
+            "country": country if has_loc else None,
+        }
+
+    def _ingest_to_neo4j(self, accounts: Optional[SourceDelta] = None, transactions: Optional[SourceDelta] = None) -> bool:
+        """
+        Neo4j 지식 그래프 구축 (지정 구간 벌크 적재, 미지정 시 파일 전체)
+        청크마다 새로 등장한 계좌/가맹점을 먼저 MERGE 한 뒤 그 청크의 거래를 바로 UNWIND 배치로 보내므로,
+        메모리에는 한 청크의 거래와 이미 적재한 계좌/가맹점 ID 집합만 유지됩니다.
+        가맹점이 없는 거래는 MATCH (m:Merchant)에서 조용히 빠지므로 미리 제외하고 건수를 기록합니다.
+        """
         print("\n🌐 Neo4j 지식 그래프 구축 중...")
+        accounts = accounts or self._full_source(self.ACCOUNTS_PATH)
+        transactions = transactions or self._full_source(self.TRANSACTIONS_PATH)
+        workers = max(1, settings.NEO4J_LOAD_WORKERS)
         try:
-            # 상위 500개 데이터만 그래프화하여 시각화 성능 확보
-            df = pd.read_csv("data/transaction_history.csv", header=None, on_bad_lines='skip', engine='python').head(500)
-            with self.neo4j_driver.session() as session:
-                for _, row in tqdm(df.iterrows(), total=len(df), desc="Graphing"):
-                    session.run("""
-                        MERGE (a:Account {id: $acc_id})
-                        MERGE (m:Merchant {id: $m_id})
-                        CREATE (t:Transaction {id: $t_id, amount: $amt, date: $date})
-                        CREATE (a)-[:PERFORMED]->(t)-[:AT]->(m)
-                    """, acc_id=str(row[self.TRANS_ACC_ID_IDX]), m_id=str(row[self.MERCHANT_IDX]), 
-                         t_id=str(row[self.TRANS_ID_IDX]), amt=float(row[self.AMOUNT_IDX]), 
-                         date=str(row[self.TIMESTAMP_IDX]))
-            print("✅ Neo4j 구축 완료.")
+            categories = self._load_merchant_categories()
+            self._create_graph_constraints()
+
+            # [1] 계좌(+위치): 계좌 파일 청크 단위 적재
+            seen_accounts, seen_merchants = set(), set()
+            acc_cols = [self.ACC_ID_IDX, self.ACC_STATE_IDX, self.ACC_COUNTRY_IDX]
+            for chunk in self._read_csv_chunks(accounts, acc_cols, {i: str for i in acc_cols}):
+                rows = {}
+                for acc_id, state, country in chunk[acc_cols].itertuples(index=False):
+                    if pd.notna(acc_id):
+                        rows[acc_id] = self._account_row(acc_id, state, country)
+                self._load_graph_rows(ACCOUNT_BATCH_CYPHER, list(rows.values()))
+                seen_accounts.update(rows)
+
+            # [2] 거래 청크별: 신규 계좌/가맹점(+카테고리) -> 거래 배치 (거래 배치만 병렬 세션)
+            total, skipped = 0, 0
+            pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="neo4j-load") if workers > 1 else None
+            try:
+                for df in tqdm(self._read_transaction_chunks(transactions), desc="Graphing Transactions"):
+                    has_merchant = df["merchant_id"].notna()
+                    skipped += int((~has_merchant).sum())
+                    df = df[has_merchant]
+
+                    new_accounts = [a for a in df["account_id"].unique() if a not in seen_accounts]
+                    self._load_graph_rows(ACCOUNT_BATCH_CYPHER, [self._account_row(a) for a in new_accounts])
+                    seen_accounts.update(new_accounts)
+
+                    new_merchants = sorted(m for m in df["merchant_id"].unique() if m not in seen_merchants)
+                    self._load_graph_rows(MERCHANT_BATCH_CYPHER, [
+                        {"m_id": m, "category": categories.get(m, DEFAULT_CATEGORY)} for m in new_merchants
+                    ])
+                    seen_merchants.update(new_merchants)
+
+                    rows = [
+                        {"t_id": t_id, "acc_id": acc_id, "amt": float(amt), "m_id": m_id, "date": str(date)}
+                        for t_id, acc_id, amt, m_id, date in df[
+                            ["transaction_id", "account_id", "amount", "merchant_id", "transaction_date"]
+                        ].itertuples(index=False)
+                    ]
+                    self._load_graph_rows(TRANSACTION_BATCH_CYPHER, rows, pool)
+                    total += len(rows)
+            finally:
+                if pool is not None:
+                    pool.shutdown()
+
+            if skipped:
+                logger.warning(f"가맹점 ID가 없는 거래 {skipped}건은 그래프에 적재하지 않았습니다.")
+            print(f"✅ Neo4j 구축 완료: Transactions {total}건, Merchants {len(seen_merchants)}건 (가맹점 없음 제외 {skipped}건)")
+            return True
         except Exception as e:
             print(f"❌ Neo4j 실패: {e}")
+            return False
+
+    def bump_data_version(self):
+        """데이터 버전을 증가시켜 기존 분석 결과 캐시를 무효화합니다."""
+        try:
+            client = redis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT)
+            version = client.incr(settings.CACHE_DATA_VERSION_KEY)
+            client.close()
+            print(f"🔄 캐시 데이터 버전 갱신: v{version}")
+        except Exception as e:
+            print(f"⚠️ 캐시 데이터 버전 갱신 실패: {e}")
 
-    def run_all(self):
-        """전체 공정 실행"""
+    def run_all(self, full: bool = False):
+        """
+        전체 공정 실행 (기본: 증분 적재)
+        저장소(SQL/Neo4j)마다 자기 워터마크 이후 구간만 반영하고, 성공한 저장소의 워터마크만 갱신합니다.
+        한쪽이 실패해도 성공한 쪽은 다음 실행에서 같은 구간을 다시 적재하지 않고, 실패한 쪽만 재시도합니다.
+        full=True이면 워터마크를 무시하고 파일 전체를 다시 반영합니다. (upsert/MERGE로 중복 없이 처리)
+        """
         self.create_tables()
-        self.ingest_sql()
-        self._ingest_to_neo4j()
+        accounts = self._plan_sources(self.ACCOUNTS_PATH, full)
+        transactions = self._plan_sources(self.TRANSACTIONS_PATH, full)
+        loaders = {"sql": self.ingest_sql, "neo4j": self._ingest_to_neo4j}
+
+        ingested = False
+        for store, load in loaders.items():
+            sources = [accounts[store], transactions[store]]
+            if not any(src.has_changes for src in sources):
+                continue
+            ingested = True
+            if load(*sources):
+                self._save_watermarks(sources, store)
+        if not ingested:
+            print("✅ 새로 추가된 데이터가 없습니다.")
+            return
+        self.bump_data_version()
 
 # --- [CLI 진입점] pyproject.toml에서 호출 ---
 
-def run_cli():
+def run_cli(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="가계부 데이터 적재 (기본: 증분 적재)")
+    parser.add_argument("--full", action="store_true", help="워터마크를 무시하고 전체 파일을 다시 적재")
+    args = parser.parse_args(argv)
+
     ingestor = DataIngestor()
     try:
-        ingestor.run_all()
+        ingestor.run_all(full=args.full)
     finally:
         ingestor.close()
 
@@ -154,6 +718,7 @@ def run_drop_cli():
         ingestor.drop_tables()
         with ingestor.neo4j_driver.session() as session:
             session.run("MATCH (n) DETACH DELETE n")
+        ingestor.bump_data_version()
         print("✅ 모든 데이터가 삭제되었습니다.")
     finally:
-        ingestor.close()
\ No newline at end of file
+        ingestor.close()
@@ -1,12 +1,21 @@
 import httpx
 import json
+import asyncio
 import logging
+import weakref
+import importlib.util
 from abc import ABC, abstractmethod
 from typing import Optional
+from langchain_openai import ChatOpenAI
+from household_ledger.common.config import settings
+from household_ledger.infrastructure.telemetry import TokenUsageCallback
 
 # 로깅 설정
 logger = logging.getLogger(__name__)
 
+# 재시도 대상 HTTP 상태 코드 (Rate Limit 및 서버 일시 오류)
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
 class ILlmClient(ABC):
     """
     LLM 클라이언트를 위한 추상 베이스 클래스(Interface)입니다.
@@ -17,10 +26,83 @@ class ILlmClient(ABC):
         """텍스트 생성을 위한 추상 메서드"""
         pass
 
+class LlmClientRegistry:
+    """
+    프로세스 전역에서 공유하는 LLM 클라이언트 레지스트리입니다.
+    호출마다 HTTP 클라이언트/ChatOpenAI 객체를 새로 만들지 않고, 이벤트 루프별로
+    keep-alive 커넥션 풀을 가진 클라이언트를 재사용합니다.
+    (httpx 커넥션은 생성된 이벤트 루프에 묶이므로 루프 단위로 관리합니다.)
+    """
+
+    def __init__(self):
+        self._http_clients = weakref.WeakKeyDictionary()
+        self._chat_models = weakref.WeakKeyDictionary()
+
+    @staticmethod
+    def _http2_enabled() -> bool:
+        """HTTP/2는 h2 패키지가 설치된 경우에만 활성화합니다."""
+        if not settings.LLM_HTTP2:
+            return False
+        if importlib.util.find_spec("h2") is None:
+            logger.debug("h2 패키지가 없어 HTTP/1.1 keep-alive로 동작합니다.")
+            return False
+        return True
+
+    def get_http_client(self) -> httpx.AsyncClient:
+        """현재 이벤트 루프에 묶인 공유 httpx.AsyncClient를 반환합니다."""
+        loop = asyncio.get_running_loop()
+        client = self._http_clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                timeout=httpx.Timeout(settings.LLM_TIMEOUT_SECONDS, connect=10.0),
+                limits=httpx.Limits(
+                    max_connections=settings.LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY
+                ),
+                http2=self._http2_enabled()
+            )
+            self._http_clients[loop] = client
+        return client
+
+    def get_chat_model(self) -> ChatOpenAI:
+        """공유 커넥션 풀을 사용하는 LangChain ChatOpenAI 객체를 반환합니다."""
+        loop = asyncio.get_running_loop()
+        model = self._chat_models.get(loop)
+        http_client = self.get_http_client()
+        if model is None or model.http_async_client is not http_client:
+            model = ChatOpenAI(
+                model=settings.LLM_MODEL_NAME,
+                base_url=settings.LLM_BASE_URL,
+                api_key=settings.LLM_API_KEY or "none",
+                temperature=0,
+                # OpenAI SDK 내장 재시도 (429/5xx 지수 백오프)
+                max_retries=settings.LLM_MAX_RETRIES,
+                http_async_client=http_client,
+                # 노드별 토큰 사용량 집계 (스트리밍 응답도 usage를 받도록 stream_usage 사용)
+                callbacks=[TokenUsageCallback()] if settings.METRICS_ENABLED else None,
+                stream_usage=settings.METRICS_ENABLED
+            )
+            self._chat_models[loop] = model
+        return model
+
+    async def aclose(self):
+        """보유한 HTTP 클라이언트를 모두 닫습니다. (애플리케이션 종료 시 호출)"""
+        for client in list(self._http_clients.values()):
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.warning(f"LLM HTTP 클라이언트 종료 실패: {e}")
+        self._http_clients.clear()
+        self._chat_models.clear()
+
+# 싱글톤 객체 생성
+llm_registry = LlmClientRegistry()
+
 class UnifiedLlmClient(ILlmClient):
     """
     Gemini, Grok, vLLM 등을 하나로 통합한 비동기 LLM 클라이언트입니다.
-    OpenAI 호환 규격을 사용하여 다양한 모델을 지원하며, httpx를 통해 비동기로 동작합니다.
+    OpenAI 호환 규격을 사용하여 다양한 모델을 지원하며, 공유 httpx 커넥션 풀을 통해 비동기로 동작합니다.
     """
     
     def __init__(self, api_key: str, base_url: str, model_name: str):
@@ -29,13 +111,22 @@ class UnifiedLlmClient(ILlmClient):
         # base_url 끝에 /v1이 중복되지 않도록 rstrip 처리
         self.base_url = base_url.rstrip("/")
         self.model_name = model_name
-        
-        # 비동기 통신을 위한 타임아웃 설정 (연결 10초, 전체 응답 60초)
-        self.timeout = httpx.Timeout(60.0, connect=10.0)
+        self.max_retries = settings.LLM_MAX_RETRIES
 
-    async def generate_text(self, prompt: str, system_prompt: Optional[str] = None) -> str:
+    @staticmethod
+    def _backoff_seconds(attempt: int, response: Optional[httpx.Response] = None) -> float:
+        """Retry-After 헤더가 있으면 우선 적용하고, 없으면 지수 백오프를 사용합니다."""
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return float(retry_after)
+        return settings.LLM_RETRY_BACKOFF_SECONDS * (2 ** attempt)
+
+    async def generate_text(self, prompt: str, system_prompt: Optional[str] = None, json_mode: bool = False) -> str:
         """
-        httpx.AsyncClient를 사용하여 OpenAI 호환 엔드포인트에 비동기 요청을 보냅니다.
+        공유 httpx.AsyncClient를 사용하여 OpenAI 호환 엔드포인트에 비동기 요청을 보냅니다.
+        429/5xx 응답 및 연결 오류는 지수 백오프로 재시도합니다.
+        json_mode=True이면 response_format으로 JSON 객체 출력을 요청합니다.
         """
         # API 요청 헤더 구성
         headers = {
@@ -55,9 +146,12 @@ class UnifiedLlmClient(ILlmClient):
             "messages": messages,
             "temperature": 0.1  # 결과의 일관성을 위해 0.1로 고정
         }
+        if json_mode:
+            payload["response_format"] = {"type": "json_object"}
 
-        # 비동기 HTTP 클라이언트를 통한 호출
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
+        # 호출마다 연결을 새로 맺지 않도록 공유 클라이언트 사용
+        client = llm_registry.get_http_client()
+        for attempt in range(self.max_retries + 1):
             try:
                 # 비동기 POST 요청 실행
                 response = await client.post(
@@ -66,6 +160,13 @@ class UnifiedLlmClient(ILlmClient):
                     json=payload
                 )
                 
+                # 일시적 오류는 백오프 후 재시도
+                if response.status_code in RETRYABLE_STATUS_CODES and attempt < self.max_retries:
+                    delay = self._backoff_seconds(attempt, response)
+                    logger.warning(f"LLM 일시 오류 ({response.status_code}), {delay:.1f}s 후 재시도 ({attempt + 1}/{self.max_retries})")
+                    await asyncio.sleep(delay)
+                    continue
+
                 # HTTP 에러 발생 시 예외 발생
                 response.raise_for_status()
                 
@@ -73,9 +174,15 @@ class UnifiedLlmClient(ILlmClient):
                 result = response.json()
                 return result["choices"][0]["message"]["content"].strip()
                 
+            except (httpx.ConnectError, httpx.RemoteProtocolError) as e:
+                if attempt < self.max_retries:
+                    await asyncio.sleep(self._backoff_seconds(attempt))
+                    continue
+                logger.error(f"LLM 연결 실패 ({self.model_name}): {e}")
+                raise
             except httpx.HTTPStatusError as e:
                 logger.error(f"HTTP 상태 오류 발생 ({self.model_name}): {e.response.status_code}")
                 raise
             except Exception as e:
                 logger.error(f"LLM 호출 중 예상치 못한 오류 발생 ({self.model_name}): {e}")
-                raise
\ No newline at end of file
+                raise
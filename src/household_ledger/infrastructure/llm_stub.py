@@ -0,0 +1,242 @@
+"""
+GPU 없이 파이프라인을 벤치마크하기 위한 OpenAI 호환 LLM 대역(stand-in) 서버입니다.
+/v1/chat/completions(스트리밍 포함)를 구현하며, 라우터/SQL/Cypher/정제/분석 프롬프트를 규칙으로 판별해
+결정적인 응답을 돌려줍니다. 첫 토큰 지연(TTFT), 초당 토큰 수, 동시 처리 슬롯, 오류 주입을 설정할 수 있습니다.
+
+실행: ledger-llm-stub --port 8000 --profile vllm-7b  (앱은 LLM_BASE_URL=http://localhost:8000/v1)
+"""
+
+import re
+import sys
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import logging
+from dataclasses import dataclass, field, replace
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from household_ledger.graph.intent_classifier import intent_classifier
+
+logger = logging.getLogger(__name__)
+
+# --- [Latency Profiles] ---
+
+@dataclass(frozen=True)
+class StubProfile:
+    ttft_ms: float = 0.0            # 요청 수신 ~ 첫 토큰까지의 지연 (prefill 대기 포함)
+    tokens_per_sec: float = 0.0     # 생성 속도 (0 = 지연 없음)
+    jitter: float = 0.0             # 지연 시간 무작위 변동 비율 (0.2 = ±20%)
+    max_concurrency: int = 0        # 동시에 생성하는 요청 수 (초과 요청은 대기, 0 = 무제한)
+    error_rate: float = 0.0         # 오류 응답 비율 (0~1)
+    error_status: int = 503         # 주입할 오류 상태 코드 (429면 Retry-After 헤더 포함)
+    seed: Optional[int] = None      # 지연/오류 재현용 난수 시드
+    script: List[Dict[str, str]] = field(default_factory=list)   # [{"match": 정규식, "response": 응답}]
+
+# 대표 프로파일 (명령행 옵션으로 개별 값 덮어쓰기 가능)
+PROFILES: Dict[str, StubProfile] = {
+    "instant": StubProfile(),
+    "vllm-7b": StubProfile(ttft_ms=250, tokens_per_sec=45, jitter=0.2, max_concurrency=16),
+    "hosted-api": StubProfile(ttft_ms=600, tokens_per_sec=80, jitter=0.3),
+    "overloaded": StubProfile(ttft_ms=1500, tokens_per_sec=15, jitter=0.5, max_concurrency=4, error_rate=0.05, error_status=429),
+}
+
+# --- [Rule-based Responses] ---
+
+_QUESTION = re.compile(r"(?:현재 질문|질문):\s*(.+)")
+
+def _question(prompt: str) -> str:
+    """프롬프트에서 마지막 '질문:' 줄을 추출합니다."""
+    matches = _QUESTION.findall(prompt)
+    return matches[-1].strip() if matches else prompt.strip().splitlines()[-1] if prompt.strip() else ""
+
+def _sql_for(prompt: str, question: str) -> str:
+    if ":merchant_ids" in prompt:
+        return "SELECT SUM(amount) AS total_amount FROM transactions WHERE merchant_id = ANY(:merchant_ids)"
+    if re.search(r"카테고리|분류|항목", question):
+        return ("SELECT category, SUM(amount) AS total_amount FROM transactions "
+                "GROUP BY category ORDER BY total_amount DESC")
+    if re.search(r"월별|추이|매달", question):
+        return ("SELECT DATE_TRUNC('month', transaction_date) AS month, SUM(amount) AS total_amount "
+                "FROM transactions GROUP BY 1 ORDER BY 1")
+    if re.search(r"얼마|합계|총", question):
+        return "SELECT SUM(amount) AS total_amount FROM transactions"
+    return "SELECT transaction_date, merchant_id, amount FROM transactions ORDER BY transaction_date DESC LIMIT 10"
+
+def rule_response(prompt: str, script: Optional[List[Dict[str, str]]] = None) -> str:
+    """프롬프트 종류(스크립트 > 라우터 > SQL > Cypher > 정제 > 가맹점 분류 > 분석)에 맞는 응답을 만듭니다."""
+    for rule in script or []:
+        if re.search(rule["match"], prompt):
+            return rule["response"]
+    question = _question(prompt)
+    if "경로 결정자" in prompt:
+        return json.dumps({"intent": intent_classifier.predict(question).intent})
+    if "PostgreSQL" in prompt:
+        return _sql_for(prompt, question)
+    if "Cypher" in prompt:
+        return "MATCH (m:Merchant)-[:BELONGS_TO]->(c:Category) RETURN DISTINCT m.id AS merchant_id LIMIT 20"
+    if "완성된 질문" in prompt:
+        return question
+    if "가맹점ID 목록" in prompt:
+        ids = re.search(r"가맹점ID 목록:\s*(\[.*?\])", prompt)
+        return json.dumps({m: "기타" for m in json.loads(ids.group(1))} if ids else {}, ensure_ascii=False)
+    return ("요청하신 기간의 지출 데이터를 분석했습니다. 가장 큰 비중을 차지한 항목과 합계를 기준으로 보면 "
+            "전반적인 소비 흐름은 안정적이며, 상위 항목의 지출을 조금 줄이면 전체 지출을 효과적으로 관리할 수 있습니다.")
+
+def split_tokens(text: str) -> List[str]:
+    """응답을 스트리밍 조각으로 나눕니다. (단어 + 뒤따르는 공백 단위, 토큰 수 근사)"""
+    return re.findall(r"\S+\s*|\s+", text)
+
+def count_prompt_tokens(messages: List[Dict[str, Any]]) -> int:
+    return sum(len(split_tokens(str(m.get("content", "")))) for m in messages)
+
+# --- [Server] ---
+
+class LlmStub:
+    """프로파일에 따라 지연/오류를 흉내 내는 OpenAI 호환 채팅 응답 생성기"""
+
+    def __init__(self, profile: StubProfile):
+        self.profile = profile
+        self._random = random.Random(profile.seed)
+        self._slots = asyncio.Semaphore(profile.max_concurrency) if profile.max_concurrency else None
+        self.stats = {"requests": 0, "errors": 0, "completion_tokens": 0}
+
+    def _delay(self, seconds: float) -> float:
+        if seconds <= 0 or not self.profile.jitter:
+            return max(seconds, 0.0)
+        return max(0.0, seconds * (1 + self._random.uniform(-self.profile.jitter, self.profile.jitter)))
+
+    def _token_interval(self) -> float:
+        return self._delay(1 / self.profile.tokens_per_sec) if self.profile.tokens_per_sec else 0.0
+
+    def _inject_error(self) -> Optional[JSONResponse]:
+        if not self.profile.error_rate or self._random.random() >= self.profile.error_rate:
+            return None
+        self.stats["errors"] += 1
+        headers = {"Retry-After": "1"} if self.profile.error_status == 429 else None
+        body = {"error": {"message": "stub injected error", "type": "server_error", "code": self.profile.error_status}}
+        return JSONResponse(body, status_code=self.profile.error_status, headers=headers)
+
+    def _prepare(self, body: Dict[str, Any]) -> Tuple[str, List[str], Dict[str, int]]:
+        messages = body.get("messages") or []
+        prompt = "\n".join(str(m.get("content", "")) for m in messages if m.get("role") != "system")
+        tokens = split_tokens(rule_response(prompt, self.profile.script))
+        usage = {"prompt_tokens": count_prompt_tokens(messages), "completion_tokens": len(tokens)}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        return body.get("model") or "llm-stub", tokens, usage
+
+    async def _acquire(self):
+        if self._slots is not None:
+            await self._slots.acquire()
+
+    def _release(self):
+        if self._slots is not None:
+            self._slots.release()
+
+    async def complete(self, body: Dict[str, Any]):
+        self.stats["requests"] += 1
+        error = self._inject_error()
+        if error is not None:
+            return error
+        model, tokens, usage = self._prepare(body)
+        self.stats["completion_tokens"] += usage["completion_tokens"]
+        if body.get("stream"):
+            include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+            return StreamingResponse(self._stream(model, tokens, usage, include_usage), media_type="text/event-stream")
+
+        await self._acquire()
+        try:
+            await asyncio.sleep(self._delay(self.profile.ttft_ms / 1000) + self._token_interval() * len(tokens))
+        finally:
+            self._release()
+        return JSONResponse({
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)}, "finish_reason": "stop"}],
+            "usage": usage
+        })
+
+    async def _stream(self, model: str, tokens: List[str], usage: Dict[str, int], include_usage: bool) -> AsyncIterator[str]:
+        chunk_id, created = f"chatcmpl-{uuid.uuid4().hex[:12]}", int(time.time())
+
+        def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None, **extra) -> str:
+            payload = {"id": chunk_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                       "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}], **extra}
+            return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+        await self._acquire()
+        try:
+            await asyncio.sleep(self._delay(self.profile.ttft_ms / 1000))
+            yield chunk({"role": "assistant", "content": ""})
+            for token in tokens:
+                yield chunk({"content": token})
+                interval = self._token_interval()
+                if interval:
+                    await asyncio.sleep(interval)
+        finally:
+            self._release()
+        yield chunk({}, "stop")
+        if include_usage:
+            payload = {"id": chunk_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                       "choices": [], "usage": usage}
+            yield f"data: {json.dumps(payload)}\n\n"
+        yield "data: [DONE]\n\n"
+
+def create_stub_app(profile: Optional[StubProfile] = None) -> FastAPI:
+    """LLM 대역 서버 FastAPI 앱을 생성합니다."""
+    stub = LlmStub(profile or PROFILES["instant"])
+    app = FastAPI(title="Household Ledger LLM Stub")
+    app.state.stub = stub
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        return await stub.complete(await request.json())
+
+    @app.get("/v1/models")
+    async def models():
+        return {"object": "list", "data": [{"id": "llm-stub", "object": "model", "owned_by": "household-ledger"}]}
+
+    @app.get("/stats")
+    async def stats():
+        return stub.stats
+
+    return app
+
+def run_stub_cli(argv=None):
+    """ledger-llm-stub 명령: 프로파일을 고르고 개별 지연/오류 값을 덮어써서 서버를 실행합니다."""
+    parser = argparse.ArgumentParser(description="OpenAI 호환 LLM 대역 서버 (GPU 없는 벤치마크용)")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="instant")
+    parser.add_argument("--ttft-ms", type=float, help="첫 토큰 지연(ms)")
+    parser.add_argument("--tokens-per-sec", type=float, help="초당 생성 토큰 수 (0 = 지연 없음)")
+    parser.add_argument("--jitter", type=float, help="지연 변동 비율 (0.2 = ±20%%)")
+    parser.add_argument("--max-concurrency", type=int, help="동시 생성 슬롯 수 (0 = 무제한)")
+    parser.add_argument("--error-rate", type=float, help="오류 주입 비율 (0~1)")
+    parser.add_argument("--error-status", type=int, help="주입할 HTTP 상태 코드 (예: 429, 503)")
+    parser.add_argument("--seed", type=int, help="재현용 난수 시드")
+    parser.add_argument("--script", help='스크립트 응답 JSON 파일 ([{"match": 정규식, "response": 응답}, ...])')
+    args = parser.parse_args(argv)
+
+    overrides = {
+        name: getattr(args, name) for name in
+        ("ttft_ms", "tokens_per_sec", "jitter", "max_concurrency", "error_rate", "error_status", "seed")
+        if getattr(args, name) is not None
+    }
+    if args.script:
+        with open(args.script, "r", encoding="utf-8") as f:
+            overrides["script"] = json.load(f)
+    profile = replace(PROFILES[args.profile], **overrides)
+    logger.info(f"LLM 대역 서버 시작: {profile}")
+
+    import uvicorn
+    uvicorn.run(create_stub_app(profile), host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    run_stub_cli(sys.argv[1:])
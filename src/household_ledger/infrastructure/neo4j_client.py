@@ -1,4 +1,4 @@
-from neo4j import GraphDatabase
+from neo4j import GraphDatabase, AsyncGraphDatabase, Query, READ_ACCESS
 from household_ledger.common.config import settings
 
 class Neo4jClient:
@@ -8,15 +8,37 @@ class Neo4jClient:
             settings.NEO4J_URI, 
             auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD)
         )
+        # 비동기 드라이버는 워크플로우(이벤트 루프) 안에서 처음 사용할 때 생성합니다.
+        self._async_driver = None
+
+    @property
+    def async_driver(self):
+        if self._async_driver is None:
+            self._async_driver = AsyncGraphDatabase.driver(
+                settings.NEO4J_URI,
+                auth=(settings.NEO4J_USER, settings.NEO4J_PASSWORD)
+            )
+        return self._async_driver
 
     def close(self):
         self.driver.close()
 
+    async def aclose(self):
+        if self._async_driver is not None:
+            await self._async_driver.close()
+            self._async_driver = None
+
     def execute_query(self, query, parameters=None):
         """Cypher 쿼리를 실행하고 결과를 리스트로 반환"""
         with self.driver.session() as session:
             result = session.run(query, parameters)
             return [record.data() for record in result]
 
+    async def aexecute_query(self, query, parameters=None):
+        """읽기 전용 세션에서 Cypher 쿼리를 비동기로 실행하고 결과를 리스트로 반환"""
+        async with self.async_driver.session(default_access_mode=READ_ACCESS) as session:
+            result = await session.run(Query(query, timeout=settings.NEO4J_QUERY_TIMEOUT_SECONDS), parameters or {})
+            return await result.data()
+
 # 싱글톤 객체 생성
-neo4j_client = Neo4jClient()
\ No newline at end of file
+neo4j_client = Neo4jClient()
@@ -0,0 +1,67 @@
+import json
+import uuid
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Sequence
+
+try:
+    import orjson
+except ImportError:  # orjson 미설치 환경에서는 표준 json으로 동작
+    orjson = None
+
+# 지원하는 SQL 결과 형식
+# - records: [{"컬럼": 값, ...}, ...] (기본값, 프론트엔드/분석 노드 호환)
+# - columnar: {"columns": [...], "data": [[컬럼1 값들], [컬럼2 값들], ...]} (키 반복이 없어 큰 결과에 유리)
+RESULT_FORMATS = ("records", "columnar")
+
+def to_jsonable(value: Any) -> Any:
+    """DB 드라이버가 돌려주는 값(Decimal, 날짜/시간, UUID 등)을 JSON 호환 값으로 변환합니다."""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, Decimal):
+        # 정수 값은 int로 유지 (금액 합계 등)
+        return int(value) if value == value.to_integral_value() and value.is_finite() else float(value)
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).hex()
+    if isinstance(value, (list, tuple)):
+        return [to_jsonable(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): to_jsonable(v) for k, v in value.items()}
+    return str(value)
+
+def rows_to_records(columns: Sequence[str], rows) -> List[Dict[str, Any]]:
+    """커서 행(tuple)을 한 번만 순회하며 JSON 호환 dict 리스트로 변환합니다."""
+    return [dict(zip(columns, map(to_jsonable, row))) for row in rows]
+
+def to_columnar(records: List[Dict[str, Any]], columns: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    """dict 리스트를 컬럼별 값 리스트 형식으로 변환합니다. (결과가 비어도 컬럼 목록은 유지)"""
+    columns = list(columns or (records[0].keys() if records else []))
+    return {"columns": columns, "data": [[r.get(c) for r in records] for c in columns]}
+
+def format_result(records: List[Dict[str, Any]], result_format: str = "records",
+                  columns: Optional[Sequence[str]] = None) -> Any:
+    """API 응답용 SQL 결과를 요청한 형식으로 반환합니다."""
+    if result_format not in RESULT_FORMATS:
+        raise ValueError(f"지원하지 않는 결과 형식입니다: {result_format}")
+    return to_columnar(records, columns) if result_format == "columnar" else records
+
+def _default(value: Any) -> Any:
+    converted = to_jsonable(value)
+    if converted is value:
+        raise TypeError(f"JSON으로 직렬화할 수 없는 값입니다: {type(value)!r}")
+    return converted
+
+def dumps(obj: Any) -> bytes:
+    """JSON 바이트로 직렬화합니다. (orjson이 있으면 사용, datetime/UUID는 네이티브 처리)"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, default=_default).encode("utf-8")
+
+def dumps_text(obj: Any) -> str:
+    return dumps(obj).decode("utf-8")
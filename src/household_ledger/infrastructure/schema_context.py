@@ -0,0 +1,140 @@
+import time
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import inspect
+from household_ledger.common.config import settings
+from household_ledger.domain import models
+from household_ledger.infrastructure.sql_executor import sql_executor
+
+logger = logging.getLogger(__name__)
+
+# --- [데이터 프로파일 SQL] ---
+# 건수/분포는 롤업 테이블에서, 기간은 transaction_date 인덱스의 MIN/MAX로 조회합니다. (원본 전체 스캔 없음)
+
+OVERVIEW_SQL = """
+SELECT (SELECT COUNT(*) FROM accounts) AS account_count,
+       (SELECT COALESCE(SUM(txn_count), 0) FROM monthly_spend_rollup) AS transaction_count,
+       (SELECT MIN(transaction_date) FROM transactions) AS first_date,
+       (SELECT MAX(transaction_date) FROM transactions) AS last_date
+"""
+
+CATEGORY_VALUES_SQL = """
+SELECT category, SUM(txn_count) AS txn_count
+FROM monthly_spend_rollup GROUP BY category ORDER BY txn_count DESC
+"""
+
+TOP_MERCHANTS_SQL = """
+SELECT merchant_id, MAX(category) AS category, SUM(txn_count) AS txn_count
+FROM monthly_spend_rollup WHERE merchant_id <> ''
+GROUP BY merchant_id ORDER BY txn_count DESC LIMIT :limit
+"""
+
+ACCOUNT_TYPES_SQL = """
+SELECT account_type, COUNT(*) AS account_count
+FROM accounts WHERE account_type IS NOT NULL GROUP BY account_type ORDER BY account_count DESC LIMIT 20
+"""
+
+def describe_models() -> str:
+    """SQLAlchemy 모델에서 가계부 테이블 정보를 추출합니다. (모델은 실행 중 바뀌지 않으므로 1회만 계산)"""
+    global _model_schema
+    if _model_schema is None:
+        schema_info = []
+        for name, obj in vars(models).items():
+            if isinstance(obj, type) and hasattr(obj, "__tablename__") and obj != models.Base:
+                table = obj.__table__
+                # 적재 관리용 내부 테이블은 제외
+                if table.info.get("internal"):
+                    continue
+                inst = inspect(obj)
+                columns = [
+                    f"- {col.name} ({col.type})" + (f": {col.comment}" if col.comment else "")
+                    for col in inst.columns
+                ]
+                header = f"Table: {obj.__tablename__}" + (f" -- {table.comment}" if table.comment else "")
+                schema_info.append(f"{header}\nColumns:\n" + "\n".join(columns))
+        _model_schema = "\n\n".join(schema_info)
+    return _model_schema
+
+_model_schema: Optional[str] = None
+
+def _quote(values: List[Any]) -> str:
+    return ", ".join(f"'{v}'" for v in values)
+
+def format_data_profile(overview: Dict[str, Any], categories: List[Dict[str, Any]],
+                        merchants: List[Dict[str, Any]], account_types: List[Dict[str, Any]]) -> str:
+    """조회한 통계를 SQL 생성 프롬프트용 요약 문자열로 변환합니다."""
+    lines = ["데이터 요약 (WHERE 조건에는 아래 실제 값을 그대로 사용):"]
+    trans = f"- transactions: 약 {int(overview.get('transaction_count') or 0):,}건"
+    if overview.get("first_date") and overview.get("last_date"):
+        trans += f", transaction_date 범위 {overview['first_date']} ~ {overview['last_date']}"
+    lines.append(trans)
+
+    accounts = f"- accounts: {int(overview.get('account_count') or 0):,}건"
+    if account_types:
+        accounts += f", account_type 값: {_quote([r['account_type'] for r in account_types])}"
+    lines.append(accounts)
+
+    if categories:
+        lines.append(f"- category 값 (거래 건수 순): {_quote([r['category'] for r in categories])}")
+    if merchants:
+        top = ", ".join(f"'{r['merchant_id']}'({r['category']})" for r in merchants)
+        lines.append(f"- 거래가 많은 merchant_id (카테고리): {top}")
+    return "\n".join(lines)
+
+class SchemaContext:
+    """
+    SQL 생성 프롬프트용 스키마 설명을 미리 만들어 캐싱하는 서비스입니다.
+    - 모델 스키마(테이블/컬럼/주석) + 실제 데이터 요약(건수, 기간, 카테고리 값, 상위 가맹점)
+    - 데이터 버전(ledger-ingest 시 증가)이 바뀌면 다시 생성하며, invalidate()로 즉시 폐기할 수 있습니다.
+    - 통계 조회에 실패하면 모델 스키마만 사용하고 SCHEMA_CONTEXT_RETRY_SECONDS 후 다시 시도합니다.
+    """
+
+    def __init__(self):
+        self._prompt: Optional[str] = None
+        self._version: Optional[str] = None
+        self._retry_at: Optional[float] = None   # 통계 조회 실패 시 재시도 가능 시각
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        """캐시된 스키마 설명을 폐기합니다. (다음 get 호출 시 재생성)"""
+        self._prompt = None
+        self._version = None
+        self._retry_at = None
+
+    def _is_fresh(self, data_version: str) -> bool:
+        if self._prompt is None or self._version != data_version:
+            return False
+        return self._retry_at is None or time.monotonic() < self._retry_at
+
+    async def _fetch_profile(self) -> str:
+        overview, categories, merchants, account_types = await asyncio.gather(
+            sql_executor.fetch_all(OVERVIEW_SQL),
+            sql_executor.fetch_all(CATEGORY_VALUES_SQL),
+            sql_executor.fetch_all(TOP_MERCHANTS_SQL, {"limit": settings.SCHEMA_CONTEXT_TOP_MERCHANTS}),
+            sql_executor.fetch_all(ACCOUNT_TYPES_SQL),
+        )
+        return format_data_profile(overview[0] if overview else {}, categories, merchants, account_types)
+
+    async def get(self, data_version: str = "0") -> str:
+        """데이터 버전에 맞는 스키마 설명을 반환합니다. (동시 요청은 한 번만 생성)"""
+        if self._is_fresh(data_version):
+            return self._prompt
+        async with self._lock:
+            if self._is_fresh(data_version):
+                return self._prompt
+
+            schema = describe_models()
+            try:
+                profile = await self._fetch_profile()
+                self._prompt, self._retry_at = f"{schema}\n\n{profile}", None
+            except Exception as e:
+                logger.warning(f"스키마 데이터 요약 생성 실패 (모델 스키마만 사용): {e}")
+                self._prompt = schema
+                self._retry_at = time.monotonic() + settings.SCHEMA_CONTEXT_RETRY_SECONDS
+            self._version = data_version
+            return self._prompt
+
+# 싱글톤 객체 생성
+schema_context = SchemaContext()
@@ -0,0 +1,186 @@
+import json
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import create_engine, text
+from household_ledger.common.config import settings
+from household_ledger.infrastructure.result_codec import rows_to_records, to_jsonable
+
+logger = logging.getLogger(__name__)
+
+# LLM이 생성한 쿼리에 붙이는 주석 태그 (pg_stat_statements에서 생성 쿼리만 골라내는 용도)
+GENERATED_QUERY_TAG = "/* household_ledger:generated */"
+
+def build_db_url(driver: str = "postgresql") -> str:
+    """설정값으로 PostgreSQL 접속 URL을 생성합니다."""
+    return (
+        f"{driver}://{settings.DB_USER}:{settings.DB_PASSWORD}@"
+        f"{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}"
+    )
+
+class SqlExecutor:
+    """
+    생성된 SQL을 이벤트 루프를 막지 않고 실행하는 실행기입니다.
+    - threadpool: 동기 엔진을 제한된 스레드 풀에서 실행 (기본값)
+    - async: SQLAlchemy 비동기 엔진(asyncpg)으로 실행
+    두 방식 모두 커넥션 풀, 쿼리 단위 statement_timeout, 서버 사이드 커서를 사용합니다.
+    """
+
+    def __init__(self, backend: Optional[str] = None, db_url: Optional[str] = None):
+        self.backend = (backend or settings.SQL_EXECUTION_BACKEND).lower()
+        if self.backend not in ("threadpool", "async"):
+            raise ValueError(f"지원하지 않는 SQL 실행 백엔드입니다: {self.backend}")
+
+        self.db_url = db_url or build_db_url()
+        # 엔진 생성 시점에는 실제 연결이 발생하지 않습니다.
+        self.engine = create_engine(
+            self.db_url,
+            pool_size=settings.SQL_POOL_SIZE,
+            max_overflow=settings.SQL_MAX_OVERFLOW,
+            pool_timeout=settings.SQL_POOL_TIMEOUT,
+            pool_pre_ping=True,
+            connect_args={"options": f"-c statement_timeout={settings.SQL_STATEMENT_TIMEOUT_MS}"}
+        )
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self._async_engine = None
+
+    # --- [Threadpool Backend] ---
+
+    def _get_thread_pool(self) -> ThreadPoolExecutor:
+        """커넥션 풀 크기만큼만 동시 실행되도록 스레드 수를 제한합니다."""
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(
+                max_workers=settings.SQL_POOL_SIZE + settings.SQL_MAX_OVERFLOW,
+                thread_name_prefix="sql-exec"
+            )
+        return self._thread_pool
+
+    def _fetch_sync(self, query: str, params: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        with self.engine.connect() as conn:
+            # yield_per: 서버 사이드 커서로 배치 단위 fetch (대용량 결과 메모리 보호)
+            result = conn.execute(
+                text(query), params or {},
+                execution_options={"yield_per": settings.SQL_STREAM_BATCH_SIZE}
+            )
+            if not result.returns_rows:
+                return []
+            return [dict(row._mapping) for row in result]
+
+    def _fetch_records_sync(self, query: str, params: Optional[Dict[str, Any]],
+                            max_rows: Optional[int] = None) -> Tuple[List[str], List[Dict[str, Any]]]:
+        with self.engine.connect() as conn:
+            result = conn.execute(
+                text(query), params or {},
+                execution_options={"yield_per": settings.SQL_STREAM_BATCH_SIZE}
+            )
+            if not result.returns_rows:
+                return [], []
+            columns = list(result.keys())
+            # max_rows: 서버 사이드 커서에서 상한만큼만 읽고 나머지는 가져오지 않음
+            rows = result.fetchmany(max_rows) if max_rows else result
+            return columns, rows_to_records(columns, rows)
+
+    def _execute_sync(self, query: str, params: Optional[Dict[str, Any]]) -> int:
+        with self.engine.begin() as conn:
+            return conn.execute(text(query), params or {}).rowcount
+
+    # --- [Async Backend] ---
+
+    def _get_async_engine(self):
+        """asyncpg 기반 비동기 엔진을 지연 생성합니다. (asyncpg 설치 필요)"""
+        if self._async_engine is None:
+            from sqlalchemy.ext.asyncio import create_async_engine
+            try:
+                self._async_engine = create_async_engine(
+                    build_db_url("postgresql+asyncpg"),
+                    pool_size=settings.SQL_POOL_SIZE,
+                    max_overflow=settings.SQL_MAX_OVERFLOW,
+                    pool_timeout=settings.SQL_POOL_TIMEOUT,
+                    pool_pre_ping=True,
+                    connect_args={"server_settings": {"statement_timeout": str(settings.SQL_STATEMENT_TIMEOUT_MS)}}
+                )
+            except ImportError as e:
+                raise RuntimeError("SQL_EXECUTION_BACKEND=async 사용 시 asyncpg 패키지가 필요합니다.") from e
+        return self._async_engine
+
+    async def _fetch_async(self, query: str, params: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        engine = self._get_async_engine()
+        async with engine.connect() as conn:
+            # stream(): 서버 사이드 커서 기반 비동기 결과 순회
+            result = await conn.stream(
+                text(query), params or {},
+                execution_options={"yield_per": settings.SQL_STREAM_BATCH_SIZE}
+            )
+            return [dict(row._mapping) async for row in result]
+
+    async def _fetch_records_async(self, query: str, params: Optional[Dict[str, Any]],
+                                   max_rows: Optional[int] = None) -> Tuple[List[str], List[Dict[str, Any]]]:
+        engine = self._get_async_engine()
+        async with engine.connect() as conn:
+            result = await conn.stream(
+                text(query), params or {},
+                execution_options={"yield_per": settings.SQL_STREAM_BATCH_SIZE}
+            )
+            columns = list(result.keys())
+            if max_rows:
+                return columns, rows_to_records(columns, await result.fetchmany(max_rows))
+            return columns, [dict(zip(columns, map(to_jsonable, row))) async for row in result]
+
+    async def _execute_async(self, query: str, params: Optional[Dict[str, Any]]) -> int:
+        engine = self._get_async_engine()
+        async with engine.begin() as conn:
+            return (await conn.execute(text(query), params or {})).rowcount
+
+    # --- [Public API] ---
+
+    async def fetch_all(self, query: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """SQL을 실행하고 결과를 dict 리스트로 반환합니다."""
+        if self.backend == "async":
+            return await self._fetch_async(query, params)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_thread_pool(), self._fetch_sync, query, params)
+
+    async def fetch_records(self, query: str, params: Optional[Dict[str, Any]] = None,
+                            max_rows: Optional[int] = None) -> Tuple[List[str], List[Dict[str, Any]]]:
+        """
+        SQL을 실행하고 (컬럼 목록, JSON 호환 dict 리스트)를 반환합니다.
+        Decimal/날짜 값은 커서를 읽는 동안 한 번에 변환하므로 별도의 직렬화 왕복(pandas 등)이 필요 없습니다.
+        max_rows를 지정하면 fetchmany로 그 행 수까지만 읽습니다.
+        """
+        if self.backend == "async":
+            return await self._fetch_records_async(query, params, max_rows)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_thread_pool(), self._fetch_records_sync, query, params, max_rows)
+
+    async def execute(self, query: str, params: Optional[Dict[str, Any]] = None) -> int:
+        """
+        결과 행이 없는 내부 쓰기 문장(DDL/INSERT 등)을 트랜잭션으로 실행하고 영향받은 행 수를 반환합니다.
+        LLM이 생성한 SQL에는 사용하지 않습니다. (생성 쿼리는 fetch_*로만 실행)
+        """
+        if self.backend == "async":
+            return await self._execute_async(query, params)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_thread_pool(), self._execute_sync, query, params)
+
+    async def explain(self, query: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """실행하지 않고 EXPLAIN (FORMAT JSON) 실행 계획의 최상위 Plan을 반환합니다."""
+        rows = await self.fetch_all(f"EXPLAIN (FORMAT JSON) {query}", params)
+        plan = rows[0]["QUERY PLAN"]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return plan[0]["Plan"]
+
+    async def dispose(self):
+        """커넥션 풀과 스레드 풀을 정리합니다. (애플리케이션 종료 시 호출)"""
+        if self._thread_pool is not None:
+            self._thread_pool.shutdown(wait=False)
+            self._thread_pool = None
+        if self._async_engine is not None:
+            await self._async_engine.dispose()
+            self._async_engine = None
+        self.engine.dispose()
+
+# 싱글톤 객체 생성
+sql_executor = SqlExecutor()
@@ -0,0 +1,174 @@
+import logging
+import threading
+import importlib.util
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from langchain_core.callbacks import AsyncCallbackHandler
+from household_ledger.common.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 현재 실행 중인 워크플로우 노드 (LLM 토큰 사용량을 노드별로 집계하는 용도)
+current_node: ContextVar[Optional[str]] = ContextVar("ledger_current_node", default=None)
+
+# 지연 시간 히스토그램 버킷 (초): 로컬 처리(ms) ~ LLM 호출(수십 초)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# 조회 행 수 히스토그램 버킷
+ROW_BUCKETS = (0, 1, 10, 50, 100, 500, 1000, 5000, 10000)
+
+# 메트릭 이름 -> (종류, 설명)
+METRICS = {
+    "ledger_node_duration_seconds": ("histogram", "워크플로우 노드별 실행 시간"),
+    "ledger_node_runs_total": ("counter", "워크플로우 노드 실행 횟수 (status=ok|error)"),
+    "ledger_llm_tokens_total": ("counter", "노드별 LLM 토큰 사용량 (kind=prompt|completion)"),
+    "ledger_llm_calls_total": ("counter", "노드별 LLM 호출 횟수"),
+    "ledger_sql_retries_total": ("counter", "SQL 검증 실패로 인한 재생성 횟수"),
+    "ledger_sql_exec_seconds": ("histogram", "PostgreSQL 쿼리 실행 시간"),
+    "ledger_sql_rows": ("histogram", "PostgreSQL 쿼리 반환 행 수"),
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+def _label_key(labels: Optional[Dict[str, Any]]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in (labels or {}).items()))
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (f'{k}="{_escape(v)}"' for k, v in pairs)
+    return "{" + ",".join(escaped) + "}"
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class MetricsRegistry:
+    """
+    Prometheus 텍스트 형식으로 내보내는 프로세스 내 메트릭 저장소입니다.
+    (prometheus_client 의존성 없이 카운터/히스토그램만 지원, 스레드 안전)
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, list]] = {}   # [버킷별 누적 수..., 합계, 건수]
+
+    @staticmethod
+    def _buckets(name: str) -> Tuple[float, ...]:
+        return ROW_BUCKETS if name == "ledger_sql_rows" else LATENCY_BUCKETS
+
+    def inc(self, name: str, labels: Optional[Dict[str, Any]] = None, value: float = 1.0):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, labels: Optional[Dict[str, Any]] = None):
+        key, buckets = _label_key(labels), self._buckets(name)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            state = series.setdefault(key, [0] * len(buckets) + [0.0, 0])
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def value(self, name: str, labels: Optional[Dict[str, Any]] = None) -> float:
+        """카운터 값 또는 히스토그램 관측 건수를 반환합니다. (테스트/통계 API용)"""
+        key = _label_key(labels)
+        with self._lock:
+            if name in self._counters:
+                return self._counters[name].get(key, 0.0)
+            return self._histograms.get(name, {}).get(key, [0])[-1]
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render(self) -> str:
+        """/metrics 응답 본문 (Prometheus text exposition format 0.0.4)"""
+        lines = []
+        with self._lock:
+            for name, (kind, help_text) in METRICS.items():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                if kind == "counter":
+                    for key, value in sorted(self._counters.get(name, {}).items()):
+                        lines.append(f"{name}{_format_labels(key)} {value}")
+                    continue
+                buckets = self._buckets(name)
+                for key, state in sorted(self._histograms.get(name, {}).items()):
+                    for bound, count in zip(buckets, state):
+                        lines.append(f"{name}_bucket{_format_labels(key, ('le', str(bound)))} {count}")
+                    lines.append(f"{name}_bucket{_format_labels(key, ('le', '+Inf'))} {state[-1]}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {state[-2]}")
+                    lines.append(f"{name}_count{_format_labels(key)} {state[-1]}")
+        return "\n".join(lines) + "\n"
+
+# 싱글톤 객체 생성
+metrics = MetricsRegistry()
+
+# --- [LLM Token Usage] ---
+
+def llm_token_usage(response) -> Tuple[int, int]:
+    """LLMResult에서 (prompt, completion) 토큰 수를 추출합니다. (스트리밍은 usage_metadata 사용)"""
+    prompt = completion = 0
+    for generations in getattr(response, "generations", None) or []:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+            prompt += usage.get("input_tokens", 0)
+            completion += usage.get("output_tokens", 0)
+    if not (prompt or completion):
+        usage = (getattr(response, "llm_output", None) or {}).get("token_usage") or {}
+        prompt, completion = usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+    return prompt, completion
+
+class TokenUsageCallback(AsyncCallbackHandler):
+    """LangChain 채팅 모델 호출이 끝날 때 현재 노드 기준으로 LLM 호출 수와 토큰 사용량을 기록합니다."""
+
+    async def on_llm_end(self, response, **kwargs: Any) -> None:
+        node = current_node.get() or "unknown"
+        prompt, completion = llm_token_usage(response)
+        metrics.inc("ledger_llm_calls_total", {"node": node})
+        if prompt:
+            metrics.inc("ledger_llm_tokens_total", {"node": node, "kind": "prompt"}, prompt)
+        if completion:
+            metrics.inc("ledger_llm_tokens_total", {"node": node, "kind": "completion"}, completion)
+
+# --- [OpenTelemetry (선택)] ---
+
+_tracer = None
+_tracer_checked = False
+
+def get_tracer():
+    """
+    OTEL_TRACING_ENABLED이고 opentelemetry-api가 설치된 경우에만 tracer를 반환합니다. (없으면 None)
+    exporter는 OpenTelemetry SDK 설정(OTEL_EXPORTER_* 환경 변수, opentelemetry-instrument 등)을 따릅니다.
+    """
+    global _tracer, _tracer_checked
+    if not _tracer_checked and settings.OTEL_TRACING_ENABLED:
+        _tracer_checked = True
+        if importlib.util.find_spec("opentelemetry") is None:
+            logger.warning("opentelemetry 패키지가 없어 span을 기록하지 않습니다.")
+        else:
+            from opentelemetry import trace
+            _tracer = trace.get_tracer("household_ledger")
+    return _tracer
+
+@contextmanager
+def node_span(name: str) -> Iterator[Optional[Any]]:
+    """노드 실행 구간을 current_node로 표시하고, 가능하면 OpenTelemetry span으로 감쌉니다."""
+    token = current_node.set(name)
+    tracer = get_tracer()
+    try:
+        if tracer is None:
+            yield None
+        else:
+            with tracer.start_as_current_span(f"ledger.node.{name}") as span:
+                yield span
+    finally:
+        current_node.reset(token)
@@ -1,23 +1,77 @@
 import asyncio
 import json
 import logging
-from typing import List, Dict, Any, Optional
+from contextlib import asynccontextmanager
+from typing import List, Dict, Any, Literal, Optional, AsyncIterator
 
 import redis.asyncio as redis
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, Field
 from langchain_core.messages import HumanMessage
 
 from household_ledger.graph.workflow import create_household_workflow
+from household_ledger.graph.nodes import (
+    get_cache_stats, get_router_stats, get_template_stats, load_result_page, _get_data_version
+)
+from household_ledger.graph.sql_templates import sql_template_store
+from household_ledger.graph.intent_classifier import intent_classifier
 from household_ledger.common.config import settings
+from household_ledger.infrastructure.llm_client import llm_registry
+from household_ledger.infrastructure.sql_executor import sql_executor
+from household_ledger.infrastructure.neo4j_client import neo4j_client
+from household_ledger.infrastructure.schema_context import schema_context
+from household_ledger.infrastructure.few_shot_index import few_shot_index
+from household_ledger.infrastructure.result_codec import dumps, dumps_text, format_result
+from household_ledger.infrastructure.telemetry import metrics
 
 # 로그 설정
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    시작 시 SQL 생성용 스키마 설명(데이터 요약 포함)을 미리 만들고 로컬 의도 분류기 학습, NL->SQL 템플릿 및 Few-shot 예시 로드를 하며,
+    종료 시 공유 커넥션(LLM HTTP 풀, SQL 풀, Neo4j, Redis)을 정리합니다.
+    """
+    try:
+        await schema_context.get(await _get_data_version())
+    except Exception as e:
+        logger.warning(f"스키마 설명 사전 생성 실패 (첫 요청 시 생성): {e}")
+    try:
+        loaded = await intent_classifier.load_logged_routes(redis_client)
+        logger.info(f"라우팅 기록 {loaded}건으로 로컬 의도 분류기 학습")
+    except Exception as e:
+        logger.warning(f"라우팅 기록 로드 실패 (기본 예시만 사용): {e}")
+    try:
+        loaded = await sql_template_store.load(redis_client)
+        logger.info(f"NL->SQL 템플릿 {loaded}건 로드")
+    except Exception as e:
+        logger.warning(f"SQL 템플릿 로드 실패 (새로 학습): {e}")
+    if settings.FEW_SHOT_ENABLED:
+        try:
+            loaded = await few_shot_index.load(redis_client)
+            logger.info(f"Few-shot 예시 {loaded}건 로드 ({settings.FEW_SHOT_BACKEND})")
+        except Exception as e:
+            logger.warning(f"Few-shot 예시 로드 실패 (새로 축적): {e}")
+    yield
+    await llm_registry.aclose()
+    await sql_executor.dispose()
+    await neo4j_client.aclose()
+    await redis_client.aclose()
+
+class LedgerJSONResponse(JSONResponse):
+    """orjson 기반 응답 (Decimal/날짜 값을 그대로 직렬화, 표준 json보다 빠름)"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
 app = FastAPI(
     title="Household Ledger AI API",
-    description="가계부 지출 분석 및 소비 패턴 진단을 위한 지능형 에이전트 서비스"
+    description="가계부 지출 분석 및 소비 패턴 진단을 위한 지능형 에이전트 서비스",
+    lifespan=lifespan,
+    default_response_class=LedgerJSONResponse
 )
 
 # 1. 워크플로우 그래프 초기화 (가계부 전용)
@@ -37,6 +91,10 @@ class AnalyzeRequest(BaseModel):
     user_id: str = Field(..., examples=["kwh_01"])
     session_id: str = Field(..., examples=["sess_20251228"])
     question: str = Field(..., examples=["이번 달 식비가 가장 많이 나간 날은 언제야?"])
+    # sql_result 형식: records(행 dict 리스트) 또는 columnar(컬럼별 값 리스트), 미지정 시 SQL_RESULT_FORMAT
+    result_format: Optional[Literal["records", "columnar"]] = None
+    # 이전 응답의 result_page.next_page_token (지정 시 LLM 파이프라인 없이 다음 결과 페이지만 조회)
+    page_token: Optional[str] = None
 
 class SaveManualRequest(BaseModel):
     """분석 결과를 수동으로 별도 저장하고 싶을 때 사용 (선택 사항)"""
@@ -45,34 +103,144 @@ class SaveManualRequest(BaseModel):
     analysis: str
     chart_data: Dict[str, Any]
 
-# --- [SECTION: API 엔드포인트] ---
+# --- [SECTION: Workflow Helpers] ---
 
-@app.post("/api/v1/analyze")
-async def analyze_ledger(req: AnalyzeRequest):
-    """
-    사용자의 질문을 받아 가계부 분석 워크플로우를 실행합니다.
-    Refiner -> Router -> SQL/Graph -> Executor -> Analyzer -> Save 순으로 진행됩니다.
-    """
-    # [핵심] LedgerState 구조와 정확히 일치하도록 초기 상태 구성
-    initial_state = {
+def build_initial_state(req: AnalyzeRequest) -> Dict[str, Any]:
+    """[핵심] LedgerState 구조와 정확히 일치하도록 초기 상태 구성"""
+    return {
         "messages": [HumanMessage(content=req.question)],
         "refined_question": "",
         "next_step": "",
         "retry_count": 0,
         "error": None,
+        "is_cached": False,
+        "cache_key": None,
         "sql_query": "",
+        "sql_params": {},
+        "sql_template": None,
         "sql_result": [],
+        "sql_columns": [],
+        "result_page": {},
         "graph_query": "",
         "graph_result": [],
+        "graph_error": None,
+        "timings": {},
         "analysis": "",
         "chart_data": {},
         "user_id": req.user_id,
         "session_id": req.session_id
     }
-    
+
+def build_response(final_state: Dict[str, Any], result_format: Optional[str] = None) -> Dict[str, Any]:
+    """
+    최종 상태에서 클라이언트에 반환할 필드만 추립니다. (sql_result는 요청한 형식으로 변환)
+    결과가 잘린 경우 sql_result는 첫 페이지이며, 이어지는 행은 result_page.next_page_token으로 조회합니다.
+    """
+    result_format = result_format or settings.SQL_RESULT_FORMAT
+    return {
+        "refined_question": final_state.get("refined_question"),
+        "next_step": final_state.get("next_step"),
+        "sql_query": final_state.get("sql_query"),
+        "analysis": final_state.get("analysis"),
+        "chart_data": final_state.get("chart_data"),
+        "result_format": result_format,
+        "sql_result": format_result(final_state.get("sql_result") or [], result_format, final_state.get("sql_columns")),
+        "result_page": final_state.get("result_page") or {},
+        "timings": final_state.get("timings"),
+        "status": "success"
+    }
+
+# 노드 완료 이벤트로 내보낼 요약 필드 (노드 이름 -> 출력에서 추출할 값)
+NODE_EVENT_FIELDS = {
+    "refiner": lambda out: {"refined_question": out.get("refined_question")},
+    "cache_check": lambda out: {"is_cached": out.get("is_cached", False)},
+    "sql_template": lambda out: {"sql_template": out.get("sql_template"), "sql_query": out.get("sql_query")},
+    "router": lambda out: {"next_step": out.get("next_step")},
+    "sql_gen": lambda out: {"sql_query": out.get("sql_query")},
+    # retry_count는 검증 실패 시 validate_sql에서만 증가 (통과 시에는 None)
+    "validate_sql": lambda out: {"error": out.get("error"), "sql_query": out.get("sql_query"),
+                                 "retry_count": out.get("retry_count")},
+    "graph_gen": lambda out: {"graph_query": out.get("graph_query")},
+    "graph_exec": lambda out: {"row_count": len(out.get("graph_result") or []), "error": out.get("graph_error")},
+    "executor": lambda out: {"row_count": len(out.get("sql_result") or []), "error": out.get("error")},
+}
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """Server-Sent Events 형식의 메시지 한 건을 만듭니다."""
+    payload = dumps_text(data)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+async def stream_analysis_events(req: AnalyzeRequest) -> AsyncIterator[str]:
+    """
+    워크플로우를 astream_events로 실행하며 진행 상황을 SSE로 내보냅니다.
+    - node: 노드가 끝나는 즉시 요약 정보(정제된 질문, 인텐트, SQL, 행 수 등) 전송
+    - token: 최종 분석(analyzer) LLM 응답을 토큰 단위로 전송
+    - done: 최종 응답 (/api/v1/analyze 응답 + 요청한 형식의 sql_result)
+    - error: 워크플로우 실패
+    """
+    final_state: Dict[str, Any] = {}
+    try:
+        async for event in graph.astream_events(build_initial_state(req), version="v2"):
+            kind = event["event"]
+            node = event.get("metadata", {}).get("langgraph_node")
+
+            if kind == "on_chat_model_stream" and node == "analyzer":
+                token = event["data"]["chunk"].content
+                if token:
+                    yield format_sse("token", {"content": token})
+
+            elif kind == "on_chain_end":
+                output = event["data"].get("output")
+                # 라우팅 함수 등 노드 이외의 체인은 이름이 노드명과 다르므로 제외
+                if event["name"] == node and event["name"] in NODE_EVENT_FIELDS and isinstance(output, dict):
+                    yield format_sse("node", {"node": node, **NODE_EVENT_FIELDS[node](output)})
+                elif not event.get("parent_ids") and isinstance(output, dict):
+                    final_state = output
+
+        if final_state.get("error") and not final_state.get("analysis"):
+            logger.error(f"Workflow Error: {final_state['error']}")
+            yield format_sse("error", {"detail": final_state["error"]})
+            return
+
+        yield format_sse("done", build_response(final_state, req.result_format))
+
+    except Exception as e:
+        logger.error(f"Critical System Error: {str(e)}")
+        yield format_sse("error", {"detail": f"서버 내부 오류: {str(e)}"})
+
+# --- [SECTION: API 엔드포인트] ---
+
+async def fetch_next_page(req: AnalyzeRequest) -> Dict[str, Any]:
+    """저장된 페이지 커서(검증된 SQL + 오프셋)로 다음 결과 페이지를 조회합니다."""
+    try:
+        page = await load_result_page(req.user_id, req.page_token)
+    except Exception as e:
+        logger.error(f"Page Fetch Error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"서버 내부 오류: {str(e)}")
+    if page is None:
+        raise HTTPException(status_code=404, detail="만료되었거나 유효하지 않은 페이지 토큰입니다.")
+
+    columns, rows, result_page = page
+    result_format = req.result_format or settings.SQL_RESULT_FORMAT
+    return {
+        "result_format": result_format,
+        "sql_result": format_result(rows, result_format, columns),
+        "result_page": result_page,
+        "status": "success"
+    }
+
+@app.post("/api/v1/analyze")
+async def analyze_ledger(req: AnalyzeRequest):
+    """
+    사용자의 질문을 받아 가계부 분석 워크플로우를 실행합니다.
+    Refiner -> Cache -> Router -> SQL/Graph(HYBRID는 병렬) -> Executor -> Analyzer -> Save 순으로 진행됩니다.
+    page_token을 지정하면 이전 결과의 다음 페이지만 조회합니다.
+    """
+    if req.page_token:
+        return await fetch_next_page(req)
     try:
         # LangGraph 비동기 실행
-        final_state = await graph.ainvoke(initial_state)
+        final_state = await graph.ainvoke(build_initial_state(req))
         
         # 워크플로우 내부 로직 에러 체크
         if final_state.get("error") and not final_state.get("analysis"):
@@ -80,19 +248,24 @@ async def analyze_ledger(req: AnalyzeRequest):
             raise HTTPException(status_code=400, detail=final_state["error"])
 
         # 최종 응답 반환
-        return {
-            "refined_question": final_state.get("refined_question"),
-            "next_step": final_state.get("next_step"),
-            "sql_query": final_state.get("sql_query"),
-            "analysis": final_state.get("analysis"),
-            "chart_data": final_state.get("chart_data"),
-            "status": "success"
-        }
+        return build_response(final_state, req.result_format)
         
     except Exception as e:
         logger.error(f"Critical System Error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"서버 내부 오류: {str(e)}")
 
+@app.post("/api/v1/analyze/stream")
+async def analyze_ledger_stream(req: AnalyzeRequest):
+    """
+    /api/v1/analyze의 스트리밍 버전입니다. (text/event-stream)
+    전체 체인이 끝날 때까지 기다리지 않고 노드 완료 이벤트와 분석 토큰을 즉시 전송합니다.
+    """
+    return StreamingResponse(
+        stream_analysis_events(req),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.post("/api/v1/save-manual")
 async def save_manual_cache(req: SaveManualRequest):
     """
@@ -110,6 +283,26 @@ async def save_manual_cache(req: SaveManualRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Redis 저장 오류: {str(e)}")
 
+@app.get("/api/v1/cache/stats")
+async def cache_stats():
+    """분석 결과 캐시의 적중/미스 카운터를 반환합니다."""
+    return get_cache_stats()
+
+@app.get("/api/v1/router/stats")
+async def router_stats():
+    """라우터 빠른 경로(로컬 분류기) 적중률과 신뢰도 임계값을 반환합니다."""
+    return get_router_stats()
+
+@app.get("/api/v1/sql-templates/stats")
+async def sql_template_stats():
+    """NL->SQL 템플릿 적중률(라우터/SQL 생성 생략 비율)과 저장된 템플릿 수를 반환합니다."""
+    return get_template_stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """노드별 지연 시간, LLM 토큰 사용량, SQL 재시도/실행 시간/행 수를 Prometheus 형식으로 반환합니다."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/health")
 async def health_check():
     """서버 상태 및 LLM 모델 정보 확인"""
@@ -0,0 +1,8 @@
+from household_ledger.common.text import char_ngrams
+
+def test_char_ngrams_normalizes_case_and_spaces():
+    """대소문자와 연속 공백 차이는 같은 n-gram으로 취급"""
+    grams = char_ngrams("  GS25   편의점 ")
+    assert grams == char_ngrams("gs25 편의점")
+    assert grams[" g"] == 1 and grams["편의점"] == 1
+    assert all(len(g) in (2, 3) for g in grams)
@@ -0,0 +1,52 @@
+from household_ledger.graph.chart_builder import build_chart_data
+
+def test_date_rows_become_line_chart():
+    rows = [
+        {"transaction_date": "2024-01-02", "amount": "3000"},   # Decimal은 문자열로 직렬화됨
+        {"transaction_date": "2024-01-01", "amount": "1000"},
+        {"transaction_date": "2024-01-01", "amount": "500"},
+    ]
+    chart = build_chart_data(rows)
+
+    assert chart["type"] == "line"
+    assert chart["x"] == "transaction_date" and chart["y"] == ["amount"]
+    assert chart["data"] == [
+        {"transaction_date": "2024-01-01", "amount": 1500.0},
+        {"transaction_date": "2024-01-02", "amount": 3000.0},
+    ]
+
+def test_long_date_series_is_rolled_up_to_months():
+    rows = [{"transaction_date": f"2024-{m:02d}-{d:02d}", "amount": 100} for m in (1, 2, 3) for d in range(1, 21)]
+    chart = build_chart_data(rows, max_points=10)
+
+    assert [r["transaction_date"] for r in chart["data"]] == ["2024-01-01", "2024-02-01", "2024-03-01"]
+    assert all(r["amount"] == 2000 for r in chart["data"])
+
+def test_many_categories_become_bar_with_others_bucket():
+    rows = [{"merchant_id": f"M{i}", "total_amount": 100 - i} for i in range(50)]
+    chart = build_chart_data(rows, max_points=5)
+
+    assert chart["type"] == "bar" and chart["x"] == "merchant_id"
+    assert len(chart["data"]) == 5
+    assert chart["data"][0] == {"merchant_id": "M0", "total_amount": 100}
+    assert chart["data"][-1]["merchant_id"] == "기타(나머지)"
+    assert chart["data"][-1]["total_amount"] == sum(100 - i for i in range(4, 50))
+
+def test_few_categories_with_single_value_become_pie():
+    rows = [{"category": "식비", "amount": 10}, {"category": "교통", "amount": 30}]
+    chart = build_chart_data(rows)
+
+    assert chart["type"] == "pie"
+    assert chart["data"][0] == {"category": "교통", "amount": 30}
+
+def test_numeric_period_column_is_used_as_axis():
+    rows = [{"month": 2, "total": 20}, {"month": 1, "total": 10}]
+    chart = build_chart_data(rows)
+
+    assert chart["type"] == "line" and chart["x"] == "month" and chart["y"] == ["total"]
+    assert [r["month"] for r in chart["data"]] == [1, 2]
+
+def test_unchartable_results_return_empty():
+    assert build_chart_data([]) == {}
+    assert build_chart_data([{"category": "식비", "amount": 10}]) == {}
+    assert build_chart_data([{"merchant_id": "A"}, {"merchant_id": "B"}]) == {}
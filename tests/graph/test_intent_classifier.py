@@ -0,0 +1,52 @@
+import json
+import pytest
+from unittest.mock import AsyncMock, patch
+from household_ledger.graph.intent_classifier import IntentClassifier, rule_intent
+
+@pytest.mark.parametrize("question, expected", [
+    ("안녕", "GENERAL"),
+    ("고마워!", "GENERAL"),
+    ("이번 달 식비 얼마야?", "SQL"),
+    ("지난달 가장 많이 쓴 곳 3개", "SQL"),
+    ("스타벅스와 같은 카테고리인 곳들", "GRAPH"),
+    ("스타벅스와 같은 카테고리 가맹점 총 지출은?", "HYBRID"),
+    ("안녕, 이번 달 식비 얼마야?", "SQL"),
+    ("식비 분석해줘", None),
+])
+def test_rule_intent(question, expected):
+    assert rule_intent(question) == expected
+
+def test_tfidf_learns_from_examples():
+    classifier = IntentClassifier(examples=[
+        ("카페 지출 추이 보여줘", "SQL"),
+        ("교통비 지출 추이 보여줘", "SQL"),
+        ("스타벅스 이용 고객 네트워크", "GRAPH"),
+        ("가맹점 네트워크 구조 보여줘", "GRAPH"),
+    ])
+    prediction = classifier.predict("식비 지출 추이 보여줘")
+    assert (prediction.intent, prediction.source) == ("SQL", "tfidf")
+    assert prediction.confidence > 0.5
+
+    # 모르는 표현만 있으면 신뢰도 0 (LLM 라우터로 넘어감)
+    assert classifier.predict("xyz").confidence == 0.0
+
+def test_add_example_refits_periodically():
+    classifier = IntentClassifier(examples=[("카페 지출 추이", "SQL")])
+    with patch("household_ledger.graph.intent_classifier.settings.INTENT_REFIT_EVERY", 2):
+        classifier.add_example("가맹점 네트워크 구조", "GRAPH")
+        assert "GRAPH" not in classifier._centroids
+        classifier.add_example("INVALID", "UNKNOWN")   # 허용되지 않은 의도는 무시
+        classifier.add_example("고객 네트워크 구조", "GRAPH")
+        assert "GRAPH" in classifier._centroids
+        assert classifier.predict("네트워크 구조").intent == "GRAPH"
+
+async def test_load_logged_routes():
+    classifier = IntentClassifier(examples=[])
+    redis_client = AsyncMock()
+    redis_client.lrange.return_value = [
+        json.dumps({"question": "가맹점 네트워크 구조", "intent": "GRAPH"}, ensure_ascii=False),
+        "not json",
+        json.dumps({"question": "카페 지출 추이", "intent": "SQL"}, ensure_ascii=False),
+    ]
+    assert await classifier.load_logged_routes(redis_client) == 2
+    assert set(classifier._centroids) == {"SQL", "GRAPH"}
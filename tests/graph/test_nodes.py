@@ -3,15 +3,22 @@ import json
 from unittest.mock import AsyncMock, patch, MagicMock
 from household_ledger.graph.nodes import (
     validate_sql_security,
+    validate_cypher_security,
+    extract_merchant_ids,
     get_dynamic_schema_info,
     check_cache_logic,
+    save_cache_logic,
+    build_cache_key,
     query_refiner_node,
     intent_router_node,
     sql_generator_node,
     validate_sql_logic,
     execute_sql_logic,
-    final_analyzer_node
+    load_result_page,
+    final_analyzer_node,
+    save_history_logic
 )
+from household_ledger.common.config import settings
 
 # --- [1. 유틸리티 테스트] ---
 
@@ -20,6 +27,17 @@ def test_sql_security_guard():
     assert validate_sql_security("DROP TABLE accounts") is False
     assert validate_sql_security("DELETE FROM transactions") is False
 
+def test_cypher_security_guard():
+    assert validate_cypher_security("MATCH (m:Merchant) RETURN m.id AS merchant_id") is True
+    assert validate_cypher_security("MATCH (n) DETACH DELETE n") is False
+    assert validate_cypher_security("MERGE (m:Merchant {id: 'x'})") is False
+
+def test_extract_merchant_ids_from_graph_result():
+    rows = [{"merchant_id": "M1"}, {"merchant_id": "M1"}, {"merchant_id": "M2"}]
+    assert extract_merchant_ids(rows) == ["M1", "M2"]
+    # merchant_id 별칭이 없으면 id 계열 컬럼을 사용
+    assert extract_merchant_ids([{"m.id": "M3", "total": 10}]) == ["M3"]
+
 def test_dynamic_schema_extraction():
     schema = get_dynamic_schema_info()
     assert "Table: accounts" in schema
@@ -27,17 +45,99 @@ def test_dynamic_schema_extraction():
 
 # --- [2. 노드 로직 테스트] ---
 
+def test_cache_key_depends_on_data_version():
+    """같은 질문이라도 데이터 버전이 바뀌면 다른 캐시 키가 생성되어야 합니다."""
+    k1 = build_cache_key("u1", "이번 달  식비", "1")
+    assert k1 == build_cache_key("u1", "이번 달 식비", "1")
+    assert k1 != build_cache_key("u1", "이번 달 식비", "2")
+
 @pytest.mark.asyncio
 async def test_check_cache_logic_hit():
-    # state 구성 (마지막 메시지 기준 캐시 키 생성 대응)
-    state = {"user_id": "u1", "messages": [MagicMock(content="식비 내역")]}
-    cached_data = [{"amount": 1000}]
+    # 정제된 질문 기준 캐시 키 생성 대응
+    state = {"user_id": "u1", "refined_question": "식비 내역"}
+    cached_data = {"next_step": "SQL", "sql_query": "SELECT 1", "sql_result": [{"amount": 1000}]}
     
     with patch("household_ledger.graph.nodes.redis_client.get", new_callable=AsyncMock) as mock_get:
-        mock_get.return_value = json.dumps(cached_data)
+        # 1. 데이터 버전 조회, 2. 캐시 조회
+        mock_get.side_effect = ["3", json.dumps(cached_data)]
         res = await check_cache_logic(state)
         assert res["is_cached"] is True
-        assert res["sql_result"] == cached_data
+        assert res["sql_result"] == cached_data["sql_result"]
+        assert res["cache_key"] == build_cache_key("u1", "식비 내역", "3")
+
+@pytest.mark.asyncio
+async def test_check_cache_logic_redis_failure_is_miss():
+    state = {"user_id": "u1", "refined_question": "식비 내역"}
+    
+    with patch("household_ledger.graph.nodes.redis_client.get", new_callable=AsyncMock) as mock_get:
+        mock_get.side_effect = ConnectionError("redis down")
+        res = await check_cache_logic(state)
+        assert res["is_cached"] is False
+
+@pytest.mark.asyncio
+async def test_save_cache_logic_writes_with_ttl():
+    state = {"cache_key": "ledger_cache:u1:v1:abc", "is_cached": False, "error": None,
+             "next_step": "SQL", "sql_query": "SELECT 1", "sql_result": [{"amount": 1000}]}
+    
+    with patch("household_ledger.graph.nodes.redis_client.setex", new_callable=AsyncMock) as mock_setex:
+        await save_cache_logic(state)
+        key, ttl, body = mock_setex.call_args.args
+        assert key == "ledger_cache:u1:v1:abc"
+        assert ttl > 0
+        assert json.loads(body)["sql_result"] == [{"amount": 1000}]
+
+        # 에러가 있는 결과는 캐시하지 않음
+        mock_setex.reset_mock()
+        await save_cache_logic({**state, "error": "SQL_EXEC_ERROR"})
+        assert not mock_setex.called
+
+@pytest.mark.asyncio
+async def test_save_cache_logic_learns_sql_template():
+    from household_ledger.graph.sql_templates import sql_template_store
+    sql_template_store.clear()
+    state = {"cache_key": None, "is_cached": False, "error": None, "next_step": "SQL",
+             "refined_question": "금액이 큰 순서대로 3개 보여줘", "sql_query": "SELECT * FROM transactions ORDER BY amount DESC LIMIT 3",
+             "sql_result": [{"amount": 1000}]}
+
+    with patch("household_ledger.graph.nodes.redis_client", new_callable=AsyncMock) as mock_redis:
+        await save_cache_logic(state)
+        key, template_id, body = next(c.args for c in mock_redis.hset.call_args_list
+                                      if c.args[0] == settings.SQL_TEMPLATE_KEY)
+        assert json.loads(body)["sql"].endswith("LIMIT :tpl_limit")
+
+        # 템플릿으로 실행한 결과나 빈 결과는 다시 학습하지 않음 (Few-shot 예시로도 추가하지 않음)
+        mock_redis.hset.reset_mock()
+        await save_cache_logic({**state, "sql_template": template_id})
+        await save_cache_logic({**state, "sql_result": []})
+        assert not mock_redis.hset.called
+    sql_template_store.clear()
+
+@pytest.mark.asyncio
+async def test_save_cache_logic_records_few_shot_examples():
+    """실행이 검증된 SQL/Cypher는 Few-shot 예시로 인덱스와 Redis에 추가되어야 합니다."""
+    from household_ledger.infrastructure.few_shot_index import few_shot_index
+    few_shot_index.clear()
+    state = {"cache_key": None, "is_cached": False, "error": None, "next_step": "HYBRID",
+             "refined_question": "스타벅스와 같은 카테고리 가맹점 지출 합계",
+             "sql_query": "SELECT SUM(amount) FROM transactions WHERE merchant_id = ANY(:merchant_ids)",
+             "sql_result": [{"sum": 1000}], "sql_template": None,
+             "graph_query": "MATCH (m:Merchant) RETURN DISTINCT m.id AS merchant_id",
+             "graph_result": [{"merchant_id": "1"}], "graph_error": None}
+
+    with patch("household_ledger.graph.nodes.redis_client", new_callable=AsyncMock) as mock_redis:
+        await save_cache_logic(state)
+        stored = [json.loads(c.args[2]) for c in mock_redis.hset.call_args_list if c.args[0] == settings.FEW_SHOT_KEY]
+        assert {e["kind"] for e in stored} == {"hybrid_sql", "hybrid_cypher"}
+
+        # 캐시 적중 결과는 다시 추가하지 않음
+        mock_redis.hset.reset_mock()
+        await save_cache_logic({**state, "is_cached": True})
+        assert not mock_redis.hset.called
+
+    hits = await few_shot_index.search("hybrid_sql", "스타벅스와 같은 카테고리 가맹점 지출 합계는?")
+    assert hits[0].query == state["sql_query"]
+    assert await few_shot_index.search("sql", state["refined_question"]) == []
+    few_shot_index.clear()
 
 @pytest.mark.asyncio
 async def test_query_refiner_node_logic():
@@ -51,6 +151,39 @@ async def test_query_refiner_node_logic():
         res = await query_refiner_node(state)
         assert res["refined_question"] == "지난달 스타벅스 지출 내역은?"
 
+@pytest.mark.asyncio
+async def test_query_refiner_uses_redis_history_without_llm():
+    """요청에 이전 메시지가 없으면 Redis 기록을 읽고, 생략형 질문은 LLM 없이 조건만 바꿔 정제합니다."""
+    stored = json.dumps({"q": "지난달 식비 얼마야?", "a": "12만원...", "slots": {"period": "지난달", "category": "식비"}}, ensure_ascii=False)
+    with patch("household_ledger.graph.nodes.get_llm") as mock_get_llm, \
+         patch("household_ledger.graph.nodes.redis_client", new_callable=AsyncMock) as mock_redis:
+        mock_redis.lrange.return_value = [stored]
+
+        res = await query_refiner_node({"session_id": "s1", "messages": [MagicMock(content="교통비는?")]})
+        assert res["refined_question"] == "지난달 교통비 얼마야?"
+        mock_redis.lrange.assert_awaited_once_with("chat_history:s1", 0, 2)
+
+        # 독립적인 질문은 그대로 사용
+        res = await query_refiner_node({"session_id": "s1", "messages": [MagicMock(content="올해 쇼핑 얼마야?")]})
+        assert res["refined_question"] == "올해 쇼핑 얼마야?"
+        assert not mock_get_llm.called
+
+@pytest.mark.asyncio
+async def test_query_refiner_falls_back_to_llm_with_slots():
+    stored = json.dumps({"q": "지난달 식비 얼마야?", "a": "12만원...", "slots": {"period": "지난달", "category": "식비"}}, ensure_ascii=False)
+    with patch("household_ledger.graph.nodes.get_llm") as mock_get_llm, \
+         patch("household_ledger.graph.nodes.redis_client", new_callable=AsyncMock) as mock_redis:
+        mock_redis.lrange.return_value = [stored]
+        mock_llm = AsyncMock()
+        mock_llm.ainvoke.return_value = MagicMock(content="지난달 식비 중 가장 큰 지출은?")
+        mock_get_llm.return_value = mock_llm
+
+        res = await query_refiner_node({"session_id": "s1", "messages": [MagicMock(content="그중 제일 큰 건 뭐야?")]})
+
+        assert res["refined_question"] == "지난달 식비 중 가장 큰 지출은?"
+        prompt = mock_llm.ainvoke.call_args.args[0]
+        assert "Q: 지난달 식비 얼마야?" in prompt and '"period": "지난달"' in prompt
+
 @pytest.mark.asyncio
 async def test_intent_router_node_logic():
     state = {"refined_question": "식비 분석해줘"}
@@ -64,6 +197,76 @@ async def test_intent_router_node_logic():
         res = await intent_router_node(state)
         assert res["next_step"] == "SQL"
 
+@pytest.mark.asyncio
+async def test_intent_router_fast_path_skips_llm():
+    """분명한 질문은 로컬 분류기로 결정하고 LLM 라우터를 호출하지 않아야 합니다."""
+    with patch("household_ledger.graph.nodes.get_llm") as mock_get_llm, \
+         patch("household_ledger.graph.nodes.router_stats", {"fast_path": 0, "llm": 0}) as stats:
+        assert (await intent_router_node({"refined_question": "이번 달 식비 얼마야?"}))["next_step"] == "SQL"
+        assert (await intent_router_node({"refined_question": "안녕"}))["next_step"] == "GENERAL"
+        assert not mock_get_llm.called
+        assert stats == {"fast_path": 2, "llm": 0}
+
+@pytest.mark.asyncio
+async def test_intent_router_low_confidence_uses_llm_and_logs_route():
+    state = {"refined_question": "식비 분석해줘"}
+    with patch("household_ledger.graph.nodes.get_llm") as mock_get_llm, \
+         patch("household_ledger.graph.nodes.redis_client", new_callable=AsyncMock) as mock_redis, \
+         patch("household_ledger.graph.nodes.intent_classifier.add_example") as mock_add, \
+         patch("household_ledger.graph.nodes.settings.INTENT_FAST_PATH_THRESHOLD", 1.01):
+        mock_llm = AsyncMock()
+        mock_llm.ainvoke.return_value = MagicMock(content=json.dumps({"intent": "SQL"}))
+        mock_get_llm.return_value = mock_llm
+
+        res = await intent_router_node(state)
+
+        assert res["next_step"] == "SQL"
+        mock_add.assert_called_once_with("식비 분석해줘", "SQL")
+        key, entry = mock_redis.lpush.call_args.args
+        assert key == "ledger_route_log"
+        assert json.loads(entry) == {"question": "식비 분석해줘", "intent": "SQL"}
+
+@pytest.mark.asyncio
+async def test_sql_generator_node_uses_cached_schema_context():
+    """SQL 생성 프롬프트는 데이터 버전별로 캐싱된 스키마 설명을 사용해야 합니다."""
+    state = {"refined_question": "식비 합계", "next_step": "SQL"}
+    with patch("household_ledger.graph.nodes.get_llm") as mock_get_llm, \
+         patch("household_ledger.graph.nodes.redis_client.get", new_callable=AsyncMock, return_value="7"), \
+         patch("household_ledger.graph.nodes.schema_context.get", new_callable=AsyncMock) as mock_schema:
+        mock_schema.return_value = "Table: transactions\n- category 값 (거래 건수 순): '식비'"
+        mock_llm = AsyncMock()
+        mock_llm.ainvoke.return_value = MagicMock(content="SELECT SUM(amount) FROM transactions")
+        mock_get_llm.return_value = mock_llm
+
+        res = await sql_generator_node(state)
+
+        mock_schema.assert_awaited_once_with("7")
+        assert "category 값 (거래 건수 순): '식비'" in mock_llm.ainvoke.call_args.args[0]
+        assert res["sql_query"] == "SELECT SUM(amount) FROM transactions"
+
+@pytest.mark.asyncio
+async def test_sql_generator_node_includes_retrieved_examples():
+    """유사한 과거 질문의 검증된 SQL이 프롬프트에 Few-shot 예시로 포함되어야 합니다."""
+    from household_ledger.infrastructure.few_shot_index import few_shot_index
+    few_shot_index.clear()
+    await few_shot_index.add("sql", "지난달 식비 합계", "SELECT SUM(amount) FROM transactions WHERE category = '식비'")
+    await few_shot_index.add("sql", "가장 최근 거래 5건", "SELECT * FROM transactions ORDER BY date DESC LIMIT 5")
+
+    state = {"refined_question": "이번 달 식비 합계", "next_step": "SQL"}
+    with patch("household_ledger.graph.nodes.get_llm") as mock_get_llm, \
+         patch("household_ledger.graph.nodes.redis_client.get", new_callable=AsyncMock, return_value="1"), \
+         patch("household_ledger.graph.nodes.schema_context.get", new_callable=AsyncMock, return_value="Table: transactions"):
+        mock_llm = AsyncMock()
+        mock_llm.ainvoke.return_value = MagicMock(content="SELECT SUM(amount) FROM transactions")
+        mock_get_llm.return_value = mock_llm
+
+        await sql_generator_node(state)
+
+        prompt = mock_llm.ainvoke.call_args.args[0]
+        assert "질문: 지난달 식비 합계\nSQL: SELECT SUM(amount) FROM transactions WHERE category = '식비'" in prompt
+        assert "가장 최근 거래 5건" not in prompt
+    few_shot_index.clear()
+
 @pytest.mark.asyncio
 async def test_execute_sql_logic_with_serialization():
     """Decimal 결과가 JSON 직렬화 가능하도록 변환되는지 테스트"""
@@ -79,14 +282,53 @@ async def test_execute_sql_logic_with_serialization():
         mock_row._mapping = {"amount": Decimal("5000.0")}
         mock_result.__iter__.return_value = [mock_row]
         
+        mock_result.keys.return_value = ["amount"]
+        mock_result.fetchmany.return_value = [(Decimal("5000.0"),)]
+        
         res = await execute_sql_logic(state)
-        # nodes.py 내부의 pd.Series 직렬화 로직 통과 확인
+        # 커서를 읽으면서 Decimal이 JSON 호환 숫자로 변환되었는지 확인
         assert res["sql_result"][0]["amount"] == 5000.0
         assert isinstance(res["sql_result"][0]["amount"], (float, int))
+        assert res["sql_columns"] == ["amount"]
+        assert res["result_page"]["truncated"] is False
+        # 행 상한 + 1까지만 조회하도록 LIMIT 주입 및 fetchmany 사용
+        executed_sql = str(mock_conn.execute.call_args.args[0])
+        assert executed_sql.endswith(f"LIMIT {settings.SQL_MAX_RESULT_ROWS + 1}")
+        mock_result.fetchmany.assert_called_once_with(settings.SQL_MAX_RESULT_ROWS + 1)
+
+@pytest.mark.asyncio
+async def test_execute_sql_logic_truncates_and_issues_page_token():
+    """상한을 넘는 결과는 잘린 것으로 표시하고 추정 건수와 다음 페이지 토큰을 반환해야 합니다."""
+    rows = [{"n": i} for i in range(4)]
+    state = {"sql_query": "SELECT n FROM t", "error": None, "user_id": "u1"}
+
+    with patch("household_ledger.graph.nodes.settings.SQL_MAX_RESULT_ROWS", 3), \
+         patch("household_ledger.graph.nodes.sql_executor.fetch_records", new_callable=AsyncMock, return_value=(["n"], rows)), \
+         patch("household_ledger.graph.nodes.sql_executor.explain", new_callable=AsyncMock, return_value={"Plan Rows": 120}), \
+         patch("household_ledger.graph.nodes.redis_client", new_callable=AsyncMock) as mock_redis:
+        res = await execute_sql_logic(state)
+
+        assert res["sql_result"] == rows[:3]
+        page = res["result_page"]
+        assert page["truncated"] is True and page["total_estimate"] == 120
+        key, ttl, entry = mock_redis.setex.call_args.args
+        assert key.endswith(page["next_page_token"])
+        assert json.loads(entry) == {"sql": "SELECT n FROM t", "params": {}, "offset": 3, "user_id": "u1"}
+
+        # 다음 페이지는 저장된 SQL에 오프셋을 적용해 조회 (다른 사용자의 토큰은 거부)
+        mock_redis.get.return_value = entry
+        assert await load_result_page("other", page["next_page_token"]) is None
+        with patch("household_ledger.graph.nodes.sql_executor.fetch_records", new_callable=AsyncMock,
+                   return_value=(["n"], [{"n": 3}])) as mock_fetch:
+            columns, next_rows, next_page = await load_result_page("u1", page["next_page_token"])
+        assert next_rows == [{"n": 3}] and next_page["offset"] == 3 and not next_page["truncated"]
+        assert mock_fetch.call_args.args[0].endswith("LIMIT 4 OFFSET 3")
 
 @pytest.mark.asyncio
 async def test_final_analyzer_node_with_chart():
-    state = {"sql_result": [{"amount": 5000}], "refined_question": "질문"}
+    """차트는 결과 컬럼으로 생성하고, LLM이 덧붙인 CHART_JSON은 제거해야 합니다."""
+    rows = [{"category": "식비", "amount": 5000}, {"category": "교통", "amount": 3000}]
+    state = {"sql_result": rows, "refined_question": "질문"}
     
     with patch("household_ledger.graph.nodes.get_llm") as mock_get_llm:
         mock_llm = AsyncMock()
@@ -94,4 +336,63 @@ async def test_final_analyzer_node_with_chart():
         mock_get_llm.return_value = mock_llm
         
         res = await final_analyzer_node(state)
-        assert "분석 결과입니다" in res["analysis"]
\ No newline at end of file
+        assert res["analysis"] == "분석 결과입니다."
+        assert res["chart_data"]["type"] == "pie"
+        assert res["chart_data"]["data"] == rows
+
+@pytest.mark.asyncio
+async def test_validate_sql_logic_local_without_llm():
+    """검증은 LLM을 호출하지 않고 로컬 파서로 수행되어야 합니다."""
+    with patch("household_ledger.graph.nodes.get_llm") as mock_get_llm:
+        ok = await validate_sql_logic({"sql_query": "SELECT amount FROM transactions", "retry_count": 0})
+        bad = await validate_sql_logic({"sql_query": "SELECT 1 FROM transactions; SELECT pg_sleep(5)", "retry_count": 0})
+        assert ok["error"] is None
+        assert bad["error"].startswith("SECURITY_VIOLATION")
+        assert bad["retry_count"] == 1
+        assert not mock_get_llm.called
+
+@pytest.mark.asyncio
+async def test_validate_sql_logic_rewrites_to_rollup():
+    """검증을 통과한 집계 쿼리는 롤업 테이블 조회로 재작성되어야 합니다."""
+    state = {"sql_query": "SELECT account_id, SUM(amount) FROM transactions GROUP BY account_id", "retry_count": 0}
+    res = await validate_sql_logic(state)
+    assert res["error"] is None
+    assert "monthly_spend_rollup" in res["sql_query"]
+
+    with patch("household_ledger.graph.nodes.settings.SQL_ROLLUP_REWRITE", False):
+        res = await validate_sql_logic(state)
+        assert "sql_query" not in res
+
+@pytest.mark.asyncio
+async def test_validate_sql_logic_explain_cost_limit():
+    state = {"sql_query": "SELECT amount FROM transactions", "retry_count": 0}
+    
+    with patch("household_ledger.graph.nodes.settings.SQL_VALIDATE_WITH_EXPLAIN", True), \
+         patch("household_ledger.graph.nodes.settings.SQL_MAX_PLAN_COST", 1000.0), \
+         patch("household_ledger.graph.nodes.sql_executor.explain", new_callable=AsyncMock) as mock_explain:
+        mock_explain.return_value = {"Node Type": "Seq Scan", "Total Cost": 250000.0}
+        res = await validate_sql_logic(state)
+        assert res["error"].startswith("VALIDATION_FAIL: COST_LIMIT_EXCEEDED")
+
+@pytest.mark.asyncio
+async def test_final_analyzer_prompt_is_bounded_for_large_results():
+    rows = [{"transaction_id": f"T{i}", "category": "식비", "amount": i} for i in range(20000)]
+    with patch("household_ledger.graph.nodes.get_llm") as mock_get_llm:
+        mock_llm = AsyncMock()
+        mock_llm.ainvoke.return_value = MagicMock(content="분석 결과입니다.")
+        mock_get_llm.return_value = mock_llm
+
+        await final_analyzer_node({"sql_result": rows, "refined_question": "식비 내역"})
+
+        prompt = mock_llm.ainvoke.call_args.args[0]
+        assert '"row_count": 20000' in prompt
+        assert len(prompt) < 6000
+
+@pytest.mark.asyncio
+async def test_save_history_stores_slots():
+    state = {"session_id": "s1", "refined_question": "지난달 식비 얼마야?", "analysis": "12만원입니다."}
+    with patch("household_ledger.graph.nodes.redis_client", new_callable=AsyncMock) as mock_redis:
+        await save_history_logic(state)
+        key, entry = mock_redis.lpush.call_args.args
+        assert key == "chat_history:s1"
+        assert json.loads(entry)["slots"] == {"period": "지난달", "category": "식비"}
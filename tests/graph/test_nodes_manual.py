@@ -33,7 +33,7 @@ async def test_manual_node_1_check_cache(redis_client_fixture):
     print("\n🔍 [Node Manual] 1. check_cache_logic 테스트...")
     state = {
         "user_id": "tester", 
-        "messages": [MagicMock(content="지난달 식비 총액")]
+        "refined_question": "지난달 식비 총액"
     }
     
     with patch("household_ledger.graph.nodes.redis_client", redis_client_fixture):
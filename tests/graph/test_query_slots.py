@@ -0,0 +1,71 @@
+import json
+import pytest
+from datetime import date
+from household_ledger.graph.query_slots import (
+    extract_limit, extract_slots, is_self_contained, parse_history_entry, resolve_period, rewrite_followup
+)
+
+def test_extract_slots():
+    assert extract_slots("지난달 스타벅스에서 쓴 식비 얼마야?") == {"period": "지난달", "category": "식비", "merchant": "스타벅스"}
+    assert extract_slots("2024년 3월 교통비") == {"period": "2024년 3월", "category": "교통비"}
+    assert extract_slots("안녕") == {}
+
+@pytest.mark.parametrize("text, expected", [
+    ("지난달", (date(2024, 4, 1), date(2024, 5, 1))),
+    ("2023년 12월", (date(2023, 12, 1), date(2024, 1, 1))),
+    ("작년", (date(2023, 1, 1), date(2024, 1, 1))),
+    ("이번 주", (date(2024, 5, 13), date(2024, 5, 20))),
+    ("최근 7일", (date(2024, 5, 9), date(2024, 5, 16))),
+    ("지난 분기", (date(2024, 1, 1), date(2024, 4, 1))),
+    ("그때", None),
+])
+def test_resolve_period(text, expected):
+    assert resolve_period(text, date(2024, 5, 15)) == expected
+
+def test_extract_limit_ignores_period_numbers():
+    assert extract_limit("최근 지출 내역 5개만 보여줘") == "5"
+    assert extract_limit("상위 10 가맹점") == "10"
+    assert extract_limit("최근 3개월 식비 합계") is None
+
+@pytest.mark.parametrize("question, expected", [
+    ("이번 달 교통비 얼마야?", True),
+    ("안녕", True),
+    ("교통비는?", False),
+    ("그중 스타벅스는?", False),
+    ("그중 제일 큰 건 뭐야?", False),
+    ("고마워?", True),               # 짧은 잡담은 생략형 꼬리 질문이 아님
+    ("잘 지내?", True),
+    ("교통비?", False),              # 조사가 없어도 카테고리 단어 단독은 생략형
+])
+def test_is_self_contained(question, expected):
+    assert is_self_contained(question) is expected
+
+@pytest.mark.parametrize("question, expected", [
+    ("교통비는?", "지난달 교통비 얼마야?"),
+    ("이번 달은?", "이번 달 식비 얼마야?"),
+    ("그럼 작년은?", "작년 식비 얼마야?"),
+    ("스타벅스는?", None),            # 직전 질문에 가맹점 조건이 없으면 LLM 정제로 넘김
+    ("그중 제일 큰 건 뭐야?", None),  # 생략형이 아닌 꼬리 질문
+])
+def test_rewrite_followup(question, expected):
+    assert rewrite_followup(question, "지난달 식비 얼마야?") == expected
+
+@pytest.mark.parametrize("question, expected", [
+    ("이디야에서는?", "지난달 이디야에서 얼마 썼어?"),   # 명시적인 '...에서' 형태
+    ("GS25는?", "지난달 GS25에서 얼마 썼어?"),         # 영문/숫자 브랜드 표기
+    ("투썸은?", "지난달 투썸에서 얼마 썼어?"),          # 세션에서 이미 언급된 가맹점
+    ("평균은?", None),                                  # 지표 단어는 가맹점이 아님 -> LLM 정제
+    ("총액은?", None),
+    ("고마워?", None),                                  # 잡담
+    ("작년은?", "작년 스타벅스에서 얼마 썼어?"),
+])
+def test_rewrite_followup_merchant_slot(question, expected):
+    previous = "지난달 스타벅스에서 얼마 썼어?"
+    assert rewrite_followup(question, previous, known_merchants={"투썸", "스타벅스"}) == expected
+
+def test_parse_history_entry_supports_legacy_format():
+    legacy = parse_history_entry("Q: 지난달 식비 얼마야?\nA: 12만원입니다...")
+    assert legacy == {"q": "지난달 식비 얼마야?", "a": "12만원입니다...", "slots": {"period": "지난달", "category": "식비"}}
+
+    entry = parse_history_entry(json.dumps({"q": "작년 교통비", "a": "...", "slots": {"period": "작년"}}, ensure_ascii=False))
+    assert entry["slots"] == {"period": "작년"}
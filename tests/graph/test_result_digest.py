@@ -0,0 +1,52 @@
+import json
+from household_ledger.graph.result_digest import build_result_digest
+
+def make_rows(n):
+    categories = ["식비", "교통", "쇼핑"]
+    return [
+        {"transaction_id": f"T{i}", "transaction_date": f"2024-{1 + i % 12:02d}-01",
+         "category": categories[i % 3], "amount": str(i)}   # Decimal은 문자열로 직렬화됨
+        for i in range(n)
+    ]
+
+def test_small_result_is_passed_through():
+    rows = make_rows(3)
+    assert json.loads(build_result_digest(rows)) == rows
+    assert build_result_digest([]) == "[]"
+
+def test_large_result_is_summarized():
+    digest = json.loads(build_result_digest(make_rows(3000), top_n=5))
+
+    assert digest["row_count"] == 3000
+    assert digest["numeric_stats"]["amount"]["sum"] == sum(range(3000))
+    assert digest["date_ranges"]["transaction_date"] == ["2024-01-01", "2024-12-01"]
+    assert [r["amount"] for r in digest["top_5_by_amount"]] == [2999, 2998, 2997, 2996, 2995]
+    # 카테고리별 합계 (식비: 0, 3, 6 ...)
+    assert digest["group_totals_of_amount"]["category"]["식비"] == sum(range(0, 3000, 3))
+    # transaction_id처럼 값 종류가 많은 컬럼은 그룹 합계에서 제외
+    assert "transaction_id" not in digest["group_totals_of_amount"]
+
+def test_prompt_size_is_bounded_regardless_of_result_size():
+    small = build_result_digest(make_rows(100), max_chars=1500)
+    large = build_result_digest(make_rows(50000), max_chars=1500)
+    assert len(small) <= 1500 and len(large) <= 1500
+    # 잘라내지 않고 행/컬럼을 줄여 맞추므로 항상 유효한 JSON
+    assert json.loads(large)["row_count"] == 50000
+
+def test_wide_result_drops_columns_before_truncating():
+    """컬럼이 많은 결과는 컬럼을 줄여 JSON을 유지하고, 그래도 넘칠 때만 잘림 표시를 붙여야 합니다."""
+    rows = [{f"column_with_a_long_name_{c:02d}": f"value {c}" for c in range(19)} for _ in range(500)]
+    for i, row in enumerate(rows):
+        row["amount"] = i
+    digest = json.loads(build_result_digest(rows, max_chars=1200, top_n=5))
+    # 집계 기준 컬럼(amount)은 남기고 나머지 컬럼을 줄임
+    assert "amount" in digest["columns"] and len(digest["columns"]) < 20
+    assert all(set(row) <= set(digest["columns"]) for row in digest["top_5_by_amount"])
+
+    tiny = build_result_digest(rows, max_chars=100)
+    assert len(tiny) <= 100 and tiny.endswith("…(truncated)")
+
+def test_non_numeric_result_uses_sample_rows():
+    rows = [{"merchant_id": f"M{i}", "category": "식비"} for i in range(200)]
+    digest = json.loads(build_result_digest(rows, top_n=3))
+    assert digest["sample_rows"] == rows[:3]
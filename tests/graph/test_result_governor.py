@@ -0,0 +1,28 @@
+from household_ledger.graph.result_governor import apply_row_limit, new_page_token
+
+def test_limit_is_injected_when_missing():
+    assert apply_row_limit("SELECT * FROM transactions;", 1001) == "SELECT * FROM transactions LIMIT 1001"
+    assert apply_row_limit("SELECT * FROM transactions ORDER BY amount DESC", 11, 10) == \
+        "SELECT * FROM transactions ORDER BY amount DESC LIMIT 11 OFFSET 10"
+
+def test_existing_limit_is_tightened_not_widened():
+    assert apply_row_limit("SELECT * FROM transactions LIMIT 5000", 1001) == "SELECT * FROM transactions LIMIT 1001"
+    # 원래 LIMIT 5는 상한보다 작으므로 그대로 유지
+    assert apply_row_limit("SELECT * FROM transactions LIMIT 5", 1001) == "SELECT * FROM transactions LIMIT 5"
+    # 원래 범위(OFFSET 10, LIMIT 30) 안에서만 페이지 이동
+    assert apply_row_limit("SELECT * FROM transactions LIMIT 30 OFFSET 10", 21, 20) == \
+        "SELECT * FROM transactions LIMIT 10 OFFSET 30"
+    assert apply_row_limit("SELECT * FROM transactions LIMIT ALL", 3) == "SELECT * FROM transactions LIMIT 3"
+
+def test_subquery_limit_is_ignored():
+    sql = "SELECT * FROM (SELECT * FROM transactions LIMIT 10) t"
+    assert apply_row_limit(sql, 4) == f"{sql} LIMIT 4"
+
+def test_non_literal_limit_is_wrapped():
+    sql = "SELECT * FROM transactions FETCH FIRST 10 ROWS ONLY"
+    assert apply_row_limit(sql, 4, 2) == f"SELECT * FROM ({sql}) AS _governed LIMIT 4 OFFSET 2"
+    sql = "SELECT * FROM transactions LIMIT :n"
+    assert apply_row_limit(sql, 4).startswith("SELECT * FROM (SELECT")
+
+def test_page_tokens_are_unique():
+    assert new_page_token() != new_page_token()
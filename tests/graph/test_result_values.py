@@ -0,0 +1,14 @@
+from datetime import datetime
+from household_ledger.graph.result_values import numeric_columns, parse_datetime, primary_measure
+
+def test_numeric_columns_accept_serialized_decimals_and_nulls():
+    rows = [{"category": "식비", "amount": "1200.50", "cnt": 3}, {"category": "교통", "amount": None, "cnt": 1}]
+    numeric = numeric_columns(rows, ["category", "amount", "cnt"])
+    assert numeric == {"amount": [1200.5, None], "cnt": [3, 1]}
+    assert primary_measure(numeric) == "amount"
+
+def test_parse_datetime_formats():
+    assert parse_datetime("2024-03") == datetime(2024, 3, 1)
+    assert parse_datetime("2024.03.05") == datetime(2024, 3, 5)
+    assert parse_datetime("2024-03-05T10:00:00+09:00") == datetime(2024, 3, 5, 10)
+    assert parse_datetime("식비") is None
@@ -0,0 +1,93 @@
+"""
+롤업 플래너 유닛 테스트 모듈
+집계 쿼리가 사전 집계 테이블 조회로 재작성되고, 결과가 달라질 수 있는 쿼리는 그대로 두는지 검증합니다.
+"""
+
+import pytest
+from household_ledger.graph.rollup_planner import rewrite_for_rollup
+from household_ledger.graph.sql_validator import check_select_sql
+
+
+@pytest.mark.parametrize("sql, expected", [
+    # 계좌별 합계: 날짜 조건이 없으므로 월별 롤업
+    ("SELECT account_id, SUM(amount) AS total FROM transactions GROUP BY account_id ORDER BY total DESC",
+     "SELECT account_id, SUM(total_amount) AS total FROM monthly_spend_rollup AS transactions GROUP BY account_id ORDER BY total DESC"),
+    # 카테고리 그룹은 NULL('기타') 행을 거르는 조건이 있을 때만 재작성
+    ("SELECT category, SUM(amount) FROM transactions WHERE category IN ('식비', '교통') GROUP BY category",
+     "SELECT category, SUM(total_amount) FROM monthly_spend_rollup AS transactions WHERE category IN ('식비', '교통') GROUP BY category"),
+    # 일 단위 날짜 조건은 일별 롤업
+    ("SELECT SUM(amount) FROM transactions WHERE transaction_date >= date_trunc('month', CURRENT_DATE)",
+     "SELECT SUM(total_amount) FROM daily_spend_rollup AS transactions WHERE transaction_date >= date_trunc('month', CURRENT_DATE)"),
+    # 월 단위 함수로만 날짜를 쓰면 월별 롤업 + 별칭 유지
+    ("SELECT date_trunc('month', t.transaction_date) AS m, SUM(t.amount) FROM transactions t GROUP BY 1",
+     "SELECT date_trunc('month', t.spend_month) AS m, SUM(t.total_amount) FROM monthly_spend_rollup t GROUP BY 1"),
+    # COUNT(*)/AVG 재작성 및 바인드 파라미터 유지
+    ("SELECT merchant_id, COUNT(*) AS cnt, AVG(amount) FROM transactions WHERE merchant_id = ANY(:merchant_ids) GROUP BY merchant_id",
+     "SELECT merchant_id, COALESCE(SUM(txn_count), 0)::bigint AS cnt, (SUM(total_amount) / NULLIF(SUM(txn_count), 0)) "
+     "FROM monthly_spend_rollup AS transactions WHERE merchant_id = ANY(:merchant_ids) GROUP BY merchant_id"),
+])
+def test_aggregate_queries_are_rewritten(sql, expected):
+    rewritten = rewrite_for_rollup(sql)
+    assert rewritten == expected
+    # 재작성 결과도 로컬 검증기를 통과해야 함 (롤업 컬럼이 모델 메타데이터에 존재)
+    assert check_select_sql(rewritten) is None
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM transactions ORDER BY amount DESC LIMIT 3",                        # 행 단위 조회
+    "SELECT SUM(amount) FROM transactions WHERE amount > 100",                       # 개별 금액 조건
+    "SELECT SUM(amount) FROM transactions WHERE transaction_time > '12:00'",         # 롤업에 없는 컬럼
+    "SELECT COUNT(merchant_id) FROM transactions",                                   # NULL 제외 건수
+    "SELECT SUM(amount) FROM transactions t JOIN accounts a ON a.account_id = t.account_id",
+    "SELECT SUM(amount) FROM transactions, accounts",
+    "SELECT SUM(amount) FROM transactions WHERE account_id IN (SELECT account_id FROM accounts)",
+    "SELECT category, SUM(amount) OVER (PARTITION BY category) FROM transactions",
+    "SELECT string_agg(merchant_id, ',') FROM transactions",
+])
+def test_ineligible_queries_are_left_alone(sql):
+    assert rewrite_for_rollup(sql) is None
+
+
+@pytest.mark.parametrize("sql", [
+    # 롤업은 NULL 차원을 '기타'/''로 저장하므로 NULL 조건/처리 함수는 원본 테이블에서 실행
+    "SELECT SUM(amount) FROM transactions WHERE merchant_id IS NULL",
+    "SELECT COUNT(*) FROM transactions t WHERE t.merchant_id IS NOT NULL",
+    "SELECT SUM(amount) FROM transactions WHERE category ISNULL",
+    "SELECT COALESCE(category, '미분류') AS c, SUM(amount) FROM transactions GROUP BY 1",
+])
+def test_null_dimension_predicates_are_left_alone(sql):
+    assert rewrite_for_rollup(sql) is None
+
+
+@pytest.mark.parametrize("sql", [
+    # NULL/자리표시 값 행을 모두 거르는 긍정 조건은 원본과 결과가 같음
+    "SELECT SUM(amount) FROM transactions WHERE merchant_id = 'M1'",
+    "SELECT SUM(amount) FROM transactions WHERE merchant_id IN ('M1', 'M2') AND category LIKE '식%'",
+    "SELECT COUNT(DISTINCT merchant_id), SUM(amount) FROM transactions WHERE merchant_id = ANY(:merchant_ids)",
+])
+def test_placeholder_dimension_filters_are_rewritten(sql):
+    assert "spend_rollup" in rewrite_for_rollup(sql)
+
+
+@pytest.mark.parametrize("sql", [
+    # 롤업에서는 NULL 가맹점이 ''로 저장되어 부정 조건을 통과함
+    "SELECT SUM(amount) FROM transactions WHERE merchant_id <> 'M1'",
+    "SELECT SUM(amount) FROM transactions WHERE merchant_id != 'M1'",
+    "SELECT SUM(amount) FROM transactions WHERE merchant_id NOT IN ('M1')",
+    "SELECT SUM(amount) FROM transactions WHERE merchant_id NOT LIKE 'M%'",
+    "SELECT SUM(amount) FROM transactions WHERE NOT merchant_id = 'M1'",
+    "SELECT SUM(amount) FROM transactions WHERE category <> '식비'",
+    # 자리표시 값 자체를 고르는 조건 (NULL 카테고리 행이 '기타'에 섞임)
+    "SELECT SUM(amount) FROM transactions WHERE category = '기타'",
+    "SELECT SUM(amount) FROM transactions WHERE category LIKE '기%'",
+    "SELECT SUM(amount) FROM transactions WHERE category = :category",
+    # NULL 그룹이 ''/'기타' 그룹으로 바뀌거나 NULL이 DISTINCT 건수에 포함됨
+    "SELECT merchant_id, SUM(amount) FROM transactions GROUP BY merchant_id",
+    "SELECT category, SUM(amount) AS total FROM transactions GROUP BY category ORDER BY total DESC",
+    "SELECT COUNT(DISTINCT merchant_id), SUM(amount) FROM transactions",
+    "SELECT DISTINCT category, COUNT(*) FROM transactions GROUP BY category",
+    # OR 조건은 다른 분기로 NULL 행이 남을 수 있음
+    "SELECT merchant_id, SUM(amount) FROM transactions WHERE merchant_id = 'M1' OR account_id = 'A1' GROUP BY merchant_id",
+])
+def test_placeholder_dimension_exposure_is_left_alone(sql):
+    assert rewrite_for_rollup(sql) is None
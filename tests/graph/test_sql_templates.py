@@ -0,0 +1,82 @@
+import json
+import pytest
+from datetime import date
+from unittest.mock import AsyncMock, patch
+from household_ledger.graph.sql_templates import SqlTemplateStore, abstract_sql, question_shape, detect_slots
+
+TODAY = date(2024, 5, 15)
+
+def test_abstract_sql_parameterizes_period_category_and_limit():
+    template = abstract_sql(
+        "지난달 식비 상위 5개 보여줘",
+        "SELECT * FROM transactions WHERE category = '식비' AND transaction_date >= '2024-04-01' "
+        "AND transaction_date < DATE '2024-05-01' ORDER BY amount DESC LIMIT 5",
+        TODAY
+    )
+    assert template.shape == "{period} {category} 상위 {limit}개 보여줘"
+    assert template.sql == ("SELECT * FROM transactions WHERE category = :tpl_category AND transaction_date >= :tpl_period_start "
+                            "AND transaction_date < :tpl_period_end ORDER BY amount DESC LIMIT :tpl_limit")
+    assert template.fixed == {}
+    assert template.values == {"category": {"식비": "식비"}}
+
+def test_abstract_sql_keeps_unlocated_slots_fixed_and_rejects_stale_dates():
+    # 상대 기간을 CURRENT_DATE로 표현한 SQL은 기간 슬롯을 고정값으로 두고 가맹점만 파라미터화
+    template = abstract_sql(
+        "스타벅스(Starbucks)에서 이번 달에 총 얼마 썼어?",
+        "SELECT SUM(amount) FROM transactions WHERE merchant_id ILIKE '%Starbucks%' "
+        "AND transaction_date >= DATE_TRUNC('month', CURRENT_DATE)",
+        TODAY
+    )
+    assert template.fixed == {"period": "이번 달"}
+    assert template.params == {"tpl_merchant": {"slot": "merchant", "kind": "value", "pattern": "%{}%"}}
+
+    # 상대 기간인데 질문 기간과 다른 날짜 리터럴이 박혀 있으면 시간이 지나면 틀리므로 학습하지 않음
+    assert abstract_sql("이번 달 교통비 얼마야?",
+                        "SELECT SUM(amount) FROM transactions WHERE transaction_date >= '2024-05-02'", TODAY) is None
+    # 이미 바인드 파라미터가 있는 SQL(HYBRID 등)은 대상이 아님
+    assert abstract_sql("식비 얼마야?", "SELECT SUM(amount) FROM transactions WHERE merchant_id = ANY(:merchant_ids)") is None
+
+def test_store_match_fills_bind_params_for_same_shape():
+    store = SqlTemplateStore()
+    store.learn("지난달 교통비 얼마야?",
+                "SELECT SUM(amount) FROM transactions WHERE category = '교통' "
+                "AND transaction_date BETWEEN '2024-04-01' AND '2024-04-30'", TODAY)
+    store.learn("지난달 식비 얼마야?",
+                "SELECT SUM(amount) FROM transactions WHERE category = '식비' "
+                "AND transaction_date BETWEEN '2024-04-01' AND '2024-04-30'", TODAY)
+
+    match = store.match("2023년 3월 교통비 얼마야", TODAY)
+    assert match.sql.endswith("BETWEEN :tpl_period_start AND :tpl_period_end_inclusive")
+    assert match.params == {"tpl_category": "교통", "tpl_period_start": date(2023, 3, 1),
+                            "tpl_period_end_inclusive": date(2023, 3, 31)}
+    # 학습하지 않은 카테고리 표기이거나 형태가 다르면 미스 (LLM 생성으로 처리)
+    assert store.match("지난달 쇼핑 얼마야?", TODAY) is None
+    assert store.match("지난달 식비 평균은?", TODAY) is None
+
+def test_store_merchant_match_requires_known_or_latin_name():
+    store = SqlTemplateStore()
+    store.learn("스타벅스(Starbucks)에서 작년에 쓴 돈",
+                "SELECT SUM(amount) FROM transactions WHERE merchant_id ILIKE '%Starbucks%' "
+                "AND transaction_date >= '2023-01-01' AND transaction_date < '2024-01-01'", TODAY)
+    assert store.match("Ediya에서 올해에 쓴 돈", TODAY).params["tpl_merchant"] == "%Ediya%"
+    assert store.match("스타벅스(starbucks)에서 올해에 쓴 돈", TODAY).params["tpl_merchant"] == "%Starbucks%"
+    assert store.match("이디야에서 올해에 쓴 돈", TODAY) is None
+
+def test_question_shape_ignores_spacing_and_punctuation():
+    question = "최근 지출 내역  10개만 보여줘?"
+    assert detect_slots(question) == {"limit": "10"}
+    assert question_shape(question, detect_slots(question)) == "최근 지출 내역 {limit}개만 보여줘"
+
+@pytest.mark.asyncio
+async def test_store_evicts_and_loads_from_redis():
+    store = SqlTemplateStore()
+    with patch("household_ledger.graph.sql_templates.settings.SQL_TEMPLATE_MAX", 1):
+        first, _ = store.learn("가장 큰 순서대로 3개", "SELECT * FROM transactions ORDER BY amount DESC LIMIT 3")
+        second, evicted = store.learn("가장 작은 순서대로 3개", "SELECT * FROM transactions ORDER BY amount LIMIT 3")
+    assert evicted == [first.id] and len(store) == 1
+
+    restored = SqlTemplateStore()
+    mock_redis = AsyncMock()
+    mock_redis.hgetall.return_value = {second.id: second.to_json(), "broken": "{"}
+    assert await restored.load(mock_redis) == 1
+    assert restored.match("가장 작은 순서대로 7개").params == {"tpl_limit": 7}
@@ -0,0 +1,48 @@
+"""
+로컬 SQL 검증기 유닛 테스트 모듈
+LLM 호출 없이 단일 읽기 전용 SELECT 여부와 테이블/컬럼 존재 여부를 판별하는지 검증합니다.
+"""
+
+import pytest
+from household_ledger.graph.sql_validator import check_select_sql, find_bind_params, tokenize_sql, SqlParseError
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM transactions LIMIT 5",
+    "SELECT category, sum(amount) total FROM transactions GROUP BY category ORDER BY total DESC",
+    "SELECT t.amount, a.account_type FROM transactions t JOIN accounts a ON t.account_id = a.account_id",
+    "SELECT EXTRACT(MONTH FROM transaction_date) AS m, COUNT(*) FROM transactions GROUP BY m",
+    "SELECT sum(amount) FROM transactions WHERE merchant_id = ANY(:merchant_ids)",
+    "WITH m AS (SELECT merchant_id, sum(amount) s FROM transactions GROUP BY merchant_id) SELECT * FROM m",
+    "SELECT 'DROP TABLE' AS note FROM transactions WHERE category = '식비';",
+])
+def test_valid_select_passes(sql):
+    assert check_select_sql(sql) is None
+
+
+@pytest.mark.parametrize("sql, expected", [
+    ("SELECT 1 FROM transactions; SELECT pg_sleep(10)", "SECURITY: MULTI_STATEMENT"),
+    ("SELECT pg_sleep(10)", "SECURITY: FORBIDDEN_FUNCTION"),
+    ("SELECT * INTO backup FROM transactions", "SECURITY: FORBIDDEN_KEYWORD"),
+    ("WITH x AS (DELETE FROM transactions RETURNING *) SELECT * FROM x", "SECURITY: FORBIDDEN_KEYWORD"),
+    ("SELECT * FROM wrong", "INVALID: UNKNOWN_TABLE"),
+    ("SELECT amountx FROM transactions", "INVALID: UNKNOWN_COLUMN"),
+    ("SELECT t.foo FROM transactions t", "INVALID: UNKNOWN_COLUMN"),
+    ("SELECT (amount FROM transactions", "INVALID: UNBALANCED_PARENTHESES"),
+])
+def test_invalid_select_rejected(sql, expected):
+    assert check_select_sql(sql).startswith(expected)
+
+
+def test_unterminated_string_is_parse_error():
+    with pytest.raises(SqlParseError):
+        tokenize_sql("SELECT * FROM transactions WHERE category = '식비")
+
+
+def test_find_bind_params_ignores_casts():
+    assert find_bind_params("SELECT amount::text FROM transactions WHERE merchant_id = ANY(:merchant_ids)") == ["merchant_ids"]
+
+
+def test_find_bind_params_ignores_normalized_constants():
+    """pg_stat_statements가 정규화한 $1 상수는 바인드 파라미터가 아닙니다."""
+    assert find_bind_params("SELECT * FROM transactions WHERE account_id = $1 AND category = :cat") == ["cat"]
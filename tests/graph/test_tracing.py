@@ -0,0 +1,43 @@
+import pytest
+from household_ledger.graph.tracing import traced_node
+from household_ledger.infrastructure.telemetry import current_node, metrics
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+@pytest.mark.asyncio
+async def test_traced_node_records_latency_and_sql_stats():
+    seen = []
+
+    async def executor(state):
+        seen.append(current_node.get())
+        return {"sql_result": [{"n": 1}, {"n": 2}], "timings": {"sql_exec": 0.03}}
+
+    wrapped = traced_node("executor", executor)
+    assert wrapped.__name__ == "executor"
+    assert await wrapped({"retry_count": 0}) == {"sql_result": [{"n": 1}, {"n": 2}], "timings": {"sql_exec": 0.03}}
+
+    # 노드 실행 중에는 LLM 토큰 집계를 위해 현재 노드가 표시되어야 함
+    assert seen == ["executor"] and current_node.get() is None
+    assert metrics.value("ledger_node_duration_seconds", {"node": "executor"}) == 1
+    assert metrics.value("ledger_node_runs_total", {"node": "executor", "status": "ok"}) == 1
+    assert metrics.value("ledger_sql_exec_seconds") == 1
+    assert 'ledger_sql_rows_bucket{le="1"} 0' in metrics.render()
+
+@pytest.mark.asyncio
+async def test_traced_node_counts_retries_and_errors():
+    async def validate(state):
+        return {"error": "VALIDATION_FAIL: x", "retry_count": state["retry_count"] + 1}
+
+    async def broken(state):
+        raise RuntimeError("boom")
+
+    await traced_node("validate_sql", validate)({"retry_count": 1})
+    with pytest.raises(RuntimeError):
+        await traced_node("analyzer", broken)({})
+
+    assert metrics.value("ledger_sql_retries_total", {"node": "validate_sql"}) == 1
+    assert metrics.value("ledger_node_runs_total", {"node": "analyzer", "status": "error"}) == 1
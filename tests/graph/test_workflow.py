@@ -3,9 +3,21 @@ import json
 from unittest.mock import AsyncMock, patch, MagicMock
 from langchain_core.messages import HumanMessage, AIMessage
 from household_ledger.graph.workflow import create_household_workflow, display_graph_info
+from household_ledger.graph.sql_templates import sql_template_store
+from household_ledger.infrastructure.few_shot_index import few_shot_index
+from household_ledger.common.config import settings
 
 # --- [Fixtures: 공통 모킹 객체] ---
 
+@pytest.fixture(autouse=True)
+def empty_template_store():
+    """테스트 간 학습된 NL->SQL 템플릿과 Few-shot 예시가 공유되지 않도록 초기화"""
+    sql_template_store.clear()
+    few_shot_index.clear()
+    yield
+    sql_template_store.clear()
+    few_shot_index.clear()
+
 @pytest.fixture
 def mock_llm():
     """nodes.py의 로직(res.content)을 따르는 비동기 LLM 모킹"""
@@ -27,10 +39,14 @@ def get_full_state(messages=None):
         "sql_result": [],
         "graph_query": "",
         "graph_result": [],
+        "graph_error": None,
+        "timings": {},
         "analysis": "",
         "chart_data": {},
         "retry_count": 0,
         "error": None,
+        "is_cached": False,
+        "cache_key": None,
         "user_id": "test_user",
         "session_id": "test_session"
     }
@@ -43,16 +59,13 @@ def get_full_state(messages=None):
 async def test_workflow_sql_path_with_retry(mock_llm):
     """
     [Scenario] 단발성 질문 (Refiner LLM 호출 없음)
-    Router(SQL) -> sql_gen(1차) -> validate(FAIL) -> sql_gen(2차) -> validate(PASS)
+    Router(SQL, 로컬 분류기) -> sql_gen(1차) -> validate(FAIL, 로컬 검증) -> sql_gen(2차) -> validate(PASS)
     """
-    # 호출 순서: 1.router, 2.sql_gen(1), 3.validate(FAIL), 4.sql_gen(2), 5.validate(PASS), 6.analyzer
+    # 호출 순서: 1.sql_gen(1), 2.sql_gen(2), 3.analyzer (라우터/검증은 LLM을 호출하지 않음)
     mock_llm.ainvoke.side_effect = [
-        mock_llm.create_response('{"intent": "SQL"}'),             # 1. router
-        mock_llm.create_response("SELECT * FROM wrong"),           # 2. sql_gen (1차)
-        mock_llm.create_response("FAIL"),                          # 3. validate (retry_count -> 1)
-        mock_llm.create_response("SELECT sum(amount) FROM trans"), # 4. sql_gen (2차)
-        mock_llm.create_response("PASS"),                          # 5. validate (성공)
-        mock_llm.create_response("합계는 5만원입니다. [CHART_JSON] {}") # 6. analyzer
+        mock_llm.create_response("SELECT * FROM wrong"),                  # 1. sql_gen (1차, 없는 테이블 -> retry_count 1)
+        mock_llm.create_response("SELECT sum(amount) FROM transactions"), # 2. sql_gen (2차, 성공)
+        mock_llm.create_response("합계는 5만원입니다. [CHART_JSON] {}")      # 3. analyzer
     ]
 
     with patch("household_ledger.graph.nodes.get_llm", return_value=mock_llm), \
@@ -70,6 +83,8 @@ async def test_workflow_sql_path_with_retry(mock_llm):
         
         assert final_state["next_step"] == "SQL"
         assert final_state["retry_count"] == 1
+        # 재생성 프롬프트에 직전 검증 실패 사유가 전달되었는지 확인
+        assert "UNKNOWN_TABLE" in mock_llm.ainvoke.call_args_list[1].args[0]
         assert "5만원" in final_state["analysis"]
 
 # -----------------------------------------------------------------
@@ -92,10 +107,9 @@ async def test_workflow_graph_multi_turn(mock_llm):
 
     with patch("household_ledger.graph.nodes.get_llm", return_value=mock_llm), \
          patch("household_ledger.graph.nodes.redis_client", new_callable=AsyncMock), \
-         patch("household_ledger.graph.nodes.GraphDatabase.driver") as mock_driver:
+         patch("household_ledger.graph.nodes.neo4j_client.aexecute_query", new_callable=AsyncMock) as mock_cypher:
         
-        mock_session = mock_driver.return_value.session.return_value.__enter__.return_value
-        mock_session.run.return_value = [{"count": 10}]
+        mock_cypher.return_value = [{"count": 10}]
         
         graph = create_household_workflow()
         # 대화 기록(history)이 있으므로 Refiner가 LLM을 호출함
@@ -109,20 +123,60 @@ async def test_workflow_graph_multi_turn(mock_llm):
         
         assert result["refined_question"] == "식비 중 스타벅스 지출 내역"
         assert result["next_step"] == "GRAPH"
+        assert result["graph_result"] == [{"count": 10}]
+
+# -----------------------------------------------------------------
+# 3. HYBRID 경로 테스트: SQL/Graph 병렬 분기 후 합류
+# -----------------------------------------------------------------
+
+@pytest.mark.asyncio
+async def test_workflow_hybrid_parallel_branches(mock_llm):
+    """
+    [Scenario] 관계 + 집계 질문
+    Router(HYBRID) -> [sql_gen -> validate_sql] || [graph_gen -> graph_exec] -> executor -> analyzer
+    """
+    async def fake_llm(prompt):
+        # 병렬 분기에서는 호출 순서가 보장되지 않으므로 프롬프트 내용으로 응답을 결정
+        if "경로 결정자" in prompt:
+            return mock_llm.create_response('{"intent": "HYBRID"}')
+        if "Cypher" in prompt:
+            return mock_llm.create_response("MATCH (m:Merchant) RETURN DISTINCT m.id AS merchant_id")
+        if "PostgreSQL" in prompt:
+            return mock_llm.create_response("SELECT sum(amount) FROM transactions WHERE merchant_id = ANY(:merchant_ids)")
+        return mock_llm.create_response("두 가맹점 합계는 3만원입니다.")
+    mock_llm.ainvoke.side_effect = fake_llm
+
+    with patch("household_ledger.graph.nodes.get_llm", return_value=mock_llm), \
+         patch("household_ledger.graph.nodes.redis_client", new_callable=AsyncMock), \
+         patch("household_ledger.graph.nodes.neo4j_client.aexecute_query", new_callable=AsyncMock) as mock_cypher, \
+         patch("household_ledger.graph.nodes.sql_executor.fetch_records", new_callable=AsyncMock) as mock_fetch:
+        
+        mock_cypher.return_value = [{"merchant_id": "M1"}, {"merchant_id": "M2"}]
+        mock_fetch.return_value = (["sum"], [{"sum": 30000}])
+        
+        graph = create_household_workflow()
+        result = await graph.ainvoke(get_full_state(messages=[HumanMessage(content="스타벅스와 같은 카테고리 가맹점 총 지출은?")]))
+        
+        assert result["next_step"] == "HYBRID"
+        assert result["sql_result"] == [{"sum": 30000}]
+        # 그래프에서 찾은 가맹점 집합이 SQL 바인드 파라미터로 전달되었는지 확인
+        query, params = mock_fetch.call_args.args
+        assert params == {"merchant_ids": ["M1", "M2"]}
+        assert mock_fetch.await_count == 1
+        assert {"sql_gen", "validate_sql", "graph_gen", "graph_exec", "sql_exec"} <= set(result["timings"])
 
 # -----------------------------------------------------------------
-# 3. GENERAL 경로 테스트: 일반 대화
+# 4. GENERAL 경로 테스트: 일반 대화
 # -----------------------------------------------------------------
 
 @pytest.mark.asyncio
 async def test_workflow_general_path(mock_llm):
     """
-    [Scenario] 일반 대화 (Router -> Analyzer)
+    [Scenario] 일반 대화 (Router(로컬 분류기) -> Analyzer)
     """
-    # 호출 순서: 1.router, 2.analyzer
+    # 호출 순서: 1.analyzer (인사는 라우터 LLM 호출 없음)
     mock_llm.ainvoke.side_effect = [
-        mock_llm.create_response('{"intent": "GENERAL"}'),      # 1. router
-        mock_llm.create_response("안녕하세요! 가계부 도우미입니다.")   # 2. analyzer
+        mock_llm.create_response("안녕하세요! 가계부 도우미입니다.")   # 1. analyzer
     ]
 
     with patch("household_ledger.graph.nodes.get_llm", return_value=mock_llm), \
@@ -138,7 +192,100 @@ async def test_workflow_general_path(mock_llm):
         assert mock_redis.lpush.called    # 대화 내역 저장은 수행함
 
 # -----------------------------------------------------------------
-# 4. 워크플로우 구조 및 시각화 테스트
+# 5. 캐시 적중 경로 테스트: Router/생성/실행 생략
+# -----------------------------------------------------------------
+
+@pytest.mark.asyncio
+async def test_workflow_cache_hit_skips_generation(mock_llm):
+    """
+    [Scenario] 캐시 적중 (Refiner -> Cache(HIT) -> Analyzer)
+    """
+    # 호출 순서: 1.analyzer (Router/SQL 생성 호출 없음)
+    mock_llm.ainvoke.side_effect = [
+        mock_llm.create_response("식비는 총 5만원입니다.")
+    ]
+    cached = {"next_step": "SQL", "sql_query": "SELECT sum(amount) FROM transactions", "sql_result": [{"sum": 50000}]}
+
+    with patch("household_ledger.graph.nodes.get_llm", return_value=mock_llm), \
+         patch("household_ledger.graph.nodes.redis_client", new_callable=AsyncMock) as mock_redis, \
+         patch("household_ledger.graph.nodes.sql_engine.connect") as mock_connect:
+        
+        mock_redis.get.side_effect = ["1", json.dumps(cached)]
+        
+        graph = create_household_workflow()
+        result = await graph.ainvoke(get_full_state(messages=[HumanMessage(content="식비 얼마야?")]))
+        
+        assert result["is_cached"] is True
+        assert result["sql_result"] == [{"sum": 50000}]
+        assert mock_llm.ainvoke.call_count == 1
+        assert not mock_connect.called
+        assert not mock_redis.setex.called
+
+# -----------------------------------------------------------------
+# 5-1. NL->SQL 템플릿 경로 테스트
+# -----------------------------------------------------------------
+
+TEMPLATE_SQL = "SELECT SUM(amount) FROM transactions WHERE category = '식비' AND transaction_date >= '2024-01-01' AND transaction_date < '2025-01-01'"
+
+@pytest.mark.asyncio
+async def test_workflow_template_hit_skips_router_and_sql_gen(mock_llm):
+    """
+    [Scenario] 같은 형태의 질문 (Refiner -> Cache(MISS) -> Template(HIT) -> Executor -> Analyzer)
+    """
+    from datetime import date
+    sql_template_store.learn("2024년 식비 얼마야?", TEMPLATE_SQL, date(2024, 6, 1))
+    # 호출 순서: 1.analyzer (Router/SQL 생성 호출 없음)
+    mock_llm.ainvoke.side_effect = [mock_llm.create_response("교통비는 총 3만원입니다.")]
+
+    with patch("household_ledger.graph.nodes.get_llm", return_value=mock_llm), \
+         patch("household_ledger.graph.nodes.redis_client", new_callable=AsyncMock) as mock_redis, \
+         patch("household_ledger.graph.nodes.sql_executor.fetch_records", new_callable=AsyncMock) as mock_fetch:
+
+        mock_redis.get.return_value = None
+        mock_fetch.return_value = (["sum"], [{"sum": 30000}])
+        sql_template_store.values["category"]["교통비"] = "교통"
+
+        graph = create_household_workflow()
+        result = await graph.ainvoke(get_full_state(messages=[HumanMessage(content="2023년 교통비 얼마야?")]))
+
+        assert result["sql_template"] is not None
+        assert mock_llm.ainvoke.call_count == 1
+        query, params = mock_fetch.call_args.args
+        assert ":tpl_category" in query
+        assert params == {"tpl_category": "교통", "tpl_period_start": date(2023, 1, 1), "tpl_period_end": date(2024, 1, 1)}
+        assert "sql_gen" not in result["timings"] and "sql_template" in result["timings"]
+
+@pytest.mark.asyncio
+async def test_workflow_template_failure_falls_back_to_llm(mock_llm):
+    """
+    [Scenario] 템플릿 SQL 실행 실패 -> 템플릿 폐기 -> sql_gen -> validate_sql -> executor
+    """
+    from datetime import date
+    sql_template_store.learn("2024년 식비 얼마야?", TEMPLATE_SQL, date(2024, 6, 1))
+    mock_llm.ainvoke.side_effect = [
+        mock_llm.create_response("SELECT sum(amount) FROM transactions WHERE category = '식비'"),  # 1. sql_gen
+        mock_llm.create_response("식비는 총 5만원입니다.")                                         # 2. analyzer
+    ]
+
+    with patch("household_ledger.graph.nodes.get_llm", return_value=mock_llm), \
+         patch("household_ledger.graph.nodes.redis_client", new_callable=AsyncMock) as mock_redis, \
+         patch("household_ledger.graph.nodes.sql_executor.fetch_records", new_callable=AsyncMock) as mock_fetch:
+
+        mock_redis.get.return_value = None
+        mock_fetch.side_effect = [Exception("relation does not exist"), (["sum"], [{"sum": 50000}])]
+
+        graph = create_household_workflow()
+        result = await graph.ainvoke(get_full_state(messages=[HumanMessage(content="2023년 식비 얼마야?")]))
+
+        assert result["error"] is None and result["sql_result"] == [{"sum": 50000}]
+        assert result["sql_template"] is None and result["sql_params"] == {}
+        # 실패한 템플릿은 폐기되고 LLM이 만든 SQL로 새 템플릿을 학습
+        assert mock_redis.hdel.await_count == 1
+        assert sum(c.args[0] == settings.SQL_TEMPLATE_KEY for c in mock_redis.hset.await_args_list) == 1
+        assert "이전 SQL" not in mock_llm.ainvoke.call_args_list[0].args[0]
+
+# -----------------------------------------------------------------
+# 6. 워크플로우 구조 및 시각화 테스트
 # -----------------------------------------------------------------
 
 def test_workflow_structure_verification():
@@ -148,4 +295,4 @@ def test_workflow_structure_verification():
     
     nodes = graph.get_graph().nodes
     # 핵심 노드들이 정상적으로 그래프에 포함되었는지 확인
-    assert all(k in nodes for k in ["refiner", "router", "executor", "analyzer", "save_history"])
\ No newline at end of file
+    assert all(k in nodes for k in ["refiner", "cache_check", "sql_template", "router", "executor", "cache_write", "analyzer", "save_history"])
\ No newline at end of file
@@ -0,0 +1,97 @@
+"""
+Few-shot 예시 벡터 인덱스 유닛 테스트 모듈
+해싱 임베딩, NumPy brute-force 검색(종류 필터/중복 갱신/상한 교체), Redis 복원, pgvector 쿼리 구성을 검증합니다.
+"""
+
+import json
+import numpy as np
+import pytest
+from unittest.mock import AsyncMock
+from household_ledger.infrastructure.few_shot_index import (
+    FewShotExample, NumpyVectorIndex, PgVectorIndex, create_few_shot_index, embed_text, format_examples
+)
+
+
+def test_embed_text_is_normalized_and_stable():
+    vec = embed_text("이번 달 식비 합계", dim=256)
+    assert vec.shape == (256,) and vec.dtype == np.float32
+    assert np.isclose(np.linalg.norm(vec), 1.0)
+    assert np.array_equal(vec, embed_text("  이번 달   식비 합계", dim=256))
+    # 표현이 비슷한 질문이 무관한 질문보다 유사도가 높아야 함
+    assert vec @ embed_text("지난 달 식비 합계", dim=256) > vec @ embed_text("스타벅스와 연결된 계좌", dim=256)
+
+
+@pytest.mark.asyncio
+async def test_numpy_index_ranks_by_similarity_within_kind():
+    index = NumpyVectorIndex(dim=256, max_examples=10)
+    await index.add("sql", "지난달 식비 합계", "SELECT 1")
+    await index.add("sql", "가장 최근 거래 5건", "SELECT 2")
+    await index.add("cypher", "이번 달 식비 합계", "MATCH (n) RETURN n")
+
+    hits = await index.search("sql", "이번 달 식비 합계", k=2, min_score=-1.0)
+    assert [h.query for h in hits] == ["SELECT 1", "SELECT 2"]
+    assert hits[0].score > hits[1].score
+    # 최소 유사도 미만은 제외
+    assert [h.query for h in await index.search("sql", "이번 달 식비 합계", k=2, min_score=0.5)] == ["SELECT 1"]
+    assert await index.search("hybrid_sql", "이번 달 식비 합계") == []
+
+
+@pytest.mark.asyncio
+async def test_numpy_index_updates_duplicates_and_evicts_oldest():
+    index = NumpyVectorIndex(dim=64, max_examples=2)
+    await index.add("sql", "식비 합계", "SELECT 1")
+    _, evicted = await index.add("sql", "식비 합계?", "SELECT 11")
+    assert evicted == [] and len(index) == 1
+
+    await index.add("sql", "교통비 합계", "SELECT 2")
+    example, evicted = await index.add("sql", "쇼핑 합계", "SELECT 3")
+    assert evicted == [FewShotExample("sql", "식비 합계", "SELECT 11").id]
+    assert len(index) == 2
+    assert {h.query for h in await index.search("sql", "합계", k=5, min_score=-1.0)} == {"SELECT 2", "SELECT 3"}
+
+
+@pytest.mark.asyncio
+async def test_numpy_index_loads_from_redis():
+    index = NumpyVectorIndex(dim=64, max_examples=10)
+    redis = AsyncMock()
+    redis.hgetall.return_value = {
+        "a": FewShotExample("sql", "식비 합계", "SELECT 1").to_json(),
+        "b": json.dumps({"kind": "unknown", "question": "q", "query": "x"}),
+        "c": "not-json",
+    }
+    assert await index.load(redis) == 1
+    assert (await index.search("sql", "식비 합계"))[0].query == "SELECT 1"
+
+
+@pytest.mark.asyncio
+async def test_pgvector_index_upserts_and_searches_by_cosine_distance():
+    executor = AsyncMock()
+    executor.fetch_all.return_value = [
+        {"kind": "sql", "question": "식비 합계", "query": "SELECT 1", "score": 0.9},
+        {"kind": "sql", "question": "교통비", "query": "SELECT 2", "score": 0.1},
+    ]
+    index = PgVectorIndex(executor=executor, dim=8, max_examples=100)
+
+    await index.add("sql", "식비 합계", "SELECT 1")
+    statements = [c.args[0] for c in executor.execute.call_args_list]
+    assert statements[0] == "CREATE EXTENSION IF NOT EXISTS vector"
+    assert "vector(8)" in statements[1] and "hnsw" in statements[2]
+    assert "ON CONFLICT (id) DO UPDATE" in statements[3]
+    assert executor.execute.call_args_list[3].args[1]["embedding"].startswith("[")
+
+    hits = await index.search("sql", "이번 달 식비 합계", k=2, min_score=0.3)
+    query, params = executor.fetch_all.call_args.args
+    assert "ORDER BY embedding <=> CAST(:embedding AS vector) LIMIT :k" in query
+    assert params["kind"] == "sql" and params["k"] == 2
+    assert [h.query for h in hits] == ["SELECT 1"]
+    # 테이블 준비 DDL은 한 번만 실행
+    assert sum("CREATE EXTENSION" in c.args[0] for c in executor.execute.call_args_list) == 1
+
+
+def test_format_examples_and_factory():
+    assert format_examples([], "SQL") == ""
+    block = format_examples([FewShotExample("sql", "식비 합계", "SELECT 1")], "SQL")
+    assert "질문: 식비 합계\nSQL: SELECT 1" in block
+    assert isinstance(create_few_shot_index("numpy"), NumpyVectorIndex)
+    with pytest.raises(ValueError):
+        create_few_shot_index("faiss")
@@ -6,7 +6,7 @@ UnifiedLlmClient 유닛 테스트 모듈
 import pytest
 import httpx
 from unittest.mock import AsyncMock, patch, MagicMock
-from household_ledger.infrastructure.llm_client import UnifiedLlmClient
+from household_ledger.infrastructure.llm_client import UnifiedLlmClient, LlmClientRegistry
 
 
 @pytest.mark.asyncio
@@ -105,4 +105,50 @@ async def test_unified_llm_client_timeout():
         with pytest.raises(httpx.TimeoutException):
             await client.generate_text("test")
             
-    print("✅ 네트워크 타임아웃 예외 처리 테스트 통과")
\ No newline at end of file
+    print("✅ 네트워크 타임아웃 예외 처리 테스트 통과")
+
+@pytest.mark.asyncio
+async def test_unified_llm_client_retries_on_503():
+    """
+    서버 일시 오류(503) 응답 시 백오프 후 재시도하여 성공 응답을 반환하는지 검증합니다.
+    """
+    client = UnifiedLlmClient(
+        api_key="test_key", 
+        base_url="https://api.example.com", 
+        model_name="test-model"
+    )
+    
+    busy = MagicMock(status_code=503, headers={})
+    ok = MagicMock(status_code=200)
+    ok.json.return_value = {"choices": [{"message": {"content": "PASS"}}]}
+    
+    with patch("httpx.AsyncClient.post", new_callable=AsyncMock, side_effect=[busy, ok]) as mock_post, \
+         patch("household_ledger.infrastructure.llm_client.asyncio.sleep", new_callable=AsyncMock) as mock_sleep:
+        result = await client.generate_text("test")
+        
+        assert result == "PASS"
+        assert mock_post.call_count == 2
+        mock_sleep.assert_awaited_once()
+            
+    print("✅ 503 재시도(백오프) 테스트 통과")
+
+
+@pytest.mark.asyncio
+async def test_llm_registry_reuses_clients_within_loop():
+    """
+    같은 이벤트 루프 안에서는 HTTP 클라이언트와 ChatOpenAI 객체를 재사용하고,
+    aclose 이후에는 커넥션 풀이 정리되는지 검증합니다.
+    """
+    registry = LlmClientRegistry()
+    
+    http_1 = registry.get_http_client()
+    http_2 = registry.get_http_client()
+    assert http_1 is http_2
+    assert registry.get_chat_model() is registry.get_chat_model()
+    
+    await registry.aclose()
+    assert http_1.is_closed
+    assert registry.get_http_client() is not http_1
+    await registry.aclose()
+            
+    print("✅ LLM 클라이언트 레지스트리 재사용 테스트 통과")
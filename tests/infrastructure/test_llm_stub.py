@@ -0,0 +1,72 @@
+"""
+LLM 대역 서버 유닛 테스트 모듈
+OpenAI 호환 응답(일반/스트리밍), 프롬프트별 규칙 응답, 오류 주입, LangChain 클라이언트 호환성을 검증합니다.
+"""
+
+import json
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from langchain_openai import ChatOpenAI
+from household_ledger.infrastructure.llm_stub import StubProfile, create_stub_app, rule_response
+
+
+def chat(client, content, **extra):
+    return client.post("/v1/chat/completions", json={
+        "model": "test", "messages": [{"role": "user", "content": content}], **extra
+    })
+
+
+def test_rule_responses_follow_prompt_kind():
+    assert json.loads(rule_response("당신은 가계부 에이전트의 경로 결정자입니다.\n질문: 이번 달 식비 얼마야?")) == {"intent": "SQL"}
+    assert rule_response("PostgreSQL 쿼리를 작성하세요.\n질문: 카테고리별 지출").startswith("SELECT category")
+    assert "ANY(:merchant_ids)" in rule_response("PostgreSQL 쿼리\n질문: 합계\n4. :merchant_ids 파라미터")
+    assert rule_response("이전 대화:\nQ: 지난달 식비\n현재 질문: 교통비는?\n완성된 질문 하나만 작성하세요.") == "교통비는?"
+    # 스크립트 규칙이 가장 우선
+    assert rule_response("질문: 아무거나", [{"match": "아무거나", "response": "고정 응답"}]) == "고정 응답"
+
+
+def test_non_streaming_completion_reports_usage():
+    client = TestClient(create_stub_app())
+    res = chat(client, "PostgreSQL 쿼리를 작성하세요.\n질문: 총 지출 얼마야?")
+
+    body = res.json()
+    assert res.status_code == 200
+    assert body["choices"][0]["message"]["content"] == "SELECT SUM(amount) AS total_amount FROM transactions"
+    assert body["usage"]["completion_tokens"] == 6
+    assert body["usage"]["total_tokens"] == body["usage"]["prompt_tokens"] + 6
+
+
+def test_streaming_completion_sends_chunks_usage_and_done():
+    client = TestClient(create_stub_app())
+    res = chat(client, "데이터: []\n질문: 요약해줘", stream=True, stream_options={"include_usage": True})
+
+    lines = [line[6:] for line in res.text.split("\n\n") if line.startswith("data: ")]
+    assert lines[-1] == "[DONE]"
+    chunks = [json.loads(line) for line in lines[:-1]]
+    content = "".join(c["choices"][0]["delta"].get("content", "") for c in chunks if c["choices"])
+    assert len(chunks) > 5 and content.startswith("요청하신 기간의")
+    assert chunks[-1]["usage"]["completion_tokens"] == len(chunks) - 3   # role/stop/usage 청크 제외
+
+
+def test_error_injection_returns_retryable_status():
+    client = TestClient(create_stub_app(StubProfile(error_rate=1.0, error_status=429, seed=1)))
+    res = chat(client, "질문: 안녕")
+    assert res.status_code == 429
+    assert res.headers["Retry-After"] == "1"
+    assert client.get("/stats").json()["errors"] == 1
+
+
+@pytest.mark.asyncio
+async def test_langchain_chat_model_works_against_stub():
+    """앱이 사용하는 ChatOpenAI가 대역 서버 응답(일반/스트리밍)을 그대로 해석해야 합니다."""
+    transport = httpx.ASGITransport(app=create_stub_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://stub") as http_client:
+        llm = ChatOpenAI(model="stub", base_url="http://stub/v1", api_key="none", max_retries=0,
+                         http_async_client=http_client, stream_usage=True)
+        res = await llm.ainvoke("당신은 가계부 에이전트의 경로 결정자입니다.\n질문: 안녕")
+        assert json.loads(res.content) == {"intent": "GENERAL"}
+        assert res.usage_metadata["output_tokens"] == 2
+
+        chunks = [chunk async for chunk in llm.astream("질문: 이번 달 요약")]
+        assert "".join(c.content for c in chunks).startswith("요청하신")
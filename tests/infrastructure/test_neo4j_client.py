@@ -44,4 +44,30 @@ def test_neo4j_execute_query_success(mocker):
         # 실제 세션의 run 메서드가 호출되었는가?
         assert mock_session.run.called
         
-    print("✅ Neo4jClient 쿼리 실행 및 파싱 테스트 통과")
\ No newline at end of file
+    print("✅ Neo4jClient 쿼리 실행 및 파싱 테스트 통과")
+
+@pytest.mark.asyncio
+async def test_neo4j_aexecute_query_read_only_session():
+    """
+    aexecute_query가 비동기 드라이버의 읽기 전용 세션에서 쿼리를 실행하는지 검증합니다.
+    """
+    from unittest.mock import AsyncMock
+    from neo4j import READ_ACCESS
+
+    mock_result = MagicMock()
+    mock_result.data = AsyncMock(return_value=[{"merchant_id": "M1"}])
+    mock_session = MagicMock()
+    mock_session.run = AsyncMock(return_value=mock_result)
+    mock_async_driver = MagicMock()
+    mock_async_driver.session.return_value.__aenter__ = AsyncMock(return_value=mock_session)
+    mock_async_driver.session.return_value.__aexit__ = AsyncMock(return_value=False)
+
+    with patch("neo4j.GraphDatabase.driver"), \
+         patch("household_ledger.infrastructure.neo4j_client.AsyncGraphDatabase.driver", return_value=mock_async_driver):
+        client = Neo4jClient()
+        res = await client.aexecute_query("MATCH (m:Merchant) RETURN m.id AS merchant_id")
+
+        assert res == [{"merchant_id": "M1"}]
+        assert mock_async_driver.session.call_args.kwargs["default_access_mode"] == READ_ACCESS
+
+    print("✅ Neo4jClient 비동기 읽기 전용 쿼리 테스트 통과")
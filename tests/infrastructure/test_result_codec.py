@@ -0,0 +1,44 @@
+"""
+결과 직렬화(result_codec) 유닛 테스트 모듈
+DB 값(Decimal, 날짜/시간)의 JSON 변환과 records/columnar 결과 형식을 검증합니다.
+"""
+
+import json
+import uuid
+import pytest
+from decimal import Decimal
+from datetime import date, datetime, time
+from household_ledger.infrastructure.result_codec import (
+    dumps, format_result, rows_to_records, to_columnar, to_jsonable
+)
+
+
+def test_to_jsonable_handles_driver_types():
+    assert to_jsonable(Decimal("5000")) == 5000 and isinstance(to_jsonable(Decimal("5000")), int)
+    assert to_jsonable(Decimal("12.5")) == 12.5
+    assert to_jsonable(date(2024, 1, 2)) == "2024-01-02"
+    assert to_jsonable(datetime(2024, 1, 2, 3, 4, 5)) == "2024-01-02T03:04:05"
+    assert to_jsonable(time(9, 30)) == "09:30:00"
+    assert to_jsonable([Decimal("1.5"), None]) == [1.5, None]
+    uid = uuid.uuid4()
+    assert to_jsonable(uid) == str(uid)
+
+
+def test_rows_to_records_and_columnar():
+    records = rows_to_records(["category", "amount"], [("식비", Decimal("10")), ("교통", Decimal("2.5"))])
+    assert records == [{"category": "식비", "amount": 10}, {"category": "교통", "amount": 2.5}]
+
+    assert to_columnar(records) == {"columns": ["category", "amount"], "data": [["식비", "교통"], [10, 2.5]]}
+    # 빈 결과에서도 컬럼 목록은 유지
+    assert to_columnar([], ["category"]) == {"columns": ["category"], "data": [[]]}
+
+
+def test_format_result_rejects_unknown_format():
+    assert format_result([{"n": 1}]) == [{"n": 1}]
+    with pytest.raises(ValueError):
+        format_result([], "arrow")
+
+
+def test_dumps_serializes_decimal_and_dates():
+    payload = {"amount": Decimal("1.25"), "day": date(2024, 1, 2), "name": "식비"}
+    assert json.loads(dumps(payload)) == {"amount": 1.25, "day": "2024-01-02", "name": "식비"}
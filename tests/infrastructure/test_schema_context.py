@@ -0,0 +1,61 @@
+import pytest
+from datetime import date
+from unittest.mock import AsyncMock, patch
+from household_ledger.infrastructure.schema_context import SchemaContext, describe_models
+
+OVERVIEW = [{"account_count": 3, "transaction_count": 12500, "first_date": date(2007, 1, 1), "last_date": date(2010, 12, 31)}]
+CATEGORIES = [{"category": "식비", "txn_count": 900}, {"category": "교통", "txn_count": 300}]
+MERCHANTS = [{"merchant_id": "M1", "category": "식비", "txn_count": 500}]
+ACCOUNT_TYPES = [{"account_type": "CREDITCARD", "account_count": 3}]
+
+def profile_results():
+    return [OVERVIEW, CATEGORIES, MERCHANTS, ACCOUNT_TYPES]
+
+def test_describe_models_excludes_internal_tables():
+    schema = describe_models()
+    assert "Table: transactions" in schema
+    assert "ingest_watermarks" not in schema
+    # 두 번째 호출부터는 같은 문자열을 재사용
+    assert describe_models() is schema
+
+@pytest.mark.asyncio
+async def test_get_builds_profile_once_per_data_version():
+    context = SchemaContext()
+    with patch("household_ledger.infrastructure.schema_context.sql_executor.fetch_all", new_callable=AsyncMock) as mock_fetch:
+        mock_fetch.side_effect = profile_results() + profile_results()
+
+        prompt = await context.get("1")
+        assert prompt.startswith(describe_models())
+        assert "약 12,500건, transaction_date 범위 2007-01-01 ~ 2010-12-31" in prompt
+        assert "account_type 값: 'CREDITCARD'" in prompt
+        assert "category 값 (거래 건수 순): '식비', '교통'" in prompt
+        assert "'M1'(식비)" in prompt
+
+        # 같은 버전은 캐시 사용 (재시도 루프에서도 DB 조회 없음)
+        assert await context.get("1") is prompt
+        assert mock_fetch.await_count == 4
+
+        # 적재로 데이터 버전이 바뀌면 다시 생성
+        await context.get("2")
+        assert mock_fetch.await_count == 8
+
+@pytest.mark.asyncio
+async def test_get_falls_back_to_model_schema_and_retries_later():
+    context = SchemaContext()
+    with patch("household_ledger.infrastructure.schema_context.sql_executor.fetch_all", new_callable=AsyncMock) as mock_fetch, \
+         patch("household_ledger.infrastructure.schema_context.settings.SCHEMA_CONTEXT_RETRY_SECONDS", 0.0):
+        mock_fetch.side_effect = [ConnectionError("db down")] * 4 + profile_results()
+
+        assert await context.get("1") == describe_models()
+        # 재시도 간격이 지나면 같은 버전이라도 다시 조회
+        assert "데이터 요약" in await context.get("1")
+
+@pytest.mark.asyncio
+async def test_invalidate_forces_rebuild():
+    context = SchemaContext()
+    with patch("household_ledger.infrastructure.schema_context.sql_executor.fetch_all", new_callable=AsyncMock) as mock_fetch:
+        mock_fetch.side_effect = profile_results() + profile_results()
+        await context.get("1")
+        context.invalidate()
+        await context.get("1")
+        assert mock_fetch.await_count == 8
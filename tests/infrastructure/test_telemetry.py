@@ -0,0 +1,43 @@
+"""
+텔레메트리 유닛 테스트 모듈
+Prometheus 텍스트 형식 렌더링과 노드별 LLM 토큰 집계를 검증합니다.
+"""
+
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+from household_ledger.infrastructure.telemetry import MetricsRegistry, TokenUsageCallback, current_node, metrics
+
+
+def test_registry_renders_prometheus_text():
+    registry = MetricsRegistry()
+    registry.inc("ledger_node_runs_total", {"node": "router", "status": "ok"})
+    registry.inc("ledger_node_runs_total", {"node": "router", "status": "ok"})
+    registry.observe("ledger_node_duration_seconds", 0.2, {"node": "router"})
+    registry.observe("ledger_sql_rows", 42)
+
+    text = registry.render()
+    assert "# TYPE ledger_node_runs_total counter" in text
+    assert 'ledger_node_runs_total{node="router",status="ok"} 2.0' in text
+    assert 'ledger_node_duration_seconds_bucket{node="router",le="0.25"} 1' in text
+    assert 'ledger_node_duration_seconds_bucket{node="router",le="0.1"} 0' in text
+    assert 'ledger_node_duration_seconds_count{node="router"} 1' in text
+    assert 'ledger_sql_rows_bucket{le="50"} 1' in text
+    assert registry.value("ledger_node_runs_total", {"node": "router", "status": "ok"}) == 2
+
+
+@pytest.mark.asyncio
+async def test_token_callback_attributes_usage_to_current_node():
+    metrics.reset()
+    message = AIMessage(content="SELECT 1", usage_metadata={"input_tokens": 120, "output_tokens": 8, "total_tokens": 128})
+    result = LLMResult(generations=[[ChatGeneration(message=message)]])
+
+    token = current_node.set("sql_gen")
+    try:
+        await TokenUsageCallback().on_llm_end(result)
+    finally:
+        current_node.reset(token)
+
+    assert metrics.value("ledger_llm_calls_total", {"node": "sql_gen"}) == 1
+    assert metrics.value("ledger_llm_tokens_total", {"node": "sql_gen", "kind": "prompt"}) == 120
+    assert metrics.value("ledger_llm_tokens_total", {"node": "sql_gen", "kind": "completion"}) == 8
@@ -0,0 +1,197 @@
+"""
+FastAPI 엔드포인트 테스트 모듈
+스트리밍 분석 API가 노드 완료 이벤트와 분석 토큰을 SSE 형식으로 전송하는지 검증합니다.
+"""
+
+import json
+import re
+from unittest.mock import AsyncMock, patch
+from fastapi.testclient import TestClient
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+from household_ledger.main import app, format_sse, NODE_EVENT_FIELDS
+
+
+def parse_sse(body: str):
+    """SSE 본문을 (event, data) 리스트로 변환"""
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_format_sse():
+    assert format_sse("node", {"node": "router", "next_step": "SQL"}) == \
+        'event: node\ndata: {"node":"router","next_step":"SQL"}\n\n'
+    # Decimal/날짜 값도 그대로 직렬화
+    from decimal import Decimal
+    from datetime import date
+    assert format_sse("done", {"v": Decimal("1.5"), "d": date(2024, 1, 2)}) == \
+        'event: done\ndata: {"v":1.5,"d":"2024-01-02"}\n\n'
+
+
+def test_retry_count_reported_by_validate_sql_event():
+    """retry_count는 검증 노드가 증가시키므로 validate_sql 이벤트에 담겨야 합니다."""
+    out = {"error": "VALIDATION_FAIL: unknown column", "retry_count": 1, "sql_query": "SELECT x FROM transactions"}
+    assert NODE_EVENT_FIELDS["validate_sql"](out)["retry_count"] == 1
+    assert "retry_count" not in NODE_EVENT_FIELDS["sql_gen"]({"sql_query": "SELECT 1"})
+
+
+def test_analyze_stream_emits_nodes_tokens_and_done():
+    """GENERAL 경로: 노드 이벤트 -> 분석 토큰 -> done 순서로 전송되어야 합니다."""
+    # 인사는 로컬 분류기가 GENERAL로 결정하므로 분석 응답만 준비
+    llm = GenericFakeChatModel(messages=iter([
+        AIMessage(content="안녕하세요 가계부 도우미입니다"),
+    ]))
+
+    with patch("household_ledger.graph.nodes.get_llm", return_value=llm), \
+         patch("household_ledger.graph.nodes.redis_client", new_callable=AsyncMock):
+        client = TestClient(app)
+        res = client.post("/api/v1/analyze/stream", json={
+            "user_id": "u1", "session_id": "s1", "question": "안녕"
+        })
+
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("text/event-stream")
+
+    events = parse_sse(res.text)
+    kinds = [kind for kind, _ in events]
+    nodes = [data["node"] for kind, data in events if kind == "node"]
+
+    assert nodes[:4] == ["refiner", "cache_check", "sql_template", "router"]
+    assert {"node": "router", "next_step": "GENERAL"} in [d for k, d in events if k == "node"]
+
+    # 토큰은 done보다 먼저, 여러 조각으로 도착해야 함 (TTFB 개선)
+    tokens = [data["content"] for kind, data in events if kind == "token"]
+    assert len(tokens) > 1
+    assert "".join(tokens) == "안녕하세요 가계부 도우미입니다"
+    assert kinds.index("token") < kinds.index("done")
+
+    done = events[-1]
+    assert done[0] == "done"
+    assert done[1]["analysis"] == "안녕하세요 가계부 도우미입니다"
+    assert done[1]["next_step"] == "GENERAL"
+    assert done[1]["sql_result"] == []
+
+
+def test_analyze_stream_columnar_result_format():
+    """result_format=columnar 요청 시 sql_result를 컬럼별 값 리스트로 반환해야 합니다."""
+    final_state = {"next_step": "SQL", "analysis": "합계입니다", "sql_columns": ["category", "amount"],
+                   "sql_result": [{"category": "식비", "amount": 10}, {"category": "교통", "amount": 5}]}
+
+    async def fake_events(*args, **kwargs):
+        yield {"event": "on_chain_end", "name": "LangGraph", "metadata": {}, "parent_ids": [],
+               "data": {"output": final_state}}
+
+    with patch("household_ledger.main.graph.astream_events", side_effect=fake_events):
+        client = TestClient(app)
+        res = client.post("/api/v1/analyze/stream", json={
+            "user_id": "u1", "session_id": "s1", "question": "카테고리별 합계", "result_format": "columnar"
+        })
+
+    kind, done = parse_sse(res.text)[-1]
+    assert kind == "done" and done["result_format"] == "columnar"
+    assert done["sql_result"] == {"columns": ["category", "amount"], "data": [["식비", "교통"], [10, 5]]}
+
+
+def test_analyze_columnar_result_format():
+    """스트리밍이 아닌 /api/v1/analyze도 요청한 형식의 sql_result를 반환해야 합니다."""
+    final_state = {"next_step": "SQL", "analysis": "합계입니다", "sql_columns": ["category", "amount"],
+                   "sql_result": [{"category": "식비", "amount": 10}, {"category": "교통", "amount": 5}]}
+    with patch("household_ledger.main.graph.ainvoke", new_callable=AsyncMock, return_value=final_state):
+        client = TestClient(app)
+        res = client.post("/api/v1/analyze", json={
+            "user_id": "u1", "session_id": "s1", "question": "카테고리별 합계", "result_format": "columnar"
+        })
+
+    assert res.status_code == 200
+    assert res.json()["result_format"] == "columnar"
+    assert res.json()["sql_result"] == {"columns": ["category", "amount"], "data": [["식비", "교통"], [10, 5]]}
+
+
+def test_analyze_page_token_skips_llm_pipeline():
+    """page_token 요청은 워크플로우를 실행하지 않고 저장된 커서로 다음 페이지만 반환해야 합니다."""
+    page = (["n"], [{"n": 3}], {"offset": 3, "row_count": 1, "truncated": False})
+    with patch("household_ledger.main.load_result_page", new_callable=AsyncMock, side_effect=[page, None]), \
+         patch("household_ledger.main.graph.ainvoke", new_callable=AsyncMock) as mock_invoke:
+        client = TestClient(app)
+        body = {"user_id": "u1", "session_id": "s1", "question": "거래 목록", "page_token": "tok"}
+        res = client.post("/api/v1/analyze", json=body)
+        expired = client.post("/api/v1/analyze", json=body)
+
+    assert res.status_code == 200
+    assert res.json()["sql_result"] == [{"n": 3}] and res.json()["result_page"]["offset"] == 3
+    assert expired.status_code == 404
+    mock_invoke.assert_not_called()
+
+
+def test_analyze_pages_through_truncated_result():
+    """잘린 결과의 첫 페이지 행은 next_page_token과 같은 응답에 담겨야 하며, 토큰을 따라가면 빠짐없이 이어져야 합니다."""
+    from household_ledger.graph.nodes import execute_sql_logic
+
+    table = [{"n": i} for i in range(5)]
+    store = {}
+
+    async def fake_fetch(sql, params=None, max_rows=None):
+        limit = re.search(r"LIMIT (\d+)", sql)
+        offset = re.search(r"OFFSET (\d+)", sql)
+        start = int(offset.group(1)) if offset else 0
+        return ["n"], table[start:start + int(limit.group(1))]
+
+    async def fake_setex(key, ttl, value):
+        store[key] = value
+
+    async def fake_get(key):
+        return store.get(key)
+
+    async def fake_invoke(state, *args, **kwargs):
+        sql_state = {"sql_query": "SELECT n FROM t ORDER BY n", "error": None, "user_id": state["user_id"]}
+        return {**state, **sql_state, **await execute_sql_logic(sql_state), "analysis": "목록입니다"}
+
+    with patch("household_ledger.graph.nodes.settings.SQL_MAX_RESULT_ROWS", 2), \
+         patch("household_ledger.graph.nodes.sql_executor.fetch_records", side_effect=fake_fetch), \
+         patch("household_ledger.graph.nodes.sql_executor.explain", new_callable=AsyncMock, return_value={"Plan Rows": 5}), \
+         patch("household_ledger.graph.nodes.redis_client", new_callable=AsyncMock) as mock_redis, \
+         patch("household_ledger.main.graph.ainvoke", side_effect=fake_invoke):
+        mock_redis.setex.side_effect = fake_setex
+        mock_redis.get.side_effect = fake_get
+        client = TestClient(app)
+        body = {"user_id": "u1", "session_id": "s1", "question": "거래 목록"}
+        res = client.post("/api/v1/analyze", json=body).json()
+        assert res["analysis"] == "목록입니다" and res["result_page"]["truncated"] is True
+
+        collected = list(res["sql_result"])
+        while res["result_page"].get("next_page_token"):
+            res = client.post("/api/v1/analyze", json={**body, "page_token": res["result_page"]["next_page_token"]}).json()
+            collected += res["sql_result"]
+
+    assert collected == table
+
+
+def test_metrics_endpoint_exposes_node_metrics():
+    """GENERAL 경로 실행 후 /metrics에 노드별 지연 시간과 실행 횟수가 노출되어야 합니다."""
+    llm = GenericFakeChatModel(messages=iter([AIMessage(content="안녕하세요")]))
+    with patch("household_ledger.graph.nodes.get_llm", return_value=llm), \
+         patch("household_ledger.graph.nodes.redis_client", new_callable=AsyncMock):
+        client = TestClient(app)
+        client.post("/api/v1/analyze", json={"user_id": "u1", "session_id": "s1", "question": "안녕"})
+        res = client.get("/metrics")
+
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("text/plain")
+    assert 'ledger_node_runs_total{node="analyzer",status="ok"}' in res.text
+    assert 'ledger_node_duration_seconds_count{node="router"}' in res.text
+
+
+def test_analyze_stream_reports_errors_as_events():
+    """워크플로우 예외는 HTTP 200 스트림 안에서 error 이벤트로 전달되어야 합니다."""
+    with patch("household_ledger.main.graph.astream_events", side_effect=RuntimeError("boom")):
+        client = TestClient(app)
+        res = client.post("/api/v1/analyze/stream", json={
+            "user_id": "u1", "session_id": "s1", "question": "안녕"
+        })
+
+    events = parse_sse(res.text)
+    assert events == [("error", {"detail": "서버 내부 오류: boom"})]